@@ -7,5 +7,32 @@ Contains API clients for different LLM providers and unified management interfac
 from .openai_api_client import OpenAIClient
 from .claude_api_client import ClaudeAPIClient
 from .llm_manager import DynamicLLMManager
+from .http_transport import HTTPTransport, get_http_transport, configure_http_transport
+from .replay_transport import RecordReplayTransport, configure_replay_transport
+from .async_support import set_async_concurrency, run_with_provider_limit
+from .response_cache import LLMResponseCache, get_response_cache, set_cache_bypass
+from .rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from .key_pool import APIKeyPool, get_key_pool, load_api_keys
+from .tokenizer import estimate_tokens, register_tokenizer
+from .document_packing import pack_documents
+from .metering import LLMMeter, get_meter, metering_stage, metered_stage
+from .single_flight import SingleFlight, get_single_flight, bypass_single_flight
+from .resilience import CircuitBreaker, get_circuit_breaker, hedged_call
+from .adaptive_timeout import AdaptiveTimeout, get_adaptive_timeout
+from .structured_output import RESPONSE_SCHEMAS, get_response_schema, get_parse_stats, parse_json_response
+from .batch_runner import BatchRequest, BatchRunner, LocalBatchBackend, OpenAIBatchBackend, ClaudeBatchBackend
 
-__all__ = ['OpenAIClient', 'ClaudeAPIClient', 'DynamicLLMManager'] 
\ No newline at end of file
+__all__ = ['OpenAIClient', 'ClaudeAPIClient', 'DynamicLLMManager',
+           'HTTPTransport', 'get_http_transport', 'configure_http_transport',
+           'RecordReplayTransport', 'configure_replay_transport',
+           'set_async_concurrency', 'run_with_provider_limit',
+           'LLMResponseCache', 'get_response_cache', 'set_cache_bypass',
+           'AdaptiveRateLimiter', 'get_rate_limiter',
+           'APIKeyPool', 'get_key_pool', 'load_api_keys',
+           'estimate_tokens', 'register_tokenizer', 'pack_documents',
+           'LLMMeter', 'get_meter', 'metering_stage', 'metered_stage',
+           'SingleFlight', 'get_single_flight', 'bypass_single_flight',
+           'CircuitBreaker', 'get_circuit_breaker', 'hedged_call',
+           'AdaptiveTimeout', 'get_adaptive_timeout',
+           'RESPONSE_SCHEMAS', 'get_response_schema', 'get_parse_stats', 'parse_json_response',
+           'BatchRequest', 'BatchRunner', 'LocalBatchBackend', 'OpenAIBatchBackend', 'ClaudeBatchBackend'] 
\ No newline at end of file
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Adaptive Timeout - 按请求的输出长度和实测生成速度计算超时
+固定超时会在长输出时把仍在生成的请求杀掉并从头重试；这里按模型记录每token耗时与首token延迟（EWMA），
+非流式请求的超时随max_tokens线性增长，流式请求只限制两次数据之间的空闲时间
+"""
+
+import os
+import threading
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 尚无实测数据时的保守估计
+DEFAULT_SECONDS_PER_TOKEN = float(os.getenv('LLM_TIMEOUT_SECONDS_PER_TOKEN', '0.05'))
+DEFAULT_FIRST_TOKEN_SECONDS = 10.0
+# 超时 = 安全系数 x 预计耗时
+TIMEOUT_SAFETY_FACTOR = 2.0
+MIN_REQUEST_TIMEOUT = 30.0
+MAX_REQUEST_TIMEOUT = float(os.getenv('LLM_MAX_REQUEST_TIMEOUT', '600'))
+CONNECT_TIMEOUT = 10.0
+# 流式请求两次数据之间允许的最长空闲
+MIN_STREAM_IDLE_TIMEOUT = 30.0
+MAX_STREAM_IDLE_TIMEOUT = 180.0
+# 流式请求的总时长上限（仍在输出时不中断，仅防止异常的无限输出）
+MAX_STREAM_SECONDS = float(os.getenv('LLM_MAX_STREAM_SECONDS', '1800'))
+# 输出太短的样本不参与每token耗时估计
+MIN_TOKENS_FOR_SAMPLE = 20
+EWMA_ALPHA = 0.2
+
+
+class _ModelTimeoutStats:
+    """单个模型的延迟估计与超时统计"""
+
+    def __init__(self):
+        self.seconds_per_token = DEFAULT_SECONDS_PER_TOKEN
+        self.first_token_seconds = DEFAULT_FIRST_TOKEN_SECONDS
+        self.samples = 0
+        self.requests = 0
+        self.successes = 0
+        self.timeouts = 0
+        self.timeout_total = 0.0
+        self.max_elapsed_ratio = 0.0
+
+
+class AdaptiveTimeout:
+    """按模型维护的自适应超时（线程安全）"""
+
+    def __init__(self):
+        self._models: Dict[str, _ModelTimeoutStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> _ModelTimeoutStats:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = _ModelTimeoutStats()
+            self._models[model] = stats
+        return stats
+
+    def request_timeout(self, model: str, max_tokens: int, stream: bool = False) -> Tuple[float, float]:
+        """
+        计算requests使用的 (连接超时, 读取超时)
+
+        非流式：读取超时覆盖整个生成过程，按max_tokens缩放；
+        流式：读取超时只是两次数据之间的空闲上限，由首token延迟决定
+        """
+        with self._lock:
+            stats = self._get(model)
+            spt, ttft = stats.seconds_per_token, stats.first_token_seconds
+            stats.requests += 1
+
+        if stream:
+            read_timeout = min(MAX_STREAM_IDLE_TIMEOUT, max(MIN_STREAM_IDLE_TIMEOUT, TIMEOUT_SAFETY_FACTOR * ttft + 10))
+        else:
+            expected = ttft + max(max_tokens or 0, 0) * spt
+            read_timeout = min(MAX_REQUEST_TIMEOUT, max(MIN_REQUEST_TIMEOUT, TIMEOUT_SAFETY_FACTOR * expected))
+
+        with self._lock:
+            self._get(model).timeout_total += read_timeout
+        return CONNECT_TIMEOUT, read_timeout
+
+    def record_success(self, model: str, elapsed: float, output_tokens: int,
+                       first_token_latency: Optional[float] = None,
+                       timeout: Optional[Tuple[float, float]] = None):
+        """记录一次成功的请求，更新每token耗时与首token延迟"""
+        with self._lock:
+            stats = self._get(model)
+            stats.successes += 1
+            if timeout:
+                stats.max_elapsed_ratio = max(stats.max_elapsed_ratio, elapsed / timeout[1])
+
+            if first_token_latency is not None:
+                stats.first_token_seconds += EWMA_ALPHA * (first_token_latency - stats.first_token_seconds)
+                generation_time = max(elapsed - first_token_latency, 0.0)
+            else:
+                # 非流式无法区分首token延迟，整体计入（偏保守）
+                generation_time = elapsed
+            if output_tokens and output_tokens >= MIN_TOKENS_FOR_SAMPLE:
+                stats.seconds_per_token += EWMA_ALPHA * (generation_time / output_tokens - stats.seconds_per_token)
+                stats.samples += 1
+
+    def record_timeout(self, model: str, elapsed: float, timeout: Optional[Tuple[float, float]] = None):
+        """记录一次超时"""
+        with self._lock:
+            self._get(model).timeouts += 1
+        read_timeout = timeout[1] if timeout else 0
+        logger.warning(f"⏰ {model} 请求超时 (已等待 {elapsed:.1f}s, 读取超时 {read_timeout:.0f}s)")
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """按模型的超时与成功统计"""
+        with self._lock:
+            return {
+                model: {
+                    'requests': s.requests,
+                    'successes': s.successes,
+                    'timeouts': s.timeouts,
+                    'timeout_rate': round(s.timeouts / s.requests, 4) if s.requests else 0.0,
+                    'avg_timeout': round(s.timeout_total / s.requests, 1) if s.requests else 0.0,
+                    'max_elapsed_ratio': round(s.max_elapsed_ratio, 3),
+                    'seconds_per_token': round(s.seconds_per_token, 4),
+                    'first_token_seconds': round(s.first_token_seconds, 2),
+                    'latency_samples': s.samples
+                }
+                for model, s in self._models.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+
+_adaptive_timeout: Optional[AdaptiveTimeout] = None
+_adaptive_timeout_lock = threading.Lock()
+
+
+def get_adaptive_timeout() -> AdaptiveTimeout:
+    """获取全局共享的自适应超时"""
+    global _adaptive_timeout
+    if _adaptive_timeout is None:
+        with _adaptive_timeout_lock:
+            if _adaptive_timeout is None:
+                _adaptive_timeout = AdaptiveTimeout()
+    return _adaptive_timeout
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Async Support - 异步调用与按提供商的并发限制
+在事件循环中调度同步客户端调用（复用共享HTTP连接池），每个提供商独立的信号量限制在途请求数
+"""
+
+import os
+import asyncio
+import threading
+import functools
+import weakref
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 每个提供商默认的最大在途请求数
+DEFAULT_ASYNC_CONCURRENCY = int(os.getenv('LLM_ASYNC_MAX_CONCURRENCY', '32'))
+
+_concurrency_limits: Dict[str, int] = {}
+_executors: Dict[str, ThreadPoolExecutor] = {}
+# 事件循环 -> {provider: Semaphore}，循环关闭后自动释放
+_semaphores: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+# 线程侧（同步代码中的并发map）共享的提供商信号量
+_thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_lock = threading.Lock()
+
+
+def set_async_concurrency(provider: str, limit: int):
+    """设置某个提供商的最大在途请求数（对之后的调用生效）"""
+    if limit < 1:
+        raise ValueError("并发限制必须 >= 1")
+    with _lock:
+        _concurrency_limits[provider] = limit
+        old_executor = _executors.pop(provider, None)
+        for loop_semaphores in _semaphores.values():
+            loop_semaphores.pop(provider, None)
+        _thread_semaphores.pop(provider, None)
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+    logger.info(f"{provider} 异步并发限制: {limit}")
+
+
+def get_async_concurrency(provider: str) -> int:
+    """获取某个提供商的最大在途请求数"""
+    return _concurrency_limits.get(provider, DEFAULT_ASYNC_CONCURRENCY)
+
+
+def _get_executor(provider: str) -> ThreadPoolExecutor:
+    """获取提供商专用线程池"""
+    with _lock:
+        executor = _executors.get(provider)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=get_async_concurrency(provider),
+                thread_name_prefix=f"llm-{provider}"
+            )
+            _executors[provider] = executor
+        return executor
+
+
+def _get_semaphore(provider: str) -> asyncio.Semaphore:
+    """获取当前事件循环中该提供商的信号量"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        loop_semaphores = _semaphores.setdefault(loop, {})
+        semaphore = loop_semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(get_async_concurrency(provider))
+            loop_semaphores[provider] = semaphore
+        return semaphore
+
+
+async def run_with_provider_limit(provider: str, func: Callable, /, *args, **kwargs) -> Any:
+    """在提供商并发限制内异步执行同步调用（provider/func仅限位置参数，kwargs可含同名的provider）"""
+    semaphore = _get_semaphore(provider)
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        # 复制上下文，使计量阶段等contextvars在线程池中可见
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _get_executor(provider),
+            functools.partial(context.run, func, *args, **kwargs)
+        )
+
+
+def _get_thread_semaphore(provider: str) -> threading.BoundedSemaphore:
+    """获取线程侧的提供商信号量"""
+    with _lock:
+        semaphore = _thread_semaphores.get(provider)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(get_async_concurrency(provider))
+            _thread_semaphores[provider] = semaphore
+        return semaphore
+
+
+def map_with_provider_limit(provider: str, func: Callable, items: List[Any]) -> List[Any]:
+    """在同步代码中并发执行func(item)，受提供商并发限制约束，结果顺序与items一致"""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    semaphore = _get_thread_semaphore(provider)
+    context = contextvars.copy_context()
+
+    def _limited(item):
+        with semaphore:
+            return context.copy().run(func, item)
+
+    max_workers = min(len(items), get_async_concurrency(provider))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"llm-{provider}-map") as executor:
+        return list(executor.map(_limited, items))
+
+
+def submit_with_provider_limit(executor: ThreadPoolExecutor, provider: str, func: Callable, *args) -> Future:
+    """向线程池提交func(*args)，执行时受提供商并发限制约束（复制当前上下文）"""
+    semaphore = _get_thread_semaphore(provider)
+    context = contextvars.copy_context()
+
+    def _limited():
+        with semaphore:
+            return context.run(func, *args)
+
+    return executor.submit(_limited)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Batch Runner - 离线批处理模式
+把大量prompt收集为JSONL批处理任务，通过提供商Batch接口提交、轮询，再按custom_id映射回调用方。
+包含本地文件后端（LocalBatchBackend），无需网络即可测试完整流程。
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from .claude_api_client import APIResponse
+from .http_transport import HTTPTransport, get_http_transport, openai_base_url, anthropic_base_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_DIR = os.getenv(
+    'LLM_BATCH_DIR',
+    str(Path(__file__).parent.parent.parent / '.cache' / 'llm_batches')
+)
+
+# 批处理任务状态
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class BatchRequest:
+    """批处理中的单个请求"""
+    custom_id: str
+    prompt: str
+    system_prompt: Optional[str] = None
+    max_tokens: int = 4000
+    temperature: float = 0.7
+
+
+def _failed_response(model: str, error: str) -> APIResponse:
+    return APIResponse(content="", model=model, usage={}, success=False, error=error)
+
+
+class BatchBackend:
+    """批处理后端接口"""
+
+    name = "base"
+
+    def submit(self, requests: List[BatchRequest], model: str) -> str:
+        """提交批处理任务，返回任务ID"""
+        raise NotImplementedError
+
+    def poll(self, job_id: str) -> str:
+        """查询任务状态: in_progress / completed / failed"""
+        raise NotImplementedError
+
+    def fetch_results(self, job_id: str) -> Dict[str, APIResponse]:
+        """获取结果 {custom_id: APIResponse}"""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API（/v1/files + /v1/batches）"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, transport: Optional[HTTPTransport] = None,
+                 base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = base_url or openai_base_url()
+        self.transport = transport or get_http_transport()
+        self.auth_headers = {"Authorization": f"Bearer {api_key}"}
+        self._models: Dict[str, str] = {}
+
+    def submit(self, requests: List[BatchRequest], model: str) -> str:
+        lines = []
+        for req in requests:
+            messages = []
+            if req.system_prompt:
+                messages.append({"role": "system", "content": req.system_prompt})
+            messages.append({"role": "user", "content": req.prompt})
+            lines.append(json.dumps({
+                "custom_id": req.custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": messages,
+                    "max_tokens": req.max_tokens,
+                    "temperature": req.temperature
+                }
+            }, ensure_ascii=False))
+        jsonl = ("\n".join(lines) + "\n").encode('utf-8')
+
+        upload = self.transport.post(
+            f"{self.base_url}/files",
+            headers=self.auth_headers,
+            files={"file": ("batch_input.jsonl", jsonl, "application/jsonl")},
+            data={"purpose": "batch"},
+            timeout=120
+        )
+        upload.raise_for_status()
+        input_file_id = upload.json()["id"]
+
+        batch = self.transport.post(
+            f"{self.base_url}/batches",
+            headers=self.auth_headers,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            },
+            timeout=60
+        )
+        batch.raise_for_status()
+        job_id = batch.json()["id"]
+        self._models[job_id] = model
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        response = self.transport.get(f"{self.base_url}/batches/{job_id}", headers=self.auth_headers, timeout=60)
+        response.raise_for_status()
+        status = response.json().get("status")
+        if status == "completed":
+            return STATUS_COMPLETED
+        if status in ("failed", "expired", "cancelled"):
+            return STATUS_FAILED
+        return STATUS_IN_PROGRESS
+
+    def fetch_results(self, job_id: str) -> Dict[str, APIResponse]:
+        model = self._models.get(job_id, "")
+        response = self.transport.get(f"{self.base_url}/batches/{job_id}", headers=self.auth_headers, timeout=60)
+        response.raise_for_status()
+        output_file_id = response.json().get("output_file_id")
+        if not output_file_id:
+            return {}
+
+        content = self.transport.get(
+            f"{self.base_url}/files/{output_file_id}/content", headers=self.auth_headers, timeout=300
+        )
+        content.raise_for_status()
+
+        results = {}
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item.get("custom_id")
+            body = (item.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            if item.get("error") or not choices:
+                results[custom_id] = _failed_response(model, str(item.get("error") or "No choices in response"))
+                continue
+            usage = body.get("usage", {})
+            results[custom_id] = APIResponse(
+                content=choices[0]["message"]["content"].strip(),
+                model=body.get("model", model),
+                usage={
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0)
+                },
+                success=True
+            )
+        return results
+
+
+class ClaudeBatchBackend(BatchBackend):
+    """Anthropic Message Batches API（/v1/messages/batches）"""
+
+    name = "claude"
+
+    def __init__(self, api_key: str, transport: Optional[HTTPTransport] = None,
+                 base_url: Optional[str] = None):
+        self.base_url = base_url or f"{anthropic_base_url()}/v1/messages/batches"
+        self.transport = transport or get_http_transport()
+        self.headers = {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+        self._models: Dict[str, str] = {}
+
+    def submit(self, requests: List[BatchRequest], model: str) -> str:
+        batch_requests = []
+        for req in requests:
+            params = {
+                "model": model,
+                "max_tokens": req.max_tokens,
+                "temperature": req.temperature,
+                "messages": [{"role": "user", "content": req.prompt}]
+            }
+            if req.system_prompt:
+                params["system"] = req.system_prompt
+            batch_requests.append({"custom_id": req.custom_id, "params": params})
+
+        response = self.transport.post(self.base_url, headers=self.headers,
+                                       json={"requests": batch_requests}, timeout=120)
+        response.raise_for_status()
+        job_id = response.json()["id"]
+        self._models[job_id] = model
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        response = self.transport.get(f"{self.base_url}/{job_id}", headers=self.headers, timeout=60)
+        response.raise_for_status()
+        status = response.json().get("processing_status")
+        if status == "ended":
+            return STATUS_COMPLETED
+        if status == "canceling":
+            return STATUS_FAILED
+        return STATUS_IN_PROGRESS
+
+    def fetch_results(self, job_id: str) -> Dict[str, APIResponse]:
+        model = self._models.get(job_id, "")
+        response = self.transport.get(f"{self.base_url}/{job_id}", headers=self.headers, timeout=60)
+        response.raise_for_status()
+        results_url = response.json().get("results_url")
+        if not results_url:
+            return {}
+
+        content = self.transport.get(results_url, headers=self.headers, timeout=300)
+        content.raise_for_status()
+
+        results = {}
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item.get("custom_id")
+            result = item.get("result") or {}
+            if result.get("type") != "succeeded":
+                results[custom_id] = _failed_response(model, json.dumps(result.get("error") or result.get("type")))
+                continue
+            message = result.get("message") or {}
+            usage = message.get("usage", {})
+            text = message["content"][0].get("text", "") if message.get("content") else ""
+            results[custom_id] = APIResponse(
+                content=text,
+                model=message.get("model", model),
+                usage={
+                    "prompt_tokens": usage.get("input_tokens", 0),
+                    "completion_tokens": usage.get("output_tokens", 0),
+                    "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+                },
+                success=True
+            )
+        return results
+
+
+def _stub_responder(request: BatchRequest, model: str) -> APIResponse:
+    """默认本地响应：回显prompt摘要（仅用于离线测试）"""
+    content = f"[local batch:{request.custom_id}] {request.prompt[:200]}"
+    prompt_tokens = len(request.prompt) // 4
+    completion_tokens = len(content) // 4
+    return APIResponse(
+        content=content,
+        model=model,
+        usage={
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        },
+        success=True
+    )
+
+
+class LocalBatchBackend(BatchBackend):
+    """本地文件批处理后端：任务写入JSONL，poll时逐条执行并写出结果JSONL"""
+
+    name = "local"
+
+    def __init__(self, work_dir: str = DEFAULT_BATCH_DIR,
+                 responder: Optional[Callable[[BatchRequest, str], APIResponse]] = None):
+        """
+        Args:
+            work_dir: 任务文件目录
+            responder: 执行单个请求的函数 (request, model) -> APIResponse；默认回显stub，不访问网络
+        """
+        self.work_dir = Path(work_dir)
+        self.responder = responder or _stub_responder
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.work_dir / job_id
+
+    def submit(self, requests: List[BatchRequest], model: str) -> str:
+        job_id = f"local_batch_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        job_dir = self._job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(job_dir / "input.jsonl", 'w', encoding='utf-8') as f:
+            for req in requests:
+                f.write(json.dumps(asdict(req), ensure_ascii=False) + "\n")
+        with open(job_dir / "job.json", 'w', encoding='utf-8') as f:
+            json.dump({"job_id": job_id, "model": model, "status": STATUS_IN_PROGRESS,
+                       "request_count": len(requests)}, f, ensure_ascii=False, indent=2)
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        job_dir = self._job_dir(job_id)
+        with self._lock:
+            with open(job_dir / "job.json", 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            if job["status"] != STATUS_IN_PROGRESS:
+                return job["status"]
+
+            with open(job_dir / "input.jsonl", 'r', encoding='utf-8') as f_in, \
+                 open(job_dir / "output.jsonl", 'w', encoding='utf-8') as f_out:
+                for line in f_in:
+                    if not line.strip():
+                        continue
+                    req = BatchRequest(**json.loads(line))
+                    try:
+                        response = self.responder(req, job["model"])
+                    except Exception as e:
+                        response = _failed_response(job["model"], str(e))
+                    f_out.write(json.dumps({"custom_id": req.custom_id, "response": asdict(response)},
+                                           ensure_ascii=False) + "\n")
+
+            job["status"] = STATUS_COMPLETED
+            with open(job_dir / "job.json", 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False, indent=2)
+            return STATUS_COMPLETED
+
+    def fetch_results(self, job_id: str) -> Dict[str, APIResponse]:
+        output_file = self._job_dir(job_id) / "output.jsonl"
+        results = {}
+        if not output_file.exists():
+            return results
+        with open(output_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    results[item["custom_id"]] = APIResponse(**item["response"])
+        return results
+
+
+class BatchRunner:
+    """提交批处理任务、轮询并把结果映射回custom_id"""
+
+    def __init__(self, backend: BatchBackend, poll_interval: float = 30.0, timeout: float = 24 * 3600):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def run(self, requests: List[BatchRequest], model: str) -> Dict[str, APIResponse]:
+        """执行批处理，返回 {custom_id: APIResponse}（缺失的结果标记为失败）"""
+        if not requests:
+            return {}
+
+        job_id = self.backend.submit(requests, model)
+        logger.info(f"📦 批处理任务已提交 ({self.backend.name}): {job_id}, {len(requests)} 个请求")
+
+        start_time = time.time()
+        status = self.backend.poll(job_id)
+        while status == STATUS_IN_PROGRESS:
+            if time.time() - start_time > self.timeout:
+                logger.error(f"❌ 批处理任务超时: {job_id}")
+                return {req.custom_id: _failed_response(model, f"Batch {job_id} timed out") for req in requests}
+            time.sleep(self.poll_interval)
+            status = self.backend.poll(job_id)
+
+        results = self.backend.fetch_results(job_id) if status == STATUS_COMPLETED else {}
+        for req in requests:
+            if req.custom_id not in results:
+                results[req.custom_id] = _failed_response(model, f"Batch {job_id} returned no result ({status})")
+
+        succeeded = sum(1 for r in results.values() if r.success)
+        logger.info(f"✅ 批处理任务完成: {job_id}, 成功 {succeeded}/{len(requests)}, 耗时 {time.time() - start_time:.1f}s")
+        return results
+
+
+class _CaptureProxy:
+    """代理客户端：generate_text只记录参数，其他属性转发给真实客户端"""
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.captured: Dict[str, Any] = {}
+
+    def generate_text(self, prompt, max_tokens=4000, temperature=0.7, system_prompt=None,
+                      cacheable_prefix=None, **_):
+        if cacheable_prefix:
+            prompt = f"{cacheable_prefix}\n\n{prompt}"
+        self.captured.update(prompt=prompt, max_tokens=max_tokens,
+                             temperature=temperature, system_prompt=system_prompt)
+        return APIResponse(content="", model="", usage={}, success=True)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def capture_text_request(client: Any, method_name: str, *args, **kwargs) -> Dict[str, Any]:
+    """
+    执行客户端的高层方法（如generate_answer），拦截其最终的generate_text调用，
+    返回请求参数而不实际发送，用于把现有prompt构造逻辑转成批处理请求
+    """
+    proxy = _CaptureProxy(client)
+    getattr(type(client), method_name)(proxy, *args, **kwargs)
+    if 'prompt' not in proxy.captured:
+        raise ValueError(f"{method_name} 未调用generate_text，无法转为批处理请求")
+    return proxy.captured
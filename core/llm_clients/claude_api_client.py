@@ -8,9 +8,24 @@ import requests
 import json
 import time
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+
+from .http_transport import HTTPTransport, get_http_transport, anthropic_base_url
+from .async_support import run_with_provider_limit, map_with_provider_limit
+from .segment_merge import tree_merge_reports, sum_usage
+from .response_cache import LLMResponseCache, DEFAULT_CACHE_SAMPLED, get_response_cache, make_cache_key, should_cache
+from .rate_limiter import AdaptiveRateLimiter, estimate_request_tokens
+from .key_pool import APIKeyPool, AUTH_ERROR_STATUS, get_key_pool
+from .tokenizer import estimate_tokens
+from .document_packing import pack_documents
+from .metering import get_meter
+from .single_flight import SingleFlight, get_single_flight
+from .adaptive_timeout import AdaptiveTimeout, get_adaptive_timeout
+from .streaming import STREAMING_ENABLED, read_claude_stream
+from .structured_output import STRUCTURED_OUTPUT_ENABLED, claude_tool_options, is_json_object
+from .resilience import ERROR_RATE_LIMIT, ERROR_SERVER, ERROR_TIMEOUT, ERROR_TRANSPORT
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -24,22 +39,57 @@ class APIResponse:
     usage: Dict[str, int]
     success: bool
     error: Optional[str] = None
+    cache_key: Optional[str] = None  # 响应写入了缓存时的键（见 invalidate_cached_response）
+    error_kind: Optional[str] = None  # 提供商侧故障类型（resilience.BREAKER_ERROR_KINDS），计入熔断
+    provider: Optional[str] = None  # 实际提供响应的提供商（管理器切换提供商时与请求的不同）
+    structured: bool = False  # 请求是否按response_schema约束为结构化输出（解析统计按此区分模式）
 
 class ClaudeAPIClient:
     """Claude API客户端 - 直接HTTP请求版本"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, transport: Optional[HTTPTransport] = None,
+                 cache: Optional[LLMResponseCache] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 timeouts: Optional[AdaptiveTimeout] = None,
+                 streaming: Optional[bool] = None,
+                 structured_output: Optional[bool] = None,
+                 key_pool: Optional[APIKeyPool] = None,
+                 cache_sampled: Optional[bool] = None):
         """初始化Claude客户端"""
-        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY') or (key_pool.primary_key if key_pool else None)
         if not self.api_key:
             raise ValueError("Claude API key not found. Please set ANTHROPIC_API_KEY environment variable.")
         
-        self.base_url = "https://api.anthropic.com/v1/messages"
+        self.base_url = f"{anthropic_base_url()}/v1/messages"
         self.model = "claude-sonnet-4-20250514"  # Claude Sonnet 4
         
         # 请求限制
         self.max_retries = 3
         self.retry_delay = 2
+        # 分段报告每段的输入token预算（需低于_generate_single_report的字符上限）
+        self.segment_token_budget = int(os.getenv('LLM_SEGMENT_TOKEN_BUDGET_CLAUDE', '36000'))
+        
+        # 共享连接池，复用keep-alive连接
+        self.transport = transport or get_http_transport()
+        # 持久化响应缓存（相同请求直接返回）
+        self.cache = cache or get_response_cache()
+        # temperature > 0 的采样请求默认不走缓存，重试与重跑时重新采样
+        self.cache_sampled = DEFAULT_CACHE_SAMPLED if cache_sampled is None else cache_sampled
+        # API key池：api_key与ANTHROPIC_API_KEYS中的key按剩余额度轮换，每个key独立限流
+        if key_pool is None:
+            key_pool = (APIKeyPool("claude", [self.api_key], rate_limiter=rate_limiter) if rate_limiter
+                        else get_key_pool("claude", [self.api_key]))
+        self.key_pool = key_pool
+        # 主key的令牌桶限流器（单key时为进程内共享的限流器）
+        self.rate_limiter = key_pool.keys[0].limiter
+        # 合并并发的相同请求
+        self.single_flight = single_flight or get_single_flight()
+        # 按输出长度与实测速度计算超时；流式响应避免中断仍在输出的长生成
+        self.timeouts = timeouts or get_adaptive_timeout()
+        self.streaming = STREAMING_ENABLED if streaming is None else streaming
+        # 声明了response_schema的请求通过强制工具调用约束输出
+        self.structured_output = STRUCTURED_OUTPUT_ENABLED if structured_output is None else structured_output
         
         # HTTP headers
         self.headers = {
@@ -48,51 +98,163 @@ class ClaudeAPIClient:
             "content-type": "application/json"
         }
         
-    def _make_request(self, payload: Dict[str, Any]) -> APIResponse:
-        """发送HTTP请求到Claude API"""
+    def _make_request(self, payload: Dict[str, Any], cache_response: Optional[bool] = None,
+                      cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """
+        发送HTTP请求到Claude API，并记录计量数据
+        
+        cache_response: 是否使用响应缓存（默认只有temperature为0时使用）
+        cache_validator: 只缓存/复用该函数返回True的内容（强制工具调用的请求默认要求为JSON对象）
+        """
+        call_stats = {}
+        start_time = time.time()
+        system_prompt = payload.get("system")
+        if system_prompt is not None and not isinstance(system_prompt, str):
+            system_prompt = json.dumps(system_prompt, ensure_ascii=False, sort_keys=True)
+        tool_options = {key: payload[key] for key in ("tools", "tool_choice") if key in payload}
+        cache_key = make_cache_key(
+            "claude", payload.get("model", self.model), system_prompt,
+            json.dumps(payload.get("messages", []), ensure_ascii=False, sort_keys=True),
+            payload.get("temperature"), payload.get("max_tokens"),
+            tool_options or None
+        )
+        use_cache = should_cache(payload.get("temperature"), self.cache_sampled, cache_response)
+        if cache_validator is None and tool_options:
+            cache_validator = is_json_object
+        
+        def _request():
+            return self._send_request(payload, call_stats, cache_key if use_cache else None, system_prompt,
+                                      cache_validator)
+        
+        # 可缓存的相同请求在途时共享同一次调用；采样请求各自独立
+        api_response, shared = self.single_flight.do(cache_key, _request) if use_cache else (_request(), False)
+        if shared:
+            # 共享结果复制一份，避免调用方附加属性时互相影响
+            api_response = replace(api_response)
+        get_meter().record(
+            "claude", self.model, api_response.usage if api_response.success and not shared else None,
+            time.time() - start_time,
+            retries=call_stats.get('attempts', 1) - 1,
+            success=api_response.success,
+            cache_hit=call_stats.get('cache_hit', False),
+            coalesced=shared
+        )
+        return api_response
+    
+    def invalidate_cached_response(self, response: APIResponse):
+        """调用方发现响应不可用（如解析失败）时删除其缓存条目，下次请求重新生成"""
+        self.cache.delete(response.cache_key)
+    
+    def uses_structured_output(self, response_schema: Optional[str]) -> bool:
+        """指定response_schema的请求是否以结构化输出（强制tool调用）发送"""
+        return bool(response_schema) and self.structured_output
+    
+    def _send_request(self, payload: Dict[str, Any], call_stats: Dict[str, Any],
+                      cache_key: Optional[str], system_prompt: Optional[str],
+                      cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """发送请求（带重试），call_stats记录尝试次数与缓存命中；cache_key为None时不读写缓存"""
+        
+        cached = self.cache.get(cache_key, validate=cache_validator) if cache_key else None
+        if cached is not None:
+            logger.info("命中LLM缓存 (Claude)")
+            call_stats['cache_hit'] = True
+            return APIResponse(
+                content=cached['content'],
+                model=cached.get('model', self.model),
+                usage=cached.get('usage', {}),
+                success=True,
+                cache_key=cache_key
+            )
+        
+        estimated_tokens = estimate_request_tokens(
+            (system_prompt or "") + json.dumps(payload.get("messages", []), ensure_ascii=False),
+            payload.get("max_tokens", 0),
+            self.model
+        )
+        
+        request_payload = dict(payload, stream=True) if self.streaming else payload
         
         for attempt in range(self.max_retries):
+            call_stats['attempts'] = attempt + 1
+            # 超时按请求的输出长度计算（流式时为两次数据之间的空闲上限）
+            timeout = self.timeouts.request_timeout(self.model, payload.get("max_tokens", 0), stream=self.streaming)
             try:
                 logger.info(f"发送Claude API请求 (尝试 {attempt + 1}/{self.max_retries})")
                 
-                response = requests.post(
+                pooled_key = self.key_pool.acquire(estimated_tokens)
+                request_start = time.time()
+                response = self.transport.post(
                     self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=120  # 2分钟超时
+                    headers=dict(self.headers, **{"x-api-key": pooled_key.key}),
+                    json=request_payload,
+                    timeout=timeout,
+                    stream=self.streaming
                 )
+                self.key_pool.update_from_headers(pooled_key, response.headers)
                 
                 logger.info(f"Claude API响应状态码: {response.status_code}")
+                if response.status_code != 200:
+                    # 读完错误响应体后关闭，释放流式请求占用的连接与host并发名额
+                    response.content
+                    response.close()
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    if self.streaming:
+                        data, first_token_latency = read_claude_stream(response, request_start)
+                    else:
+                        data, first_token_latency = response.json(), None
+                    self.timeouts.record_success(
+                        self.model, time.time() - request_start,
+                        (data.get("usage") or {}).get("output_tokens", 0),
+                        first_token_latency=first_token_latency,
+                        timeout=None if self.streaming else timeout
+                    )
                     
-                    # 提取响应内容
+                    # 提取响应内容（强制工具调用时内容为tool_use的JSON输入）
                     content = ""
                     if "content" in data and data["content"]:
-                        content = data["content"][0].get("text", "")
+                        tool_inputs = [block.get("input") for block in data["content"] if block.get("type") == "tool_use"]
+                        if tool_inputs:
+                            content = json.dumps(tool_inputs[0], ensure_ascii=False)
+                        else:
+                            content = data["content"][0].get("text", "")
                     
-                    # 构建统一响应
+                    # 构建统一响应（input_tokens不含缓存读取/写入的部分，需加回）
                     usage = data.get("usage", {})
+                    cached_tokens = usage.get("cache_read_input_tokens") or 0
+                    cache_creation_tokens = usage.get("cache_creation_input_tokens") or 0
+                    prompt_tokens = usage.get("input_tokens", 0) + cached_tokens + cache_creation_tokens
                     api_response = APIResponse(
                         content=content,
                         model=self.model,
                         usage={
-                            "prompt_tokens": usage.get("input_tokens", 0),
+                            "prompt_tokens": prompt_tokens,
                             "completion_tokens": usage.get("output_tokens", 0),
-                            "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+                            "total_tokens": prompt_tokens + usage.get("output_tokens", 0),
+                            "cached_tokens": cached_tokens,
+                            "cache_creation_tokens": cache_creation_tokens
                         },
                         success=True
                     )
                     
-                    logger.info(f"Claude API调用成功 - 输入: {usage.get('input_tokens', 0)} tokens, 输出: {usage.get('output_tokens', 0)} tokens")
+                    logger.info(f"Claude API调用成功 - 输入: {prompt_tokens} tokens (缓存命中 {cached_tokens}), 输出: {usage.get('output_tokens', 0)} tokens")
+                    self.key_pool.record_usage(pooled_key, estimated_tokens, api_response.usage["total_tokens"])
+                    if cache_key and (cache_validator is None or cache_validator(api_response.content)):
+                        self.cache.put(cache_key, {
+                            'content': api_response.content,
+                            'model': api_response.model,
+                            'usage': api_response.usage
+                        })
+                        api_response.cache_key = cache_key
                     return api_response
                 
                 elif response.status_code == 429:
                     # 速率限制
                     logger.warning(f"Claude API速率限制 (尝试 {attempt + 1}/{self.max_retries})")
                     if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay * (2 ** attempt))
+                        # 暂停该key的限流器（Retry-After或抖动退避）；多key时隔离该key，换key重试
+                        wait_time = self.key_pool.on_rate_limited(pooled_key, response.headers, attempt, self.retry_delay)
+                        logger.warning(f"Claude API将在 {wait_time:.1f} 秒后重试")
                         continue
                     else:
                         return APIResponse(
@@ -100,11 +262,15 @@ class ClaudeAPIClient:
                             model=self.model,
                             usage={},
                             success=False,
-                            error=f"Rate limit exceeded after {self.max_retries} attempts"
+                            error=f"Rate limit exceeded after {self.max_retries} attempts",
+                            error_kind=ERROR_RATE_LIMIT
                         )
                 
-                elif response.status_code == 401:
-                    # 认证失败
+                elif response.status_code in AUTH_ERROR_STATUS:
+                    # 认证失败：多key时隔离该key并换key重试
+                    if self.key_pool.on_auth_error(pooled_key, response.status_code) and attempt < self.max_retries - 1:
+                        logger.warning(f"Claude API key {pooled_key.label} 认证失败，换key重试")
+                        continue
                     return APIResponse(
                         content="",
                         model=self.model,
@@ -127,10 +293,12 @@ class ClaudeAPIClient:
                             model=self.model,
                             usage={},
                             success=False,
-                            error=error_msg
+                            error=error_msg,
+                            error_kind=ERROR_SERVER if response.status_code >= 500 else None
                         )
                         
             except requests.exceptions.Timeout:
+                self.timeouts.record_timeout(self.model, time.time() - request_start, timeout)
                 logger.warning(f"Claude API请求超时 (尝试 {attempt + 1}/{self.max_retries})")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
@@ -141,7 +309,8 @@ class ClaudeAPIClient:
                         model=self.model,
                         usage={},
                         success=False,
-                        error="Request timeout after multiple attempts"
+                        error="Request timeout after multiple attempts",
+                        error_kind=ERROR_TIMEOUT
                     )
                     
             except requests.exceptions.ConnectionError as e:
@@ -155,7 +324,8 @@ class ClaudeAPIClient:
                         model=self.model,
                         usage={},
                         success=False,
-                        error=f"Connection error: {str(e)}"
+                        error=f"Connection error: {str(e)}",
+                        error_kind=ERROR_TRANSPORT
                     )
                     
             except Exception as e:
@@ -169,7 +339,8 @@ class ClaudeAPIClient:
                         model=self.model,
                         usage={},
                         success=False,
-                        error=f"Unknown error: {str(e)}"
+                        error=f"Unknown error: {str(e)}",
+                        error_kind=ERROR_TRANSPORT if isinstance(e, requests.exceptions.RequestException) else None
                     )
         
         return APIResponse(
@@ -184,8 +355,28 @@ class ClaudeAPIClient:
                      prompt: str, 
                      max_tokens: int = 4000,
                      temperature: float = 0.7,
-                     system_prompt: Optional[str] = None) -> APIResponse:
-        """生成文本"""
+                     system_prompt: Optional[str] = None,
+                     cacheable_prefix: Optional[str] = None,
+                     response_schema: Optional[str] = None,
+                     cache_response: Optional[bool] = None,
+                     cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """
+        生成文本
+        
+        cacheable_prefix: 多次请求共用的长上下文（如报告），作为用户消息的第一个内容块
+        并标记cache_control，后续请求命中Anthropic提示缓存
+        response_schema: RESPONSE_SCHEMAS中的schema名称，通过强制工具调用返回符合该schema的JSON
+        cache_response: 是否使用响应缓存（默认只有temperature为0时使用）
+        cache_validator: 只缓存/复用该函数返回True的内容（如可解析）；之后发现不可用时调用invalidate_cached_response
+        """
+        
+        if cacheable_prefix:
+            content = [
+                {"type": "text", "text": cacheable_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+        else:
+            content = prompt
         
         # 构建请求载荷
         payload = {
@@ -193,24 +384,57 @@ class ClaudeAPIClient:
             "max_tokens": max_tokens,
             "temperature": temperature,
             "messages": [
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": content}
             ]
         }
         
         if system_prompt:
             payload["system"] = system_prompt
+        structured = self.uses_structured_output(response_schema)
+        if structured:
+            payload.update(claude_tool_options(response_schema))
         
-        return self._make_request(payload)
+        response = self._make_request(payload, cache_response=cache_response, cache_validator=cache_validator)
+        response.structured = structured
+        return response
+    
+    async def generate_text_async(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7,
+                                  system_prompt: Optional[str] = None,
+                                  cacheable_prefix: Optional[str] = None,
+                                  response_schema: Optional[str] = None,
+                                  cache_response: Optional[bool] = None,
+                                  cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """异步版本的generate_text（受claude并发限制约束）"""
+        return await run_with_provider_limit(
+            "claude", self.generate_text, prompt, max_tokens=max_tokens,
+            temperature=temperature, system_prompt=system_prompt, cacheable_prefix=cacheable_prefix,
+            response_schema=response_schema, cache_response=cache_response, cache_validator=cache_validator
+        )
+    
+    async def generate_response_async(self, prompt: str, system_prompt: Optional[str] = None,
+                                      max_tokens: int = 2000, temperature: float = 0.3) -> str:
+        """异步生成文本，返回字符串（与OpenAIClient.generate_response_async对应）"""
+        response = await self.generate_text_async(
+            prompt, max_tokens=max_tokens, temperature=temperature, system_prompt=system_prompt
+        )
+        return response.content if response.success else ""
+    
+    async def generate_report_async(self, documents: List[Dict], topic: str, max_tokens: int = 4000) -> APIResponse:
+        """异步版本的generate_report"""
+        return await run_with_provider_limit("claude", self.generate_report, documents, topic, max_tokens)
+    
+    async def generate_answer_async(self, question: str, report: str, difficulty: str) -> APIResponse:
+        """异步版本的generate_answer"""
+        return await run_with_provider_limit("claude", self.generate_answer, question, report, difficulty)
     
     def generate_report(self, documents: List[Dict], topic: str, max_tokens: int = 4000) -> APIResponse:
         """生成领域报告 - 支持分段处理和融合"""
         
-        # 检查文档总长度
-        total_chars = sum(len(doc.get('content', '')) for doc in documents)
-        max_chars_per_segment = 100000  # 每段最大字符数
+        # 按token预算估算是否需要分段
+        total_tokens = sum(estimate_tokens(doc.get('content', ''), self.model) for doc in documents)
         
-        if total_chars > max_chars_per_segment:
-            print(f"📄 文档内容过长 ({total_chars} 字符)，启用分段处理...")
+        if total_tokens > self.segment_token_budget:
+            print(f"📄 文档内容过长 (约 {total_tokens} tokens)，启用分段处理...")
             return self._generate_segmented_report(documents, topic, max_tokens)
         else:
             return self._generate_single_report(documents, topic, max_tokens)
@@ -289,91 +513,86 @@ Summary requirements:
         )
     
     def _generate_segmented_report(self, documents: List[Dict], topic: str, max_tokens: int) -> APIResponse:
-        """分段生成报告并融合"""
+        """分段生成报告并融合 - 各段并发生成（受共享并发限制），段数过多时层级融合"""
+        
+        start_time = time.time()
         
         # 将文档分段
-        segments = self._split_documents_into_segments(documents)
-        print(f"📚 文档分为 {len(segments)} 段进行处理")
+        segments, packing_stats = self._split_documents_into_segments(documents)
+        print(f"📚 文档分为 {len(segments)} 段进行并发处理 (填充率 {packing_stats['fill_ratio']:.1%})")
         
-        # 为每段生成子报告
-        segment_reports = []
-        for i, segment_docs in enumerate(segments, 1):
-            print(f"  🔍 处理第 {i}/{len(segments)} 段...")
-            
+        def _run_segment(item):
+            i, segment_docs = item
+            segment_start = time.time()
             try:
                 segment_result = self._generate_single_report(segment_docs, f"{topic} (第{i}段)", max_tokens // 2)
-                if segment_result.success:
-                    segment_reports.append({
-                        'segment': i,
-                        'content': segment_result.content,
-                        'doc_count': len(segment_docs)
-                    })
-                    print(f"    ✅ 第{i}段完成 ({len(segment_result.content.split())} 词)")
-                else:
-                    print(f"    ❌ 第{i}段失败: {segment_result.error}")
-                    
-                                 # 段间休息
-                import time
-                time.sleep(2)
-                
             except Exception as e:
-                print(f"    ❌ 第{i}段处理异常: {e}")
-                continue
+                segment_result = APIResponse(content="", model=self.model, usage={}, success=False, error=str(e))
+            timing = {
+                'segment': i,
+                'doc_count': len(segment_docs),
+                'seconds': round(time.time() - segment_start, 2),
+                'success': segment_result.success,
+                'words': len(segment_result.content.split()) if segment_result.success else 0
+            }
+            if segment_result.success:
+                print(f"    ✅ 第{i}段完成 ({timing['words']} 词, {timing['seconds']}s)")
+            else:
+                print(f"    ❌ 第{i}段失败: {segment_result.error}")
+            return segment_result, timing
+        
+        results = map_with_provider_limit("claude", _run_segment, list(enumerate(segments, 1)))
+        segment_timings = [timing for _, timing in results]
+        
+        # 为每段生成子报告（失败的段跳过）
+        segment_reports = [
+            {
+                'segment': timing['segment'],
+                'content': segment_result.content,
+                'doc_count': timing['doc_count'],
+                'usage': segment_result.usage
+            }
+            for segment_result, timing in results if segment_result.success
+        ]
         
         if not segment_reports:
-            return APIResponse(
+            result = APIResponse(
                 content="",
                 model=self.model,
                 usage={},
                 success=False,
                 error="所有文档段处理失败"
             )
+            result.segment_timings = segment_timings
+            result.merge_timings = []
+            result.packing_stats = packing_stats
+            return result
         
         # 融合所有段报告
         print("  🔄 融合各段报告...")
-        return self._merge_segment_reports(segment_reports, topic, max_tokens)
-    
-    def _split_documents_into_segments(self, documents: List[Dict], max_chars_per_segment: int = 100000) -> List[List[Dict]]:
-        """将文档分割成段"""
-        segments = []
-        current_segment = []
-        current_chars = 0
-        
-        for doc in documents:
-            doc_chars = len(doc.get('content', ''))
-            
-            # 如果单个文档就超过限制，单独成段
-            if doc_chars > max_chars_per_segment:
-                if current_segment:
-                    segments.append(current_segment)
-                    current_segment = []
-                    current_chars = 0
-                
-                # 分割超长文档
-                content = doc.get('content', '')
-                chunk_size = max_chars_per_segment
-                for j in range(0, len(content), chunk_size):
-                    chunk_content = content[j:j + chunk_size]
-                    chunk_doc = doc.copy()
-                    chunk_doc['content'] = chunk_content
-                    chunk_doc['title'] = f"{doc.get('title', 'N/A')} (部分{j//chunk_size + 1})"
-                    segments.append([chunk_doc])
-                continue
-            
-            # 检查是否需要开始新段
-            if current_chars + doc_chars > max_chars_per_segment and current_segment:
-                segments.append(current_segment)
-                current_segment = []
-                current_chars = 0
-            
-            current_segment.append(doc)
-            current_chars += doc_chars
-        
-        # 添加最后一段
-        if current_segment:
-            segments.append(current_segment)
+        merged, merge_timings = tree_merge_reports(
+            segment_reports,
+            lambda group: self._merge_segment_reports(group, topic, max_tokens),
+            "claude"
+        )
+        if merged is None:
+            merged = APIResponse(
+                content="",
+                model=self.model,
+                usage=sum_usage([r['usage'] for r in segment_reports]),
+                success=False,
+                error="层级融合中间步骤失败"
+            )
         
-        return segments
+        merged.segment_timings = segment_timings
+        merged.merge_timings = merge_timings
+        merged.packing_stats = packing_stats
+        print(f"  ⏱️ 分段报告总耗时 {time.time() - start_time:.1f}s ({len(segments)} 段, {len(merge_timings)} 次融合)")
+        return merged
+    
+    def _split_documents_into_segments(self, documents: List[Dict]) -> Tuple[List[List[Dict]], Dict[str, Any]]:
+        """按token预算装箱分段（First-Fit Decreasing），返回分段和填充率统计"""
+        return pack_documents(documents, self.segment_token_budget, self.model)
     
     def _merge_segment_reports(self, segment_reports: List[Dict], topic: str, max_tokens: int) -> APIResponse:
         """融合各段报告"""
@@ -418,16 +637,8 @@ Requirements:
             if merge_result.success:
                 print(f"    ✅ 报告融合完成 ({len(merge_result.content.split())} 词)")
                 
-                # 合并usage统计
-                total_usage = {
-                    'input_tokens': sum(r.get('usage', {}).get('input_tokens', 0) for r in segment_reports) + merge_result.usage.get('input_tokens', 0),
-                    'output_tokens': sum(r.get('usage', {}).get('output_tokens', 0) for r in segment_reports) + merge_result.usage.get('output_tokens', 0),
-                    'total_tokens': 0
-                }
-                total_usage['total_tokens'] = total_usage['input_tokens'] + total_usage['output_tokens']
-                
-                # 更新usage信息
-                merge_result.usage = total_usage
+                # 合并usage统计（各段 + 本次融合）
+                merge_result.usage = sum_usage([r.get('usage', {}) for r in segment_reports] + [merge_result.usage])
                 
                 return merge_result
             else:
@@ -501,10 +712,11 @@ QUESTION DISTRIBUTION REQUIREMENT:
 
 FORMAT: Use simple text format, numbered Q1, Q2, etc."""
 
-        prompt = f"""Based on the following research summary about "{topic}", generate {num_questions} questions where AT LEAST 70% are SHORT ANSWER DEEP QUERIES:
+        # 报告放在最前面作为可缓存前缀，同一报告的多批问题生成共享
+        report_prefix = f"""Research Summary about "{topic}":
+{report[:6000]}..."""
 
-Research Summary:
-{report[:6000]}...
+        prompt = f"""Based on the research summary above, generate {num_questions} questions where AT LEAST 70% are SHORT ANSWER DEEP QUERIES:
 
 MANDATORY REQUIREMENTS:
 1. Generate EXACTLY {num_questions} questions
@@ -534,7 +746,8 @@ Generate exactly {num_questions} questions now:"""
             prompt=prompt,
             max_tokens=max_tokens,
             temperature=0.7,  # 降低温度以获得更一致的结果
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            cacheable_prefix=report_prefix
         )
     
     def generate_answer(self, question: str, report: str, difficulty: str) -> APIResponse:
@@ -599,9 +812,9 @@ Answer: "Hinton et al. (2006) in deep belief networks paper"
 
 CRITICAL: Your answer must be PROFESSIONALLY CONCENTRATED - the essential expert response to the specific query."""
             
-            prompt = f"""Research Context: {report[:2000]}
-
-EXPERT QUERY: {question}
+            report_prefix = f"Research Context: {report[:2000]}"
+            
+            prompt = f"""EXPERT QUERY: {question}
 
 TASK: Provide the concentrated professional answer to this specific query.
 
@@ -627,24 +840,25 @@ CONCENTRATED PROFESSIONAL ANSWER:"""
             
             word_req = word_requirements.get(difficulty, "800-1200 words")
             
-            system_prompt = f"""You are a professional research expert. Please answer questions based on the provided research summary.
+            # system prompt与报告前缀在同一报告的所有问题间保持不变，便于前缀缓存
+            system_prompt = """You are a professional research expert. Please answer questions based on the provided research summary.
 
 Answer requirements:
-1. Length: {word_req}
+1. Length: as specified with each question
 2. Based on summary content, do not fabricate information
 3. Clear structure and rigorous logic
 4. Adjust answer depth according to question difficulty
 5. Use academic writing style
 6. Answer ENTIRELY in English for consistency in comparative analysis"""
 
-            prompt = f"""Based on the following research summary, answer the question:
+            report_prefix = f"""Research Summary:
+{report}"""
+
+            prompt = f"""Based on the research summary above, answer the question:
 
 Question: {question}
 Difficulty: {difficulty}
 
-Research Summary:
-{report}
-
 Please provide a detailed answer of {word_req}. Write entirely in English for consistency in comparative analysis."""
 
             max_tokens = 2000 if difficulty == "Hard" else 1500 if difficulty == "Medium" else 1000
@@ -654,7 +868,8 @@ Please provide a detailed answer of {word_req}. Write entirely in English for co
             prompt=prompt,
             max_tokens=max_tokens,
             temperature=temperature,
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            cacheable_prefix=report_prefix
         )
     
     def _is_short_answer_deep_query(self, question: str) -> bool:
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Document Packing - 按token预算装箱分段
+用 First-Fit Decreasing 把文档装入尽量少的段，每段不超过模型的token预算；
+超过预算的单个文档先按比例切块。返回分段结果和填充率统计。
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .tokenizer import estimate_tokens, get_tokenizer_name
+
+logger = logging.getLogger(__name__)
+
+
+def _default_doc_text(doc: Dict[str, Any]) -> str:
+    return f"\n文档:\n标题: {doc.get('title', 'N/A')}\n内容: {doc.get('content', 'N/A')}\n"
+
+
+def _split_oversized_document(doc: Dict[str, Any], doc_tokens: int, token_budget: int) -> List[Dict[str, Any]]:
+    """按token比例把超长文档切成不超过预算的块"""
+    content = doc.get('content', '')
+    chars_per_token = max(len(content) / max(doc_tokens, 1), 0.5)
+    # 留5%余量给标题等开销
+    chunk_chars = max(1, int(token_budget * 0.95 * chars_per_token))
+
+    chunks = []
+    for j in range(0, len(content), chunk_chars):
+        chunk_doc = doc.copy()
+        chunk_doc['content'] = content[j:j + chunk_chars]
+        chunk_doc['title'] = f"{doc.get('title', 'N/A')} (部分{j // chunk_chars + 1})"
+        chunks.append(chunk_doc)
+    return chunks
+
+
+def pack_documents(documents: List[Dict[str, Any]],
+                   token_budget: int,
+                   model: Optional[str] = None,
+                   doc_text_fn: Callable[[Dict[str, Any]], str] = _default_doc_text) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+    """
+    把文档装箱到尽量少的段中
+
+    Args:
+        documents: 文档列表（含title/content）
+        token_budget: 每段的token上限
+        model: 模型名（选择tokenizer）
+        doc_text_fn: 文档在prompt中的文本形式（用于计数）
+
+    Returns:
+        (segments, stats)，段内文档保持原始顺序；stats含fill_ratio等
+    """
+    items = []  # (tokens, original_order, doc)
+    split_documents = 0
+    for order, doc in enumerate(documents):
+        tokens = estimate_tokens(doc_text_fn(doc), model)
+        if tokens > token_budget:
+            split_documents += 1
+            for k, chunk in enumerate(_split_oversized_document(doc, tokens, token_budget)):
+                chunk_tokens = min(estimate_tokens(doc_text_fn(chunk), model), token_budget)
+                items.append((chunk_tokens, order + k / 1000.0, chunk))
+        else:
+            items.append((tokens, float(order), doc))
+
+    # First-Fit Decreasing
+    bins: List[Dict[str, Any]] = []
+    for tokens, order, doc in sorted(items, key=lambda x: -x[0]):
+        for b in bins:
+            if b['tokens'] + tokens <= token_budget:
+                b['tokens'] += tokens
+                b['items'].append((order, doc))
+                break
+        else:
+            bins.append({'tokens': tokens, 'items': [(order, doc)]})
+
+    # 段按首个文档的原始位置排序，段内保持原始顺序
+    for b in bins:
+        b['items'].sort(key=lambda x: x[0])
+    bins.sort(key=lambda b: b['items'][0][0] if b['items'] else 0)
+
+    segments = [[doc for _, doc in b['items']] for b in bins]
+    total_tokens = sum(b['tokens'] for b in bins)
+    stats = {
+        'segments': len(segments),
+        'documents': len(documents),
+        'split_documents': split_documents,
+        'total_tokens': total_tokens,
+        'token_budget': token_budget,
+        'segment_tokens': [b['tokens'] for b in bins],
+        'fill_ratio': round(total_tokens / (len(bins) * token_budget), 4) if bins else 0.0,
+        'tokenizer': get_tokenizer_name(model)
+    }
+    logger.info(f"📦 文档装箱: {len(documents)} 个文档 -> {len(segments)} 段, "
+                f"填充率 {stats['fill_ratio']:.1%} (预算 {token_budget} tokens/段, tokenizer={stats['tokenizer']})")
+    return segments, stats
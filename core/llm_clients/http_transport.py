@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+HTTP Transport - 共享连接池
+为OpenAI/Claude客户端提供线程安全的keep-alive连接复用，避免每次调用重新建立TCP+TLS连接；
+API地址可通过 OPENAI_BASE_URL / ANTHROPIC_BASE_URL 指向本地stub服务器，
+LLM_TRANSPORT_MODE=record|replay 时全局连接池换成录制/回放传输（见 replay_transport）；
+per_host_limit 对流式请求同样生效：名额一直占用到响应关闭（读完或出错时由调用方close）
+"""
+
+import os
+import threading
+import logging
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 默认连接池配置（可通过环境变量覆盖）
+DEFAULT_POOL_CONNECTIONS = int(os.getenv('LLM_HTTP_POOL_CONNECTIONS', '4'))
+DEFAULT_POOL_MAXSIZE = int(os.getenv('LLM_HTTP_POOL_MAXSIZE', '32'))
+DEFAULT_PER_HOST_LIMIT = int(os.getenv('LLM_HTTP_PER_HOST_LIMIT', '32'))
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_ANTHROPIC_BASE_URL = "https://api.anthropic.com"
+
+
+def openai_base_url() -> str:
+    """OpenAI API地址（与官方SDK一致读取 OPENAI_BASE_URL，创建客户端时读取）"""
+    return (os.getenv('OPENAI_BASE_URL') or DEFAULT_OPENAI_BASE_URL).rstrip('/')
+
+
+def anthropic_base_url() -> str:
+    """Anthropic API地址（与官方SDK一致读取 ANTHROPIC_BASE_URL，不含 /v1）"""
+    return (os.getenv('ANTHROPIC_BASE_URL') or DEFAULT_ANTHROPIC_BASE_URL).rstrip('/')
+
+
+def _release_on_close(response: requests.Response, semaphore: threading.BoundedSemaphore):
+    """流式响应在close()时才释放host并发名额；未关闭就被回收的响应在回收时释放（只释放一次）"""
+    release = weakref.finalize(response, semaphore.release)
+    close = response.close
+
+    def _close():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = _close
+
+
+class HTTPTransport:
+    """线程安全的共享HTTP连接池"""
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 per_host_limit: Optional[int] = DEFAULT_PER_HOST_LIMIT,
+                 keep_alive: bool = True):
+        """
+        Args:
+            pool_connections: 缓存的host连接池数量
+            pool_maxsize: 每个host连接池保留的最大连接数
+            per_host_limit: 每个host同时在途的最大请求数，None表示不限制
+            keep_alive: 是否复用连接；False时每次请求后关闭连接（旧行为）
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.per_host_limit = per_host_limit
+        self.keep_alive = keep_alive
+
+        # 所有线程共享同一个adapter（即同一个urllib3连接池），Session按线程隔离
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+            pool_block=False
+        )
+        self._local = threading.local()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'errors': 0
+        }
+
+    def _get_session(self) -> requests.Session:
+        """获取当前线程的Session（挂载共享adapter）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    def _get_host_semaphore(self, url: str) -> Optional[threading.BoundedSemaphore]:
+        """获取host级别的并发限制"""
+        if not self.per_host_limit:
+            return None
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送HTTP请求，接口与requests.request一致"""
+        if not self.keep_alive:
+            headers = dict(kwargs.pop('headers', None) or {})
+            headers['Connection'] = 'close'
+            kwargs['headers'] = headers
+
+        semaphore = self._get_host_semaphore(url)
+        if semaphore is not None:
+            semaphore.acquire()
+        hold_permit = False
+        try:
+            with self._lock:
+                self.stats['requests'] += 1
+            response = self._get_session().request(method, url, **kwargs)
+            if semaphore is not None and kwargs.get('stream'):
+                _release_on_close(response, semaphore)
+                hold_permit = True
+            return response
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            if semaphore is not None and not hold_permit:
+                semaphore.release()
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def get_statistics(self) -> Dict[str, int]:
+        """获取请求统计"""
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self):
+        """关闭连接池"""
+        self._adapter.close()
+
+
+# 全局共享实例
+_shared_transport: Optional[HTTPTransport] = None
+_shared_lock = threading.Lock()
+
+
+def _create_default_transport() -> HTTPTransport:
+    mode = os.getenv('LLM_TRANSPORT_MODE', '').strip().lower()
+    if mode in ('record', 'replay'):
+        from .replay_transport import RecordReplayTransport
+        return RecordReplayTransport(mode=mode)
+    return HTTPTransport()
+
+
+def get_http_transport() -> HTTPTransport:
+    """获取全局共享的HTTP连接池"""
+    global _shared_transport
+    if _shared_transport is None:
+        with _shared_lock:
+            if _shared_transport is None:
+                _shared_transport = _create_default_transport()
+    return _shared_transport
+
+
+def set_http_transport(transport: HTTPTransport) -> HTTPTransport:
+    """替换全局HTTP连接池（如录制/回放传输，影响之后创建的客户端）"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is not None and _shared_transport is not transport:
+            _shared_transport.close()
+        _shared_transport = transport
+    return transport
+
+
+def configure_http_transport(pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                             pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                             per_host_limit: Optional[int] = DEFAULT_PER_HOST_LIMIT,
+                             keep_alive: bool = True) -> HTTPTransport:
+    """重新配置全局HTTP连接池（影响之后创建的客户端）"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is not None:
+            _shared_transport.close()
+        _shared_transport = HTTPTransport(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            per_host_limit=per_host_limit,
+            keep_alive=keep_alive
+        )
+    logger.info(f"HTTP连接池已配置: pool_maxsize={pool_maxsize}, per_host_limit={per_host_limit}, keep_alive={keep_alive}")
+    return _shared_transport
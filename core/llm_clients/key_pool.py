@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+API Key Pool - 同一提供商的多个API key轮换使用
+每个key有独立的限流器（额度按账号计算），请求按剩余额度与权重分配（额度充足时按权重比例轮换）；
+429的key在退避期内隔离，认证失败（401/403）的key长时间隔离，其余key继续服务；按key统计用量
+"""
+
+import os
+import time
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# 认证失败的key隔离时长（秒）
+AUTH_QUARANTINE_SECONDS = float(os.getenv('LLM_KEY_AUTH_QUARANTINE_SECONDS', '900'))
+AUTH_ERROR_STATUS = (401, 403)
+
+# 每个提供商的key来源：*_API_KEYS 为逗号分隔的多个key（可写作 key:权重），*_API_KEY 为单个key
+KEY_ENV_VARS = {
+    'openai': ('OPENAI_API_KEYS', 'OPENAI_API_KEY'),
+    'claude': ('ANTHROPIC_API_KEYS', 'CLAUDE_API_KEYS', 'ANTHROPIC_API_KEY', 'CLAUDE_API_KEY'),
+}
+
+KeySpec = Union[str, Tuple[str, float]]
+
+
+def parse_key_spec(spec: str) -> Tuple[str, float]:
+    """解析 'key' 或 'key:权重'"""
+    key, sep, weight = spec.strip().rpartition(':')
+    if sep and key:
+        try:
+            return key, max(float(weight), 0.0)
+        except ValueError:
+            pass
+    return spec.strip(), 1.0
+
+
+def load_api_keys(provider: str) -> List[Tuple[str, float]]:
+    """从环境变量加载提供商的全部key（去重，保持顺序）"""
+    specs: List[Tuple[str, float]] = []
+    for env_var in KEY_ENV_VARS.get(provider, ()):
+        for part in (os.getenv(env_var) or '').split(','):
+            if part.strip():
+                specs.append(parse_key_spec(part))
+    return _dedupe(specs)
+
+
+def _dedupe(specs: Sequence[KeySpec]) -> List[Tuple[str, float]]:
+    seen = set()
+    result = []
+    for spec in specs:
+        key, weight = (spec, 1.0) if isinstance(spec, str) else spec
+        if key and key not in seen:
+            seen.add(key)
+            result.append((key, weight))
+    return result
+
+
+def mask_key(key: str) -> str:
+    """日志与统计中使用的key标识（不暴露完整key）"""
+    if len(key) <= 12:
+        return f"key-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}"
+    return f"{key[:5]}...{key[-4:]}"
+
+
+class MissingAPIKeyError(ValueError):
+    """提供商没有可用的API key（客户端在首次请求时抛出）"""
+
+
+class PooledKey:
+    """池中的单个key及其限流器、隔离状态与用量统计"""
+
+    def __init__(self, key: str, weight: float, limiter: AdaptiveRateLimiter):
+        self.key = key
+        self.label = mask_key(key)
+        self.weight = weight
+        self.limiter = limiter
+        self.quarantined_until = 0.0
+        self.quarantine_reason: Optional[str] = None
+        self.stats = {'requests': 0, 'successes': 0, 'rate_limited': 0, 'auth_errors': 0,
+                      'tokens': 0, 'quarantined': 0}
+
+    def available(self, now: float) -> bool:
+        return self.weight > 0 and self.quarantined_until <= now
+
+
+class APIKeyPool:
+    """同一提供商的API key池（线程安全）"""
+
+    def __init__(self, provider: str, keys: Sequence[KeySpec],
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None):
+        """
+        Args:
+            provider: 提供商名称
+            keys: key列表（字符串或 (key, 权重)）
+            rate_limiter: 单key时使用的限流器（默认为提供商共享的限流器）
+        """
+        specs = _dedupe(keys)
+        if not specs:
+            raise MissingAPIKeyError(f"{provider} 未配置API key")
+        self.provider = provider
+        if len(specs) == 1:
+            # 单key与此前行为一致：使用提供商共享的限流器
+            limiters = [rate_limiter or get_rate_limiter(provider)]
+        else:
+            limiters = [get_rate_limiter(provider, key_id=mask_key(key)) for key, _ in specs]
+        self.keys = [PooledKey(key, weight, limiter) for (key, weight), limiter in zip(specs, limiters)]
+        self._lock = threading.Lock()
+        if len(self.keys) > 1:
+            logger.info(f"🔑 {provider} key池: {len(self.keys)} 个key ({', '.join(k.label for k in self.keys)})")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def primary_key(self) -> str:
+        return self.keys[0].key
+
+    def _select(self, tokens: int) -> PooledKey:
+        """
+        选择 剩余额度 x 权重 / (已分配请求数 + 1) 最高的可用key：
+        额度充足时按权重比例轮换，某个key额度紧张时自动少分配；全部隔离时选最早解除隔离的key
+        """
+        now = time.time()
+        candidates = [k for k in self.keys if k.available(now)]
+        if not candidates:
+            # 429隔离的key在其限流器中处于暂停状态，acquire时会等待；认证隔离的key直接返回错误
+            return min(self.keys, key=lambda k: k.quarantined_until)
+        return max(candidates, key=lambda k: k.limiter.headroom(tokens) * k.weight / (k.stats['requests'] + 1))
+
+    def acquire(self, tokens: int = 0) -> PooledKey:
+        """为一次请求分配key并在其限流器上预留额度（阻塞直到有额度）"""
+        with self._lock:
+            pooled = self._select(tokens)
+            pooled.stats['requests'] += 1
+        pooled.limiter.acquire(tokens)
+        return pooled
+
+    def update_from_headers(self, pooled: PooledKey, headers):
+        pooled.limiter.update_from_headers(headers)
+
+    def record_usage(self, pooled: PooledKey, estimated_tokens: int, actual_tokens: int):
+        """记录一次成功请求并用实际token校正该key的额度"""
+        pooled.limiter.record_usage(estimated_tokens, actual_tokens)
+        with self._lock:
+            pooled.stats['successes'] += 1
+            pooled.stats['tokens'] += actual_tokens or 0
+
+    def _quarantine(self, pooled: PooledKey, seconds: float, reason: str):
+        with self._lock:
+            pooled.quarantined_until = max(pooled.quarantined_until, time.time() + seconds)
+            pooled.quarantine_reason = reason
+            pooled.stats['quarantined'] += 1
+
+    def _next_available_in(self) -> float:
+        """距离有可用key的秒数（0表示当前就有）"""
+        now = time.time()
+        with self._lock:
+            return max(0.0, min(k.quarantined_until for k in self.keys) - now)
+
+    def on_rate_limited(self, pooled: PooledKey, headers=None, attempt: int = 0,
+                        base_delay: float = 2.0) -> float:
+        """
+        处理429：暂停该key的限流器，多key时在退避期内隔离该key
+
+        Returns:
+            下次请求需要等待的秒数（有其他可用key时为0）
+        """
+        delay = pooled.limiter.on_rate_limited(headers, attempt, base_delay)
+        with self._lock:
+            pooled.stats['rate_limited'] += 1
+        if len(self.keys) == 1:
+            return delay
+        self._quarantine(pooled, delay, 'rate_limited')
+        logger.warning(f"🚦 {self.provider} key {pooled.label} 触发限流，隔离 {delay:.1f}s")
+        return self._next_available_in()
+
+    def on_auth_error(self, pooled: PooledKey, status_code: int) -> bool:
+        """
+        处理认证失败：多key时长时间隔离该key
+
+        Returns:
+            是否还有其他可用key（调用方据此决定是否换key重试）
+        """
+        with self._lock:
+            pooled.stats['auth_errors'] += 1
+        if len(self.keys) == 1:
+            return False
+        self._quarantine(pooled, AUTH_QUARANTINE_SECONDS, f'auth_{status_code}')
+        logger.error(f"🔑 {self.provider} key {pooled.label} 认证失败 (HTTP {status_code})，"
+                     f"隔离 {AUTH_QUARANTINE_SECONDS:.0f}s")
+        now = time.time()
+        with self._lock:
+            return any(k.available(now) for k in self.keys)
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """按key的用量与状态"""
+        now = time.time()
+        with self._lock:
+            return {
+                k.label: {
+                    **k.stats,
+                    'weight': k.weight,
+                    'quarantine_remaining': round(max(0.0, k.quarantined_until - now), 1),
+                    'quarantine_reason': k.quarantine_reason if k.quarantined_until > now else None,
+                    'rate_limiter': k.limiter.get_statistics()
+                }
+                for k in self.keys
+            }
+
+
+_pools: Dict[Tuple[str, Tuple[Tuple[str, float], ...]], APIKeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(provider: str, keys: Optional[Sequence[KeySpec]] = None) -> APIKeyPool:
+    """
+    获取共享的key池：keys与环境变量中配置的key合并（去重，未指定权重时沿用环境变量中的权重），
+    相同key集合共享同一个池
+    """
+    env_specs = load_api_keys(provider)
+    env_weights = dict(env_specs)
+    given = [(spec, env_weights.get(spec, 1.0)) if isinstance(spec, str) else spec
+             for spec in keys or [] if spec]
+    specs = tuple(_dedupe(given + env_specs))
+    with _pools_lock:
+        pool = _pools.get((provider, specs))
+        if pool is None:
+            pool = APIKeyPool(provider, specs)
+            _pools[(provider, specs)] = pool
+        return pool
+
+
+def get_key_pool_statistics() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """所有多key池的按key用量 {提供商: {key标识: 统计}}"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for pool in pools:
+        if len(pool) > 1:
+            result.setdefault(pool.provider, {}).update(pool.get_statistics())
+    return result
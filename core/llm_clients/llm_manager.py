@@ -8,18 +8,46 @@ import os
 import json
 import logging
 import re
-from typing import Dict, List, Any, Optional, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Any, Optional, Union
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 # 导入API客户端
 from .openai_api_client import OpenAIClient
 from .claude_api_client import ClaudeAPIClient, APIResponse
+from .http_transport import HTTPTransport, get_http_transport
+from .key_pool import get_key_pool, load_api_keys
+from .metering import metered_stage, metering_failover
+from .async_support import (run_with_provider_limit, map_with_provider_limit, submit_with_provider_limit,
+                            get_async_concurrency)
+from .question_stream import QuestionStream
+from .structured_output import parse_json_response
+from .resilience import get_circuit_breaker, get_latency_tracker, hedged_call, is_provider_failure
+from .batch_runner import (BatchBackend, BatchRequest, BatchRunner, LocalBatchBackend,
+                           OpenAIBatchBackend, ClaudeBatchBackend, capture_text_request)
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# generate_answers 每次请求回答的问题数（1为逐题请求）
+DEFAULT_ANSWERS_PER_REQUEST = int(os.getenv('LLM_ANSWERS_PER_REQUEST', '1'))
+
+# 多题合并请求时每题的输出token预算
+ANSWER_TOKEN_BUDGETS = {"Easy": 1000, "Medium": 1500, "Hard": 2000}
+SHORT_ANSWER_TOKEN_BUDGET = 60
+MAX_MULTI_ANSWER_TOKENS = 16000
+
+# 未指定提供商时，当前提供商熔断或失败后切换到其他可用提供商（默认关闭，LLM_FAILOVER=1开启；
+# 切换后响应的provider字段与计量记录的failover_from标明实际提供商）
+DEFAULT_FAILOVER = os.getenv('LLM_FAILOVER', '0') == '1'
+# 对冲请求触发的延迟分位数（如95），0为关闭
+DEFAULT_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0'))
+# 可在提供商之间切换的阶段（提示词与输出格式与提供商无关）
+FAILOVER_STAGES = {"text", "report", "questions", "answers", "refine"}
+
 class LLMProvider(Enum):
     """LLM提供商枚举"""
     OPENAI = "openai"
@@ -33,31 +61,41 @@ class LLMConfig:
     api_key: Optional[str] = None
     max_tokens: int = 4000
     temperature: float = 0.7
+    # 同一提供商的全部key（含api_key），请求在这些key之间按剩余额度轮换
+    api_keys: List[str] = field(default_factory=list)
 
 class DynamicLLMManager:
     """动态LLM管理器"""
     
-    def __init__(self):
+    def __init__(self, transport: Optional[HTTPTransport] = None):
         """初始化管理器"""
         self.clients = {}
         self.current_provider = None
         self.configs = {}
-        
-        # 默认配置
+        # 所有提供商共享同一个HTTP连接池
+        self.transport = transport or get_http_transport()
+        self.failover_enabled = DEFAULT_FAILOVER
+        self.hedge_percentile = DEFAULT_HEDGE_PERCENTILE or None
+        
+        # 默认配置（OPENAI_API_KEYS / ANTHROPIC_API_KEYS 可配置多个key）
+        openai_keys = [key for key, _ in load_api_keys("openai")]
+        claude_keys = [key for key, _ in load_api_keys("claude")]
         self.default_configs = {
             LLMProvider.OPENAI: LLMConfig(
                 provider=LLMProvider.OPENAI,
                 model_name="gpt-4o",
-                api_key=os.getenv('OPENAI_API_KEY'),
+                api_key=os.getenv('OPENAI_API_KEY') or next(iter(openai_keys), None),
                 max_tokens=4000,
-                temperature=0.7
+                temperature=0.7,
+                api_keys=openai_keys
             ),
             LLMProvider.CLAUDE: LLMConfig(
                 provider=LLMProvider.CLAUDE,
                 model_name="claude-3-5-sonnet-20241022",
-                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                api_key=os.getenv('ANTHROPIC_API_KEY') or next(iter(claude_keys), None),
                 max_tokens=4000,
-                temperature=0.7
+                temperature=0.7,
+                api_keys=claude_keys
             )
         }
         
@@ -69,8 +107,11 @@ class DynamicLLMManager:
         # 初始化OpenAI客户端
         try:
             if self.default_configs[LLMProvider.OPENAI].api_key:
+                config = self.default_configs[LLMProvider.OPENAI]
                 self.clients[LLMProvider.OPENAI] = OpenAIClient(
-                    api_key=self.default_configs[LLMProvider.OPENAI].api_key
+                    api_key=config.api_key,
+                    transport=self.transport,
+                    key_pool=get_key_pool("openai", [config.api_key] + config.api_keys)
                 )
                 logger.info("OpenAI客户端初始化成功")
             else:
@@ -81,8 +122,11 @@ class DynamicLLMManager:
         # 初始化Claude客户端
         try:
             if self.default_configs[LLMProvider.CLAUDE].api_key:
+                config = self.default_configs[LLMProvider.CLAUDE]
                 self.clients[LLMProvider.CLAUDE] = ClaudeAPIClient(
-                    api_key=self.default_configs[LLMProvider.CLAUDE].api_key
+                    api_key=config.api_key,
+                    transport=self.transport,
+                    key_pool=get_key_pool("claude", [config.api_key] + config.api_keys)
                 )
                 logger.info("Claude客户端初始化成功")
             else:
@@ -117,13 +161,109 @@ class DynamicLLMManager:
         """获取可用的LLM提供商"""
         return list(self.clients.keys())
     
+    def configure_resilience(self, 
+                             failover: Optional[bool] = None,
+                             hedge_percentile: Optional[float] = None):
+        """配置提供商切换与对冲请求（hedge_percentile<=0 关闭对冲）"""
+        if failover is not None:
+            self.failover_enabled = failover
+        if hedge_percentile is not None:
+            self.hedge_percentile = hedge_percentile if hedge_percentile > 0 else None
+        logger.info(f"容错配置: failover={self.failover_enabled}, hedge_percentile={self.hedge_percentile}")
+    
+    def _call_with_resilience(self, 
+                              stage: str,
+                              target_provider: LLMProvider,
+                              call: Callable[[Any], APIResponse],
+                              allow_failover: bool = True) -> APIResponse:
+        """
+        经熔断器调用 call(client)：目标提供商熔断或失败时按需切换到其他提供商，
+        开启对冲时主请求超过该阶段历史延迟分位数后再发一次请求；
+        只有提供商侧故障（见 resilience.is_provider_failure）计入熔断，返回的响应带有实际提供商（provider）
+        
+        allow_failover: 调用方显式指定提供商时为False（如提供商对比实验），只使用目标提供商
+        """
+        candidates = [target_provider]
+        if allow_failover and self.failover_enabled and stage in FAILOVER_STAGES:
+            candidates += [p for p in self.clients if p != target_provider]
+        
+        last_response = None
+        for candidate in candidates:
+            breaker = get_circuit_breaker(candidate.value)
+            if not breaker.allow_request():
+                logger.warning(f"⚡ {candidate.value} 处于熔断状态，跳过")
+                continue
+            
+            client = self.clients[candidate]
+            tracker = get_latency_tracker(candidate.value, stage)
+            hedge_after = tracker.percentile(self.hedge_percentile) if self.hedge_percentile else None
+            
+            failover_from = None
+            if candidate != target_provider:
+                logger.warning(f"🔀 {stage} 请求切换到备用提供商 {candidate.value}")
+                failover_from = target_provider.value
+            
+            def _call():
+                with metering_failover(failover_from):
+                    return call(client)
+            
+            start_time = time.time()
+            provider_failure = False
+            try:
+                response, hedged = hedged_call(_call, hedge_after)
+            except Exception as e:
+                logger.error(f"{stage} 请求异常 ({candidate.value}): {e}")
+                provider_failure = is_provider_failure(error=e)
+                response, hedged = APIResponse(
+                    content="",
+                    model=self.default_configs[candidate].model_name,
+                    usage={},
+                    success=False,
+                    error=str(e)
+                ), False
+            
+            if response is not None:
+                response.provider = candidate.value
+            if response is not None and response.success:
+                breaker.record_success()
+                tracker.add(time.time() - start_time)
+                if hedged:
+                    logger.info(f"⏱️ {stage} 由对冲请求返回 ({candidate.value})")
+                return response
+            
+            if provider_failure or is_provider_failure(response):
+                breaker.record_failure()
+            else:
+                # 请求本身的错误（4xx、空响应等）说明提供商可用，不计入熔断
+                breaker.record_success()
+            last_response = response
+        
+        if last_response is None:
+            last_response = APIResponse(
+                content="",
+                model=self.default_configs[target_provider].model_name,
+                usage={},
+                success=False,
+                error=f"LLM提供商 {target_provider.value} 熔断中，无可用的备用提供商"
+            )
+        return last_response
+    
     def generate_text(self, 
                      prompt: str, 
                      provider: Optional[Union[LLMProvider, str]] = None,
                      max_tokens: Optional[int] = None,
                      temperature: Optional[float] = None,
-                     system_prompt: Optional[str] = None) -> APIResponse:
-        """生成文本"""
+                     system_prompt: Optional[str] = None,
+                     cacheable_prefix: Optional[str] = None,
+                     response_schema: Optional[str] = None,
+                     cache_response: Optional[bool] = None,
+                     cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """
+        生成文本（cacheable_prefix为多次请求共用的长上下文，放在最前面以命中提供商前缀缓存；
+        response_schema为RESPONSE_SCHEMAS中的名称，输出按该schema约束为JSON；
+        cache_response显式指定是否使用响应缓存，None时temperature>0的请求不缓存；
+        cache_validator只缓存/复用该函数返回True的内容）
+        """
         
         # 确定使用的提供商
         if provider:
@@ -139,26 +279,23 @@ class DynamicLLMManager:
         # 获取配置
         config = self.default_configs[target_provider]
         max_tokens = max_tokens or config.max_tokens
-        temperature = temperature or config.temperature
-        
-        # 调用相应的客户端
-        client = self.clients[target_provider]
+        temperature = config.temperature if temperature is None else temperature
         
         try:
-            if target_provider == LLMProvider.OPENAI:
-                return client.generate_text(
+            return self._call_with_resilience(
+                "text", target_provider,
+                lambda client: client.generate_text(
                     prompt=prompt,
                     max_tokens=max_tokens,
                     temperature=temperature,
-                    system_prompt=system_prompt
-                )
-            elif target_provider == LLMProvider.CLAUDE:
-                return client.generate_text(
-                    prompt=prompt,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    system_prompt=system_prompt
-                )
+                    system_prompt=system_prompt,
+                    cacheable_prefix=cacheable_prefix,
+                    response_schema=response_schema,
+                    cache_response=cache_response,
+                    cache_validator=cache_validator
+                ),
+                allow_failover=provider is None
+            )
         except Exception as e:
             logger.error(f"文本生成失败 ({target_provider.value}): {e}")
             return APIResponse(
@@ -188,6 +325,7 @@ class DynamicLLMManager:
             logger.error(f"内容生成失败: {e}")
             return ""
     
+    @metered_stage("report")
     def generate_report(self, 
                        documents: List[Dict], 
                        topic: str,
@@ -206,11 +344,12 @@ class DynamicLLMManager:
         if not target_provider or target_provider not in self.clients:
             raise ValueError(f"LLM提供商 {target_provider} 不可用")
         
-        # 调用相应的客户端
-        client = self.clients[target_provider]
-        
         try:
-            return client.generate_report(documents, topic, max_tokens)
+            return self._call_with_resilience(
+                "report", target_provider,
+                lambda client: client.generate_report(documents, topic, max_tokens),
+                allow_failover=provider is None
+            )
         except Exception as e:
             logger.error(f"报告生成失败 ({target_provider.value}): {e}")
             config = self.default_configs[target_provider]
@@ -222,6 +361,7 @@ class DynamicLLMManager:
                 error=str(e)
             )
     
+    @metered_stage("questions")
     def generate_questions(self, 
                           report: str, 
                           topic: str,
@@ -240,43 +380,13 @@ class DynamicLLMManager:
         if not target_provider or target_provider not in self.clients:
             raise ValueError(f"LLM提供商 {target_provider} 不可用")
         
-        # 调用相应的客户端
-        client = self.clients[target_provider]
-        
         try:
-            api_response = client.generate_questions(report, topic, num_questions)
-            
-            if api_response.success and api_response.content:
-                # 直接解析文本格式
-                content = api_response.content.strip()
-                questions_data = self._parse_text_questions(content)
-                
-                # 构建成功响应
-                result = APIResponse(
-                    content=api_response.content,
-                    model=api_response.model,
-                    usage=api_response.usage,
-                    success=True
-                )
-                
-                # 添加解析后的问题数据
-                result.questions = questions_data
-                result.count = len(questions_data)
-                
-                logger.info(f"问题生成成功: {len(questions_data)} 个有效问题")
-                return result
-            else:
-                # API调用失败
-                result = APIResponse(
-                    content="",
-                    model=api_response.model,
-                    usage=api_response.usage,
-                    success=False,
-                    error=api_response.error
-                )
-                result.questions = []
-                result.count = 0
-                return result
+            api_response = self._call_with_resilience(
+                "questions", target_provider,
+                lambda client: client.generate_questions(report, topic, num_questions),
+                allow_failover=provider is None
+            )
+            return self._build_questions_result(api_response)
                 
         except Exception as e:
             logger.error(f"问题生成失败 ({target_provider.value}): {e}")
@@ -292,6 +402,40 @@ class DynamicLLMManager:
             result.count = 0
             return result
     
+    def _build_questions_result(self, api_response: APIResponse) -> APIResponse:
+        """解析问题生成响应，附加questions/count字段"""
+        if api_response.success and api_response.content:
+            # 直接解析文本格式
+            content = api_response.content.strip()
+            questions_data = self._parse_text_questions(content)
+            
+            # 构建成功响应
+            result = APIResponse(
+                content=api_response.content,
+                model=api_response.model,
+                usage=api_response.usage,
+                success=True
+            )
+            
+            # 添加解析后的问题数据
+            result.questions = questions_data
+            result.count = len(questions_data)
+            
+            logger.info(f"问题生成成功: {len(questions_data)} 个有效问题")
+            return result
+        else:
+            # API调用失败
+            result = APIResponse(
+                content="",
+                model=api_response.model,
+                usage=api_response.usage,
+                success=False,
+                error=api_response.error
+            )
+            result.questions = []
+            result.count = 0
+            return result
+    
     def _extract_questions_from_text(self, text: str) -> List[Dict[str, Any]]:
         """从文本中提取问题的备用方法"""
         questions = []
@@ -406,49 +550,10 @@ class DynamicLLMManager:
         for i, block in enumerate(question_blocks):
             if i == 0:  # 跳过第一个空块
                 continue
-                
-            block = block.strip()
-            if not block:
-                continue
             
-            # 解析每个问题块
-            question_text = ""
-            difficulty = "Medium"
-            question_type = "general"
-            reasoning = "Generated research question"
-            
-            lines = block.split('\n')
-            current_section = "question"
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if line.upper().startswith('DIFFICULTY:'):
-                    difficulty = line.split(':', 1)[1].strip()
-                    current_section = "difficulty"
-                elif line.upper().startswith('TYPE:'):
-                    question_type = line.split(':', 1)[1].strip()
-                    current_section = "type"
-                elif line.upper().startswith('REASONING:'):
-                    reasoning = line.split(':', 1)[1].strip()
-                    current_section = "reasoning"
-                else:
-                    if current_section == "question":
-                        question_text += " " + line if question_text else line
-                    elif current_section == "reasoning":
-                        reasoning += " " + line
-            
-            # 清理问题文本
-            question_text = question_text.strip()
-            if question_text:
-                questions.append({
-                    'question': question_text,
-                    'difficulty': difficulty,
-                    'type': question_type,
-                    'reasoning': reasoning
-                })
+            question = self._parse_question_block(block)
+            if question:
+                questions.append(question)
         
         # 如果没有解析到足够的问题，使用备用方法
         if len(questions) < 3:
@@ -458,6 +563,73 @@ class DynamicLLMManager:
         
         return questions
     
+    def _parse_question_block(self, block: str) -> Optional[Dict[str, Any]]:
+        """解析单个问题块（Qn: 标记之后到下一个标记之前的文本）"""
+        block = block.strip()
+        if not block:
+            return None
+        
+        question_text = ""
+        difficulty = "Medium"
+        question_type = "general"
+        reasoning = "Generated research question"
+        
+        lines = block.split('\n')
+        current_section = "question"
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            if line.upper().startswith('DIFFICULTY:'):
+                difficulty = line.split(':', 1)[1].strip()
+                current_section = "difficulty"
+            elif line.upper().startswith('TYPE:'):
+                question_type = line.split(':', 1)[1].strip()
+                current_section = "type"
+            elif line.upper().startswith('REASONING:'):
+                reasoning = line.split(':', 1)[1].strip()
+                current_section = "reasoning"
+            else:
+                if current_section == "question":
+                    question_text += " " + line if question_text else line
+                elif current_section == "reasoning":
+                    reasoning += " " + line
+        
+        # 清理问题文本
+        question_text = question_text.strip()
+        if not question_text:
+            return None
+        return {
+            'question': question_text,
+            'difficulty': difficulty,
+            'type': question_type,
+            'reasoning': reasoning
+        }
+    
+    def generate_questions_stream(self, 
+                                  report: str, 
+                                  topic: str,
+                                  num_questions: int = 50,
+                                  provider: Optional[Union[LLMProvider, str]] = None,
+                                  deep_short_answer: bool = False,
+                                  transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> QuestionStream:
+        """
+        流式生成问题：返回可迭代的QuestionStream，每个问题在流中写完即产出
+        
+        deep_short_answer=True 时使用 generate_deep_short_answer_questions 的提示词；
+        transform 在产出前处理每个问题（如统一设置难度）；迭代结束后 stream.response 为完整响应
+        """
+        if deep_short_answer:
+            request = lambda: self._build_questions_result(
+                self.generate_deep_short_answer_questions(report, topic, num_questions, provider)
+            )
+        else:
+            request = lambda: self.generate_questions(report, topic, num_questions, provider)
+        return QuestionStream(request, self._parse_question_block, transform)
+    
+    @metered_stage("answers")
     def generate_answer(self, 
                        question: str, 
                        report: str, 
@@ -476,11 +648,12 @@ class DynamicLLMManager:
         if not target_provider or target_provider not in self.clients:
             raise ValueError(f"LLM提供商 {target_provider} 不可用")
         
-        # 调用相应的客户端
-        client = self.clients[target_provider]
-        
         try:
-            return client.generate_answer(question, report, difficulty)
+            return self._call_with_resilience(
+                "answers", target_provider,
+                lambda client: client.generate_answer(question, report, difficulty),
+                allow_failover=provider is None
+            )
         except Exception as e:
             logger.error(f"答案生成失败 ({target_provider.value}): {e}")
             config = self.default_configs[target_provider]
@@ -492,12 +665,92 @@ class DynamicLLMManager:
                 error=str(e)
             )
     
+    def _resolve_provider(self, provider: Optional[Union[LLMProvider, str]] = None) -> LLMProvider:
+        """解析目标提供商"""
+        if provider:
+            if isinstance(provider, str):
+                provider = LLMProvider(provider.lower())
+            target_provider = provider
+        else:
+            target_provider = self.current_provider
+        
+        if not target_provider or target_provider not in self.clients:
+            raise ValueError(f"LLM提供商 {target_provider} 不可用")
+        return target_provider
+    
+    async def generate_text_async(self, 
+                                  prompt: str, 
+                                  provider: Optional[Union[LLMProvider, str]] = None,
+                                  max_tokens: Optional[int] = None,
+                                  temperature: Optional[float] = None,
+                                  system_prompt: Optional[str] = None,
+                                  cacheable_prefix: Optional[str] = None,
+                                  response_schema: Optional[str] = None,
+                                  cache_response: Optional[bool] = None,
+                                  cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """异步生成文本（按提供商限制并发）"""
+        target_provider = self._resolve_provider(provider)
+        return await run_with_provider_limit(
+            target_provider.value, self.generate_text, prompt, provider=provider,
+            max_tokens=max_tokens, temperature=temperature, system_prompt=system_prompt,
+            cacheable_prefix=cacheable_prefix, response_schema=response_schema,
+            cache_response=cache_response, cache_validator=cache_validator
+        )
+    
+    async def generate_content_async(self, 
+                                     prompt: str,
+                                     provider: Optional[Union[LLMProvider, str]] = None,
+                                     temperature: Optional[float] = None,
+                                     max_tokens: Optional[int] = None,
+                                     system_prompt: Optional[str] = None) -> str:
+        """异步生成内容（返回字符串）"""
+        try:
+            response = await self.generate_text_async(
+                prompt, provider=provider, max_tokens=max_tokens,
+                temperature=temperature, system_prompt=system_prompt
+            )
+            return response.content if response.success else ""
+        except Exception as e:
+            logger.error(f"内容生成失败: {e}")
+            return ""
+    
+    async def generate_report_async(self, 
+                                    documents: List[Dict], 
+                                    topic: str,
+                                    provider: Optional[Union[LLMProvider, str]] = None,
+                                    max_tokens: int = 4000) -> APIResponse:
+        """异步生成领域报告"""
+        target_provider = self._resolve_provider(provider)
+        return await run_with_provider_limit(
+            target_provider.value, self.generate_report, documents, topic, provider, max_tokens
+        )
+    
+    async def generate_answer_async(self, 
+                                    question: str, 
+                                    report: str, 
+                                    difficulty: str,
+                                    provider: Optional[Union[LLMProvider, str]] = None) -> APIResponse:
+        """异步生成答案"""
+        target_provider = self._resolve_provider(provider)
+        return await run_with_provider_limit(
+            target_provider.value, self.generate_answer, question, report, difficulty, provider
+        )
+    
+    @metered_stage("answers")
     def generate_answers(self, 
                         questions_data: List[Dict[str, Any]], 
                         report: str,
                         provider: Optional[Union[LLMProvider, str]] = None,
-                        max_answers: int = 5) -> Dict[str, Any]:
-        """批量生成答案"""
+                        max_answers: int = 5,
+                        use_batch: bool = False,
+                        batch_backend: Optional[BatchBackend] = None,
+                        questions_per_request: Optional[int] = None) -> Dict[str, Any]:
+        """
+        批量生成答案
+        
+        use_batch=True时通过提供商Batch接口离线提交；
+        questions_per_request>1时每次请求共享一份报告回答多个问题，解析失败的问题单独重试
+        """
         
         # 确定使用的提供商
         if provider:
@@ -513,6 +766,88 @@ class DynamicLLMManager:
         # 限制答案数量
         questions_to_answer = questions_data[:max_answers] if len(questions_data) > max_answers else questions_data
         
+        # 批处理模式：先一次性提交所有答案请求，循环中直接取结果
+        batch_answers = None
+        questions_per_request = questions_per_request or DEFAULT_ANSWERS_PER_REQUEST
+        if use_batch:
+            batch_answers = self._generate_answers_via_batch(questions_to_answer, report, target_provider, batch_backend)
+        elif questions_per_request > 1 and len(questions_to_answer) > 1:
+            batch_answers = self._generate_answers_multi(questions_to_answer, report, target_provider, questions_per_request)
+        
+        return self._build_answers_result(questions_to_answer, batch_answers, report, provider)
+    
+    @metered_stage("answers")
+    def generate_answers_pipelined(self, 
+                                   questions: Iterable[Dict[str, Any]], 
+                                   report: str,
+                                   provider: Optional[Union[LLMProvider, str]] = None,
+                                   max_answers: int = 5,
+                                   questions_per_request: Optional[int] = None) -> Dict[str, Any]:
+        """
+        与问题生成流水线并行地生成答案
+        
+        questions 可以是 generate_questions_stream 返回的流：每到达一个问题（或凑满一组）就提交答案请求，
+        不必等全部问题生成完；返回结构与 generate_answers 相同，另含 questions（实际回答的问题列表）
+        """
+        target_provider = self._resolve_provider(provider)
+        questions_per_request = questions_per_request or DEFAULT_ANSWERS_PER_REQUEST
+        
+        questions_to_answer: List[Dict[str, Any]] = []
+        submitted = []
+        pending_group: List[int] = []
+        
+        def _answer_one(index: int) -> List[APIResponse]:
+            question_data = questions_to_answer[index]
+            return [self.generate_answer(
+                question_data.get('question', ''), report, question_data.get('difficulty', 'Medium'), provider
+            )]
+        
+        def _answer_group(indices: List[int]) -> List[Optional[APIResponse]]:
+            return self._answer_question_group([questions_to_answer[i] for i in indices], report, target_provider)
+        
+        max_workers = get_async_concurrency(target_provider.value)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"llm-{target_provider.value}-pipe") as executor:
+            
+            def _submit(indices: List[int]):
+                if len(indices) == 1:
+                    future = submit_with_provider_limit(executor, target_provider.value, _answer_one, indices[0])
+                else:
+                    future = submit_with_provider_limit(executor, target_provider.value, _answer_group, list(indices))
+                submitted.append((list(indices), future))
+            
+            for question_data in questions:
+                if len(questions_to_answer) >= max_answers:
+                    break
+                questions_to_answer.append(question_data)
+                pending_group.append(len(questions_to_answer) - 1)
+                if len(pending_group) >= questions_per_request:
+                    _submit(pending_group)
+                    pending_group = []
+            if pending_group:
+                _submit(pending_group)
+            
+            responses: List[Optional[APIResponse]] = [None] * len(questions_to_answer)
+            for indices, future in submitted:
+                try:
+                    group_responses = future.result()
+                except Exception as e:
+                    logger.error(f"流水线答案请求失败: {e}")
+                    continue
+                for i, response in zip(indices, group_responses):
+                    responses[i] = response
+        
+        logger.info(f"🔀 流水线答案生成: {len(questions_to_answer)} 个问题 -> {len(submitted)} 个请求")
+        responses = self._requeue_unparsed_answers(questions_to_answer, responses, report, target_provider)
+        result = self._build_answers_result(questions_to_answer, responses, report, provider)
+        result['questions'] = questions_to_answer
+        return result
+    
+    def _build_answers_result(self, 
+                              questions_to_answer: List[Dict[str, Any]],
+                              batch_answers: Optional[List[APIResponse]],
+                              report: str,
+                              provider: Optional[LLMProvider]) -> Dict[str, Any]:
+        """整理答案结果；batch_answers为None时逐题请求"""
         qa_pairs = []
         total_answer_length = 0
         successful_answers = 0
@@ -526,7 +861,10 @@ class DynamicLLMManager:
                 logger.info(f"生成答案 {i+1}/{len(questions_to_answer)}: {question[:50]}...")
                 
                 # 生成答案
-                answer_response = self.generate_answer(question, report, difficulty, provider)
+                if batch_answers is not None:
+                    answer_response = batch_answers[i]
+                else:
+                    answer_response = self.generate_answer(question, report, difficulty, provider)
                 
                 if answer_response.success and answer_response.content:
                     answer = answer_response.content
@@ -566,10 +904,6 @@ class DynamicLLMManager:
                     }
                     qa_pairs.append(qa_pair)
                 
-                # 短暂休息避免API限制
-                import time
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"处理问题 {i+1} 失败: {e}")
                 qa_pair = {
@@ -604,6 +938,260 @@ class DynamicLLMManager:
         
         return result
     
+    def get_batch_backend(self, provider: Optional[Union[LLMProvider, str]] = None) -> BatchBackend:
+        """
+        获取批处理后端，由环境变量 LLM_BATCH_BACKEND 控制：
+        api（默认，提供商Batch接口）/ local（本地文件任务，经同步客户端执行）/ stub（本地文件任务，离线回显）
+        """
+        target_provider = self._resolve_provider(provider)
+        client = self.clients[target_provider]
+        mode = os.getenv('LLM_BATCH_BACKEND', 'api').lower()
+        
+        if mode == 'stub':
+            return LocalBatchBackend()
+        if mode == 'local':
+            return LocalBatchBackend(responder=lambda req, model: client.generate_text(
+                prompt=req.prompt,
+                max_tokens=req.max_tokens,
+                temperature=req.temperature,
+                system_prompt=req.system_prompt
+            ))
+        if target_provider == LLMProvider.OPENAI:
+            return OpenAIBatchBackend(client.api_key, transport=self.transport)
+        return ClaudeBatchBackend(client.api_key, transport=self.transport)
+    
+    def run_batch(self, 
+                  requests: List[BatchRequest],
+                  provider: Optional[Union[LLMProvider, str]] = None,
+                  backend: Optional[BatchBackend] = None,
+                  poll_interval: float = 30.0,
+                  timeout: float = 24 * 3600) -> Dict[str, APIResponse]:
+        """提交批处理任务并等待结果，返回 {custom_id: APIResponse}"""
+        target_provider = self._resolve_provider(provider)
+        backend = backend or self.get_batch_backend(target_provider)
+        runner = BatchRunner(backend, poll_interval=poll_interval, timeout=timeout)
+        return runner.run(requests, self.clients[target_provider].model)
+    
+    def generate_text_batch(self, 
+                            prompts: List[str],
+                            provider: Optional[Union[LLMProvider, str]] = None,
+                            max_tokens: Optional[int] = None,
+                            temperature: Optional[float] = None,
+                            system_prompt: Optional[str] = None,
+                            backend: Optional[BatchBackend] = None) -> List[APIResponse]:
+        """批处理生成文本，结果与prompts顺序一致"""
+        target_provider = self._resolve_provider(provider)
+        config = self.default_configs[target_provider]
+        requests = [
+            BatchRequest(
+                custom_id=f"text-{i:05d}",
+                prompt=prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens or config.max_tokens,
+                temperature=temperature or config.temperature
+            )
+            for i, prompt in enumerate(prompts)
+        ]
+        results = self.run_batch(requests, target_provider, backend)
+        return [results[req.custom_id] for req in requests]
+    
+    @metered_stage("questions")
+    def generate_questions_batch(self, 
+                                 jobs: List[Dict[str, Any]],
+                                 provider: Optional[Union[LLMProvider, str]] = None,
+                                 backend: Optional[BatchBackend] = None) -> List[APIResponse]:
+        """
+        批处理生成问题
+        
+        Args:
+            jobs: [{'report': ..., 'topic': ..., 'num_questions': ...}, ...]
+        
+        Returns:
+            与jobs顺序一致的APIResponse列表（含questions/count字段）
+        """
+        target_provider = self._resolve_provider(provider)
+        client = self.clients[target_provider]
+        
+        requests = []
+        for i, job in enumerate(jobs):
+            captured = capture_text_request(
+                client, 'generate_questions', job['report'], job['topic'], job.get('num_questions', 50)
+            )
+            requests.append(BatchRequest(custom_id=f"questions-{i:05d}", **captured))
+        
+        results = self.run_batch(requests, target_provider, backend)
+        return [self._build_questions_result(results[req.custom_id]) for req in requests]
+    
+    @metered_stage("answers")
+    def _generate_answers_via_batch(self, 
+                                    questions_data: List[Dict[str, Any]],
+                                    report: str,
+                                    target_provider: LLMProvider,
+                                    backend: Optional[BatchBackend] = None) -> List[APIResponse]:
+        """把generate_answer的请求收集为一个批处理任务，返回与问题顺序一致的结果"""
+        client = self.clients[target_provider]
+        
+        requests = []
+        for i, question_data in enumerate(questions_data):
+            captured = capture_text_request(
+                client, 'generate_answer',
+                question_data.get('question', ''), report, question_data.get('difficulty', 'Medium')
+            )
+            requests.append(BatchRequest(custom_id=f"answer-{i:05d}", **captured))
+        
+        logger.info(f"📦 批处理答案生成: {len(requests)} 个请求")
+        results = self.run_batch(requests, target_provider, backend)
+        return [results[req.custom_id] for req in requests]
+    
+    def _generate_answers_multi(self, 
+                                questions_data: List[Dict[str, Any]],
+                                report: str,
+                                target_provider: LLMProvider,
+                                questions_per_request: int) -> List[APIResponse]:
+        """每次请求回答多个问题（报告只发送一次），返回与问题顺序一致的结果"""
+        groups = [
+            list(range(start, min(start + questions_per_request, len(questions_data))))
+            for start in range(0, len(questions_data), questions_per_request)
+        ]
+        logger.info(f"📎 多题合并答案生成: {len(questions_data)} 个问题 -> {len(groups)} 个请求")
+        
+        group_results = map_with_provider_limit(
+            target_provider.value,
+            lambda indices: self._answer_question_group([questions_data[i] for i in indices], report, target_provider),
+            groups
+        )
+        
+        responses: List[Optional[APIResponse]] = [None] * len(questions_data)
+        for indices, group_responses in zip(groups, group_results):
+            for i, response in zip(indices, group_responses):
+                responses[i] = response
+        
+        return self._requeue_unparsed_answers(questions_data, responses, report, target_provider)
+    
+    def _requeue_unparsed_answers(self, 
+                                  questions_data: List[Dict[str, Any]],
+                                  responses: List[Optional[APIResponse]],
+                                  report: str,
+                                  target_provider: LLMProvider) -> List[APIResponse]:
+        """合并请求中未能解析的问题单独重新请求"""
+        requeued = [i for i, response in enumerate(responses) if response is None]
+        if requeued:
+            logger.warning(f"  🔁 {len(requeued)} 个问题未能从合并响应中解析，单独重试")
+            retried = map_with_provider_limit(
+                target_provider.value,
+                lambda i: self.generate_answer(
+                    questions_data[i].get('question', ''), report,
+                    questions_data[i].get('difficulty', 'Medium'), target_provider
+                ),
+                requeued
+            )
+            for i, response in zip(requeued, retried):
+                responses[i] = response
+        
+        return responses
+    
+    def _answer_question_group(self, 
+                               group: List[Dict[str, Any]],
+                               report: str,
+                               target_provider: LLMProvider) -> List[Optional[APIResponse]]:
+        """在一次请求中回答一组问题，无法解析的问题返回None"""
+        client = self.clients[target_provider]
+        
+        question_lines = []
+        max_tokens = 200
+        for idx, question_data in enumerate(group, 1):
+            question = question_data.get('question', '')
+            difficulty = question_data.get('difficulty', 'Medium')
+            if hasattr(client, '_is_short_answer_deep_query') and client._is_short_answer_deep_query(question):
+                requirement = "ONLY the core factual answer, maximum 10 words"
+                max_tokens += SHORT_ANSWER_TOKEN_BUDGET
+            else:
+                requirement = {"Easy": "400-600 words", "Medium": "800-1200 words",
+                               "Hard": "1500-2000 words"}.get(difficulty, "800-1200 words")
+                max_tokens += ANSWER_TOKEN_BUDGETS.get(difficulty, ANSWER_TOKEN_BUDGETS["Medium"])
+            question_lines.append(f"[{idx}] (Difficulty: {difficulty}; Length: {requirement})\n{question}")
+        
+        system_prompt = """You are a professional research expert. Answer each question based on the provided research summary.
+
+Answer requirements:
+1. Follow the length requirement given for each question
+2. Based on summary content, do not fabricate information
+3. Clear structure and rigorous logic; use academic writing style
+4. Answer ENTIRELY in English for consistency in comparative analysis
+5. Answer every question independently and completely"""
+        
+        report_prefix = f"""Research Summary:
+{report}"""
+        
+        prompt = f"""Answer ALL of the following {len(group)} questions based on the research summary above.
+
+{chr(10).join(question_lines)}
+
+Return ONLY a JSON object with one entry per question, in this format:
+{{"answers": [
+  {{"id": 1, "answer": "..."}},
+  {{"id": 2, "answer": "..."}}
+]}}"""
+        
+        try:
+            response = self._call_with_resilience(
+                "answers", target_provider,
+                lambda group_client: group_client.generate_text(
+                    prompt=prompt,
+                    max_tokens=min(max_tokens, MAX_MULTI_ANSWER_TOKENS),
+                    temperature=0.7,
+                    system_prompt=system_prompt,
+                    cacheable_prefix=report_prefix,
+                    response_schema="multi_answers"
+                ),
+                allow_failover=False
+            )
+        except Exception as e:
+            logger.error(f"多题合并答案请求失败 ({target_provider.value}): {e}")
+            return [None] * len(group)
+        
+        if not response.success:
+            logger.warning(f"  ⚠️ 多题合并答案请求失败: {response.error}")
+            return [None] * len(group)
+        
+        answers = self._parse_multi_answers(response.content, response.structured)
+        results: List[Optional[APIResponse]] = []
+        usage_assigned = False
+        for idx in range(1, len(group) + 1):
+            answer = answers.get(idx)
+            if not answer:
+                results.append(None)
+                continue
+            # 整个请求的用量记在第一个成功解析的答案上，避免重复计数
+            results.append(APIResponse(
+                content=answer,
+                model=response.model,
+                usage={} if usage_assigned else response.usage,
+                success=True
+            ))
+            usage_assigned = True
+        return results
+    
+    def _parse_multi_answers(self, content: str, structured: bool = False) -> Dict[int, str]:
+        """解析多题合并响应，返回 {问题序号: 答案}（兼容 {"answers": [...]} 与直接返回的数组）"""
+        items = parse_json_response(content, "multi_answers", repair=self._clean_json_content, structured=structured)
+        if isinstance(items, dict):
+            items = items.get('answers')
+        
+        answers = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                idx = int(item.get('id'))
+            except (TypeError, ValueError):
+                continue
+            answer = item.get('answer')
+            if isinstance(answer, str) and answer.strip():
+                answers[idx] = answer.strip()
+        return answers
+    
+    @metered_stage("questions")
     def refine_question(self, 
                        question: str, 
                        feedback: str, 
@@ -622,11 +1210,12 @@ class DynamicLLMManager:
         if not target_provider or target_provider not in self.clients:
             raise ValueError(f"LLM提供商 {target_provider} 不可用")
         
-        # 调用相应的客户端
-        client = self.clients[target_provider]
-        
         try:
-            return client.refine_question(question, feedback, report)
+            return self._call_with_resilience(
+                "refine", target_provider,
+                lambda client: client.refine_question(question, feedback, report),
+                allow_failover=provider is None
+            )
         except Exception as e:
             logger.error(f"问题优化失败 ({target_provider.value}): {e}")
             config = self.default_configs[target_provider]
@@ -680,11 +1269,14 @@ class DynamicLLMManager:
                     "model_name": config.model_name,
                     "max_tokens": config.max_tokens,
                     "temperature": config.temperature,
-                    "api_key_configured": bool(config.api_key)
+                    "api_key_configured": bool(config.api_key),
+                    "api_keys": self.clients[provider].key_pool.get_statistics(),
+                    "circuit_breaker": get_circuit_breaker(provider.value).get_statistics()
                 }
         
         return info
 
+    @metered_stage("report")
     def generate_simplified_report(self, 
                                   documents: Union[str, List[Dict]], 
                                   topic_id: Optional[str] = None,
@@ -722,6 +1314,7 @@ class DynamicLLMManager:
             logger.error(f"简化报告生成失败 ({target_provider.value}): {e}")
             return None
 
+    @metered_stage("questions")
     def generate_deep_short_answer_questions(self, 
                                            report: str, 
                                            topic_id: Optional[str] = None,
@@ -761,6 +1354,7 @@ class DynamicLLMManager:
                 error=str(e)
             )
 
+    @metered_stage("questions")
     def generate_short_answer_deep_questions(self, 
                                            report: str, 
                                            topic_id: Optional[str] = None,
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+LLM Metering - 按流水线阶段统计调用耗时、token、重试次数与估算成本
+客户端每次调用记录一条CallRecord，阶段由 metering_stage() 上下文标记（跨线程池需复制context），
+实验结束时汇总写到结果JSON旁边
+"""
+
+import json
+import time
+import functools
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .adaptive_timeout import get_adaptive_timeout
+from .structured_output import get_parse_stats
+from .key_pool import get_key_pool_statistics
+
+logger = logging.getLogger(__name__)
+
+# 每百万token价格（美元）：(输入, 输出, 缓存命中的输入)，按模型名前缀匹配
+PRICING_PER_MILLION: Dict[str, Tuple[float, float, float]] = {
+    'gpt-4o-mini': (0.15, 0.60, 0.075),
+    'gpt-4o': (2.50, 10.00, 1.25),
+    'gpt-4.1': (2.00, 8.00, 0.50),
+    'claude-sonnet-4': (3.00, 15.00, 0.30),
+    'claude-3-5-sonnet': (3.00, 15.00, 0.30),
+    'claude-3-5-haiku': (0.80, 4.00, 0.08),
+}
+# Anthropic缓存写入按输入价格的1.25倍计费
+CACHE_WRITE_MULTIPLIER = 1.25
+
+UNSPECIFIED_STAGE = "unspecified"
+
+_current_stage: ContextVar[Optional[str]] = ContextVar('llm_metering_stage', default=None)
+# 管理器切换到备用提供商时，调用方原本请求的提供商
+_failover_from: ContextVar[Optional[str]] = ContextVar('llm_metering_failover_from', default=None)
+
+
+@contextmanager
+def metering_stage(stage: str, override: bool = True):
+    """
+    标记当前上下文中LLM调用所属的流水线阶段
+
+    Args:
+        stage: 阶段名（report / questions / answers / screening / keyword_validation / composite_query ...）
+        override: False时只在外层尚未标记阶段时生效（用于管理器方法的默认阶段）
+    """
+    if not override and _current_stage.get() is not None:
+        yield
+        return
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def metered_stage(stage: str, override: bool = False):
+    """装饰器：方法内的LLM调用默认归入stage（外层已标记阶段时保持外层）"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metering_stage(stage, override=override):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def metering_failover(requested_provider: Optional[str]):
+    """标记当前上下文中的调用由备用提供商代替requested_provider完成（None表示未切换）"""
+    token = _failover_from.set(requested_provider)
+    try:
+        yield
+    finally:
+        _failover_from.reset(token)
+
+
+def current_stage() -> str:
+    """当前上下文的阶段名"""
+    return _current_stage.get() or UNSPECIFIED_STAGE
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """按价格表估算一次调用的成本（美元），未知模型返回0"""
+    matches = [prefix for prefix in PRICING_PER_MILLION if (model or '').startswith(prefix)]
+    if not matches:
+        return 0.0
+    input_price, output_price, cached_price = PRICING_PER_MILLION[max(matches, key=len)]
+
+    cached = usage.get('cached_tokens', 0) or 0
+    cache_creation = usage.get('cache_creation_tokens', 0) or 0
+    uncached = max(0, (usage.get('prompt_tokens', 0) or 0) - cached - cache_creation)
+    cost = (uncached * input_price
+            + cached * cached_price
+            + cache_creation * input_price * CACHE_WRITE_MULTIPLIER
+            + (usage.get('completion_tokens', 0) or 0) * output_price)
+    return cost / 1_000_000
+
+
+@dataclass
+class CallRecord:
+    """单次LLM调用的计量记录"""
+    provider: str
+    model: str
+    stage: str
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    retries: int
+    success: bool
+    cache_hit: bool
+    coalesced: bool
+    cost: float
+    timestamp: float
+    failover_from: Optional[str] = None
+
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {
+        'calls': 0, 'failed_calls': 0, 'cache_hits': 0, 'coalesced': 0, 'retries': 0, 'failover_calls': 0,
+        'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'total_tokens': 0,
+        'latency_total': 0.0, 'latency_max': 0.0, 'cost': 0.0
+    }
+
+
+def _add_to_bucket(bucket: Dict[str, Any], record: CallRecord):
+    bucket['calls'] += 1
+    bucket['failed_calls'] += 0 if record.success else 1
+    bucket['cache_hits'] += 1 if record.cache_hit else 0
+    bucket['coalesced'] += 1 if record.coalesced else 0
+    bucket['retries'] += record.retries
+    bucket['failover_calls'] += 1 if record.failover_from else 0
+    bucket['prompt_tokens'] += record.prompt_tokens
+    bucket['completion_tokens'] += record.completion_tokens
+    bucket['cached_tokens'] += record.cached_tokens
+    bucket['total_tokens'] += record.prompt_tokens + record.completion_tokens
+    bucket['latency_total'] += record.latency
+    bucket['latency_max'] = max(bucket['latency_max'], record.latency)
+    bucket['cost'] += record.cost
+
+
+def _finalize_bucket(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    bucket['latency_avg'] = round(bucket['latency_total'] / bucket['calls'], 3) if bucket['calls'] else 0.0
+    bucket['latency_total'] = round(bucket['latency_total'], 3)
+    bucket['latency_max'] = round(bucket['latency_max'], 3)
+    bucket['cost'] = round(bucket['cost'], 6)
+    return bucket
+
+
+class LLMMeter:
+    """进程内的LLM调用计量器（线程安全）"""
+
+    def __init__(self):
+        self._records: List[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, usage: Optional[Dict[str, int]], latency: float,
+               retries: int = 0, success: bool = True, cache_hit: bool = False,
+               coalesced: bool = False) -> CallRecord:
+        """记录一次调用（缓存命中或合并到在途请求的调用不计成本；provider为实际提供响应的提供商）"""
+        usage = usage or {}
+        record = CallRecord(
+            provider=provider,
+            model=model,
+            stage=current_stage(),
+            latency=round(latency, 3),
+            prompt_tokens=usage.get('prompt_tokens', 0) or 0,
+            completion_tokens=usage.get('completion_tokens', 0) or 0,
+            cached_tokens=usage.get('cached_tokens', 0) or 0,
+            retries=max(0, retries),
+            success=success,
+            cache_hit=cache_hit,
+            coalesced=coalesced,
+            cost=0.0 if cache_hit or coalesced else estimate_cost(model, usage),
+            timestamp=time.time(),
+            failover_from=_failover_from.get()
+        )
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    def mark(self) -> int:
+        """返回当前记录位置，配合 summary(since=...) 统计某段区间"""
+        with self._lock:
+            return len(self._records)
+
+    def records(self, since: int = 0) -> List[CallRecord]:
+        with self._lock:
+            return list(self._records[since:])
+
+    def summary(self, since: int = 0) -> Dict[str, Any]:
+        """按阶段和提供商汇总（by_provider按实际提供响应的提供商；failovers为 请求的->实际的 提供商调用数）"""
+        records = self.records(since)
+        totals = _empty_bucket()
+        by_stage: Dict[str, Dict[str, Any]] = {}
+        by_provider: Dict[str, Dict[str, Any]] = {}
+        failovers: Dict[str, int] = {}
+        for record in records:
+            _add_to_bucket(totals, record)
+            _add_to_bucket(by_stage.setdefault(record.stage, _empty_bucket()), record)
+            _add_to_bucket(by_provider.setdefault(record.provider, _empty_bucket()), record)
+            if record.failover_from:
+                route = f"{record.failover_from}->{record.provider}"
+                failovers[route] = failovers.get(route, 0) + 1
+
+        return {
+            'totals': _finalize_bucket(totals),
+            'by_stage': {stage: _finalize_bucket(b) for stage, b in sorted(by_stage.items())},
+            'by_provider': {provider: _finalize_bucket(b) for provider, b in sorted(by_provider.items())},
+            'failovers': dict(sorted(failovers.items())),
+            'wall_time': round(records[-1].timestamp - records[0].timestamp + records[0].latency, 3) if records else 0.0
+        }
+
+    def write_summary(self, results_path: Union[str, Path], since: int = 0,
+                      include_calls: bool = False) -> Optional[Path]:
+        """把汇总写到结果文件旁边：<结果文件名>_metering.json（传入目录时写为目录下的llm_metering.json）"""
+        results_path = Path(results_path)
+        if results_path.is_dir():
+            output_path = results_path / "llm_metering.json"
+        else:
+            output_path = results_path.with_name(f"{results_path.stem}_metering.json")
+
+        data = self.summary(since)
+        # 按模型的超时/成功统计（进程累计）
+        data['timeouts'] = get_adaptive_timeout().get_statistics()
+        # 按调用点的JSON解析结果（structured / free_text 两种模式分别统计）
+        data['parsing'] = get_parse_stats().get_statistics()
+        # 多key池的按key用量
+        key_usage = get_key_pool_statistics()
+        if key_usage:
+            data['api_keys'] = key_usage
+        if include_calls:
+            data['calls'] = [asdict(r) for r in self.records(since)]
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"写入计量汇总失败: {e}")
+            return None
+
+        totals = data['totals']
+        logger.info(f"📊 LLM计量: {totals['calls']} 次调用, {totals['total_tokens']} tokens, "
+                    f"估算成本 ${totals['cost']:.4f} -> {output_path}")
+        return output_path
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+
+
+_meter: Optional[LLMMeter] = None
+_meter_lock = threading.Lock()
+
+
+def get_meter() -> LLMMeter:
+    """获取全局共享的计量器"""
+    global _meter
+    if _meter is None:
+        with _meter_lock:
+            if _meter is None:
+                _meter = LLMMeter()
+    return _meter
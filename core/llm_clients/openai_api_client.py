@@ -4,12 +4,28 @@ OpenAI API Client for Deep Research QA Benchmark
 Replaces Claude API with OpenAI GPT-4o for all content generation
 """
 
+import os
 import json
 import requests
 import time
 import logging
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, replace
+
+from .http_transport import HTTPTransport, get_http_transport, openai_base_url
+from .async_support import run_with_provider_limit, map_with_provider_limit
+from .segment_merge import tree_merge_reports, sum_usage
+from .response_cache import LLMResponseCache, DEFAULT_CACHE_SAMPLED, get_response_cache, make_cache_key, should_cache
+from .rate_limiter import AdaptiveRateLimiter, get_rate_limiter, estimate_request_tokens
+from .key_pool import APIKeyPool, PooledKey, AUTH_ERROR_STATUS, MissingAPIKeyError, get_key_pool, load_api_keys
+from .tokenizer import estimate_tokens
+from .document_packing import pack_documents
+from .metering import get_meter
+from .single_flight import SingleFlight, get_single_flight
+from .adaptive_timeout import AdaptiveTimeout, get_adaptive_timeout
+from .streaming import STREAMING_ENABLED, read_openai_stream
+from .structured_output import STRUCTURED_OUTPUT_ENABLED, openai_response_format, is_json_object
+from .resilience import ERROR_RATE_LIMIT, ERROR_SERVER, request_error_kind
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -22,22 +38,79 @@ class APIResponse:
     usage: Dict[str, int]
     success: bool
     error: Optional[str] = None
+    cache_key: Optional[str] = None  # 响应写入了缓存时的键（见 invalidate_cached_response）
+    error_kind: Optional[str] = None  # 提供商侧故障类型（resilience.BREAKER_ERROR_KINDS），计入熔断
+    provider: Optional[str] = None  # 实际提供响应的提供商（管理器切换提供商时与请求的不同）
+    structured: bool = False  # 请求是否按response_schema约束为结构化输出（解析统计按此区分模式）
+
+def _format_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """统一usage格式，cached_tokens为命中提供商前缀缓存的输入token数"""
+    return {
+        "prompt_tokens": usage.get('prompt_tokens', 0),
+        "completion_tokens": usage.get('completion_tokens', 0),
+        "total_tokens": usage.get('total_tokens', 0),
+        "cached_tokens": (usage.get('prompt_tokens_details') or {}).get('cached_tokens', usage.get('cached_tokens', 0))
+    }
 
 class OpenAIClient:
     """OpenAI API client for content generation"""
     
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(self, api_key: str, model: str = "gpt-4o", transport: Optional[HTTPTransport] = None,
+                 cache: Optional[LLMResponseCache] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 timeouts: Optional[AdaptiveTimeout] = None,
+                 streaming: Optional[bool] = None,
+                 structured_output: Optional[bool] = None,
+                 key_pool: Optional[APIKeyPool] = None,
+                 cache_sampled: Optional[bool] = None):
         self.api_key = api_key
         self.model = model
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        self.api_url = f"{openai_base_url()}/chat/completions"
+        # 共享连接池，复用keep-alive连接
+        self.transport = transport or get_http_transport()
+        # 持久化响应缓存（相同请求直接返回）
+        self.cache = cache or get_response_cache()
+        # temperature > 0 的采样请求默认不走缓存，重试与重跑时重新采样
+        self.cache_sampled = DEFAULT_CACHE_SAMPLED if cache_sampled is None else cache_sampled
+        # API key池：api_key与OPENAI_API_KEYS中的key按剩余额度轮换，每个key独立限流；
+        # 没有任何key时客户端照常创建，首次请求时才失败（见 key_pool 属性）
+        self._key_pool = key_pool
+        self._pool_rate_limiter = rate_limiter
+        if key_pool is None and (api_key or load_api_keys("openai")):
+            self._key_pool = self.key_pool
+        # 主key的令牌桶限流器（单key时为进程内共享的限流器）
+        self.rate_limiter = (self._key_pool.keys[0].limiter if self._key_pool is not None
+                             else rate_limiter or get_rate_limiter("openai"))
+        # 合并并发的相同请求
+        self.single_flight = single_flight or get_single_flight()
+        # 按输出长度与实测速度计算超时；流式响应避免中断仍在输出的长生成
+        self.timeouts = timeouts or get_adaptive_timeout()
+        self.streaming = STREAMING_ENABLED if streaming is None else streaming
+        # 声明了response_schema的请求使用json_schema约束输出
+        self.structured_output = STRUCTURED_OUTPUT_ENABLED if structured_output is None else structured_output
+        # 分段报告每段的输入token预算（OpenAI使用更保守的限制）
+        self.segment_token_budget = int(os.getenv('LLM_SEGMENT_TOKEN_BUDGET_OPENAI', '28000'))
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
         
+    @property
+    def key_pool(self) -> APIKeyPool:
+        """API key池（创建客户端时没有key的，在首次使用时创建；仍没有key时抛出MissingAPIKeyError）"""
+        if self._key_pool is None:
+            keys = [self.api_key] if self.api_key else []
+            self._key_pool = (APIKeyPool("openai", keys or load_api_keys("openai"), rate_limiter=self._pool_rate_limiter)
+                              if self._pool_rate_limiter else get_key_pool("openai", keys))
+        return self._key_pool
+    
     def generate_content(self, prompt: str, system_prompt: str = None, 
                         max_tokens: int = 6000, temperature: float = 0.7,
-                        max_retries: int = 3, retry_delay: float = 2.0) -> Optional[str]:
+                        max_retries: int = 3, retry_delay: float = 2.0,
+                        response_schema: Optional[str] = None,
+                        cache_response: Optional[bool] = None,
+                        cache_validator: Optional[Callable[[str], bool]] = None) -> Optional[str]:
         """
         Generate content using OpenAI API with optimized parameters for longer responses
         
@@ -48,10 +121,101 @@ class OpenAIClient:
             temperature: Sampling temperature
             max_retries: Maximum number of retry attempts
             retry_delay: Delay between retries in seconds
+            response_schema: Name of a schema in RESPONSE_SCHEMAS to constrain the output to JSON
+            cache_response: Use the response cache for this call (default: only when temperature is 0)
+            cache_validator: Only cache / reuse content for which this returns True (e.g. it parses)
             
         Returns:
             Generated content or None if failed
         """
+        call_stats = {}
+        start_time = time.time()
+        response_format = self._response_format(response_schema)
+        cache_key = make_cache_key("openai", self.model, system_prompt, prompt, temperature, max_tokens,
+                                   response_format)
+        use_cache, cache_validator = self._cache_policy(temperature, response_format, cache_response, cache_validator)
+        
+        def _request():
+            return self._request_content(prompt, system_prompt, max_tokens, temperature, max_retries, retry_delay,
+                                         call_stats, cache_key if use_cache else None, response_format,
+                                         cache_validator)
+        
+        # 可缓存的相同请求在途时共享同一次调用；采样请求各自独立
+        content, shared = self.single_flight.do(cache_key, _request) if use_cache else (_request(), False)
+        call_stats['coalesced'] = shared
+        self._record_call(call_stats, start_time, content is not None)
+        return content
+    
+    def _cache_policy(self, temperature: float, response_format: Optional[Dict[str, Any]],
+                      cache_response: Optional[bool],
+                      cache_validator: Optional[Callable[[str], bool]]) -> Tuple[bool, Optional[Callable[[str], bool]]]:
+        """是否走缓存，以及写入/复用前的内容校验（结构化输出请求默认只缓存可解析的JSON）"""
+        use_cache = should_cache(temperature, self.cache_sampled, cache_response)
+        if cache_validator is None and response_format:
+            cache_validator = is_json_object
+        return use_cache, cache_validator
+    
+    def invalidate_cached_response(self, response: "APIResponse"):
+        """调用方发现响应不可用（如解析失败）时删除其缓存条目，下次请求重新生成"""
+        self.cache.delete(response.cache_key)
+    
+    def uses_structured_output(self, response_schema: Optional[str]) -> bool:
+        """指定response_schema的请求是否以结构化输出发送（调用方据此传parse_json_response的structured）"""
+        return bool(response_schema) and self.structured_output
+    
+    def _response_format(self, response_schema: Optional[str]) -> Optional[Dict[str, Any]]:
+        """结构化输出开启时把schema名称转为response_format参数"""
+        if self.uses_structured_output(response_schema):
+            return openai_response_format(response_schema)
+        return None
+    
+    def _record_call(self, call_stats: Dict[str, Any], start_time: float, success: bool):
+        """记录一次调用的计量数据"""
+        get_meter().record(
+            "openai", self.model, call_stats.get('usage'), time.time() - start_time,
+            retries=call_stats.get('attempts', 1) - 1,
+            success=success,
+            cache_hit=call_stats.get('cache_hit', False),
+            coalesced=call_stats.get('coalesced', False)
+        )
+    
+    def _post_completion(self, data: Dict[str, Any], pooled_key: PooledKey) -> Dict[str, Any]:
+        """使用分配的key发送请求并返回完整结果（流式时拼接增量），记录超时统计；HTTP错误与超时向上抛出"""
+        stream = self.streaming
+        if stream:
+            data = dict(data, stream=True, stream_options={"include_usage": True})
+        timeout = self.timeouts.request_timeout(self.model, data.get("max_tokens", 0), stream=stream)
+        
+        start_time = time.time()
+        try:
+            headers = dict(self.headers, Authorization=f"Bearer {pooled_key.key}")
+            response = self.transport.post(self.api_url, headers=headers, json=data,
+                                           timeout=timeout, stream=stream)
+            self.key_pool.update_from_headers(pooled_key, response.headers)
+            if not response.ok:
+                response.close()
+            response.raise_for_status()
+            if stream:
+                result, first_token_latency = read_openai_stream(response, start_time)
+            else:
+                result, first_token_latency = response.json(), None
+        except requests.exceptions.Timeout:
+            self.timeouts.record_timeout(self.model, time.time() - start_time, timeout)
+            raise
+        
+        self.timeouts.record_success(
+            self.model, time.time() - start_time,
+            (result.get('usage') or {}).get('completion_tokens', 0),
+            first_token_latency=first_token_latency,
+            timeout=None if stream else timeout
+        )
+        return result
+    
+    def _request_content(self, prompt: str, system_prompt: Optional[str], max_tokens: int, temperature: float,
+                         max_retries: int, retry_delay: float, call_stats: Dict[str, Any],
+                         cache_key: Optional[str], response_format: Optional[Dict[str, Any]] = None,
+                         cache_validator: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """发送请求（带重试），call_stats记录尝试次数、用量与缓存命中；cache_key为None时不读写缓存"""
         
         messages = []
         if system_prompt:
@@ -67,18 +231,35 @@ class OpenAIClient:
             "frequency_penalty": 0.1,
             "presence_penalty": 0.1
         }
+        if response_format:
+            data["response_format"] = response_format
+        
+        cached = self.cache.get(cache_key, validate=cache_validator) if cache_key else None
+        if cached is not None:
+            print(f"  💾 命中LLM缓存 (内容长度: {len(cached['content'])}字符)")
+            call_stats.update(cache_hit=True, usage=_format_usage(cached.get('usage', {})))
+            return cached['content']
+        
+        estimated_tokens = estimate_request_tokens((system_prompt or "") + prompt, max_tokens, self.model)
         
         for attempt in range(max_retries):
+            call_stats['attempts'] = attempt + 1
             try:
                 print(f"  🔄 OpenAI API调用 (尝试 {attempt + 1}/{max_retries})")
                 
-                response = requests.post(self.api_url, headers=self.headers, json=data, timeout=30)
-                response.raise_for_status()
-                
-                result = response.json()
+                pooled_key = self.key_pool.acquire(estimated_tokens)
+                result = self._post_completion(data, pooled_key)
                 if 'choices' in result and len(result['choices']) > 0:
                     content = result['choices'][0]['message']['content'].strip()
                     print(f"  ✅ API调用成功 (内容长度: {len(content)}字符)")
+                    call_stats['usage'] = _format_usage(result.get('usage', {}))
+                    self.key_pool.record_usage(pooled_key, estimated_tokens, result.get('usage', {}).get('total_tokens', 0))
+                    if cache_key and (cache_validator is None or cache_validator(content)):
+                        self.cache.put(cache_key, {
+                            'content': content,
+                            'model': self.model,
+                            'usage': result.get('usage', {})
+                        })
                     return content
                 else:
                     if attempt < max_retries - 1:
@@ -92,20 +273,17 @@ class OpenAIClient:
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:  # Rate limit
                     if attempt < max_retries - 1:
-                        # 尝试从响应头中读取建议的等待时间
-                        retry_after = e.response.headers.get('Retry-After')
-                        if retry_after:
-                            wait_time = int(retry_after)
-                        else:
-                            # 更保守的指数退避
-                            wait_time = min(retry_delay * (2 ** attempt), 60)  # 最大60秒
-                        
-                        print(f"  🚦 API速率限制，{wait_time}秒后重试...")
-                        time.sleep(wait_time)
+                        # 根据Retry-After或抖动退避暂停该key的限流器（多key时隔离该key，换key重试）
+                        wait_time = self.key_pool.on_rate_limited(pooled_key, e.response.headers, attempt, retry_delay)
+                        print(f"  🚦 API速率限制，{wait_time:.1f}秒后重试...")
                         continue
                     else:
                         print(f"❌ Rate limit exceeded after {max_retries} attempts")
                         return None
+                elif e.response.status_code in AUTH_ERROR_STATUS and \
+                        self.key_pool.on_auth_error(pooled_key, e.response.status_code) and attempt < max_retries - 1:
+                    print(f"  🔑 API key {pooled_key.label} 认证失败，换key重试...")
+                    continue
                 elif e.response.status_code >= 500:  # Server errors
                     if attempt < max_retries - 1:
                         print(f"  🔧 服务器错误 ({e.response.status_code})，{retry_delay}秒后重试...")
@@ -126,6 +304,9 @@ class OpenAIClient:
                 else:
                     print(f"❌ OpenAI API request failed after {max_retries} attempts: {e}")
                     return None
+            except MissingAPIKeyError as e:
+                print(f"❌ {e}")
+                return None
             except Exception as e:
                 if attempt < max_retries - 1:
                     print(f"  ❌ 未知错误，{retry_delay}秒后重试...")
@@ -139,11 +320,15 @@ class OpenAIClient:
     
     def generate_response(self, prompt: str, system_prompt: str = None, 
                          max_tokens: int = 2000, temperature: float = 0.3,
-                         max_retries: int = 10) -> str:
+                         max_retries: int = 10, response_schema: Optional[str] = None,
+                         cache_response: Optional[bool] = None,
+                         cache_validator: Optional[Callable[[str], bool]] = None) -> str:
         """
         Alias for generate_content method to maintain compatibility with existing code
         """
-        result = self.generate_content(prompt, system_prompt, max_tokens, temperature, max_retries)
+        result = self.generate_content(prompt, system_prompt, max_tokens, temperature, max_retries,
+                                       response_schema=response_schema, cache_response=cache_response,
+                                       cache_validator=cache_validator)
         return result if result is not None else ""
     
     def generate_text(self, 
@@ -152,8 +337,52 @@ class OpenAIClient:
                      temperature: float = 0.7,
                      system_prompt: Optional[str] = None,
                      max_retries: int = 3,
-                     retry_delay: float = 2.0) -> APIResponse:
-        """生成文本 - 与Claude API兼容的接口，增加重试机制"""
+                     retry_delay: float = 2.0,
+                     cacheable_prefix: Optional[str] = None,
+                     response_schema: Optional[str] = None,
+                     cache_response: Optional[bool] = None,
+                     cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """
+        生成文本 - 与Claude API兼容的接口，增加重试机制
+        
+        cacheable_prefix: 多次请求共用的长上下文（如报告），放在用户消息最前面，
+        由OpenAI自动前缀缓存（>=1024 tokens时生效）
+        response_schema: RESPONSE_SCHEMAS中的schema名称，输出按该schema约束为JSON
+        cache_response: 是否使用响应缓存（默认只有temperature为0时使用）
+        cache_validator: 只缓存/复用该函数返回True的内容（如可解析）；之后发现不可用时调用invalidate_cached_response
+        """
+        if cacheable_prefix:
+            prompt = f"{cacheable_prefix}\n\n{prompt}"
+        
+        call_stats = {}
+        start_time = time.time()
+        response_format = self._response_format(response_schema)
+        cache_key = make_cache_key("openai", self.model, system_prompt, prompt, temperature, max_tokens,
+                                   response_format)
+        use_cache, cache_validator = self._cache_policy(temperature, response_format, cache_response, cache_validator)
+        
+        def _request():
+            return self._request_text(prompt, max_tokens, temperature, system_prompt, max_retries, retry_delay,
+                                      call_stats, cache_key if use_cache else None, response_format,
+                                      cache_validator)
+        
+        # 可缓存的相同请求在途时共享同一次调用；采样请求各自独立
+        response, shared = self.single_flight.do(cache_key, _request) if use_cache else (_request(), False)
+        if shared:
+            # 共享结果复制一份，避免调用方附加属性时互相影响
+            response = replace(response)
+            call_stats['coalesced'] = True
+        elif response.success:
+            call_stats['usage'] = response.usage
+        response.structured = response_format is not None
+        self._record_call(call_stats, start_time, response.success)
+        return response
+    
+    def _request_text(self, prompt: str, max_tokens: int, temperature: float, system_prompt: Optional[str],
+                      max_retries: int, retry_delay: float, call_stats: Dict[str, Any],
+                      cache_key: Optional[str], response_format: Optional[Dict[str, Any]] = None,
+                      cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """发送请求（带重试），返回APIResponse；call_stats记录尝试次数与缓存命中；cache_key为None时不读写缓存"""
         
         messages = []
         if system_prompt:
@@ -169,29 +398,50 @@ class OpenAIClient:
             "frequency_penalty": 0.1,
             "presence_penalty": 0.1
         }
+        if response_format:
+            data["response_format"] = response_format
+        
+        cached = self.cache.get(cache_key, validate=cache_validator) if cache_key else None
+        if cached is not None:
+            print(f"  💾 命中LLM缓存 (内容长度: {len(cached['content'])}字符)")
+            call_stats['cache_hit'] = True
+            return APIResponse(
+                content=cached['content'],
+                model=cached.get('model', self.model),
+                usage=_format_usage(cached.get('usage', {})),
+                success=True,
+                cache_key=cache_key
+            )
+        
+        estimated_tokens = estimate_request_tokens((system_prompt or "") + prompt, max_tokens, self.model)
         
         for attempt in range(max_retries):
+            call_stats['attempts'] = attempt + 1
             try:
                 print(f"  🔄 OpenAI API调用 (尝试 {attempt + 1}/{max_retries})")
                 
-                response = requests.post(self.api_url, headers=self.headers, json=data, timeout=30)
-                response.raise_for_status()
-                
-                result = response.json()
+                pooled_key = self.key_pool.acquire(estimated_tokens)
+                result = self._post_completion(data, pooled_key)
                 if 'choices' in result and len(result['choices']) > 0:
                     content = result['choices'][0]['message']['content'].strip()
-                    usage = result.get('usage', {})
+                    usage = _format_usage(result.get('usage', {}))
                     
-                    print(f"  ✅ API调用成功 (tokens: {usage.get('total_tokens', 0)})")
+                    print(f"  ✅ API调用成功 (tokens: {usage['total_tokens']}, 缓存命中: {usage['cached_tokens']})")
+                    self.key_pool.record_usage(pooled_key, estimated_tokens, usage['total_tokens'])
+                    cached_as = None
+                    if cache_key and (cache_validator is None or cache_validator(content)):
+                        self.cache.put(cache_key, {
+                            'content': content,
+                            'model': self.model,
+                            'usage': usage
+                        })
+                        cached_as = cache_key
                     return APIResponse(
                         content=content,
                         model=self.model,
-                        usage={
-                            "prompt_tokens": usage.get('prompt_tokens', 0),
-                            "completion_tokens": usage.get('completion_tokens', 0),
-                            "total_tokens": usage.get('total_tokens', 0)
-                        },
-                        success=True
+                        usage=usage,
+                        success=True,
+                        cache_key=cached_as
                     )
                 else:
                     if attempt < max_retries - 1:
@@ -210,16 +460,9 @@ class OpenAIClient:
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:  # Rate limit
                     if attempt < max_retries - 1:
-                        # 尝试从响应头中读取建议的等待时间
-                        retry_after = e.response.headers.get('Retry-After')
-                        if retry_after:
-                            wait_time = int(retry_after)
-                        else:
-                            # 更保守的指数退避
-                            wait_time = min(retry_delay * (2 ** attempt), 60)  # 最大60秒
-                        
-                        print(f"  🚦 API速率限制，{wait_time}秒后重试...")
-                        time.sleep(wait_time)
+                        # 根据Retry-After或抖动退避暂停该key的限流器（多key时隔离该key，换key重试）
+                        wait_time = self.key_pool.on_rate_limited(pooled_key, e.response.headers, attempt, retry_delay)
+                        print(f"  🚦 API速率限制，{wait_time:.1f}秒后重试...")
                         continue
                     else:
                         return APIResponse(
@@ -227,8 +470,13 @@ class OpenAIClient:
                             model=self.model,
                             usage={},
                             success=False,
-                            error=f"Rate limit exceeded after {max_retries} attempts"
+                            error=f"Rate limit exceeded after {max_retries} attempts",
+                            error_kind=ERROR_RATE_LIMIT
                         )
+                elif e.response.status_code in AUTH_ERROR_STATUS and \
+                        self.key_pool.on_auth_error(pooled_key, e.response.status_code) and attempt < max_retries - 1:
+                    print(f"  🔑 API key {pooled_key.label} 认证失败，换key重试...")
+                    continue
                 elif e.response.status_code >= 500:  # Server errors
                     if attempt < max_retries - 1:
                         print(f"  🔧 服务器错误 ({e.response.status_code})，{retry_delay}秒后重试...")
@@ -240,7 +488,8 @@ class OpenAIClient:
                             model=self.model,
                             usage={},
                             success=False,
-                            error=f"Server error {e.response.status_code} after {max_retries} attempts"
+                            error=f"Server error {e.response.status_code} after {max_retries} attempts",
+                            error_kind=ERROR_SERVER
                         )
                 else:
                     return APIResponse(
@@ -262,8 +511,17 @@ class OpenAIClient:
                         model=self.model,
                         usage={},
                         success=False,
-                        error=f"Request failed after {max_retries} attempts: {str(e)}"
+                        error=f"Request failed after {max_retries} attempts: {str(e)}",
+                        error_kind=request_error_kind(e)
                     )
+            except MissingAPIKeyError as e:
+                return APIResponse(
+                    content="",
+                    model=self.model,
+                    usage={},
+                    success=False,
+                    error=str(e)
+                )
             except Exception as e:
                 if attempt < max_retries - 1:
                     print(f"  ❌ 未知错误，{retry_delay}秒后重试...")
@@ -286,15 +544,46 @@ class OpenAIClient:
             error="Max retries exceeded"
         )
     
+    async def generate_text_async(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7,
+                                  system_prompt: str = None, max_retries: int = 3,
+                                  retry_delay: float = 2.0, cacheable_prefix: Optional[str] = None,
+                                  response_schema: Optional[str] = None,
+                                  cache_response: Optional[bool] = None,
+                                  cache_validator: Optional[Callable[[str], bool]] = None) -> APIResponse:
+        """异步版本的generate_text（受openai并发限制约束）"""
+        return await run_with_provider_limit(
+            "openai", self.generate_text, prompt, max_tokens=max_tokens, temperature=temperature,
+            system_prompt=system_prompt, max_retries=max_retries, retry_delay=retry_delay,
+            cacheable_prefix=cacheable_prefix, response_schema=response_schema,
+            cache_response=cache_response, cache_validator=cache_validator
+        )
+    
+    async def generate_response_async(self, prompt: str, system_prompt: str = None,
+                                      max_tokens: int = 2000, temperature: float = 0.3,
+                                      max_retries: int = 10, response_schema: Optional[str] = None) -> str:
+        """异步版本的generate_response"""
+        return await run_with_provider_limit(
+            "openai", self.generate_response, prompt, system_prompt=system_prompt,
+            max_tokens=max_tokens, temperature=temperature, max_retries=max_retries,
+            response_schema=response_schema
+        )
+    
+    async def generate_report_async(self, documents: List[Dict], topic: str, max_tokens: int = 4000) -> APIResponse:
+        """异步版本的generate_report"""
+        return await run_with_provider_limit("openai", self.generate_report, documents, topic, max_tokens)
+    
+    async def generate_answer_async(self, question: str, report: str, difficulty: str) -> APIResponse:
+        """异步版本的generate_answer"""
+        return await run_with_provider_limit("openai", self.generate_answer, question, report, difficulty)
+    
     def generate_report(self, documents: List[Dict], topic: str, max_tokens: int = 4000) -> APIResponse:
         """生成领域报告 - 支持分段处理和融合"""
         
-        # 检查文档总长度
-        total_chars = sum(len(doc.get('content', '')) for doc in documents)
-        max_chars_per_segment = 80000  # OpenAI使用更保守的限制
+        # 按token预算估算是否需要分段
+        total_tokens = sum(estimate_tokens(doc.get('content', ''), self.model) for doc in documents)
         
-        if total_chars > max_chars_per_segment:
-            print(f"📄 文档内容过长 ({total_chars} 字符)，启用分段处理...")
+        if total_tokens > self.segment_token_budget:
+            print(f"📄 文档内容过长 (约 {total_tokens} tokens)，启用分段处理...")
             return self._generate_segmented_report(documents, topic, max_tokens)
         else:
             return self._generate_single_report(documents, topic, max_tokens)
@@ -378,21 +667,78 @@ IMPORTANT: Write as if you're telling the complete story of this research area.
             system_prompt=system_prompt
         )
     
-    def _generate_segmented_report(self, documents, topic_id=None):
-        """分段生成报告"""
-        try:
-            # 分段处理
-            segments = self._split_documents(documents)
-            segment_reports = []
-            
-            for i, segment in enumerate(segments):
-                logger.info(f"  🔍 处理第 {i+1}/{len(segments)} 段...")
-                logger.info(f"📊 使用文档内容长度: {len(segment)} 字符")
-                
-                # 每段目标字数更高
-                target_words = max(1000, min(1500, len(segment) // 40))
-                
-                prompt = f"""Based on the following document content, generate a detailed segment report.
+    def _generate_segmented_report(self, documents: List[Dict], topic: str, max_tokens: int) -> APIResponse:
+        """分段生成报告 - 各段并发生成（受共享并发限制），再层级融合"""
+        start_time = time.time()
+        segments, packing_stats = self._split_documents(documents)
+        logger.info(f"📚 文档分为 {len(segments)} 段 (填充率 {packing_stats['fill_ratio']:.1%})，并发生成段报告...")
+        
+        def _run_segment(item):
+            index, segment = item
+            segment_start = time.time()
+            try:
+                response = self._generate_segment_report(segment)
+            except Exception as e:
+                response = APIResponse(content="", model=self.model, usage={}, success=False, error=str(e))
+            timing = {
+                'segment': index + 1,
+                'chars': len(segment),
+                'seconds': round(time.time() - segment_start, 2),
+                'success': response.success,
+                'words': len(response.content.split()) if response.success else 0
+            }
+            if response.success:
+                logger.info(f"    ✅ 第{index + 1}段完成 ({timing['words']} 词, {timing['seconds']}s)")
+            else:
+                logger.error(f"    ❌ 第{index + 1}段生成失败: {response.error}")
+            return response, timing
+        
+        results = map_with_provider_limit("openai", _run_segment, list(enumerate(segments)))
+        segment_timings = [timing for _, timing in results]
+        
+        failed = [timing['segment'] for timing in segment_timings if not timing['success']]
+        if failed:
+            result = APIResponse(
+                content="",
+                model=self.model,
+                usage=sum_usage([response.usage for response, _ in results]),
+                success=False,
+                error=f"分段报告生成失败: 第{failed}段"
+            )
+            result.segment_timings = segment_timings
+            result.merge_timings = []
+            result.packing_stats = packing_stats
+            return result
+        
+        segment_reports = [
+            {'segment': timing['segment'], 'content': response.content, 'doc_count': 0, 'usage': response.usage}
+            for response, timing in results
+        ]
+        
+        # 融合各段报告 - 段数过多时层级融合
+        logger.info("  🔄 融合各段报告...")
+        merged, merge_timings = tree_merge_reports(segment_reports, self._merge_segment_reports, "openai")
+        if merged is None:
+            merged = APIResponse(
+                content="",
+                model=self.model,
+                usage=sum_usage([r['usage'] for r in segment_reports]),
+                success=False,
+                error="层级融合中间步骤失败"
+            )
+        
+        merged.segment_timings = segment_timings
+        merged.merge_timings = merge_timings
+        merged.packing_stats = packing_stats
+        logger.info(f"  ⏱️ 分段报告总耗时 {time.time() - start_time:.1f}s ({len(segments)} 段, {len(merge_timings)} 次融合)")
+        return merged
+    
+    def _generate_segment_report(self, segment: str) -> APIResponse:
+        """生成单个段报告"""
+        # 每段目标字数更高
+        target_words = max(1000, min(1500, len(segment) // 40))
+        
+        prompt = f"""Based on the following document content, generate a detailed segment report.
 
 CRITICAL REQUIREMENTS:
 1. Word count: MANDATORY minimum {target_words} words - count your words as you write
@@ -417,75 +763,36 @@ Document content:
 
 Generate a detailed segment report (minimum {target_words} words):"""
 
-                response = self.generate_text(
-                    prompt=prompt,
-                    max_tokens=2500,  # 增加token限制
-                    temperature=0.3,
-                    system_prompt="You are a professional academic report writing expert, skilled at generating detailed, information-rich segment reports."
-                )
-                
-                if response.success:
-                    segment_report = response.content
-                    word_count = len(segment_report.split())
-                    segment_reports.append(segment_report)
-                    logger.info(f"    ✅ 第{i+1}段完成 ({word_count} 词)")
-                else:
-                    logger.error(f"    ❌ 第{i+1}段生成失败: {response.error}")
-                    return None
-            
-            # 融合各段报告 - 关键优化
-            logger.info("  🔄 融合各段报告...")
-            merged_report = self._merge_segment_reports(segment_reports)
-            
-            return merged_report
-            
-        except Exception as e:
-            logger.error(f"分段生成报告失败: {str(e)}")
-            return None
+        return self.generate_text(
+            prompt=prompt,
+            max_tokens=2500,  # 增加token限制
+            temperature=0.3,
+            system_prompt="You are a professional academic report writing expert, skilled at generating detailed, information-rich segment reports."
+        )
 
-    def _split_documents(self, documents, max_chars_per_segment=80000):
-        """分割文档为多个段落"""
-        try:
-            # 如果documents是字符串，直接分割
-            if isinstance(documents, str):
-                text = documents
-            else:
-                # 如果是列表，合并为字符串
-                text = " ".join(str(doc) for doc in documents)
-            
-            segments = []
-            current_segment = ""
-            
-            # 按句子分割
-            sentences = text.split('.')
-            
-            for sentence in sentences:
-                if len(current_segment) + len(sentence) + 1 <= max_chars_per_segment:
-                    current_segment += sentence + "."
-                else:
-                    if current_segment:
-                        segments.append(current_segment)
-                    current_segment = sentence + "."
-            
-            # 添加最后一段
-            if current_segment:
-                segments.append(current_segment)
-            
-            return segments
-            
-        except Exception as e:
-            logger.error(f"分割文档失败: {str(e)}")
-            return [documents]  # 返回原始文档
+    def _split_documents(self, documents) -> Tuple[List[str], Dict[str, Any]]:
+        """按token预算装箱分段，返回每段的文档文本和填充率统计"""
+        # 兼容直接传入字符串
+        if isinstance(documents, str):
+            documents = [{'title': 'N/A', 'content': documents}]
+        
+        packed, packing_stats = pack_documents(documents, self.segment_token_budget, self.model)
+        segments = [
+            "".join(f"\n文档 {i}:\n标题: {doc.get('title', 'N/A')}\n内容: {doc.get('content', 'N/A')}\n"
+                    for i, doc in enumerate(segment_docs, 1))
+            for segment_docs in packed
+        ]
+        return segments, packing_stats
 
-    def _merge_segment_reports(self, segment_reports):
-        """融合分段报告 - 关键优化"""
+    def _merge_segment_reports(self, segment_reports: List[Dict]) -> APIResponse:
+        """融合分段报告 - 关键优化（usage包含各段与本次融合的总用量）"""
         try:
             # 计算目标字数 - 避免过长
-            total_segment_words = sum(len(report.split()) for report in segment_reports)
+            total_segment_words = sum(len(report['content'].split()) for report in segment_reports)
             target_words = max(1000, min(1500, total_segment_words // 3))
             
             # 构建融合prompt
-            segments_text = "\n\n".join([f"Segment Report {i+1}:\n{report}" for i, report in enumerate(segment_reports)])
+            segments_text = "\n\n".join([f"Segment Report {report['segment']}:\n{report['content']}" for report in segment_reports])
             
             prompt = f"""Please merge the following multiple segment reports into a complete comprehensive report.
 
@@ -524,18 +831,23 @@ Generate a detailed merged report (minimum {target_words} words):"""
                 system_prompt="You are a professional academic report merging expert, skilled at integrating multiple segment reports into information-rich comprehensive reports."
             )
             
+            response.usage = sum_usage([r.get('usage', {}) for r in segment_reports] + [response.usage])
             if response.success:
-                merged_report = response.content
-                word_count = len(merged_report.split())
+                word_count = len(response.content.split())
                 logger.info(f"    ✅ 报告融合完成 ({word_count} 词)")
-                return merged_report
             else:
                 logger.error(f"    ❌ 报告融合失败: {response.error}")
-                return None
+            return response
             
         except Exception as e:
             logger.error(f"融合报告失败: {str(e)}")
-            return None
+            return APIResponse(
+                content="",
+                model=self.model,
+                usage={},
+                success=False,
+                error=f"报告融合失败: {str(e)}"
+            )
 
     def generate_deep_short_answer_questions(self, report: str, topic: str, num_questions: int = 50) -> APIResponse:
         """生成Deep Short Answer Questions - 基于您的要求优化"""
@@ -667,10 +979,11 @@ MANDATORY TARGET: Generate EXACTLY 90% Academic-Grade BrowseComp questions (prov
 
 FORMAT: Use simple text format, numbered Q1, Q2, etc."""
 
-        prompt = f"""Based on the following research summary about "{topic}", generate {num_questions} questions where EXACTLY 90% MUST BE Academic-Grade BrowseComp-style Deep Query type:
+        # 报告放在最前面作为可缓存前缀，同一报告的多批问题生成共享
+        report_prefix = f"""Research Summary about "{topic}":
+{report[:6000]}..."""
 
-Research Summary:
-{report[:6000]}...
+        prompt = f"""Based on the research summary above, generate {num_questions} questions where EXACTLY 90% MUST BE Academic-Grade BrowseComp-style Deep Query type:
 
 ABSOLUTE MANDATORY REQUIREMENTS FOR ACADEMIC EXCELLENCE:
 1. Generate EXACTLY {num_questions} questions
@@ -728,7 +1041,8 @@ Generate exactly {num_questions} questions now with MAXIMUM academic rigor:"""
             prompt=prompt,
             max_tokens=max_tokens,
             temperature=0.7,  # 降低温度以获得更一致的结果
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            cacheable_prefix=report_prefix
         )
     
     def generate_answer(self, question: str, report: str, difficulty: str) -> APIResponse:
@@ -791,9 +1105,9 @@ Query: "When did...?" → "March 2023"
 
 🎯 ULTIMATE GOAL: One precise fact, maximum brevity, zero elaboration."""
             
-            prompt = f"""Research Context: {report[:1500]}
-
-QUERY: {question}
+            report_prefix = f"Research Context: {report[:1500]}"
+            
+            prompt = f"""QUERY: {question}
 
 EXTRACTION TASK: Extract ONLY the core factual answer.
 
@@ -819,24 +1133,25 @@ ULTRA-CONCENTRATED ANSWER:"""
             
             word_req = word_requirements.get(difficulty, "800-1200 words")
             
-            system_prompt = f"""You are a professional research expert. Please answer questions based on the provided research summary.
+            # system prompt与报告前缀在同一报告的所有问题间保持不变，便于前缀缓存
+            system_prompt = """You are a professional research expert. Please answer questions based on the provided research summary.
 
 Answer requirements:
-1. Length: {word_req}
+1. Length: as specified with each question
 2. Based on summary content, do not fabricate information
 3. Clear structure and rigorous logic
 4. Adjust answer depth according to question difficulty
 5. Use academic writing style
 6. Answer ENTIRELY in English for consistency in comparative analysis"""
 
-            prompt = f"""Based on the following research summary, answer the question:
+            report_prefix = f"""Research Summary:
+{report}"""
+
+            prompt = f"""Based on the research summary above, answer the question:
 
 Question: {question}
 Difficulty: {difficulty}
 
-Research Summary:
-{report}
-
 Please provide a detailed answer of {word_req}. Write entirely in English for consistency in comparative analysis."""
 
             max_tokens = 2000 if difficulty == "Hard" else 1500 if difficulty == "Medium" else 1000
@@ -846,7 +1161,8 @@ Please provide a detailed answer of {word_req}. Write entirely in English for co
             prompt=prompt,
             max_tokens=max_tokens,
             temperature=temperature,
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            cacheable_prefix=report_prefix
         )
     
     def _is_short_answer_deep_query(self, question: str) -> bool:
@@ -1337,16 +1653,31 @@ def call_openai_with_messages(api_key: str, messages: List[Dict[str, str]],
         "presence_penalty": 0.1
     }
     
+    rate_limiter = get_rate_limiter("openai")
+    estimated_tokens = estimate_request_tokens(
+        "".join(str(m.get("content", "")) for m in messages), max_tokens, model
+    )
+    
+    adaptive_timeout = get_adaptive_timeout()
+    timeout = adaptive_timeout.request_timeout(model, max_tokens)
+    start_time = time.time()
+    usage = None
     try:
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", 
+        rate_limiter.acquire(estimated_tokens)
+        response = get_http_transport().post(
+            f"{openai_base_url()}/chat/completions",
             headers=headers, 
             json=data, 
-            timeout=120
+            timeout=timeout
         )
+        rate_limiter.update_from_headers(response.headers)
+        if response.status_code == 429:
+            rate_limiter.on_rate_limited(response.headers)
         response.raise_for_status()
         
         result = response.json()
+        usage = _format_usage(result.get('usage', {}))
+        adaptive_timeout.record_success(model, time.time() - start_time, usage['completion_tokens'], timeout=timeout)
         if 'choices' in result and len(result['choices']) > 0:
             return result['choices'][0]['message']['content'].strip()
         else:
@@ -1354,11 +1685,15 @@ def call_openai_with_messages(api_key: str, messages: List[Dict[str, str]],
             return None
             
     except requests.exceptions.RequestException as e:
+        if isinstance(e, requests.exceptions.Timeout):
+            adaptive_timeout.record_timeout(model, time.time() - start_time, timeout)
         print(f"❌ OpenAI API request failed: {e}")
         return None
     except Exception as e:
         print(f"❌ OpenAI API error: {e}")
         return None
+    finally:
+        get_meter().record("openai", model, usage, time.time() - start_time, success=usage is not None)
 
 def get_difficulty_specific_system_prompt(difficulty: str) -> str:
     """
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Question Stream - 边生成边解析问题
+问题生成的输出是 Q1: ... Q2: ... 的文本块，流式增量中出现下一个Qn:标记时上一个问题即完整，
+立即交给下游（答案生成可以在第30个问题还在生成时就开始回答第1个问题）
+"""
+
+import re
+import queue
+import threading
+import contextvars
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from .streaming import stream_listener
+
+logger = logging.getLogger(__name__)
+
+QUESTION_MARKER = re.compile(r'\bQ\d+:')
+
+_DONE = object()
+
+
+class IncrementalQuestionParser:
+    """流式增量监听器：把增量拼成文本，每遇到新的Qn:标记就解析上一个完整的问题块"""
+
+    def __init__(self, parse_block: Callable[[str], Optional[Dict[str, Any]]],
+                 on_question: Callable[[Dict[str, Any]], None]):
+        self.parse_block = parse_block
+        self.on_question = on_question
+        self._buffer = ""
+        self._emitted: Set[str] = set()
+        self._lock = threading.RLock()
+
+    def on_stream_start(self):
+        """新的一次流式尝试（重试时丢弃上次未完成的块，已产出的问题按文本去重）"""
+        with self._lock:
+            self._buffer = ""
+
+    def on_text(self, delta: str):
+        with self._lock:
+            self._buffer += delta
+            markers = list(QUESTION_MARKER.finditer(self._buffer))
+            if len(markers) < 2:
+                return
+            # 最后一个标记之后的块可能还没写完，留在缓冲区
+            for current, following in zip(markers, markers[1:]):
+                self._emit_block(self._buffer[current.end():following.start()])
+            self._buffer = self._buffer[markers[-1].start():]
+
+    def emit(self, question: Dict[str, Any]):
+        """产出一个问题（相同文本只产出一次）"""
+        key = question.get('question', '').strip().lower()
+        with self._lock:
+            if not key or key in self._emitted:
+                return
+            self._emitted.add(key)
+        self.on_question(question)
+
+    def _emit_block(self, block: str):
+        question = self.parse_block(block)
+        if question:
+            self.emit(question)
+
+
+class QuestionStream:
+    """
+    在后台线程执行问题生成请求，迭代时按完成顺序产出问题
+
+    请求结束后用完整响应的解析结果补齐尚未产出的问题（最后一个块、缓存命中或非流式响应），
+    迭代完成后 response 为与非流式接口相同的APIResponse（含questions/usage）
+    """
+
+    def __init__(self, request: Callable[[], Any],
+                 parse_block: Callable[[str], Optional[Dict[str, Any]]],
+                 transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.response = None
+        self.questions: List[Dict[str, Any]] = []
+        self._transform = transform
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._finished = False
+        self._parser = IncrementalQuestionParser(parse_block, self._queue.put)
+
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._run, request), name="llm-question-stream", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, request: Callable[[], Any]):
+        try:
+            with stream_listener(self._parser):
+                response = request()
+            self.response = response
+            # 补齐流中未能提前产出的问题
+            for question in getattr(response, 'questions', None) or []:
+                self._parser.emit(question)
+        except Exception as e:
+            logger.error(f"流式问题生成失败: {e}")
+            self._queue.put(e)
+        finally:
+            self._queue.put(_DONE)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while not self._finished:
+            item = self._queue.get()
+            if item is _DONE:
+                self._finished = True
+                return
+            if isinstance(item, Exception):
+                raise item
+            question = self._transform(item) if self._transform else item
+            self.questions.append(question)
+            yield question
+
+    def wait(self) -> Any:
+        """消费完所有问题并返回完整响应"""
+        for _ in self:
+            pass
+        self._thread.join()
+        return self.response
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Adaptive Rate Limiter - 共享令牌桶限流
+按提供商维护 requests/min 与 tokens/min 两个令牌桶，进程内所有线程和协程共享；
+根据 x-ratelimit-* / anthropic-ratelimit-* / retry-after 响应头自动调整额度，
+429时全局暂停并使用带抖动的退避
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Tuple
+
+from .tokenizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 初始额度（收到响应头后会自动校正）
+DEFAULT_LIMITS = {
+    'openai': {'rpm': 500, 'tpm': 150000},
+    'claude': {'rpm': 50, 'tpm': 40000},
+}
+
+
+def estimate_request_tokens(text: str, max_tokens: int = 0, model: Optional[str] = None) -> int:
+    """估算一次请求消耗的token（输入token估算加上输出上限）"""
+    return estimate_tokens(text or '', model) + (max_tokens or 0)
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """解析时长，支持 '1s' / '6m0s' / '20ms' / 纯数字秒 / RFC3339时间戳"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    matches = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if matches and ''.join(n + u for n, u in matches) == value:
+        units = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+        return sum(float(n) * units[u] for n, u in matches)
+
+    try:
+        reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """单个令牌桶（每分钟额度）"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60.0)
+
+    def wait_time(self, amount: float) -> float:
+        """获取amount个令牌需要等待的秒数"""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+
+class AdaptiveRateLimiter:
+    """按提供商共享的自适应令牌桶限流器（线程安全）"""
+
+    def __init__(self, provider: str, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 max_backoff: float = 60.0):
+        defaults = DEFAULT_LIMITS.get(provider, {'rpm': 60, 'tpm': 60000})
+        rpm = rpm or int(os.getenv(f'LLM_RATE_LIMIT_RPM_{provider.upper()}', defaults['rpm']))
+        tpm = tpm or int(os.getenv(f'LLM_RATE_LIMIT_TPM_{provider.upper()}', defaults['tpm']))
+
+        self.provider = provider
+        self.max_backoff = max_backoff
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'acquired': 0,
+            'waited_seconds': 0.0,
+            'rate_limited': 0,
+            'header_updates': 0
+        }
+
+    def _reserve(self, tokens: int) -> float:
+        """尝试预留额度，返回需要等待的秒数（0表示已预留）"""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait_time(1),
+                self._tokens.wait_time(tokens)
+            )
+            if wait <= 0:
+                self._requests.level -= 1
+                self._tokens.level -= min(tokens, self._tokens.capacity)
+                self.stats['acquired'] += 1
+                return 0.0
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """阻塞直到有足够额度（线程中使用）"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            with self._lock:
+                self.stats['waited_seconds'] += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """等待直到有足够额度（协程中使用）"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            with self._lock:
+                self.stats['waited_seconds'] += wait
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """用实际token消耗校正预扣的额度"""
+        if not actual_tokens:
+            return
+        with self._lock:
+            self._tokens.level += min(estimated_tokens, self._tokens.capacity) - actual_tokens
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]):
+        """根据提供商返回的限流响应头校正额度"""
+        if not headers:
+            return
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        request_limit = _to_int(headers.get('x-ratelimit-limit-requests')
+                                or headers.get('anthropic-ratelimit-requests-limit'))
+        request_remaining = _to_int(headers.get('x-ratelimit-remaining-requests')
+                                    or headers.get('anthropic-ratelimit-requests-remaining'))
+        token_limit = _to_int(headers.get('x-ratelimit-limit-tokens')
+                              or headers.get('anthropic-ratelimit-tokens-limit')
+                              or headers.get('anthropic-ratelimit-input-tokens-limit'))
+        token_remaining = _to_int(headers.get('x-ratelimit-remaining-tokens')
+                                  or headers.get('anthropic-ratelimit-tokens-remaining')
+                                  or headers.get('anthropic-ratelimit-input-tokens-remaining'))
+        request_reset = _parse_duration(headers.get('x-ratelimit-reset-requests')
+                                        or headers.get('anthropic-ratelimit-requests-reset'))
+        token_reset = _parse_duration(headers.get('x-ratelimit-reset-tokens')
+                                      or headers.get('anthropic-ratelimit-tokens-reset')
+                                      or headers.get('anthropic-ratelimit-input-tokens-reset'))
+        retry_after = _parse_duration(headers.get('retry-after'))
+
+        with self._lock:
+            now = time.monotonic()
+            updated = False
+            for bucket, limit, remaining, reset in (
+                (self._requests, request_limit, request_remaining, request_reset),
+                (self._tokens, token_limit, token_remaining, token_reset),
+            ):
+                bucket.refill(now)
+                if limit:
+                    bucket.capacity = float(limit)
+                    updated = True
+                if remaining is not None:
+                    bucket.level = min(bucket.level, float(remaining))
+                    updated = True
+                    if remaining <= 0 and reset:
+                        self._paused_until = max(self._paused_until, now + reset)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+                updated = True
+            if updated:
+                self.stats['header_updates'] += 1
+
+    def on_rate_limited(self, headers: Optional[Mapping[str, str]] = None,
+                        attempt: int = 0, base_delay: float = 2.0) -> float:
+        """处理429：按retry-after或抖动退避全局暂停，返回暂停秒数"""
+        self.update_from_headers(headers)
+        retry_after = None
+        if headers:
+            retry_after = _parse_duration({k.lower(): v for k, v in headers.items()}.get('retry-after'))
+        delay = retry_after if retry_after else backoff_delay(attempt, base_delay, self.max_backoff)
+        delay += random.uniform(0, min(1.0, delay * 0.1))
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._requests.level = min(self._requests.level, 0.0)
+            self.stats['rate_limited'] += 1
+        return delay
+
+    def headroom(self, tokens: int = 0) -> float:
+        """当前剩余额度占比（0-1，按请求数与token数中较紧的一个），暂停中返回0"""
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                return 0.0
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            remaining = min(self._requests.level / self._requests.capacity,
+                            (self._tokens.level - min(tokens, self._tokens.capacity)) / self._tokens.capacity)
+        return max(0.0, min(1.0, remaining))
+
+    def get_statistics(self) -> Dict[str, float]:
+        """获取限流统计与当前额度"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['rpm_limit'] = self._requests.capacity
+            stats['tpm_limit'] = self._tokens.capacity
+        return stats
+
+
+def backoff_delay(attempt: int, base_delay: float = 2.0, max_delay: float = 60.0) -> float:
+    """带抖动的指数退避（equal jitter）"""
+    ceiling = min(max_delay, base_delay * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+# 全局共享实例（每个提供商一个；多key时每个key一个）
+_limiters: Dict[Tuple[str, Optional[str]], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, key_id: Optional[str] = None) -> AdaptiveRateLimiter:
+    """获取提供商共享的限流器（key_id区分同一提供商下额度独立的多个API key）"""
+    with _limiters_lock:
+        limiter = _limiters.get((provider, key_id))
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(provider)
+            _limiters[(provider, key_id)] = limiter
+        return limiter
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Replay Transport - 录制/回放LLM HTTP请求，用于离线基准测试
+record模式照常访问API，并把请求与完整响应（含流式SSE原文、响应头、耗时）追加写入JSONL；
+replay模式按请求内容（方法 + 路径 + JSON请求体）从录制文件返回响应，不访问网络。
+录制文件与stub服务器（tools/benchmarks/stub_llm_server.py）通用，
+通过官方SDK访问的调用（如exp07 web_search）可经由stub服务器回放
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .http_transport import HTTPTransport, set_http_transport
+
+logger = logging.getLogger(__name__)
+
+# 默认录制文件（.cache目录不纳入版本管理）
+DEFAULT_REPLAY_PATH = os.getenv('LLM_REPLAY_PATH', '.cache/llm_recordings.jsonl')
+# 回放时按录制耗时的倍数等待（0表示立即返回，1表示按真实延迟回放）
+DEFAULT_LATENCY_SCALE = float(os.getenv('LLM_REPLAY_LATENCY_SCALE', '0'))
+
+TRANSPORT_MODES = ('record', 'replay', 'replay_or_record')
+
+# 录制时保留的响应头（限流器与解析依赖这些头）
+RECORDED_HEADER_PREFIXES = ('content-type', 'retry-after', 'x-ratelimit-', 'anthropic-ratelimit-',
+                            'request-id', 'x-request-id')
+
+
+class ReplayMiss(requests.exceptions.ConnectionError):
+    """回放模式下录制文件中没有对应的请求"""
+
+
+def request_key(method: str, url: str, body: Any = None) -> str:
+    """请求的录制键：方法 + URL路径 + 规范化的JSON请求体（与host和API key无关）"""
+    canonical = json.dumps({
+        'method': method.upper(),
+        'path': urlsplit(url).path,
+        'body': body
+    }, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class RecordingStore:
+    """JSONL录制文件：同一个键录制了多次时按录制顺序循环返回（线程安全）"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"跳过无法解析的录制记录: {self.path}:{line_number}")
+                    continue
+                self._entries.setdefault(entry['key'], []).append(entry)
+        logger.info(f"📼 已加载录制文件: {self.path} ({len(self)} 条)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[cursor % len(entries)]
+
+    def append(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries.setdefault(entry['key'], []).append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def make_entry(method: str, url: str, body: Any, status_code: int, headers, content: bytes,
+               latency: float) -> Dict[str, Any]:
+    """构造一条录制记录（响应体按UTF-8保存，流式响应保存SSE原文）"""
+    kept_headers = {
+        name.lower(): value for name, value in dict(headers or {}).items()
+        if name.lower().startswith(RECORDED_HEADER_PREFIXES)
+    }
+    return {
+        'key': request_key(method, url, body),
+        'method': method.upper(),
+        'path': urlsplit(url).path,
+        'request': body,
+        'status_code': status_code,
+        'headers': kept_headers,
+        'body': content.decode('utf-8', errors='replace'),
+        'latency': round(latency, 3),
+        'recorded_at': time.time()
+    }
+
+
+def build_response(entry: Dict[str, Any], url: str) -> requests.Response:
+    """把录制记录还原为requests.Response（iter_lines / json / raise_for_status 与真实响应一致）"""
+    response = requests.Response()
+    response.status_code = entry['status_code']
+    response.headers = CaseInsensitiveDict(entry.get('headers') or {})
+    response._content = entry.get('body', '').encode('utf-8')
+    response._content_consumed = True
+    response.encoding = 'utf-8'
+    response.url = url
+    response.reason = 'OK' if response.status_code < 400 else 'Replayed Error'
+    return response
+
+
+class RecordReplayTransport(HTTPTransport):
+    """
+    录制/回放传输，接口与HTTPTransport一致，可直接传给客户端的transport参数
+
+    mode:
+        record: 访问真实API并录制
+        replay: 只从录制文件返回，没有录制的请求抛出ReplayMiss（客户端按网络错误处理）
+        replay_or_record: 有录制时回放，否则访问真实API并录制（增量补录）
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_REPLAY_PATH, mode: str = 'replay',
+                 latency_scale: float = DEFAULT_LATENCY_SCALE, **pool_kwargs):
+        if mode not in TRANSPORT_MODES:
+            raise ValueError(f"未知的传输模式: {mode}（可选: {', '.join(TRANSPORT_MODES)}）")
+        super().__init__(**pool_kwargs)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.store = RecordingStore(path)
+        self.stats.update({'replayed': 0, 'recorded': 0, 'misses': 0})
+        logger.info(f"📼 LLM传输模式: {mode} ({self.store.path})")
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        body = kwargs.get('json')
+        if self.mode != 'record':
+            entry = self.store.lookup(request_key(method, url, body))
+            if entry is not None:
+                if self.latency_scale > 0:
+                    time.sleep(entry.get('latency', 0.0) * self.latency_scale)
+                with self._lock:
+                    self.stats['replayed'] += 1
+                return build_response(entry, url)
+            if self.mode == 'replay':
+                with self._lock:
+                    self.stats['misses'] += 1
+                raise ReplayMiss(f"录制文件中没有该请求: {method.upper()} {urlsplit(url).path}")
+
+        start_time = time.time()
+        response = super().request(method, url, **kwargs)
+        # 读取完整响应（流式响应在此处读完，调用方从录制的副本中按行解析）
+        try:
+            content = response.content
+        finally:
+            response.close()
+        entry = make_entry(method, url, body, response.status_code, response.headers, content,
+                           time.time() - start_time)
+        self.store.append(entry)
+        with self._lock:
+            self.stats['recorded'] += 1
+        return build_response(entry, url)
+
+
+def configure_replay_transport(path: Union[str, Path] = DEFAULT_REPLAY_PATH, mode: str = 'replay',
+                               latency_scale: float = DEFAULT_LATENCY_SCALE) -> RecordReplayTransport:
+    """把全局HTTP连接池换成录制/回放传输（影响之后创建的客户端）"""
+    return set_http_transport(RecordReplayTransport(path, mode=mode, latency_scale=latency_scale))
+
+
+def point_at_stub_server(base_url: str):
+    """把OpenAI / Anthropic / web_search 的API地址指向stub服务器（影响之后创建的客户端）"""
+    base_url = base_url.rstrip('/')
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    logger.info(f"🧪 LLM API地址已指向: {base_url}")
+
+
+def configure_offline_from_argv(argv: Sequence[str]) -> List[str]:
+    """
+    实验入口的离线参数：--llm-stub=URL / --llm-record=PATH / --llm-replay=PATH
+    处理后返回去掉这些参数的argv（其余参数交给入口原有的解析逻辑）
+    """
+    remaining = []
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--llm-stub' and value:
+            point_at_stub_server(value)
+        elif name == '--llm-record' and value:
+            configure_replay_transport(value, mode='record')
+        elif name == '--llm-replay' and value:
+            configure_replay_transport(value, mode='replay')
+        else:
+            remaining.append(arg)
+    return remaining
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Resilience - 熔断、延迟统计与对冲请求
+每个提供商一个熔断器：连续失败达到阈值后打开，冷却期内直接跳过该提供商（由管理器切换到备用提供商），
+冷却结束后放行一次探测请求；只有提供商侧故障（连接错误、超时、5xx、重试用尽的429）计入失败，
+请求本身的问题（其他4xx、空响应、输出不可解析）不影响熔断；对冲请求在主请求超过历史延迟分位数仍未返回时再发一次，取先成功的结果
+"""
+
+import os
+import time
+import threading
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import requests
+
+from .single_flight import bypass_single_flight
+from .streaming import stream_listener
+
+logger = logging.getLogger(__name__)
+
+# 熔断器默认参数
+DEFAULT_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+DEFAULT_RECOVERY_TIMEOUT = float(os.getenv('LLM_BREAKER_RECOVERY_TIMEOUT', '60'))
+# 开始对冲前至少需要的延迟样本数
+MIN_HEDGE_SAMPLES = 10
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# APIResponse.error_kind：客户端重试用尽后的失败类型
+ERROR_TRANSPORT = "transport"
+ERROR_TIMEOUT = "timeout"
+ERROR_SERVER = "server"
+ERROR_RATE_LIMIT = "rate_limit"
+# 计入熔断的失败类型（提供商侧故障）
+BREAKER_ERROR_KINDS = {ERROR_TRANSPORT, ERROR_TIMEOUT, ERROR_SERVER, ERROR_RATE_LIMIT}
+
+
+def request_error_kind(error: Exception) -> str:
+    """requests异常对应的失败类型"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return ERROR_TIMEOUT
+    return ERROR_TRANSPORT
+
+
+def is_provider_failure(response: Any = None, error: Optional[Exception] = None) -> bool:
+    """失败的响应或调用异常是否属于提供商侧故障（计入熔断）"""
+    if error is not None:
+        return isinstance(error, requests.exceptions.RequestException)
+    return getattr(response, 'error_kind', None) in BREAKER_ERROR_KINDS
+
+
+class CircuitBreaker:
+    """单个提供商的熔断器（线程安全）"""
+
+    def __init__(self, provider: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 recovery_timeout: float = DEFAULT_RECOVERY_TIMEOUT):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def allow_request(self) -> bool:
+        """是否允许向该提供商发送请求（半开状态只放行一个探测请求）"""
+        with self._lock:
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = STATE_HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"🔌 {self.provider} 熔断冷却结束，进入半开状态")
+
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state != STATE_CLOSED:
+                logger.info(f"✅ {self.provider} 探测成功，熔断器关闭")
+            self.state = STATE_CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN or (
+                    self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+                self.stats['opened'] += 1
+                logger.warning(f"🚫 {self.provider} 连续失败 {self.consecutive_failures} 次，熔断 {self.recovery_timeout:.0f}s")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'state': self.state, 'consecutive_failures': self.consecutive_failures}
+
+
+class LatencyTracker:
+    """滑动窗口内的成功请求延迟，用于计算对冲触发阈值"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """返回第p百分位延迟，样本不足时返回None"""
+        with self._lock:
+            if len(self._samples) < MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """获取提供商的全局熔断器"""
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider)
+            _breakers[provider] = breaker
+        return breaker
+
+
+def get_latency_tracker(provider: str, stage: str) -> LatencyTracker:
+    """获取 (提供商, 阶段) 的延迟统计"""
+    with _registry_lock:
+        tracker = _trackers.get((provider, stage))
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[(provider, stage)] = tracker
+        return tracker
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _registry_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+def _is_success(response: Any) -> bool:
+    return bool(getattr(response, 'success', False))
+
+
+def hedged_call(func: Callable[[], Any], hedge_after: Optional[float]) -> Tuple[Any, bool]:
+    """
+    执行func，若hedge_after秒后仍未返回则再发起一次（绕过请求合并），返回先成功的结果
+
+    Returns:
+        (结果, 是否由对冲请求返回)
+    """
+    if hedge_after is None:
+        return func(), False
+
+    executor = _get_hedge_executor()
+    primary = executor.submit(contextvars.copy_context().run, func)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result(), False
+
+    def _hedge():
+        # 对冲请求不参与合并，也不向流式监听器推送（避免与主请求的增量交错）
+        with bypass_single_flight(), stream_listener(None):
+            return func()
+
+    logger.info(f"⏱️ 主请求超过 {hedge_after:.1f}s 未返回，发起对冲请求")
+    hedge = executor.submit(contextvars.copy_context().run, _hedge)
+    pending = {primary, hedge}
+    first_result = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"对冲中的请求异常: {e}")
+                continue
+            if _is_success(result):
+                return result, future is hedge
+            if first_result is None:
+                first_result = result
+    if first_result is None:
+        # 两个请求都抛出异常，重新抛出主请求的异常
+        return primary.result(), False
+    return first_result, False
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+LLM Response Cache - 持久化响应缓存
+按 (provider, model, system_prompt, prompt, temperature, max_tokens) 的哈希寻址，
+SQLite存储，按条目数/字节数做LRU淘汰，重跑实验时复用相同prompt的响应
+
+temperature > 0 的采样请求默认不读不写缓存（重试与重跑应得到新的采样），
+可用 LLM_CACHE_SAMPLED=1、客户端的 cache_sampled 或单次调用的 cache_response=True 显式开启
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存位置与容量（可通过环境变量覆盖）
+DEFAULT_CACHE_PATH = os.getenv(
+    'LLM_CACHE_PATH',
+    str(Path(__file__).parent.parent.parent / '.cache' / 'llm_responses.sqlite')
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '50000'))
+DEFAULT_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# 是否也缓存 temperature > 0 的采样请求
+DEFAULT_CACHE_SAMPLED = os.getenv('LLM_CACHE_SAMPLED', '').lower() in ('1', 'true', 'yes')
+
+
+def should_cache(temperature: Optional[float], cache_sampled: bool = DEFAULT_CACHE_SAMPLED,
+                 cache_response: Optional[bool] = None) -> bool:
+    """
+    请求是否走响应缓存
+
+    Args:
+        temperature: 请求的采样温度
+        cache_sampled: 是否缓存 temperature > 0 的请求
+        cache_response: 单次调用的显式选择（None时按温度决定）
+    """
+    if cache_response is not None:
+        return cache_response
+    return cache_sampled or not temperature
+
+
+def make_cache_key(provider: str, model: str, system_prompt: Optional[str], prompt: str,
+                   temperature: Optional[float], max_tokens: Optional[int],
+                   response_format: Optional[Dict[str, Any]] = None) -> str:
+    """生成缓存键（SHA-256）；response_format为结构化输出参数，未使用时不参与哈希，已有缓存键保持不变"""
+    key_fields = {
+        'provider': provider,
+        'model': model,
+        'system_prompt': system_prompt or '',
+        'prompt': prompt,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }
+    if response_format:
+        key_fields['response_format'] = response_format
+    key_data = json.dumps(key_fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """基于SQLite的LRU响应缓存（线程安全）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 bypass: bool = False):
+        """
+        Args:
+            path: SQLite文件路径
+            max_entries: 最大条目数
+            max_bytes: 最大存储字节数
+            bypass: True时不读不写（用于需要重新采样的实验）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """延迟打开数据库"""
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str, validate: Optional[Callable[[str], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存，未命中返回None
+
+        Args:
+            key: 缓存键
+            validate: 对缓存内容('content')的校验，不通过时删除该条目并按未命中处理
+        """
+        if self.bypass:
+            return None
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                value = json.loads(row[0])
+                if validate is not None and not validate(value.get('content', '')):
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self.stats['invalidations'] += 1
+                    self.stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                self.stats['hits'] += 1
+                return value
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning(f"读取LLM缓存失败: {e}")
+                self.stats['misses'] += 1
+                return None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """写入缓存并按LRU淘汰"""
+        if self.bypass:
+            return
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data.encode('utf-8')), now, now)
+                )
+                self.stats['writes'] += 1
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入LLM缓存失败: {e}")
+
+    def delete(self, key: str):
+        """删除一个条目（调用方发现缓存的响应无法使用时，如解析失败）"""
+        if self.bypass or not key:
+            return
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                deleted = conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+                conn.commit()
+                self.stats['invalidations'] += max(deleted, 0)
+            except sqlite3.Error as e:
+                logger.warning(f"删除LLM缓存条目失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """淘汰最久未访问的条目，直到满足容量限制"""
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        while count > self.max_entries or total_bytes > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            count -= 1
+            total_bytes -= row[1]
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['bypass'] = self.bypass
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局共享实例
+_shared_cache: Optional[LLMResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """获取全局共享的响应缓存（LLM_CACHE_BYPASS=1 时默认旁路）"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                bypass = os.getenv('LLM_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+                _shared_cache = LLMResponseCache(bypass=bypass)
+    return _shared_cache
+
+
+def set_cache_bypass(bypass: bool = True):
+    """开启/关闭全局缓存旁路"""
+    get_response_cache().bypass = bypass
+    logger.info(f"LLM响应缓存旁路: {bypass}")
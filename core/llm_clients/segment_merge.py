@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Segment Merge - 分段报告的层级融合
+段报告过多时无法在一次调用中融合，按fan_in分组逐层并发融合，直到剩余报告可一次融合
+"""
+
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .async_support import map_with_provider_limit
+
+logger = logging.getLogger(__name__)
+
+# 单次融合调用最多包含的段报告数
+DEFAULT_MERGE_FAN_IN = 6
+
+
+def sum_usage(usages: List[Dict[str, int]]) -> Dict[str, int]:
+    """累加多次调用的token用量"""
+    total = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    for usage in usages:
+        for key in total:
+            total[key] += (usage or {}).get(key, 0)
+    return total
+
+
+def _merged_label(group: List[Dict[str, Any]]) -> str:
+    first = str(group[0]['segment']).split('-')[0]
+    last = str(group[-1]['segment']).split('-')[-1]
+    return f"{first}-{last}"
+
+
+def tree_merge_reports(segment_reports: List[Dict[str, Any]],
+                       merge_fn: Callable[[List[Dict[str, Any]]], Any],
+                       provider: str,
+                       fan_in: int = DEFAULT_MERGE_FAN_IN) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    层级融合段报告
+
+    Args:
+        segment_reports: [{'segment', 'content', 'doc_count', 'usage'}, ...]
+        merge_fn: 融合一组段报告，返回APIResponse（usage需已包含该组所有段的用量）
+        provider: 用于并发限制的提供商名
+        fan_in: 每次融合的最大段数
+
+    Returns:
+        (最终融合的APIResponse，中间层失败时为None; 每次融合调用的耗时记录)
+    """
+    merge_timings: List[Dict[str, Any]] = []
+    reports = list(segment_reports)
+    level = 0
+
+    while len(reports) > fan_in:
+        level += 1
+        groups = [reports[i:i + fan_in] for i in range(0, len(reports), fan_in)]
+        logger.info(f"  🌲 第{level}层融合: {len(reports)} 份报告 -> {len(groups)} 组")
+
+        def _merge_group(group: List[Dict[str, Any]], level=level) -> Optional[Dict[str, Any]]:
+            if len(group) == 1:
+                return group[0]
+            start = time.time()
+            response = merge_fn(group)
+            merge_timings.append({
+                'level': level,
+                'segments': _merged_label(group),
+                'inputs': len(group),
+                'seconds': round(time.time() - start, 2),
+                'success': response.success
+            })
+            if not response.success:
+                logger.error(f"    ❌ 第{level}层融合失败 (段 {_merged_label(group)}): {response.error}")
+                return None
+            return {
+                'segment': _merged_label(group),
+                'content': response.content,
+                'doc_count': sum(r.get('doc_count', 0) for r in group),
+                'usage': response.usage
+            }
+
+        merged = map_with_provider_limit(provider, _merge_group, groups)
+        merge_timings.sort(key=lambda t: (t['level'], int(t['segments'].split('-')[0])))
+        if any(m is None for m in merged):
+            return None, merge_timings
+        reports = merged
+
+    start = time.time()
+    final_response = merge_fn(reports)
+    merge_timings.append({
+        'level': level + 1,
+        'segments': _merged_label(reports),
+        'inputs': len(reports),
+        'seconds': round(time.time() - start, 2),
+        'success': final_response.success
+    })
+    return final_response, merge_timings
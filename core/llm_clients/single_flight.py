@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Single Flight - 合并并发的相同请求
+相同缓存键的请求同时在途时只发送一次，其余调用者等待并共享结果（包括异常）；
+与持久化缓存互补：覆盖第一个结果写入缓存之前的窗口期
+"""
+
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_bypass: ContextVar[bool] = ContextVar('llm_single_flight_bypass', default=False)
+
+
+@contextmanager
+def bypass_single_flight():
+    """当前上下文中的调用不参与合并（对冲请求需要真正发出第二个请求）"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class _Call:
+    """一次在途调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按key合并并发调用（线程安全）"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'executed': 0,    # 实际执行的调用
+            'coalesced': 0    # 合并到已有在途调用的请求
+        }
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行func，若相同key的调用已在途则等待其结果
+
+        Returns:
+            (结果, 是否为共享的结果)
+        """
+        if _bypass.get():
+            return func(), False
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            logger.debug(f"合并在途请求: {key[:12]}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        with self._lock:
+            total = self.stats['executed'] + self.stats['coalesced']
+            return {
+                **self.stats,
+                'in_flight': len(self._calls),
+                'coalesce_rate': self.stats['coalesced'] / total if total else 0.0
+            }
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局共享的请求合并器"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming - 读取OpenAI / Claude的SSE流式响应
+把增量拼回与非流式接口相同结构的结果，调用方的解析逻辑不变；
+空闲超时由requests的读取超时控制，持续输出的慢响应不会被中断；
+stream_listener() 标记的上下文中，增量文本同时推送给监听器（用于边生成边解析）
+"""
+
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+from .adaptive_timeout import MAX_STREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 是否对生成请求使用流式响应
+STREAMING_ENABLED = os.getenv('LLM_STREAMING', '1') != '0'
+
+# 当前上下文的增量文本监听器：需实现 on_stream_start() 与 on_text(delta)
+_stream_listener: ContextVar[Optional[Any]] = ContextVar('llm_stream_listener', default=None)
+
+
+@contextmanager
+def stream_listener(listener: Optional[Any]):
+    """在当前上下文中把流式增量推送给listener（None表示不推送，如对冲的重复请求）"""
+    token = _stream_listener.set(listener)
+    try:
+        yield
+    finally:
+        _stream_listener.reset(token)
+
+
+def _notify_start():
+    listener = _stream_listener.get()
+    if listener is not None:
+        listener.on_stream_start()
+
+
+def _notify_text(text: str):
+    listener = _stream_listener.get()
+    if listener is not None:
+        listener.on_text(text)
+
+
+def iter_sse_data(response: requests.Response, start_time: float) -> Iterator[str]:
+    """逐条产出SSE事件的data字段（按UTF-8解码，不依赖响应头的charset）"""
+    deadline = start_time + MAX_STREAM_SECONDS
+    try:
+        for raw_line in response.iter_lines():
+            if time.time() > deadline:
+                raise requests.exceptions.ReadTimeout(f"流式响应超过 {MAX_STREAM_SECONDS:.0f}s 上限")
+            if not raw_line:
+                continue
+            line = raw_line.decode('utf-8', errors='replace')
+            if line.startswith('data:'):
+                yield line[5:].strip()
+    except requests.exceptions.ConnectionError as e:
+        # requests把流读取中的urllib3读取超时包装成ConnectionError，还原为超时
+        if e.args and isinstance(e.args[0], ReadTimeoutError):
+            raise requests.exceptions.ReadTimeout(str(e)) from e
+        raise
+    finally:
+        response.close()
+
+
+def read_openai_stream(response: requests.Response, start_time: float) -> Tuple[Dict[str, Any], Optional[float]]:
+    """
+    读取Chat Completions流，返回 (与非流式相同结构的结果, 首token延迟)
+    需要请求中设置 stream_options.include_usage 才能拿到usage
+    """
+    parts = []
+    usage: Dict[str, Any] = {}
+    first_token_latency = None
+    finish_reason = None
+
+    _notify_start()
+    for data in iter_sse_data(response, start_time):
+        if data == '[DONE]':
+            break
+        chunk = json.loads(data)
+        if chunk.get('error'):
+            raise RuntimeError(f"流式响应错误: {chunk['error']}")
+        if chunk.get('usage'):
+            usage = chunk['usage']
+        for choice in chunk.get('choices') or []:
+            delta = (choice.get('delta') or {}).get('content')
+            if delta:
+                if first_token_latency is None:
+                    first_token_latency = time.time() - start_time
+                parts.append(delta)
+                _notify_text(delta)
+            finish_reason = choice.get('finish_reason') or finish_reason
+
+    result = {'usage': usage, 'choices': []}
+    if parts or finish_reason:
+        result['choices'].append({
+            'message': {'role': 'assistant', 'content': ''.join(parts)},
+            'finish_reason': finish_reason
+        })
+    return result, first_token_latency
+
+
+def read_claude_stream(response: requests.Response, start_time: float) -> Tuple[Dict[str, Any], Optional[float]]:
+    """读取Messages流，返回 (与非流式相同结构的结果, 首token延迟)；tool_use块的JSON增量拼接后解析为input"""
+    parts = []
+    tool_block: Optional[Dict[str, Any]] = None
+    tool_json_parts = []
+    usage: Dict[str, Any] = {}
+    message: Dict[str, Any] = {}
+    first_token_latency = None
+
+    _notify_start()
+    for data in iter_sse_data(response, start_time):
+        event = json.loads(data)
+        event_type = event.get('type')
+        if event_type == 'message_start':
+            message = event.get('message', {})
+            usage.update(message.get('usage') or {})
+        elif event_type == 'content_block_start':
+            block = event.get('content_block') or {}
+            if block.get('type') == 'tool_use':
+                tool_block = {'type': 'tool_use', 'id': block.get('id'), 'name': block.get('name'), 'input': {}}
+        elif event_type == 'content_block_delta':
+            delta = event.get('delta') or {}
+            if delta.get('type') == 'input_json_delta':
+                if first_token_latency is None:
+                    first_token_latency = time.time() - start_time
+                tool_json_parts.append(delta.get('partial_json', ''))
+                continue
+            text = delta.get('text')
+            if text:
+                if first_token_latency is None:
+                    first_token_latency = time.time() - start_time
+                parts.append(text)
+                _notify_text(text)
+        elif event_type == 'message_delta':
+            # output_tokens在message_delta中为累计值
+            usage.update(event.get('usage') or {})
+            if event.get('delta', {}).get('stop_reason'):
+                message['stop_reason'] = event['delta']['stop_reason']
+        elif event_type == 'error':
+            raise RuntimeError(f"流式响应错误: {event.get('error')}")
+        elif event_type == 'message_stop':
+            break
+
+    result = dict(message)
+    result['content'] = [{'type': 'text', 'text': ''.join(parts)}] if parts else []
+    if tool_block is not None:
+        tool_json = ''.join(tool_json_parts)
+        tool_block['input'] = json.loads(tool_json) if tool_json else {}
+        result['content'].append(tool_block)
+    result['usage'] = usage
+    return result, first_token_latency
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Structured Output - 按JSON Schema约束模型输出，并统计各调用点的JSON解析结果
+所有需要JSON响应的调用点的schema集中定义在 RESPONSE_SCHEMAS 中：
+OpenAI使用 response_format=json_schema（strict），Claude使用强制调用的工具（tool_use的input即为JSON），
+调用方按名称引用schema；解析统计按调用点和模式（structured / free_text）区分，用于对比开启前后的解析失败率
+"""
+
+import os
+import re
+import json
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 是否对声明了schema的请求启用结构化输出（关闭时退回自由文本+正则修复，用于对比）
+STRUCTURED_OUTPUT_ENABLED = os.getenv('LLM_STRUCTURED_OUTPUT', '1') != '0'
+
+# 解析结果
+PARSE_OK = "ok"
+PARSE_REPAIRED = "repaired"
+PARSE_FAILED = "failed"
+
+
+def _string() -> Dict[str, Any]:
+    return {"type": "string"}
+
+
+def _number() -> Dict[str, Any]:
+    return {"type": "number"}
+
+
+def _integer() -> Dict[str, Any]:
+    return {"type": "integer"}
+
+
+def _boolean() -> Dict[str, Any]:
+    return {"type": "boolean"}
+
+
+def _string_list() -> Dict[str, Any]:
+    return {"type": "array", "items": _string()}
+
+
+def _enum(*values: str) -> Dict[str, Any]:
+    return {"type": "string", "enum": list(values)}
+
+
+def _object(**properties: Dict[str, Any]) -> Dict[str, Any]:
+    """strict模式要求所有字段必填且不允许额外字段"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+def _array_of(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": item}
+
+
+_KEYWORD_NECESSITY = _object(
+    is_necessary=_boolean(),
+    necessity_score=_number(),
+    masking_impact=_enum("essential", "important", "helpful", "redundant"),
+    reasoning=_string(),
+    alternative_answers_without_keyword=_string_list()
+)
+
+_QA_EVALUATION_ITEM = _object(
+    question_index=_integer(),
+    question_clarity=_number(),
+    question_specificity=_number(),
+    answer_accuracy=_number(),
+    answer_completeness=_number(),
+    browsecomp_adherence=_number(),
+    overall_score=_number(),
+    grade=_enum("A", "B", "C", "D", "F"),
+    strengths=_string_list(),
+    weaknesses=_string_list(),
+    suggestions=_string_list()
+)
+
+# 调用点名称 -> JSON Schema（顶层必须为object）
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    # llm_manager 多题合并答案
+    "multi_answers": _object(
+        answers=_array_of(_object(id=_integer(), answer=_string()))
+    ),
+    # exp07 文档筛选
+    "document_screening": _object(
+        is_suitable=_boolean(),
+        quality_score=_number(),
+        reasoning=_string(),
+        potential_answers=_string_list(),
+        content_type=_enum("factual", "biographical", "technical", "news", "promotional", "error", "abstract"),
+        issues=_string_list(),
+        fact_categories_present=_string_list()
+    ),
+    # exp07 文档中的短答案定位
+    "answer_location": _object(
+        short_answers=_array_of(_object(
+            answer_text=_string(),
+            answer_type=_enum("number", "name", "date", "location", "noun"),
+            context=_string(),
+            position=_integer(),
+            confidence=_number(),
+            reasoning=_string()
+        ))
+    ),
+    # exp07 核心框架：Short Answer提取
+    "short_answers": _object(
+        short_answers=_array_of(_object(
+            answer_text=_string(),
+            answer_type=_enum("noun", "number", "name", "date", "location"),
+            confidence=_number(),
+            extraction_source=_string(),
+            document_position=_integer(),
+            reasoning=_string()
+        ))
+    ),
+    # exp07 核心框架：最小精确问题
+    "minimal_precise_query": _object(
+        question_text=_string(),
+        minimal_keywords=_string_list(),
+        generation_method=_enum("web_search", "llm_analysis"),
+        confidence=_number(),
+        reasoning=_string()
+    ),
+    # exp07 核心框架：候选关键词
+    "candidate_keywords": _object(
+        candidate_keywords=_array_of(_object(
+            keyword=_string(),
+            keyword_type=_enum("proper_noun", "number", "technical_term", "date", "location"),
+            extraction_context=_string(),
+            specificity_score=_number(),
+            necessity_reasoning=_string()
+        )),
+        minimal_count=_integer()
+    ),
+    # exp07 关键词必要性（掩码测试，核心框架与并行验证器共用）
+    "keyword_necessity": _KEYWORD_NECESSITY,
+    # exp07 核心框架：无关联扩展问题
+    "unrelated_query": _object(
+        question_text=_string(),
+        answer=_string(),
+        minimal_keywords=_string_list(),
+        generation_method=_string(),
+        layer_level=_integer(),
+        no_correlation_verified=_boolean(),
+        circular_reasoning_check=_string(),
+        domain_switch=_string(),
+        reasoning=_string()
+    ),
+    # exp07 核心框架：两个问题间的关联/循环推理检测
+    "correlation_check": _object(
+        has_circular_reasoning=_boolean(),
+        has_correlation=_boolean(),
+        correlation_score=_number(),
+        circular_reasoning_explanation=_string(),
+        shared_entities=_string_list(),
+        validation_passed=_boolean(),
+        reasoning=_string()
+    ),
+    # exp07 核心框架：去掉关键词后答案是否仍唯一
+    "answer_determination": _object(
+        can_still_determine=_boolean(),
+        determination_level=_enum("still_unique", "ambiguous", "multiple_answers"),
+        alternative_answers=_string_list(),
+        reasoning=_string(),
+        necessity_of_removed_keyword=_enum("essential", "helpful", "redundant")
+    ),
+    # exp07 核心框架：融合模式——候选关键词与逐个关键词的掩码测试结论在一次调用中返回
+    "fused_keywords": _object(
+        candidate_keywords=_array_of(_object(
+            keyword=_string(),
+            keyword_type=_enum("proper_noun", "number", "technical_term", "date", "location"),
+            extraction_context=_string(),
+            specificity_score=_number(),
+            is_necessary=_boolean(),
+            necessity_score=_number(),
+            masking_impact=_enum("essential", "important", "helpful", "redundant"),
+            determination_level=_enum("still_unique", "ambiguous", "multiple_answers"),
+            alternative_answers_without_keyword=_string_list(),
+            reasoning=_string()
+        )),
+        minimal_count=_integer()
+    ),
+    # exp07 核心框架：最小精确问题验证
+    "minimal_precise_validation": _object(
+        is_minimal=_boolean(),
+        is_precise=_boolean(),
+        essential_keywords=_string_list(),
+        redundant_keywords=_string_list(),
+        precision_score=_number(),
+        minimality_score=_number(),
+        overall_quality=_enum("excellent", "good", "fair", "poor"),
+        improvement_suggestions=_string(),
+        alternative_answers=_string_list(),
+        reasoning=_string()
+    ),
+    # exp07 核心框架：根答案暴露风险
+    "answer_exposure": _object(
+        exposure_risk=_enum("high", "medium", "low", "safe"),
+        will_expose_answer=_boolean(),
+        risk_factors=_string_list(),
+        reasoning_path_to_answer=_string(),
+        safety_score=_number(),
+        recommendations=_string()
+    ),
+    # exp06 问答质量评判
+    "qa_evaluation": _object(
+        evaluations=_array_of(_QA_EVALUATION_ITEM),
+        overall_assessment=_object(
+            avg_question_clarity=_number(),
+            avg_question_specificity=_number(),
+            avg_answer_accuracy=_number(),
+            avg_answer_completeness=_number(),
+            avg_browsecomp_adherence=_number(),
+            overall_avg_score=_number(),
+            overall_grade=_enum("A", "B", "C", "D", "F"),
+            general_feedback=_string()
+        )
+    ),
+}
+
+
+def get_response_schema(name: str) -> Dict[str, Any]:
+    """按名称获取schema"""
+    try:
+        return RESPONSE_SCHEMAS[name]
+    except KeyError:
+        raise ValueError(f"未定义的响应schema: {name}")
+
+
+def openai_response_format(name: str) -> Dict[str, Any]:
+    """Chat Completions的response_format参数"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": get_response_schema(name), "strict": True}
+    }
+
+
+def claude_tool_options(name: str) -> Dict[str, Any]:
+    """Messages API的强制工具调用参数（模型只能以符合input_schema的JSON调用该工具）"""
+    return {
+        "tools": [{
+            "name": name,
+            "description": f"Return the {name.replace('_', ' ')} result as structured JSON.",
+            "input_schema": get_response_schema(name)
+        }],
+        "tool_choice": {"type": "tool", "name": name}
+    }
+
+
+def is_json_object(text: Optional[str]) -> bool:
+    """内容是否为完整的JSON对象（结构化输出请求只缓存能直接解析的响应）"""
+    try:
+        return isinstance(json.loads(text or ''), dict)
+    except ValueError:
+        return False
+
+
+def _empty_bucket() -> Dict[str, int]:
+    return {'attempts': 0, 'repaired': 0, 'failures': 0}
+
+
+class ParseStats:
+    """按调用点和模式统计JSON解析结果（线程安全）"""
+
+    def __init__(self):
+        self._sites: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, site: str, outcome: str, structured: bool = False):
+        """
+        记录一次解析：outcome为 ok / repaired（需要修复才能解析）/ failed；
+        structured为该请求是否由客户端按schema约束（见客户端的 uses_structured_output / APIResponse.structured），
+        Batch请求与未按schema约束的请求记为free_text
+        """
+        mode = "structured" if structured else "free_text"
+        with self._lock:
+            bucket = self._sites.setdefault(site, {}).setdefault(mode, _empty_bucket())
+            bucket['attempts'] += 1
+            bucket['repaired'] += 1 if outcome == PARSE_REPAIRED else 0
+            bucket['failures'] += 1 if outcome == PARSE_FAILED else 0
+
+    def get_statistics(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{调用点: {模式: attempts / repaired / failures / failure_rate / repair_rate}}"""
+        with self._lock:
+            return {
+                site: {
+                    mode: {
+                        **bucket,
+                        'failure_rate': round(bucket['failures'] / bucket['attempts'], 4) if bucket['attempts'] else 0.0,
+                        'repair_rate': round(bucket['repaired'] / bucket['attempts'], 4) if bucket['attempts'] else 0.0
+                    }
+                    for mode, bucket in sorted(modes.items())
+                }
+                for site, modes in sorted(self._sites.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+
+
+_parse_stats: Optional[ParseStats] = None
+_parse_stats_lock = threading.Lock()
+
+
+def get_parse_stats() -> ParseStats:
+    """获取全局共享的解析统计"""
+    global _parse_stats
+    if _parse_stats is None:
+        with _parse_stats_lock:
+            if _parse_stats is None:
+                _parse_stats = ParseStats()
+    return _parse_stats
+
+
+def record_parse(site: str, outcome: str, structured: bool = False):
+    """记录一次解析结果（供自行解析的调用点使用）"""
+    get_parse_stats().record(site, outcome, structured)
+
+
+def parse_json_response(text: Optional[str], site: str,
+                        repair: Optional[Callable[[str], str]] = None,
+                        structured: bool = False) -> Optional[Any]:
+    """
+    解析LLM返回的JSON并计入解析统计
+
+    先直接解析（结构化输出时总能成功）；失败时去掉markdown代码块，截取最外层的对象或数组，
+    可选地用repair清理后再解析；都失败返回None；
+    structured由发出请求的调用点传入（该请求是否按schema约束），决定计入哪种模式的统计
+    """
+    if text:
+        try:
+            value = json.loads(text)
+            record_parse(site, PARSE_OK, structured)
+            return value
+        except ValueError:
+            pass
+
+        cleaned = re.sub(r'```(?:json)?\s*|\s*```', '', text).strip()
+        starts = [i for i in (cleaned.find('{'), cleaned.find('[')) if i >= 0]
+        if starts:
+            start = min(starts)
+            end = cleaned.rfind('}' if cleaned[start] == '{' else ']') + 1
+            if end > start:
+                candidate = cleaned[start:end]
+                if repair:
+                    candidate = repair(candidate)
+                try:
+                    value = json.loads(candidate, strict=False)
+                    record_parse(site, PARSE_REPAIRED, structured)
+                    return value
+                except ValueError:
+                    pass
+
+    logger.warning(f"无法解析JSON响应 ({site}): {(text or '')[:200]}...")
+    record_parse(site, PARSE_FAILED, structured)
+    return None
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Token Estimation - 可插拔的token计数
+优先使用注册的tokenizer（按模型名前缀匹配），其次尝试tiktoken（可选依赖），
+都不可用时使用本地启发式估算（CJK字符约1 token/字，其他文本约4字符/token）
+"""
+
+import math
+import re
+import threading
+import logging
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 模型名前缀 -> 计数函数
+_tokenizers: Dict[str, Callable[[str], int]] = {}
+_tiktoken_encodings: Dict[str, object] = {}
+_lock = threading.Lock()
+
+_CJK_PATTERN = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def heuristic_token_count(text: str) -> int:
+    """本地启发式估算token数"""
+    if not text:
+        return 0
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    other_chars = len(text) - cjk_chars
+    return cjk_chars + math.ceil(other_chars / 4)
+
+
+def register_tokenizer(model_prefix: str, count_fn: Callable[[str], int]):
+    """注册某类模型的token计数函数（如 'claude' -> Anthropic count_tokens 封装）"""
+    with _lock:
+        _tokenizers[model_prefix] = count_fn
+    logger.info(f"已注册tokenizer: {model_prefix}")
+
+
+def _get_tiktoken_counter(model: str) -> Optional[Callable[[str], int]]:
+    """尝试获取tiktoken编码器（未安装或模型未知时返回None）"""
+    with _lock:
+        if model in _tiktoken_encodings:
+            encoding = _tiktoken_encodings[model]
+        else:
+            try:
+                import tiktoken
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("o200k_base") if model.startswith("gpt-4o") else None
+            except ImportError:
+                encoding = None
+            _tiktoken_encodings[model] = encoding
+    if encoding is None:
+        return None
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def get_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """获取模型对应的token计数函数"""
+    if model:
+        with _lock:
+            matches = [prefix for prefix in _tokenizers if model.startswith(prefix)]
+            if matches:
+                return _tokenizers[max(matches, key=len)]
+        if model.startswith(("gpt-", "o1", "o3", "o4")):
+            counter = _get_tiktoken_counter(model)
+            if counter is not None:
+                return counter
+    return heuristic_token_count
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """估算文本token数"""
+    if not text:
+        return 0
+    try:
+        return get_token_counter(model)(text)
+    except Exception as e:
+        logger.debug(f"tokenizer计数失败，使用启发式估算: {e}")
+        return heuristic_token_count(text)
+
+
+def get_tokenizer_name(model: Optional[str] = None) -> str:
+    """返回实际使用的tokenizer名称（用于统计报告）"""
+    counter = get_token_counter(model)
+    if counter is heuristic_token_count:
+        return "heuristic"
+    with _lock:
+        if any(counter is fn for fn in _tokenizers.values()):
+            return "registered"
+    return "tiktoken"
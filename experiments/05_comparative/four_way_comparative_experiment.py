@@ -33,20 +33,30 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from core.llm_clients.openai_api_client import OpenAIClient
 from core.llm_clients.claude_api_client import ClaudeAPIClient
 from core.llm_clients.llm_manager import DynamicLLMManager
+from core.llm_clients.metering import get_meter
+from core.llm_clients.segment_merge import sum_usage
+from core.llm_clients.replay_transport import configure_offline_from_argv
 
 class FourWayComparativeExperiment:
     """四方对比实验管理器"""
     
-    def __init__(self, openai_api_key: str, claude_api_key: str):
+    def __init__(self, openai_api_key: str, claude_api_key: str, use_batch_api: bool = False,
+                 answers_per_request: int = 1, pipeline_answers: bool = False):
         """
         初始化实验
         
         Args:
             openai_api_key: OpenAI API密钥
             claude_api_key: Claude API密钥
+            use_batch_api: 问题/答案批量阶段是否走提供商Batch接口（离线提交，不需要交互延迟）
+            answers_per_request: 每次答案请求合并回答的问题数（默认1即逐题回答；>1时报告只发送一次）
+            pipeline_answers: 流式生成问题，每个问题生成完即开始回答（默认关闭；与Batch接口互斥）
         """
         self.openai_api_key = openai_api_key
         self.claude_api_key = claude_api_key
+        self.use_batch_api = use_batch_api
+        self.answers_per_request = answers_per_request
+        self.pipeline_answers = pipeline_answers and not use_batch_api
         
         # 创建全新的输出目录 - 避免与历史数据混淆
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -227,24 +237,26 @@ class FourWayComparativeExperiment:
             print(f"❌ 读取随机文档文件失败: {e}")
             return []
     
-    def _generate_questions_in_batches(self, report_content: str, topic_id: str, provider: str, test_mode: bool = False) -> List[Dict[str, Any]]:
-        """分段生成问题"""
+    def _generate_questions_in_batches(self, report_content: str, topic_id: str, provider: str,
+                                       test_mode: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """分段生成问题，返回 (问题列表, 各批次累计的token用量)"""
         if test_mode:
             print("  🧪 测试模式：生成3个问题")
             questions_result = self.llm_manager.generate_questions(report_content, topic_id, num_questions=3, provider=provider)
             
             if questions_result.success and hasattr(questions_result, 'questions'):
-                return questions_result.questions
+                return questions_result.questions, sum_usage([questions_result.usage])
             else:
                 print("  ⚠️ 测试问题生成失败，使用默认问题")
                 return [
                     {'question': 'What are the main findings in this research?', 'difficulty': 'Easy', 'type': 'factual'},
                     {'question': 'How do these findings relate to current field developments?', 'difficulty': 'Medium', 'type': 'analytical'},
                     {'question': 'What are the implications and future directions?', 'difficulty': 'Hard', 'type': 'evaluative'}
-                ]
+                ], sum_usage([questions_result.usage])
         else:
             print("  📝 分段生成50个问题...")
             all_questions = []
+            batch_usages = []
             
             # 分3批生成：Easy(15) + Medium(20) + Hard(15) = 50
             batches = [
@@ -253,16 +265,28 @@ class FourWayComparativeExperiment:
                 ("Hard", 15)
             ]
             
-            for difficulty, count in batches:
-                print(f"    🎯 生成 {difficulty} 难度问题 ({count}个)...")
-                
-                batch_result = self.llm_manager.generate_questions(
-                    report_content, 
-                    f"{topic_id}_{difficulty.lower()}", 
-                    num_questions=count, 
+            if self.use_batch_api:
+                print("    📦 通过Batch接口一次提交3个难度批次...")
+                batch_results = self.llm_manager.generate_questions_batch(
+                    [{'report': report_content, 'topic': f"{topic_id}_{difficulty.lower()}", 'num_questions': count}
+                     for difficulty, count in batches],
                     provider=provider
                 )
+            
+            for batch_index, (difficulty, count) in enumerate(batches):
+                print(f"    🎯 生成 {difficulty} 难度问题 ({count}个)...")
+                
+                if self.use_batch_api:
+                    batch_result = batch_results[batch_index]
+                else:
+                    batch_result = self.llm_manager.generate_questions(
+                        report_content, 
+                        f"{topic_id}_{difficulty.lower()}", 
+                        num_questions=count, 
+                        provider=provider
+                    )
                 
+                batch_usages.append(batch_result.usage)
                 if batch_result.success and hasattr(batch_result, 'questions'):
                     batch_questions = batch_result.questions
                     # 确保难度设置正确
@@ -272,11 +296,50 @@ class FourWayComparativeExperiment:
                     print(f"    ✅ {difficulty}: {len(batch_questions)} 个问题")
                 else:
                     print(f"    ⚠️ {difficulty} 批次失败，跳过")
-                
-                # 批次间休息
-                time.sleep(1)
             
-            return all_questions
+            return all_questions, sum_usage(batch_usages)
+    
+    def _generate_questions_and_answers_pipelined(self, report_content: str, topic_id: str, provider: str,
+                                                  test_mode: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, int], Dict[str, Any]]:
+        """流式生成问题并同时生成答案，返回 (问题列表, 问题阶段token用量, 答案结果)"""
+        if test_mode:
+            print("  🧪 测试模式：流式生成3个问题")
+            batches = [(None, 3)]
+        else:
+            print("  📝 流式分段生成50个问题，边生成边回答...")
+            # 分3批生成：Easy(15) + Medium(20) + Hard(15) = 50，三个批次同时请求
+            batches = [
+                ("Easy", 15),
+                ("Medium", 20), 
+                ("Hard", 15)
+            ]
+        
+        streams = []
+        for difficulty, count in batches:
+            topic = f"{topic_id}_{difficulty.lower()}" if difficulty else topic_id
+            # 确保难度设置正确
+            transform = (lambda q, d=difficulty: dict(q, difficulty=d)) if difficulty else None
+            streams.append((difficulty, self.llm_manager.generate_questions_stream(
+                report_content, topic, num_questions=count, provider=provider, transform=transform
+            )))
+        
+        def _all_questions():
+            for difficulty, stream in streams:
+                yield from stream
+                if difficulty:
+                    if stream.response is not None and stream.response.success:
+                        print(f"    ✅ {difficulty}: {len(stream.questions)} 个问题")
+                    else:
+                        print(f"    ⚠️ {difficulty} 批次失败，跳过")
+        
+        answers_result = self.llm_manager.generate_answers_pipelined(
+            _all_questions(), report_content, provider, max_answers=50,
+            questions_per_request=self.answers_per_request
+        )
+        questions_usage = sum_usage([
+            response.usage for response in (stream.wait() for _, stream in streams) if response is not None
+        ])
+        return answers_result.pop('questions', []), questions_usage, answers_result
     
     def process_topic_with_llm(self, topic_data: Dict[str, Any], provider: str, model: str, test_mode: bool = False) -> Dict[str, Any]:
         """使用指定LLM处理单个主题"""
@@ -286,6 +349,7 @@ class FourWayComparativeExperiment:
         print(f"🔍 处理主题: {topic_id} (使用 {provider})")
         
         start_time = time.time()
+        meter_mark = get_meter().mark()
         
         try:
             # Step 1: 生成报告
@@ -309,7 +373,16 @@ class FourWayComparativeExperiment:
             
             # Step 2: 生成问题 (分段生成)
             print("  ❓ 生成研究问题...")
-            questions_data = self._generate_questions_in_batches(report_content, topic_id, provider, test_mode)
+            answers_result = None
+            if self.pipeline_answers:
+                # 问题与答案流水线：答案在问题流中逐个开始生成
+                questions_data, questions_usage, answers_result = self._generate_questions_and_answers_pipelined(
+                    report_content, topic_id, provider, test_mode
+                )
+                if not questions_data:
+                    answers_result = None
+            else:
+                questions_data, questions_usage = self._generate_questions_in_batches(report_content, topic_id, provider, test_mode)
             
             if not questions_data:
                 print(f"  ❌ 问题生成失败")
@@ -322,9 +395,13 @@ class FourWayComparativeExperiment:
             
             print(f"  ✅ 问题生成完成 ({len(questions_data)} 个问题)")
             
-            # Step 3: 生成答案
-            print("  💬 生成答案...")
-            answers_result = self.llm_manager.generate_answers(questions_data, report_content, provider, max_answers=50)
+            # Step 3: 生成答案（流水线模式下已完成）
+            if answers_result is None:
+                print("  💬 生成答案...")
+                answers_result = self.llm_manager.generate_answers(
+                    questions_data, report_content, provider, max_answers=50, use_batch=self.use_batch_api,
+                    questions_per_request=self.answers_per_request
+                )
             
             if not answers_result['success']:
                 print(f"  ❌ 答案生成失败: {answers_result.get('error', 'Unknown error')}")
@@ -359,10 +436,12 @@ class FourWayComparativeExperiment:
                         'questions': questions_data,
                         'count': len(questions_data),
                         'model': report_result.model,  # 使用report的model信息
-                        'usage': {'total_tokens': 0}  # 分段生成，暂时设为0
+                        'usage': questions_usage  # 各难度批次累计用量
                     },
                     'answers': answers_result
-                }
+                },
+                # 按阶段的耗时/token/成本计量
+                'metering': get_meter().summary(since=meter_mark)
             }
             
             # 添加QA对
@@ -440,6 +519,7 @@ class FourWayComparativeExperiment:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         exp_output_dir = self.output_dir / f"{experiment_id}_{timestamp}"
         exp_output_dir.mkdir(exist_ok=True)
+        meter_mark = get_meter().mark()
         
         # 检查是否有已存在的实验目录（断点续做）
         existing_dirs = list(self.output_dir.glob(f"{experiment_id}_*"))
@@ -450,7 +530,7 @@ class FourWayComparativeExperiment:
             # 检查已完成的主题
             completed_topics = set()
             for json_file in latest_dir.glob("*.json"):
-                if json_file.name != "complete_experiment_results.json":
+                if json_file.name != "complete_experiment_results.json" and not json_file.name.endswith("_metering.json"):
                     try:
                         with open(json_file, 'r', encoding='utf-8') as f:
                             result = json.load(f)
@@ -478,7 +558,7 @@ class FourWayComparativeExperiment:
                     # 读取已有结果
                     results = []
                     for json_file in exp_output_dir.glob("*.json"):
-                        if json_file.name != "complete_experiment_results.json":
+                        if json_file.name != "complete_experiment_results.json" and not json_file.name.endswith("_metering.json"):
                             try:
                                 with open(json_file, 'r', encoding='utf-8') as f:
                                     result = json.load(f)
@@ -487,7 +567,7 @@ class FourWayComparativeExperiment:
                                 continue
                     
                     # 保存完整实验结果
-                    self._save_complete_results(exp_output_dir, config, experiment_id, results)
+                    self._save_complete_results(exp_output_dir, config, experiment_id, results, meter_mark)
                     return str(exp_output_dir)
         
         results = []
@@ -511,9 +591,6 @@ class FourWayComparativeExperiment:
                     json.dump(result, f, indent=2, ensure_ascii=False)
                 
                 print(f"💾 保存: {result_file}")
-                
-                # 短暂休息避免API限制
-                time.sleep(1)
         
         except Exception as e:
             print(f"❌ 实验 {experiment_id} 执行失败: {e}")
@@ -521,11 +598,12 @@ class FourWayComparativeExperiment:
             return ""
         
         # 保存完整实验结果
-        self._save_complete_results(exp_output_dir, config, experiment_id, results)
+        self._save_complete_results(exp_output_dir, config, experiment_id, results, meter_mark)
         return str(exp_output_dir)
     
-    def _save_complete_results(self, exp_output_dir: Path, config: Dict, experiment_id: str, results: List):
-        """保存完整实验结果"""
+    def _save_complete_results(self, exp_output_dir: Path, config: Dict, experiment_id: str, results: List,
+                               meter_mark: int = 0):
+        """保存完整实验结果，并在旁边写入本次实验的LLM计量汇总"""
         experiment_result = {
             'experiment_info': {
                 'experiment_id': experiment_id,
@@ -544,6 +622,7 @@ class FourWayComparativeExperiment:
         complete_results_file = exp_output_dir / "complete_experiment_results.json"
         with open(complete_results_file, 'w', encoding='utf-8') as f:
             json.dump(experiment_result, f, indent=2, ensure_ascii=False)
+        get_meter().write_summary(complete_results_file, since=meter_mark)
         
         print(f"\n✅ 实验 {config['name']} 完成!")
         print(f"📁 结果目录: {exp_output_dir}")
@@ -1024,6 +1103,7 @@ class FourWayComparativeExperiment:
                     }
                     
                     # 运行单个主题测试
+                    meter_mark = get_meter().mark()
                     result = self.process_topic_with_llm(
                         test_topic,
                         test_config['provider'],
@@ -1061,6 +1141,7 @@ class FourWayComparativeExperiment:
                     complete_results_file = test_output_dir / "complete_experiment_results.json"
                     with open(complete_results_file, 'w', encoding='utf-8') as f:
                         json.dump(test_experiment_result, f, indent=2, ensure_ascii=False)
+                    get_meter().write_summary(complete_results_file, since=meter_mark)
                     
                     if result.get('success', False):
                         experiment_results[exp_id] = str(test_output_dir)
@@ -1102,9 +1183,23 @@ def main():
     print("⚠️  注意: 本次实验不使用任何历史数据，所有结果存储在新目录")
     print("=" * 70)
     
-    # 检查是否为测试模式
+    # 检查是否为测试模式（--llm-stub / --llm-record / --llm-replay 用于离线运行）
     import sys
-    test_mode = len(sys.argv) > 1 and sys.argv[1] == "test"
+    args = configure_offline_from_argv(sys.argv[1:])
+    test_mode = len(args) > 0 and args[0] == "test"
+    use_batch_api = "--batch" in args
+    pipeline_answers = "--pipeline" in args
+    answers_per_request = 1
+    for arg in args:
+        if arg.startswith("--answers-per-request="):
+            answers_per_request = max(1, int(arg.split("=", 1)[1]))
+    
+    if use_batch_api:
+        print("📦 Batch模式：问题与答案阶段将通过提供商Batch接口离线提交")
+    elif pipeline_answers:
+        print("🔀 流水线模式：问题流式生成，答案逐个并行生成（--pipeline 开启）")
+    if answers_per_request > 1:
+        print(f"🧩 答案合并模式：每次请求回答 {answers_per_request} 个问题")
     
     if test_mode:
         print("🧪 测试模式：只运行一个topic进行快速验证")
@@ -1125,7 +1220,9 @@ def main():
     
     try:
         # 初始化实验系统
-        experiment = FourWayComparativeExperiment(openai_api_key, claude_api_key)
+        experiment = FourWayComparativeExperiment(openai_api_key, claude_api_key, use_batch_api=use_batch_api,
+                                                  answers_per_request=answers_per_request,
+                                                  pipeline_answers=pipeline_answers)
         
         if test_mode:
             # 测试模式：运行单个topic测试
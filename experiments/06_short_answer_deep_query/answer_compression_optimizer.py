@@ -13,6 +13,7 @@ from typing import List, Dict, Any, Optional, Tuple
 # 添加项目根目录到路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from core.llm_clients.llm_manager import llm_manager
+from core.llm_clients.metering import metered_stage
 
 logger = logging.getLogger(__name__)
 
@@ -154,6 +155,7 @@ class AnswerCompressionOptimizer:
         
         return optimized_pairs, optimization_summary
     
+    @metered_stage("answer_compression", override=True)
     def _compress_answer(self, question: str, original_answer: str, 
                         max_words: int, max_chars: int) -> Dict[str, Any]:
         """
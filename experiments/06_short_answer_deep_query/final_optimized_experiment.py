@@ -25,12 +25,16 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import random # Added for randomization in generate_short_answer_deep_questions
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from core.llm_clients.llm_manager import DynamicLLMManager
+from core.llm_clients.metering import get_meter, metered_stage
+from core.llm_clients.async_support import submit_with_provider_limit
+from core.llm_clients.replay_transport import configure_offline_from_argv
 from report_quality_evaluation_system import (
     ReportQualityEvaluator,
     TopicRelevanceAnalyzer
@@ -98,6 +102,13 @@ class FinalOptimizedExperiment:
             "enable_answer_compression": True,
             "compression_threshold": 15,
             
+            # 批处理配置：问题/答案生成阶段通过提供商Batch接口离线提交
+            "use_batch_api": False,
+            # 流水线配置：每个问题生成完立即请求其短答案（非Batch模式）
+            "pipeline_answers": True,
+            "pipeline_workers": 16,
+            "pipeline_refill_margin": 2,         # 问题请求窗口 = 目标问题数 + 补充余量
+            
             # 质量控制配置 - 进一步放宽标准
             "min_report_quality_score": 0.45,    # 进一步降低到0.45
             "min_relevance_score": 0.15,         # 大幅降低到0.15以适应实际表现
@@ -156,6 +167,7 @@ class FinalOptimizedExperiment:
             self.logger.error(f"加载topic数据时出错: {e}")
             return []
     
+    @metered_stage("report")
     def generate_simplified_report(self, topic_info: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
         """生成topic级别的多文档融合报告（修改为支持topic-based处理）"""
         
@@ -289,6 +301,7 @@ Generate a comprehensive fusion report that preserves all critical details while
             self.logger.error(f"Topic {topic_id} 融合报告生成失败: {e}")
             raise
     
+    @metered_stage("report")
     def _generate_single_document_report(self, document: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
         """原始的单文档报告生成方法（向后兼容）"""
         
@@ -486,13 +499,24 @@ Please generate a simplified report that meets the requirements. Remember: OUTPU
         self.logger.info(f"📊 提取事实点: {len(fact_points)} 个不同事实点")
         
         # 第二步：LLM基于事实点生成深度问题（而不是反推问题）
-        generated_questions = self._llm_generate_questions_from_facts(report, fact_points, num_questions)
+        batch_answers = None
+        if self.config.get('pipeline_answers') and not self.config.get('use_batch_api'):
+            # 流水线模式：问题生成的同时已提交短答案请求
+            generated_questions, batch_answers = self._pipelined_generate_questions_and_answers(
+                report, fact_points, num_questions
+            )
+        else:
+            generated_questions = self._llm_generate_questions_from_facts(report, fact_points, num_questions)
         self.logger.info(f"🧠 LLM生成问题: {len(generated_questions)} 个深度问题")
         
         # 第三步：关键修复 - 让LLM基于完整report和问题生成真正的短答案
         final_qa_pairs = []
         used_question_patterns = set()
         
+        # 批处理模式：一次提交所有不重复问题的答案请求
+        if self.config.get('use_batch_api'):
+            batch_answers = self._batch_generate_short_answers(generated_questions, report)
+        
         for i, question_data in enumerate(generated_questions):
             if len(final_qa_pairs) >= num_questions:
                 break
@@ -509,7 +533,10 @@ Please generate a simplified report that meets the requirements. Remember: OUTPU
                 continue
             
             # 🔑 关键修复：LLM基于完整report回答问题，生成真正的短答案
-            true_answer = self._llm_generate_true_short_answer(question, report, fact_context)
+            if batch_answers is not None and i in batch_answers:
+                true_answer = batch_answers[i]
+            else:
+                true_answer = self._llm_generate_true_short_answer(question, report, fact_context)
             
             if true_answer and len(true_answer.split()) <= self.config['max_answer_words']:
                 # BrowseComp检测
@@ -544,6 +571,114 @@ Please generate a simplified report that meets the requirements. Remember: OUTPU
         
         return final_qa_pairs
     
+    def _pipelined_generate_questions_and_answers(self, report: str, fact_points: List[Dict],
+                                                  target_count: int) -> Tuple[List[Dict[str, Any]], Dict[int, Optional[str]]]:
+        """
+        流水线模式：按候选顺序为事实点生成问题，问题按候选顺序确定后立即提交其短答案请求；
+        在途+已返回未确定的问题请求不超过 target_count + pipeline_refill_margin，
+        生成失败的候选由后续候选补充，凑够target_count后取消剩余请求
+        
+        Returns:
+            (按候选顺序的前target_count个问题, {问题索引: 短答案})；重复模式的问题（按候选顺序判断）不预先回答
+        """
+        candidates = self._select_fact_candidates(self._group_facts_by_type(fact_points))
+        provider = self.llm_manager.get_current_provider().value
+        window = target_count + self.config.get('pipeline_refill_margin', 2)
+        
+        question_texts: Dict[int, Optional[str]] = {}
+        question_futures = {}
+        answer_futures = {}
+        accepted_indices: List[int] = []
+        submitted_patterns = set()
+        next_index = 0
+        cursor = 0
+        
+        with ThreadPoolExecutor(max_workers=self.config['pipeline_workers'], thread_name_prefix="exp06-pipe") as executor:
+            while len(accepted_indices) < target_count:
+                # 补充问题请求：已确定 + 已返回待确定 + 在途 的问题数不超过窗口
+                ready_ahead = sum(1 for index in range(cursor, next_index) if question_texts.get(index))
+                while next_index < len(candidates) and \
+                        len(accepted_indices) + ready_ahead + len(question_futures) < window:
+                    fact_type, fact_point = candidates[next_index]
+                    future = submit_with_provider_limit(executor, provider, self._llm_generate_single_question_from_fact,
+                                                        fact_point, report, fact_type)
+                    question_futures[future] = next_index
+                    next_index += 1
+                if not question_futures:
+                    break
+                
+                done, _ = wait(question_futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    question_texts[question_futures.pop(future)] = future.result()
+                
+                # 按候选顺序确定问题，首次出现的问题模式提交答案请求
+                while cursor in question_texts and len(accepted_indices) < target_count:
+                    question = question_texts[cursor]
+                    if question:
+                        accepted_indices.append(cursor)
+                        pattern = self._create_question_fingerprint(question)
+                        if pattern not in submitted_patterns:
+                            submitted_patterns.add(pattern)
+                            answer_futures[cursor] = submit_with_provider_limit(
+                                executor, provider, self._llm_generate_true_short_answer,
+                                question, report, candidates[cursor][1]['context']
+                            )
+                    cursor += 1
+            
+            cancelled = sum(1 for future in question_futures if future.cancel())
+            
+            generated_questions = []
+            answers: Dict[int, Optional[str]] = {}
+            for index in accepted_indices:
+                fact_type, fact_point = candidates[index]
+                if index in answer_futures:
+                    answers[len(generated_questions)] = answer_futures[index].result()
+                generated_questions.append({
+                    'question': question_texts[index],
+                    'fact_type': fact_type,
+                    'fact_context': fact_point['context'],
+                    'source_fact': fact_point['fact_value']
+                })
+        
+        self.logger.info(f"🔀 流水线问题/答案生成: {len(generated_questions)}/{len(candidates)} 个候选, "
+                         f"{next_index - cancelled} 个问题请求, {len(answer_futures)} 个答案请求")
+        return generated_questions, answers
+    
+    def _group_facts_by_type(self, fact_points: List[Dict]) -> Dict[str, List[Dict]]:
+        """按类型分组事实点"""
+        facts_by_type = {}
+        for point in fact_points:
+            facts_by_type.setdefault(point['type'], []).append(point)
+        return facts_by_type
+    
+    def _select_fact_candidates(self, facts_by_type: Dict[str, List[Dict]]) -> List[Tuple[str, Dict]]:
+        """每种类型最多取8个事实点作为问题生成候选"""
+        candidates = []
+        for fact_type, type_facts in facts_by_type.items():
+            max_questions_per_type = min(8, len(type_facts))
+            for fact_point in type_facts[:max_questions_per_type]:
+                candidates.append((fact_type, fact_point))
+        return candidates
+    
+    @metered_stage("answers")
+    def _batch_generate_short_answers(self, questions: List[Dict[str, Any]], report: str) -> Dict[int, Optional[str]]:
+        """批处理模式：为每个首次出现的问题模式生成短答案，返回 {问题索引: 答案}"""
+        seen_patterns = set()
+        indices = []
+        for i, question_data in enumerate(questions):
+            pattern = self._create_question_fingerprint(question_data['question'])
+            if pattern not in seen_patterns:
+                seen_patterns.add(pattern)
+                indices.append(i)
+        
+        prompts = [self._build_short_answer_prompt(questions[i]['question'], report) for i in indices]
+        responses = self.llm_manager.generate_text_batch(prompts)
+        
+        return {
+            i: self._parse_short_answer(response.content) if response.success else None
+            for i, response in zip(indices, responses)
+        }
+    
     def _extract_diverse_factual_points(self, report: str, target_count: int) -> List[Dict[str, Any]]:
         """提取事实点（不是最终答案，而是生成问题的素材）"""
         
@@ -616,6 +751,9 @@ Please generate a simplified report that meets the requirements. Remember: OUTPU
                 facts_by_type[fact_type] = []
             facts_by_type[fact_type].append(point)
         
+        if self.config.get('use_batch_api'):
+            return self._batch_generate_questions_from_facts(facts_by_type, target_count)
+        
         # 为每种类型生成问题
         for fact_type, type_facts in facts_by_type.items():
             if len(generated_questions) >= target_count:
@@ -642,9 +780,50 @@ Please generate a simplified report that meets the requirements. Remember: OUTPU
         
         return generated_questions
     
+    @metered_stage("questions")
+    def _batch_generate_questions_from_facts(self, facts_by_type: Dict[str, List[Dict]], target_count: int) -> List[Dict[str, Any]]:
+        """批处理模式：一次提交所有候选事实点的问题生成请求"""
+        candidates = self._select_fact_candidates(facts_by_type)
+        
+        prompts = [self._build_fact_question_prompt(fact_point, fact_type) for fact_type, fact_point in candidates]
+        responses = self.llm_manager.generate_text_batch(prompts)
+        
+        generated_questions = []
+        for (fact_type, fact_point), api_response in zip(candidates, responses):
+            if len(generated_questions) >= target_count:
+                break
+            question = self._parse_generated_question(api_response.content) if api_response.success else None
+            if question:
+                generated_questions.append({
+                    'question': question,
+                    'fact_type': fact_type,
+                    'fact_context': fact_point['context'],
+                    'source_fact': fact_point['fact_value']
+                })
+        
+        self.logger.info(f"📦 批处理问题生成: {len(generated_questions)}/{len(candidates)} 个候选成功")
+        return generated_questions
+    
+    @metered_stage("questions")
     def _llm_generate_single_question_from_fact(self, fact_point: Dict, report: str, fact_type: str) -> Optional[str]:
         """LLM基于单个事实点生成一个深度问题"""
         
+        prompt = self._build_fact_question_prompt(fact_point, fact_type)
+        
+        try:
+            api_response = self.llm_manager.generate_text(prompt)
+            
+            if api_response.success and api_response.content:
+                return self._parse_generated_question(api_response.content)
+                
+        except Exception as e:
+            self.logger.debug(f"LLM生成问题失败: {e}")
+        
+        return None
+    
+    def _build_fact_question_prompt(self, fact_point: Dict, fact_type: str) -> str:
+        """构建基于事实点的问题生成prompt"""
+        
         fact_value = fact_point['fact_value']
         context = fact_point['context']
         
@@ -681,30 +860,44 @@ Question: [Your deep, specific question here]
 
 Generate ONE excellent question now:"""
         
+        return prompt
+    
+    def _parse_generated_question(self, content: str) -> Optional[str]:
+        """从LLM响应中提取问题"""
+        if not content:
+            return None
+        
+        question_match = re.search(r'Question:\s*(.+?)(?:\n|$)', content.strip(), re.IGNORECASE)
+        if question_match:
+            question = question_match.group(1).strip()
+            
+            # 确保问题以问号结尾
+            if not question.endswith('?'):
+                question += '?'
+            
+            return question
+        
+        return None
+    
+    @metered_stage("answers")
+    def _llm_generate_true_short_answer(self, question: str, report: str, fact_context: str) -> Optional[str]:
+        """🔑 关键修复：LLM基于完整report和问题生成真正的短答案"""
+        
+        prompt = self._build_short_answer_prompt(question, report)
+        
         try:
             api_response = self.llm_manager.generate_text(prompt)
             
             if api_response.success and api_response.content:
-                response = api_response.content.strip()
-                
-                # 提取问题
-                question_match = re.search(r'Question:\s*(.+?)(?:\n|$)', response, re.IGNORECASE)
-                if question_match:
-                    question = question_match.group(1).strip()
-                    
-                    # 确保问题以问号结尾
-                    if not question.endswith('?'):
-                        question += '?'
-                    
-                    return question
+                return self._parse_short_answer(api_response.content)
                 
         except Exception as e:
-            self.logger.debug(f"LLM生成问题失败: {e}")
+            self.logger.debug(f"LLM生成短答案失败: {e}")
         
         return None
     
-    def _llm_generate_true_short_answer(self, question: str, report: str, fact_context: str) -> Optional[str]:
-        """🔑 关键修复：LLM基于完整report和问题生成真正的短答案"""
+    def _build_short_answer_prompt(self, question: str, report: str) -> str:
+        """构建基于完整report的短答案prompt"""
         
         prompt = f"""You are answering a BrowseComp-style deep query question based on the provided research report.
 
@@ -732,24 +925,21 @@ Answer: [Your precise short answer]
 
 Generate the answer now:"""
         
-        try:
-            api_response = self.llm_manager.generate_text(prompt)
+        return prompt
+    
+    def _parse_short_answer(self, content: str) -> Optional[str]:
+        """从LLM响应中提取短答案"""
+        if not content:
+            return None
+        
+        answer_match = re.search(r'Answer:\s*(.+?)(?:\n|$)', content.strip(), re.IGNORECASE)
+        if answer_match:
+            answer = answer_match.group(1).strip()
             
-            if api_response.success and api_response.content:
-                response = api_response.content.strip()
-                
-                # 提取答案
-                answer_match = re.search(r'Answer:\s*(.+?)(?:\n|$)', response, re.IGNORECASE)
-                if answer_match:
-                    answer = answer_match.group(1).strip()
-                    
-                    # 清理答案格式
-                    answer = answer.strip('"\'')
-                    
-                    return answer
-                
-        except Exception as e:
-            self.logger.debug(f"LLM生成短答案失败: {e}")
+            # 清理答案格式
+            answer = answer.strip('"\'')
+            
+            return answer
         
         return None
     
@@ -1145,6 +1335,7 @@ Generate the answer now:"""
         # 生成指纹
         return '_'.join(sorted(key_words))
     
+    @metered_stage("questions")
     def _generate_question_for_answer(self, answer: str, context: str, answer_type: str) -> Optional[Dict[str, Any]]:
         """为给定答案反向生成问题"""
         
@@ -1863,6 +2054,7 @@ Generate ONE question-answer pair now:"""
         results_file = self.experiment_dir / "complete_experiment_results.json"
         with open(results_file, 'w', encoding='utf-8') as f:
             json.dump(final_result, f, ensure_ascii=False, indent=2)
+        get_meter().write_summary(results_file)
         
         # 生成总结报告
         self.generate_summary_report(final_result)
@@ -2030,6 +2222,9 @@ def main():
     print("=" * 60)
     print()
     
+    # --llm-stub / --llm-record / --llm-replay 用于离线运行
+    configure_offline_from_argv(sys.argv[1:])
+    
     # 选择运行模式
     print("请选择运行模式:")
     print("1. test  - 测试模式 (3个文档)")
@@ -11,12 +11,18 @@ GPT-4o Question-Answer Quality Evaluator
 版本: v1.0
 """
 
-import json
+import os
+import sys
 import logging
 import time
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from core.llm_clients.metering import metered_stage
+from core.llm_clients.structured_output import parse_json_response
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -92,6 +98,7 @@ class GPT4oQAQualityEvaluator:
 - 考虑BrowseComp方法论的"倒置问题"特征
 """
 
+    @metered_stage("qa_evaluation", override=True)
     def evaluate_qa_pairs(self, report: str, qa_pairs: List[Dict[str, Any]], 
                          sample_size: int = 10) -> Dict[str, Any]:
         """评判问答对质量"""
@@ -119,7 +126,7 @@ class GPT4oQAQualityEvaluator:
         
         try:
             start_time = time.time()
-            api_response = self.llm_manager.generate_text(prompt)
+            api_response = self.llm_manager.generate_text(prompt, response_schema="qa_evaluation")
             evaluation_time = time.time() - start_time
             
             if not api_response.success:
@@ -128,7 +135,7 @@ class GPT4oQAQualityEvaluator:
             response = api_response.content
             
             # 解析评判结果
-            evaluation_data = self._parse_evaluation_response(response)
+            evaluation_data = self._parse_evaluation_response(response, api_response.structured)
             
             # 添加元数据
             evaluation_data['meta'] = {
@@ -146,23 +153,16 @@ class GPT4oQAQualityEvaluator:
             logger.error(f"❌ GPT-4o质量评判失败: {e}")
             return self._create_fallback_evaluation(sample_pairs)
     
-    def _parse_evaluation_response(self, response: str) -> Dict[str, Any]:
+    def _parse_evaluation_response(self, response: str, structured: bool = False) -> Dict[str, Any]:
         """解析GPT-4o的评判响应"""
         try:
-            # 提取JSON部分
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            else:
-                json_str = response.strip()
-            
-            # 清理格式问题
-            json_str = json_str.replace('\n', ' ').replace('\r', '')
-            json_str = json_str.replace(',}', '}').replace(',]', ']')
-            
-            evaluation_data = json.loads(json_str)
+            # 结构化输出直接解析；自由文本时去掉代码块并清理格式问题
+            evaluation_data = parse_json_response(response, "qa_evaluation", repair=self._clean_json_text,
+                                                  structured=structured)
             
             # 验证数据结构
-            if 'evaluations' not in evaluation_data or 'overall_assessment' not in evaluation_data:
+            if not isinstance(evaluation_data, dict) or \
+                    'evaluations' not in evaluation_data or 'overall_assessment' not in evaluation_data:
                 raise ValueError("评判响应格式不正确")
             
             return evaluation_data
@@ -171,6 +171,12 @@ class GPT4oQAQualityEvaluator:
             logger.warning(f"解析GPT-4o评判响应失败: {e}")
             return self._extract_evaluation_fallback(response)
     
+    @staticmethod
+    def _clean_json_text(json_str: str) -> str:
+        """清理格式问题（换行、多余的尾逗号）"""
+        json_str = json_str.replace('\n', ' ').replace('\r', '')
+        return json_str.replace(',}', '}').replace(',]', ']')
+    
     def _extract_evaluation_fallback(self, response: str) -> Dict[str, Any]:
         """备用评判结果提取"""
         # 简单的文本分析备用方案
@@ -293,7 +299,7 @@ def test_gpt4o_evaluator():
     """测试GPT-4o评判器"""
     # 模拟LLM管理器
     class MockLLMManager:
-        def generate_text(self, prompt):
+        def generate_text(self, prompt, **kwargs):
             class MockResponse:
                 success = True
                 content = '''```json
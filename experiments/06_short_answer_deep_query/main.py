@@ -30,6 +30,7 @@ from typing import Dict, Any, Optional
 
 # 导入核心组件
 from final_optimized_experiment import FinalOptimizedExperiment
+from core.llm_clients.replay_transport import configure_offline_from_argv
 
 class UnifiedExperimentRunner:
     """统一实验运行器 - Answer-to-Query Enhanced"""
@@ -590,6 +591,8 @@ class UnifiedExperimentRunner:
 
 def main():
     """主函数"""
+    # --llm-stub / --llm-record / --llm-replay 用于离线运行
+    configure_offline_from_argv(sys.argv[1:])
     runner = UnifiedExperimentRunner()
     runner.run()
 
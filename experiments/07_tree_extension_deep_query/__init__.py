@@ -12,10 +12,14 @@ sys.path.append(str(current_dir))
 
 from core_framework import AgentDepthReasoningFramework
 from main import AgentReasoningMainFramework
-from excel_exporter import DefaultExcelExporter
+from excel_exporter import FixedCleanExcelExporter
+
+# 旧名称保留为别名
+DefaultExcelExporter = FixedCleanExcelExporter
 
 __all__ = [
     'AgentDepthReasoningFramework',
     'AgentReasoningMainFramework', 
+    'FixedCleanExcelExporter',
     'DefaultExcelExporter'
 ] 
\ No newline at end of file
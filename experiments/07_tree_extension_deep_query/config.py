@@ -45,6 +45,8 @@ class TreeExtensionConfig:
         self.max_search_calls_per_extension = 1  # Limit API calls
         self.search_timeout = 30  # Seconds
         self.enable_search_verification = True  # Enabled: Fixing Deep Research API calls
+        # 搜索后端: openai（远程Web搜索）/ local（本地BM25索引）/ local_first（本地预筛选，不足时再远程搜索）
+        self.search_backend = os.getenv('EXP07_SEARCH_BACKEND', 'openai')
         
         # Verification thresholds (优化后的合理阈值)
         self.validity_threshold = 0.65  # Minimum validity score
@@ -89,7 +91,10 @@ class TreeExtensionConfig:
         
         # Performance settings
         self.batch_size = 10  # Documents processed in batch
-        self.parallel_processing = False  # Keep false for API rate limits
+        self.parallel_processing = True  # 文档并发处理，API额度由共享限流器控制
+        self.max_concurrent_documents = 4  # 同时处理的文档数（parallel_processing=False时为1）
+        # 关键词提取与必要性测试合并为一次结构化调用（A/B对比见 tools/benchmarks/keyword_fusion_ab.py）
+        self.fused_keyword_mode = os.getenv('EXP07_FUSED_KEYWORDS', '').lower() in ('1', 'true', 'yes')
         self.progress_save_interval = 5  # Save progress every N questions (防止长时间运行时的数据丢失)
         
         # Debug settings
@@ -171,6 +176,12 @@ class TreeExtensionConfig:
             if self.parallel_branches < 1 or self.parallel_branches > 5:
                 raise ValueError("Parallel branches must be between 1 and 5")
             
+            if self.max_concurrent_documents < 1:
+                raise ValueError("Max concurrent documents must be >= 1")
+            
+            if self.search_backend not in ('openai', 'local', 'local_first'):
+                raise ValueError("Search backend must be one of: openai, local, local_first")
+            
             return True
             
         except Exception as e:
@@ -22,6 +22,10 @@ import logging
 import json
 import time
 import re
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import List, Dict, Optional, Any, Tuple, Set
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -30,6 +34,9 @@ import uuid
 # 导入循环问题处理器和并行验证器
 from utils.circular_problem_handler import CircularProblemHandler
 from utils.parallel_keyword_validator import create_parallel_validator
+from utils.web_search import search_many
+from core.llm_clients.metering import metered_stage
+from core.llm_clients.structured_output import RESPONSE_SCHEMAS, parse_json_response
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -143,6 +150,53 @@ class AgentReasoningTree:
             'trajectory_records': self.trajectory_records
         }
 
+@dataclass
+class ExtensionTask:
+    """一次扩展节点展开（Series或Parallel）"""
+    parent_query: PreciseQuery
+    keyword: Optional[MinimalKeyword]  # None表示在展开时从父问题中提取第一个最小关键词
+    layer: int
+    tree_id: str
+    query_id: str
+    extension_type: str  # series, parallel
+    root_answer: Optional[str] = None  # 根答案暴露验证使用
+    parallel_index: int = 0
+
+def _new_framework_stats() -> Dict[str, int]:
+    """框架统计计数器的初始值"""
+    return {
+        'documents_processed': 0,
+        'short_answers_extracted': 0,
+        'root_queries_generated': 0,
+        'minimal_keywords_found': 0,
+        'series_extensions_created': 0,
+        'parallel_extensions_created': 0,
+        'final_composite_queries': 0,
+        'total_reasoning_trees': 0
+    }
+
+class ReasoningRunState:
+    """
+    单次处理的可变状态：轨迹记录、统计、循环问题处理器
+    每个文档使用独立实例，同一个框架实例因此可以被多个线程同时用来处理不同文档
+    """
+    
+    def __init__(self):
+        self.trajectory_records: List[Dict] = []
+        self.stats: Dict[str, int] = _new_framework_stats()
+        self.circular_handler = CircularProblemHandler()
+    
+    def merge_from(self, other: 'ReasoningRunState'):
+        """把另一个状态的轨迹和计数合并进来（轨迹step_id顺延编号）"""
+        for record in other.trajectory_records:
+            if 'step_id' in record:
+                record['step_id'] = len(self.trajectory_records) + 1
+            self.trajectory_records.append(record)
+        for key, value in other.stats.items():
+            self.stats[key] = self.stats.get(key, 0) + value
+        for key, value in other.circular_handler.stats.items():
+            self.circular_handler.stats[key] = self.circular_handler.stats.get(key, 0) + value
+
 class AgentDepthReasoningFramework:
     """Agent深度推理测试框架主类"""
     
@@ -151,25 +205,55 @@ class AgentDepthReasoningFramework:
         self.search_client = search_client
         self.max_short_answers = 3
         self.max_tree_layers = 3
-        self.trajectory_records = []
+        self.max_concurrent_trees = 3  # 同一文档内并发构建的推理树数（1为顺序构建）
+        self.max_concurrent_expansions = 4  # 同一层内并发展开的扩展节点数（1为顺序展开）
+        # 融合模式：候选关键词与逐个关键词的掩码测试在一次结构化调用中完成（失败时回退到多次调用）
+        self.fused_keyword_mode = False
         
-        # 初始化循环问题处理器
-        self.circular_handler = CircularProblemHandler()
+        # 轨迹、统计和循环问题处理器按文档隔离（见ReasoningRunState），
+        # 不在process_document_for_agent_reasoning中直接调用单步方法时使用默认状态
+        self._run_local = threading.local()
+        self._default_run_state = ReasoningRunState()
         
         # 初始化并行关键词验证器
         self.parallel_validator = create_parallel_validator(api_client, max_workers=3) if api_client else None
         
-        # 统计信息
-        self.stats = {
-            'documents_processed': 0,
-            'short_answers_extracted': 0,
-            'root_queries_generated': 0,
-            'minimal_keywords_found': 0,
-            'series_extensions_created': 0,
-            'parallel_extensions_created': 0,
-            'final_composite_queries': 0,
-            'total_reasoning_trees': 0
-        }
+        # 累计统计信息（所有已处理文档）
+        self.total_stats = _new_framework_stats()
+        self._total_stats_lock = threading.Lock()
+    
+    @property
+    def trajectory_records(self) -> List[Dict]:
+        """当前文档的轨迹记录"""
+        return self._current_run_state().trajectory_records
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """当前文档的统计信息"""
+        return self._current_run_state().stats
+    
+    @property
+    def circular_handler(self) -> CircularProblemHandler:
+        """当前文档的循环问题处理器"""
+        return self._current_run_state().circular_handler
+    
+    def _current_run_state(self) -> ReasoningRunState:
+        return getattr(self._run_local, 'state', None) or self._default_run_state
+    
+    @contextmanager
+    def _use_run_state(self, state: ReasoningRunState):
+        """在当前线程中把state设为活动状态"""
+        previous = getattr(self._run_local, 'state', None)
+        self._run_local.state = state
+        try:
+            yield state
+        finally:
+            self._run_local.state = previous
+    
+    def get_statistics(self) -> Dict[str, int]:
+        """所有已处理文档的累计统计"""
+        with self._total_stats_lock:
+            return self.total_stats.copy()
     
     def set_api_client(self, api_client):
         """设置API客户端"""
@@ -181,15 +265,26 @@ class AgentDepthReasoningFramework:
     
     def process_document_for_agent_reasoning(self, document_content: str, document_id: str) -> Dict[str, Any]:
         """
-        处理文档，生成Agent推理测试数据
+        处理文档，生成Agent推理测试数据（线程安全，可并发处理多个文档）
         
         Args:
             document_content: 文档内容
             document_id: 文档ID
             
         Returns:
-            完整的Agent推理测试结果
+            完整的Agent推理测试结果（轨迹记录和统计只包含本文档）
         """
+        state = ReasoningRunState()
+        with self._use_run_state(state):
+            result = self._process_document(document_content, document_id)
+        
+        with self._total_stats_lock:
+            for key, value in state.stats.items():
+                self.total_stats[key] = self.total_stats.get(key, 0) + value
+        return result
+    
+    def _process_document(self, document_content: str, document_id: str) -> Dict[str, Any]:
+        """在当前文档状态中执行6步流程"""
         logger.info(f"🎯 开始为Agent生成深度推理测试题: {document_id}")
         start_time = time.time()
         
@@ -203,34 +298,13 @@ class AgentDepthReasoningFramework:
             if not root_queries:
                 return self._create_error_result(document_id, "Step 1 failed: No root queries generated")
             
-            # 为每个Root Query构建推理树
-            reasoning_trees = []
-            for i, root_query in enumerate(root_queries):
-                logger.info(f"🌳 构建推理树 {i+1}/{len(root_queries)}")
-                
-                # Step 2: 提取Root Query的最小关键词
-                logger.info("📍 Step 2: 提取Root Query最小关键词")
-                minimal_keywords = self._step2_extract_minimal_keywords(root_query)
-                
-                if not minimal_keywords:
-                    logger.warning(f"跳过Root Query {root_query.query_id}: 无法提取最小关键词")
-                    continue
-                
-                # 根据关键词数量决定树结构
-                if len(minimal_keywords) == 1:
-                    logger.info("🔗 单关键词模式: 构建2层Series树")
-                    tree = self._build_single_keyword_tree(root_query, minimal_keywords[0])
-                else:
-                    logger.info(f"🌐 多关键词模式: 构建3层Series+Parallel树 ({len(minimal_keywords)}个关键词)")
-                    tree = self._build_multi_keyword_tree(root_query, minimal_keywords)
-                
-                if tree:
-                    # Step 6: 生成最终综合问题
-                    logger.info("📍 Step 6: 生成最终综合问题")
-                    composite_queries = self._step6_generate_composite_query(tree)
-                    tree.final_composite_query = composite_queries  # 现在是字典格式
-                    reasoning_trees.append(tree.to_dict())  # 转换为字典存储
-                    self.stats['total_reasoning_trees'] += 1
+            # 为每个Root Query构建推理树（各树互不依赖，并发构建，轨迹和统计按Root Query顺序合并）
+            tree_jobs = list(enumerate(root_queries))
+            built_trees = self._run_in_child_states(
+                lambda job: self._build_reasoning_tree_for_root_query(job[1], job[0], len(root_queries)),
+                tree_jobs, self.max_concurrent_trees
+            )
+            reasoning_trees = [tree for tree in built_trees if tree]
             
             # 计算处理时间
             processing_time = time.time() - start_time
@@ -252,6 +326,81 @@ class AgentDepthReasoningFramework:
             logger.error(f"处理文档失败 {document_id}: {e}")
             return self._create_error_result(document_id, str(e))
     
+    def _build_reasoning_tree_for_root_query(
+        self, root_query: PreciseQuery, index: int, total: int
+    ) -> Optional[Dict[str, Any]]:
+        """为单个Root Query执行Step 2-6，返回推理树字典（无法提取关键词时返回None）"""
+        logger.info(f"🌳 构建推理树 {index+1}/{total}")
+        
+        # Step 2: 提取Root Query的最小关键词
+        logger.info("📍 Step 2: 提取Root Query最小关键词")
+        minimal_keywords = self._step2_extract_minimal_keywords(root_query)
+        
+        if not minimal_keywords:
+            logger.warning(f"跳过Root Query {root_query.query_id}: 无法提取最小关键词")
+            return None
+        
+        # 根据关键词数量决定树结构
+        if len(minimal_keywords) == 1:
+            logger.info("🔗 单关键词模式: 构建2层Series树")
+            tree = self._build_single_keyword_tree(root_query, minimal_keywords[0])
+        else:
+            logger.info(f"🌐 多关键词模式: 构建3层Series+Parallel树 ({len(minimal_keywords)}个关键词)")
+            tree = self._build_multi_keyword_tree(root_query, minimal_keywords)
+        
+        if not tree:
+            return None
+        
+        # Step 6: 生成最终综合问题
+        logger.info("📍 Step 6: 生成最终综合问题")
+        composite_queries = self._step6_generate_composite_query(tree)
+        tree.final_composite_query = composite_queries  # 现在是字典格式
+        self.stats['total_reasoning_trees'] += 1
+        return tree.to_dict()  # 转换为字典存储
+    
+    def _run_in_child_states(self, func, items: List[Any], max_workers: int) -> List[Any]:
+        """
+        并发执行func(item)，每个任务使用独立的ReasoningRunState
+        
+        任务结束后按items顺序把各自的轨迹和统计合并回当前状态，返回值顺序与items一致；
+        任一任务抛出异常时，在合并完所有状态后重新抛出第一个异常
+        """
+        parent_state = self._current_run_state()
+        child_states = [ReasoningRunState() for _ in items]
+        
+        def _run(index: int):
+            with self._use_run_state(child_states[index]):
+                return func(items[index])
+        
+        if len(items) <= 1 or max_workers <= 1:
+            outcomes = []
+            for index in range(len(items)):
+                try:
+                    outcomes.append((_run(index), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(items)),
+                                    thread_name_prefix="exp07-tree") as executor:
+                # 复制上下文，使计量阶段等contextvars在工作线程中可见
+                futures = [executor.submit(contextvars.copy_context().run, _run, index)
+                           for index in range(len(items))]
+                outcomes = []
+                for future in futures:
+                    try:
+                        outcomes.append((future.result(), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+        
+        for child_state in child_states:
+            parent_state.merge_from(child_state)
+        
+        for _, error in outcomes:
+            if error is not None:
+                raise error
+        return [result for result, _ in outcomes]
+    
+    @metered_stage("short_answer_extraction", override=True)
     def _step1_extract_short_answers_and_build_root_queries(
         self, document_content: str, document_id: str
     ) -> List[PreciseQuery]:
@@ -347,6 +496,7 @@ class AgentDepthReasoningFramework:
             logger.error(f"Step 1执行失败: {e}")
             return []
     
+    @metered_stage("keyword_extraction", override=True)
     def _step2_extract_minimal_keywords(self, root_query: PreciseQuery) -> List[MinimalKeyword]:
         """
         Step 2: 提取Root Query的最小关键词
@@ -362,15 +512,23 @@ class AgentDepthReasoningFramework:
         try:
             logger.info(f"分析Root Query的最小关键词: {root_query.query_text}")
             
-            # 2.1 初步提取关键词
-            candidate_keywords = self._extract_candidate_keywords(
-                root_query.query_text, root_query.answer
-            )
+            minimal_keywords = None
+            if self.fused_keyword_mode:
+                # 2.1 + 2.2 融合：一次调用返回候选关键词及其掩码测试结论
+                minimal_keywords = self._extract_minimal_keywords_fused(
+                    root_query.query_text, root_query.answer
+                )
             
-            # 2.2 验证关键词必要性（移除测试）
-            minimal_keywords = self._validate_keyword_necessity(
-                root_query.query_text, root_query.answer, candidate_keywords
-            )
+            if minimal_keywords is None:
+                # 2.1 初步提取关键词
+                candidate_keywords = self._extract_candidate_keywords(
+                    root_query.query_text, root_query.answer
+                )
+                
+                # 2.2 验证关键词必要性（移除测试）
+                minimal_keywords = self._validate_keyword_necessity(
+                    root_query.query_text, root_query.answer, candidate_keywords
+                )
             
             # 2.3 关键词唯一性评分
             for keyword in minimal_keywords:
@@ -510,12 +668,23 @@ class AgentDepthReasoningFramework:
             
             # Step 3: 针对每个关键词创建Series扩展
             # Step 4: 针对所有关键词创建Parallel扩展
-            first_layer_nodes = []
+            # 同一层的节点互不依赖，按层展开：层内并发，层与层之间串行
+            first_layer_tasks = [ExtensionTask(
+                parent_query=root_query, keyword=keywords[0], layer=1, tree_id=tree_id,
+                query_id=f"{tree_id}_series_1", extension_type="series",
+                root_answer=self._extract_root_answer_from_tree_id(tree_id)
+            )]
+            # Parallel扩展（所有关键词）
+            first_layer_tasks.extend(ExtensionTask(
+                parent_query=root_query, keyword=keyword, layer=1, tree_id=tree_id,
+                query_id=f"{tree_id}_parallel_1_{i}", extension_type="parallel",
+                root_answer=root_query.answer, parallel_index=i
+            ) for i, keyword in enumerate(keywords))
             
-            # Series扩展（选择第一个关键词）
-            series1_query = self._step3_create_series_extension(
-                root_query, keywords[0], layer=1, tree_id=tree_id
-            )
+            first_layer_queries = self._expand_extension_layer(first_layer_tasks)
+            
+            first_layer_nodes = []
+            series1_query = first_layer_queries[0]
             if series1_query:
                 series1_node = QuestionTreeNode(
                     node_id=f"{tree_id}_series1",
@@ -529,10 +698,8 @@ class AgentDepthReasoningFramework:
                 first_layer_nodes.append(series1_node)
                 self.stats['series_extensions_created'] += 1
             
-            # Parallel扩展（所有关键词）
-            parallel_queries = self._step4_create_parallel_extensions(
-                root_query, keywords, layer=1, tree_id=tree_id
-            )
+            parallel_queries = [query for query in first_layer_queries[1:] if query]
+            logger.info(f"✅ 完成Parallel扩展: {len(parallel_queries)}/{len(keywords)} 个问题")
             for i, parallel_query in enumerate(parallel_queries):
                 parallel_node = QuestionTreeNode(
                     node_id=f"{tree_id}_parallel1_{i}",
@@ -546,9 +713,8 @@ class AgentDepthReasoningFramework:
                 first_layer_nodes.append(parallel_node)
                 self.stats['parallel_extensions_created'] += 1
             
-            # Step 5: 重复过程构建第二层
-            for node in first_layer_nodes:
-                self._build_second_layer_extensions(tree, node)
+            # Step 5: 重复过程构建第二层（第一层全部完成后再整层展开）
+            self._build_second_layer(tree, first_layer_nodes)
             
             logger.info(f"✅ 多关键词推理树构建完成: {len(tree.all_nodes)} 个节点")
             return tree
@@ -557,6 +723,7 @@ class AgentDepthReasoningFramework:
             logger.error(f"多关键词树构建失败: {e}")
             return None
     
+    @metered_stage("extension", override=True)
     def _step3_create_series_extension(
         self, parent_query: PreciseQuery, keyword: MinimalKeyword, 
         layer: int, tree_id: str
@@ -569,172 +736,162 @@ class AgentDepthReasoningFramework:
         - 使用Web搜索+LLM分析
         - 新问题不能与Root问题有任何关联
         """
+        task = ExtensionTask(
+            parent_query=parent_query, keyword=keyword, layer=layer, tree_id=tree_id,
+            query_id=f"{tree_id}_series_{layer}", extension_type="series",
+            root_answer=self._extract_root_answer_from_tree_id(tree_id)
+        )
+        return self._expand_extension_layer([task])[0]
+    
+    @metered_stage("extension", override=True)
+    def _step4_create_parallel_extensions(
+        self, root_query: PreciseQuery, keywords: List[MinimalKeyword], 
+        layer: int, tree_id: str
+    ) -> List[PreciseQuery]:
+        """
+        Step 4: 创建Parallel横向扩展
+        
+        要求：
+        - 针对所有关键词分别生成问题
+        - 每个问题都不能与Root问题关联
+        - 生成n个不同的最精确问题
+        """
+        logger.info(f"创建Parallel扩展 (Layer {layer}): {len(keywords)} 个关键词")
+        
+        tasks = [ExtensionTask(
+            parent_query=root_query, keyword=keyword, layer=layer, tree_id=tree_id,
+            query_id=f"{tree_id}_parallel_{layer}_{i}", extension_type="parallel",
+            root_answer=root_query.answer, parallel_index=i
+        ) for i, keyword in enumerate(keywords)]
+        parallel_queries = [query for query in self._expand_extension_layer(tasks) if query]
+        
+        logger.info(f"✅ 完成Parallel扩展: {len(parallel_queries)}/{len(keywords)} 个问题")
+        return parallel_queries
+    
+    @metered_stage("extension", override=True)
+    def _expand_extension_layer(self, tasks: List[ExtensionTask]) -> List[Optional[PreciseQuery]]:
+        """
+        展开同一层的所有扩展节点
+        
+        1. 并发为每个节点做Web搜索并生成无关联问题
+        2. 整层生成完成后，再并发执行无关联验证和根答案暴露验证
+        轨迹按tasks顺序合并；返回值与tasks一一对应，未通过验证的为None
+        """
+        if not tasks:
+            return []
+        
+        candidates = self._run_in_child_states(
+            self._generate_extension_candidate, tasks, self.max_concurrent_expansions
+        )
+        validations = self._run_in_child_states(
+            lambda pair: self._validate_extension_candidate(*pair),
+            list(zip(tasks, candidates)), self.max_concurrent_expansions
+        )
+        return [candidate if passed else None for candidate, passed in zip(candidates, validations)]
+    
+    def _generate_extension_candidate(self, task: ExtensionTask) -> Optional[PreciseQuery]:
+        """为单个扩展节点生成候选问题（Web搜索 + 无关联问题生成）"""
         try:
-            logger.info(f"创建Series扩展 (Layer {layer}): 关键词 '{keyword.keyword}'")
+            if task.keyword is None:
+                # 提取父节点的关键词，为第一个关键词创建扩展
+                parent_keywords = self._step2_extract_minimal_keywords(task.parent_query)
+                if not parent_keywords:
+                    logger.warning(f"无法为问题 {task.parent_query.query_id} 提取关键词")
+                    return None
+                task.keyword = parent_keywords[0]
+            
+            if task.extension_type == "series":
+                logger.info(f"创建Series扩展 (Layer {task.layer}): 关键词 '{task.keyword.keyword}'")
             
             # 使用智能Web搜索获取关键词相关信息 (集成循环检测)
             search_context = self._smart_web_search_for_keyword(
-                keyword.keyword, parent_query.query_text, parent_query.answer
+                task.keyword.keyword, task.parent_query.query_text, task.parent_query.answer
             )
             
             # 生成无关联的新问题
-            extension_query = self._generate_unrelated_query(
-                keyword, search_context, layer, f"{tree_id}_series_{layer}"
+            return self._generate_unrelated_query(
+                task.keyword, search_context, task.layer, task.query_id
             )
             
-            if extension_query:
-                # 验证无关联性 - 使用增强的严格验证
-                validation_passed = False
-                try:
-                    # 优先使用新的严格无关联验证
-                    parent_questions = [parent_query.query_text]
-                    if self._validate_strict_no_correlation(parent_questions, extension_query.query_text, layer):
-                        logger.info(f"✅ Series扩展成功 (严格验证通过): {extension_query.query_text}")
-                        validation_passed = True
-                    else:
-                        logger.warning("Series扩展失败: 严格验证未通过 - 存在关联")
-                except Exception as e:
-                    logger.warning(f"严格验证失败，回退到原有验证: {e}")
-                    # 回退到原有验证方法
-                    if self._validate_no_correlation(parent_query.query_text, extension_query.query_text):
-                        logger.info(f"✅ Series扩展成功 (原有验证通过): {extension_query.query_text}")
-                        validation_passed = True
-                    else:
-                        logger.warning("Series扩展失败: 与父问题存在关联")
-                
-                # 额外验证：检查是否会暴露根答案
-                root_answer = self._extract_root_answer_from_tree_id(tree_id)
-                if root_answer and validation_passed:
-                    exposure_safe = self._validate_no_root_answer_exposure(
-                        extension_query.query_text, root_answer, layer
-                    )
-                    if not exposure_safe:
-                        logger.warning(f"Series扩展问题可能暴露根答案，需要重新设计: {extension_query.query_text}")
-                        validation_passed = False
-                
-                # 记录Series扩展轨迹
-                try:
-                    self._record_detailed_trajectory_enhanced(
-                        step=f"step3_series_extension_layer_{layer}",
-                        layer_level=layer,
-                        current_keywords=[keyword.keyword],
-                        keyword_count=1,
-                        parent_question=parent_query.query_text,
-                        parent_answer=parent_query.answer,
-                        parent_keywords=[kw.keyword for kw in parent_query.minimal_keywords],
-                        current_question=extension_query.query_text,
-                        current_answer=extension_query.answer,
-                        generation_method=extension_query.generation_method,
-                        validation_results={'validation_passed': validation_passed},
-                        no_correlation_verified=validation_passed,
-                        tree_id=tree_id,
-                        query_id=extension_query.query_id,
-                        extension_type="series"
-                    )
-                except Exception as e:
-                    logger.error(f"记录Series扩展轨迹失败: {e}")
-                
-                if validation_passed:
-                    return extension_query
-                else:
-                    return None
-            
-            return None
-            
         except Exception as e:
-            logger.error(f"Step 3执行失败: {e}")
+            logger.error(f"{task.extension_type}扩展生成失败 (Layer {task.layer}): {e}")
             return None
     
-    def _step4_create_parallel_extensions(
-        self, root_query: PreciseQuery, keywords: List[MinimalKeyword], 
-        layer: int, tree_id: str
-    ) -> List[PreciseQuery]:
-        """
-        Step 4: 创建Parallel横向扩展
+    def _validate_extension_candidate(self, task: ExtensionTask, extension_query: Optional[PreciseQuery]) -> bool:
+        """验证候选问题与父问题无关联、不暴露根答案，并记录扩展轨迹"""
+        if not extension_query:
+            return False
+        
+        if task.extension_type == "series":
+            label = "Series扩展"
+        else:
+            label = f"Parallel扩展 {task.parallel_index+1}"
         
-        要求：
-        - 针对所有关键词分别生成问题
-        - 每个问题都不能与Root问题关联
-        - 生成n个不同的最精确问题
-        """
         try:
-            logger.info(f"创建Parallel扩展 (Layer {layer}): {len(keywords)} 个关键词")
+            # 验证无关联性 - 使用增强的严格验证
+            validation_passed = False
+            try:
+                # 优先使用新的严格无关联验证
+                parent_questions = [task.parent_query.query_text]
+                if self._validate_strict_no_correlation(parent_questions, extension_query.query_text, task.layer):
+                    logger.info(f"✅ {label} (严格验证通过): {extension_query.query_text}")
+                    validation_passed = True
+                else:
+                    logger.warning(f"{label} 失败: 严格验证未通过 - 存在关联")
+            except Exception as e:
+                logger.warning(f"{label} 严格验证失败，回退到原有验证: {e}")
+                # 回退到原有验证方法
+                if self._validate_no_correlation(task.parent_query.query_text, extension_query.query_text):
+                    logger.info(f"✅ {label} (原有验证通过): {extension_query.query_text}")
+                    validation_passed = True
+                else:
+                    logger.warning(f"{label} 失败: 与父问题存在关联")
             
-            parallel_queries = []
-            for i, keyword in enumerate(keywords):
-                # 为每个关键词生成独立问题 (集成循环检测)
-                search_context = self._smart_web_search_for_keyword(
-                    keyword.keyword, root_query.query_text, root_query.answer
+            # 额外验证：检查是否会暴露根答案
+            if task.root_answer and validation_passed:
+                exposure_safe = self._validate_no_root_answer_exposure(
+                    extension_query.query_text, task.root_answer, task.layer
                 )
-                
-                extension_query = self._generate_unrelated_query(
-                    keyword, search_context, layer, f"{tree_id}_parallel_{layer}_{i}"
-                )
-                
-                if extension_query:
-                    # 验证与Root问题无关联 - 使用增强的严格验证
+                if not exposure_safe:
+                    logger.warning(f"{label}问题可能暴露根答案，需要重新设计: {extension_query.query_text}")
                     validation_passed = False
-                    try:
-                        # 优先使用新的严格无关联验证
-                        parent_questions = [root_query.query_text]
-                        if self._validate_strict_no_correlation(parent_questions, extension_query.query_text, layer):
-                            parallel_queries.append(extension_query)
-                            logger.info(f"✅ Parallel扩展 {i+1} (严格验证通过): {extension_query.query_text}")
-                            validation_passed = True
-                        else:
-                            logger.warning(f"Parallel扩展 {i+1} 失败: 严格验证未通过 - 存在关联")
-                    except Exception as e:
-                        logger.warning(f"Parallel扩展 {i+1} 严格验证失败，回退到原有验证: {e}")
-                        # 回退到原有验证方法
-                        if self._validate_no_correlation(root_query.query_text, extension_query.query_text):
-                            parallel_queries.append(extension_query)
-                            logger.info(f"✅ Parallel扩展 {i+1} (原有验证通过): {extension_query.query_text}")
-                            validation_passed = True
-                        else:
-                            logger.warning(f"Parallel扩展 {i+1} 失败: 与Root问题存在关联")
-                    
-                    # 额外验证：检查是否会暴露根答案
-                    if validation_passed:
-                        exposure_safe = self._validate_no_root_answer_exposure(
-                            extension_query.query_text, root_query.answer, layer
-                        )
-                        if not exposure_safe:
-                            logger.warning(f"Parallel扩展问题可能暴露根答案，需要重新设计: {extension_query.query_text}")
-                            validation_passed = False
-                            # 从已添加的列表中移除这个问题
-                            if extension_query in parallel_queries:
-                                parallel_queries.remove(extension_query)
-                    
-                    # 记录Parallel扩展轨迹
-                    try:
-                        self._record_detailed_trajectory_enhanced(
-                            step=f"step4_parallel_extension_layer_{layer}_{i}",
-                            layer_level=layer,
-                            current_keywords=[keyword.keyword],
-                            keyword_count=1,
-                            parent_question=root_query.query_text,
-                            parent_answer=root_query.answer,
-                            parent_keywords=[kw.keyword for kw in root_query.minimal_keywords],
-                            current_question=extension_query.query_text,
-                            current_answer=extension_query.answer,
-                            generation_method=extension_query.generation_method,
-                            validation_results={'validation_passed': validation_passed},
-                            no_correlation_verified=validation_passed,
-                            tree_id=tree_id,
-                            query_id=extension_query.query_id,
-                            extension_type="parallel",
-                            parallel_index=i
-                        )
-                    except Exception as e:
-                        logger.error(f"记录Parallel扩展轨迹失败: {e}")
             
-            logger.info(f"✅ 完成Parallel扩展: {len(parallel_queries)}/{len(keywords)} 个问题")
-            return parallel_queries
+            # 记录扩展轨迹
+            try:
+                if task.extension_type == "series":
+                    step = f"step3_series_extension_layer_{task.layer}"
+                    extra = {}
+                else:
+                    step = f"step4_parallel_extension_layer_{task.layer}_{task.parallel_index}"
+                    extra = {'parallel_index': task.parallel_index}
+                self._record_detailed_trajectory_enhanced(
+                    step=step,
+                    layer_level=task.layer,
+                    current_keywords=[task.keyword.keyword],
+                    keyword_count=1,
+                    parent_question=task.parent_query.query_text,
+                    parent_answer=task.parent_query.answer,
+                    parent_keywords=[kw.keyword for kw in task.parent_query.minimal_keywords],
+                    current_question=extension_query.query_text,
+                    current_answer=extension_query.answer,
+                    generation_method=extension_query.generation_method,
+                    validation_results={'validation_passed': validation_passed},
+                    no_correlation_verified=validation_passed,
+                    tree_id=task.tree_id,
+                    query_id=extension_query.query_id,
+                    extension_type=task.extension_type,
+                    **extra
+                )
+            except Exception as e:
+                logger.error(f"记录{label}轨迹失败: {e}")
+            
+            return validation_passed
             
         except Exception as e:
-            logger.error(f"Step 4执行失败: {e}")
-            return []
+            logger.error(f"{label}验证失败: {e}")
+            return False
     
+    @metered_stage("composite_query", override=True)
     def _step6_generate_composite_query(self, tree: AgentReasoningTree) -> Dict[str, str]:
         """
         Step 6: 生成最终综合问题和答案 - 三格式输出
@@ -1335,11 +1492,12 @@ class AgentDepthReasoningFramework:
             response = self.api_client.generate_response(
                 prompt=prompt,
                 temperature=0.3,
-                max_tokens=800
+                max_tokens=800,
+                response_schema="short_answers"
             )
             
             # 解析响应
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "short_answers")
             if not parsed_data or 'short_answers' not in parsed_data:
                 logger.warning("无法解析Short Answer响应，尝试从原始响应中提取")
                 # 尝试从响应中直接提取信息
@@ -1500,10 +1658,11 @@ class AgentDepthReasoningFramework:
             response = self.api_client.generate_response(
                 prompt=generation_prompt,
                 temperature=0.4,
-                max_tokens=600
+                max_tokens=600,
+                response_schema="minimal_precise_query"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "minimal_precise_query")
             if not parsed_data or 'question_text' not in parsed_data:
                 logger.warning("无法解析问题生成响应")
                 return None
@@ -1630,10 +1789,11 @@ class AgentDepthReasoningFramework:
             response = self.api_client.generate_response(
                 prompt=prompt,
                 temperature=0.3,
-                max_tokens=500
+                max_tokens=500,
+                response_schema="candidate_keywords"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "candidate_keywords")
             if not parsed_data or 'candidate_keywords' not in parsed_data:
                 return []
             
@@ -1664,6 +1824,7 @@ class AgentDepthReasoningFramework:
             logger.error(f"提取候选关键词失败: {e}")
             return []
     
+    @metered_stage("keyword_validation", override=True)
     def _validate_keyword_necessity(
         self, query_text: str, answer: str, keywords: List[MinimalKeyword]
     ) -> List[MinimalKeyword]:
@@ -1722,10 +1883,11 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
                     response = self.api_client.generate_response(
                         prompt=masking_prompt,
                         temperature=0.2,
-                        max_tokens=400
+                        max_tokens=400,
+                        response_schema="keyword_necessity"
                     )
                     
-                    parsed_data = self._parse_json_response(response)
+                    parsed_data = self._parse_json_response(response, "keyword_necessity")
                     if parsed_data:
                         is_necessary = parsed_data.get('is_necessary', True)
                         
@@ -1755,6 +1917,139 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             logger.error(f"验证关键词必要性失败: {e}")
             return keywords
     
+    def _judge_keywords_fused(
+        self, query_text: str, answer: str, keywords: Optional[List[str]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        融合模式：一次结构化调用完成关键词提取与逐个关键词的掩码测试
+        
+        Args:
+            query_text: 问题文本
+            answer: 目标答案
+            keywords: 需要判定的关键词；为None时由模型同时提取候选关键词
+            
+        Returns:
+            每个关键词一项（含keyword_type、necessity_score、determination_level等），调用或解析失败返回None
+        """
+        if keywords is None:
+            keyword_section = """**PART 1 - EXTRACTION (Following WorkFlow):**
+1. Extract **n sub-keywords** where n is the **MINIMAL number** sufficient to identify answer
+2. Keywords must be **HIGHLY SPECIFIC** (proper nouns, numbers, technical terms, dates, locations)
+3. Keywords must be **DISTINCTIVE**, **UNIQUE**, and **independently meaningful** (1-3 words)
+4. Avoid question words ("what", "which", "who", ...) and common words ("the", "a", "in", ...)
+5. Each keyword should be able to serve as a child question answer
+**TARGET: Extract 2-5 highly specific keywords that together uniquely identify the answer.**"""
+        else:
+            keyword_section = f"""**PART 1 - KEYWORDS TO JUDGE:**
+Judge exactly these keywords, in this order, without adding or removing any: {json.dumps(keywords, ensure_ascii=False)}"""
+        
+        prompt = f"""**TASK: Extract minimal keywords and perform the Minimum Keyword Check for each of them in ONE pass.**
+
+**QUERY:** {query_text}
+**ANSWER:** {answer}
+
+{keyword_section}
+
+**PART 2 - MASKING TEST FOR EVERY KEYWORD (Following WorkFlow):**
+For each keyword separately, mask it from the query (replace it with [MASKED]) while keeping all other keywords, and check whether the remaining keywords and descriptions can still uniquely identify the answer "{answer}".
+- determination_level: "still_unique" if the answer is still uniquely identified, "ambiguous" if the question becomes unclear, "multiple_answers" if other valid answers appear
+- is_necessary: false only when determination_level is "still_unique"
+- **NECESSITY LEVELS:** ESSENTIAL (1.0) masking creates multiple answers; IMPORTANT (0.8) precision drops significantly; HELPFUL (0.6) minor impact; REDUNDANT (0.3) no impact
+
+**Output Format (JSON):**
+{{
+    "candidate_keywords": [
+        {{
+            "keyword": "exact keyword text",
+            "keyword_type": "proper_noun/number/technical_term/date/location",
+            "extraction_context": "surrounding phrase or sentence",
+            "specificity_score": 0.0-1.0,
+            "is_necessary": true/false,
+            "necessity_score": 0.0-1.0,
+            "masking_impact": "essential/important/helpful/redundant",
+            "determination_level": "still_unique/ambiguous/multiple_answers",
+            "alternative_answers_without_keyword": ["list", "of", "possible", "answers"],
+            "reasoning": "why masking this keyword does/doesn't break unique identification"
+        }}
+    ],
+    "minimal_count": "minimum number needed to identify answer"
+}}"""
+        
+        try:
+            response = self.api_client.generate_response(
+                prompt=prompt,
+                temperature=0.2,
+                max_tokens=1200,
+                response_schema="fused_keywords"
+            )
+            parsed_data = self._parse_json_response(response, "fused_keywords")
+            if not parsed_data or not isinstance(parsed_data.get('candidate_keywords'), list):
+                logger.warning("融合关键词调用解析失败，回退到多次调用")
+                return None
+            return [
+                kw_data for kw_data in parsed_data['candidate_keywords']
+                if isinstance(kw_data, dict) and str(kw_data.get('keyword', '')).strip()
+            ]
+        except Exception as e:
+            logger.error(f"融合关键词调用失败: {e}")
+            return None
+    
+    def _extract_minimal_keywords_fused(self, query_text: str, answer: str) -> Optional[List[MinimalKeyword]]:
+        """融合模式的Step 2：与 _extract_candidate_keywords + _validate_keyword_necessity 使用相同的保留规则"""
+        judged = self._judge_keywords_fused(query_text, answer)
+        if judged is None:
+            return None
+        
+        minimal_keywords = []
+        for kw_data in judged:
+            try:
+                uniqueness_score = float(kw_data.get('specificity_score', 0.5))
+            except (ValueError, TypeError):
+                uniqueness_score = 0.5
+            try:
+                necessity_score = float(kw_data.get('necessity_score', 0.8))
+            except (ValueError, TypeError):
+                necessity_score = 0.8
+            
+            keyword_text = kw_data['keyword'].strip()
+            # 只保留必要的关键词（分数 > 0.5）
+            if kw_data.get('is_necessary', True) and necessity_score > 0.5:
+                minimal_keywords.append(MinimalKeyword(
+                    keyword=keyword_text,
+                    keyword_type=kw_data.get('keyword_type', 'unknown'),
+                    uniqueness_score=uniqueness_score,
+                    necessity_score=necessity_score,
+                    extraction_context=kw_data.get('extraction_context', ''),
+                    position_in_query=query_text.find(keyword_text)
+                ))
+                logger.info(f"✅ 关键词 '{keyword_text}' 是必要的 (分数: {necessity_score:.2f})")
+            else:
+                logger.info(f"❌ 关键词 '{keyword_text}' 不是必要的 (分数: {necessity_score:.2f})")
+        
+        logger.info(f"融合提取完成: {len(minimal_keywords)}/{len(judged)} 个关键词是必要的")
+        return minimal_keywords
+    
+    def _minimize_keywords_fused(self, question_text: str, answer: str, initial_keywords: List[str]) -> Optional[List[str]]:
+        """融合模式的精确关键词最小化：与 _test_answer_determination_without_keyword 相同，只有 still_unique 才可移除"""
+        judged = self._judge_keywords_fused(question_text, answer, keywords=list(initial_keywords))
+        if judged is None:
+            return None
+        
+        verdicts = {str(kw_data['keyword']).strip().lower(): kw_data for kw_data in judged}
+        essential_keywords = []
+        for keyword in initial_keywords:
+            kw_data = verdicts.get(keyword.strip().lower())
+            # 模型漏判的关键词保守地视为必要
+            if kw_data is None or kw_data.get('determination_level', 'ambiguous') != 'still_unique':
+                essential_keywords.append(keyword)
+        
+        if not essential_keywords:
+            essential_keywords = [initial_keywords[0]]
+            logger.info(f"⚠️ 保留第一个关键词作为最小必要关键词: {initial_keywords[0]}")
+        
+        logger.info(f"✅ 融合最小化完成: {len(essential_keywords)}/{len(initial_keywords)} 个关键词是必要的")
+        return essential_keywords
+    
     def _calculate_keyword_uniqueness(self, keyword: str, answer: str) -> float:
         """计算关键词唯一性分数"""
         try:
@@ -1898,6 +2193,15 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             logger.error(f"搜索接口调用失败: {e}")
             return None
     
+    def search_many(self, queries: List[str], max_results: int = 3) -> List[Optional[List[Dict[str, Any]]]]:
+        """提供给循环处理器使用的批量搜索接口：并发执行，返回值与queries一一对应，格式同search"""
+        if not self.search_client:
+            return [None] * len(queries)
+        return search_many(
+            queries, max_results=max_results,
+            search_fn=lambda query, max_results: self.search(query, max_results=max_results)
+        )
+    
     def _generate_unrelated_query(
         self, keyword: MinimalKeyword, search_context: str, 
         layer: int, query_id: str
@@ -1974,10 +2278,11 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             response = self.api_client.generate_response(
                 prompt=generation_prompt,
                 temperature=0.5,  # 更高创造性，确保多样性
-                max_tokens=600
+                max_tokens=600,
+                response_schema="unrelated_query"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "unrelated_query")
             if not parsed_data or 'question_text' not in parsed_data:
                 logger.warning("无法解析无关联问题生成响应")
                 return None
@@ -2079,10 +2384,11 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             response = self.api_client.generate_response(
                 prompt=correlation_prompt,
                 temperature=0.2,
-                max_tokens=500
+                max_tokens=500,
+                response_schema="correlation_check"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "correlation_check")
             if parsed_data:
                 has_circular_reasoning = parsed_data.get('has_circular_reasoning', False)
                 has_correlation = parsed_data.get('has_correlation', False)
@@ -2392,40 +2698,12 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             logger.error(f"计算复杂度分数失败: {e}")
             return 0.8
     
-    def _parse_json_response(self, response: str) -> Optional[Dict]:
-        """解析JSON响应"""
-        try:
-            # 尝试直接解析
-            return json.loads(response)
-        except json.JSONDecodeError:
-            try:
-                # 尝试提取JSON部分
-                json_start = response.find('{')
-                json_end = response.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_str = response[json_start:json_end]
-                    return json.loads(json_str)
-            except:
-                pass
-            
-            try:
-                # 尝试查找并修复常见的JSON格式问题
-                import re
-                # 移除可能的markdown代码块标记
-                cleaned = re.sub(r'```json\s*|\s*```', '', response)
-                cleaned = cleaned.strip()
-                
-                # 找到最外层的大括号
-                json_start = cleaned.find('{')
-                json_end = cleaned.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_str = cleaned[json_start:json_end]
-                    return json.loads(json_str)
-            except:
-                pass
-            
-            logger.warning(f"无法解析JSON响应: {response[:200]}...")
-            return None
+    def _parse_json_response(self, response: str, site: str = "core_framework") -> Optional[Dict]:
+        """解析JSON响应（site为调用点名称，与请求使用的response_schema同名，计入解析失败率统计）"""
+        structured = site in RESPONSE_SCHEMAS and self.api_client is not None and \
+            self.api_client.uses_structured_output(site)
+        parsed = parse_json_response(response, site, structured=structured)
+        return parsed if isinstance(parsed, dict) else None
     
     def _classify_keyword_type(self, keyword: str) -> str:
         """分类关键词类型"""
@@ -2522,23 +2800,23 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
     
     def _build_second_layer_extensions(self, tree: AgentReasoningTree, parent_node: QuestionTreeNode):
         """构建第二层扩展"""
+        self._build_second_layer(tree, [parent_node])
+    
+    def _build_second_layer(self, tree: AgentReasoningTree, parent_nodes: List[QuestionTreeNode]):
+        """为第一层的所有节点整层构建第二层Series扩展（提取关键词、搜索、生成并发执行）"""
         try:
-            logger.info(f"为节点 {parent_node.node_id} 构建第二层扩展")
-            
-            # 提取父节点的关键词
-            parent_keywords = self._step2_extract_minimal_keywords(parent_node.query)
-            
-            if not parent_keywords:
-                logger.warning(f"无法为节点 {parent_node.node_id} 提取关键词")
-                return
-            
-            # 为第一个关键词创建Series扩展
-            if parent_keywords:
-                series_query = self._step3_create_series_extension(
-                    parent_node.query, parent_keywords[0], layer=2, 
-                    tree_id=f"{tree.tree_id}_series2"
-                )
-                
+            logger.info(f"为 {len(parent_nodes)} 个节点构建第二层扩展")
+            
+            # 为每个父节点的第一个关键词创建Series扩展
+            tasks = [ExtensionTask(
+                parent_query=parent_node.query, keyword=None, layer=2,
+                tree_id=f"{tree.tree_id}_series2", query_id=f"{tree.tree_id}_series2_series_2",
+                extension_type="series",
+                root_answer=self._extract_root_answer_from_tree_id(f"{tree.tree_id}_series2")
+            ) for parent_node in parent_nodes]
+            series_queries = self._expand_extension_layer(tasks)
+            
+            for parent_node, series_query in zip(parent_nodes, series_queries):
                 if series_query:
                     series_node = QuestionTreeNode(
                         node_id=f"{parent_node.node_id}_series2",
@@ -2568,6 +2846,11 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
         if not self.api_client or not initial_keywords:
             return self._optimize_minimal_keywords(question_text, answer, initial_keywords)
         
+        if self.fused_keyword_mode:
+            essential_keywords = self._minimize_keywords_fused(question_text, answer, initial_keywords)
+            if essential_keywords is not None:
+                return essential_keywords
+        
         try:
             logger.info(f"开始精确关键词最小化测试: {len(initial_keywords)} 个候选关键词")
             
@@ -2654,10 +2937,11 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             response = self.api_client.generate_response(
                 prompt=test_prompt,
                 temperature=0.2,  # 低温度确保客观判断
-                max_tokens=400
+                max_tokens=400,
+                response_schema="answer_determination"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "answer_determination")
             if parsed_data:
                 can_still_determine = parsed_data.get('can_still_determine', False)
                 determination_level = parsed_data.get('determination_level', 'ambiguous')
@@ -2977,10 +3261,11 @@ For each keyword in [{', '.join(keywords)}]:
             response = self.api_client.generate_response(
                 prompt=validation_prompt,
                 temperature=0.1,  # 非常低的温度确保客观评估
-                max_tokens=600
+                max_tokens=600,
+                response_schema="minimal_precise_validation"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "minimal_precise_validation")
             if parsed_data:
                 return {
                     'is_minimal': parsed_data.get('is_minimal', False),
@@ -3059,10 +3344,11 @@ Imagine an Agent analyzing this question step by step. Would the Agent be able t
             response = self.api_client.generate_response(
                 prompt=exposure_test_prompt,
                 temperature=0.1,  # 很低温度确保客观分析
-                max_tokens=500
+                max_tokens=500,
+                response_schema="answer_exposure"
             )
             
-            parsed_data = self._parse_json_response(response)
+            parsed_data = self._parse_json_response(response, "answer_exposure")
             if parsed_data:
                 will_expose = parsed_data.get('will_expose_answer', False)
                 exposure_risk = parsed_data.get('exposure_risk', 'high')
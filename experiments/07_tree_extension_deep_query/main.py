@@ -12,8 +12,10 @@ import sys
 import os
 import time
 import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 # 添加项目路径
 project_root = Path(__file__).parent.parent.parent
@@ -22,11 +24,17 @@ sys.path.insert(0, str(project_root))
 # 导入核心组件
 from config import get_config
 from core.llm_clients.openai_api_client import OpenAIClient
+from core.llm_clients.metering import get_meter
+from core.llm_clients.key_pool import get_key_pool
+from core.llm_clients.replay_transport import configure_offline_from_argv
 from utils.document_loader import DocumentLoader
 from utils.document_screener import DocumentScreener
 from core_framework import AgentDepthReasoningFramework
 from excel_exporter import FixedCleanExcelExporter
 from utils.web_search import web_search
+from utils.search_cache import CachedSearchClient
+from utils.local_search import LocalFirstSearchClient, get_local_search_client
+from utils.result_journal import ResultJournal, STATUS_SUCCESS, STATUS_FAILED, STATUS_EXCEPTION
 
 # 设置日志
 logging.basicConfig(
@@ -45,7 +53,7 @@ class AgentReasoningMainFramework:
     def __init__(self):
         self.config = get_config()
         self.api_client = None
-        self.search_client = web_search
+        self.search_client = self._create_search_client(self.config.search_backend)
         
         # 核心组件
         self.document_loader = DocumentLoader()
@@ -66,19 +74,34 @@ class AgentReasoningMainFramework:
             'step6_success_rate': 0.0
         }
     
+    def _create_search_client(self, backend: str):
+        """按配置选择搜索后端（签名均为 (query, max_results=5, **kwargs)）"""
+        if backend == 'local':
+            logger.info("📚 搜索后端: 本地BM25索引")
+            return get_local_search_client()
+        # 远程搜索结果按规范化查询持久化缓存（跨文档、跨运行复用）
+        remote_client = CachedSearchClient(web_search)
+        if backend == 'local_first':
+            logger.info("📚 搜索后端: 本地BM25预筛选 + 远程Web搜索")
+            return LocalFirstSearchClient(remote_client)
+        return remote_client
+    
     def initialize_framework(self, api_key: str) -> bool:
         """初始化框架组件"""
         try:
             logger.info("🎯 初始化Agent深度推理测试框架...")
             
-            # 初始化API客户端
-            self.api_client = OpenAIClient(api_key=api_key)
+            # 初始化API客户端（多个key用逗号分隔，请求按剩余额度在key之间轮换）
+            api_keys = [key.strip() for key in api_key.split(',') if key.strip()]
+            api_key = api_keys[0]
+            self.api_client = OpenAIClient(api_key=api_key, key_pool=get_key_pool("openai", api_keys))
             
             # 设置API客户端到各组件
             self.document_screener.set_api_client(self.api_client)
             
             # 初始化Agent推理框架
             self.agent_reasoning_framework = AgentDepthReasoningFramework()
+            self.agent_reasoning_framework.fused_keyword_mode = self.config.fused_keyword_mode
             
             # 设置API客户端
             if hasattr(self.agent_reasoning_framework, 'set_api_client'):
@@ -280,6 +303,8 @@ class AgentReasoningMainFramework:
             'total_processing_time': total_time,
             'processing_results': processing_results,
             'experiment_statistics': self.experiment_stats.copy(),
+            'search_backend': self.config.search_backend,
+            'web_search_cache': self.search_client.get_statistics(),
             'summary': {
                 'total_documents_attempted': total_docs,
                 'successful_documents': successful_docs,
@@ -311,6 +336,7 @@ class AgentReasoningMainFramework:
             json_file = results_dir / f"{session_id}_agent_reasoning_results.json"
             with open(json_file, 'w', encoding='utf-8') as f:
                 json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+            get_meter().write_summary(json_file)
             
             # 保存简化摘要
             summary_file = results_dir / f"{session_id}_summary.json"
@@ -320,6 +346,8 @@ class AgentReasoningMainFramework:
                 'success': results.get('success', False),
                 'summary': results.get('summary', {}),
                 'processing_time': results.get('total_processing_time', 0),
+                'search_backend': results.get('search_backend', 'openai'),
+                'web_search_cache': results.get('web_search_cache', {}),
                 'agent_features': results.get('agent_reasoning_features', {})
             }
             
@@ -420,21 +448,31 @@ class AgentReasoningMainFramework:
             logger.info(f"✅ 筛选完成: {final_doc_count}/{total_docs} 个文档通过筛选")
             print(f"✅ 筛选完成: {final_doc_count}/{total_docs} 个文档通过筛选 (跳过{skipped_count}个短文档)")
             
-            # 3. 生产级别处理
-            print(f"\n🚀 开始生产级别处理 {final_doc_count} 个文档")
+            # 3. 打开结果日志，跳过上次运行已成功完成的文档
+            journal = ResultJournal(self._get_production_journal_path(topic))
+            completed_ids = journal.completed_ids()
+            pending_documents = [doc for doc in screened_documents if doc['doc_id'] not in completed_ids]
+            resumed_count = final_doc_count - len(pending_documents)
+            if resumed_count:
+                logger.info(f"📒 断点续跑: {resumed_count} 个文档已在结果日志中完成 ({journal.path})")
+                print(f"📒 断点续跑: 跳过 {resumed_count} 个已完成文档，剩余 {len(pending_documents)} 个")
+            
+            # 4. 生产级别处理
+            print(f"\n🚀 开始生产级别处理 {len(pending_documents)} 个文档")
             print("=" * 60)
             
+            doc_ids = [doc['doc_id'] for doc in screened_documents]
             results = self._run_agent_reasoning_generation_production(
-                screened_documents, topic, session_id
+                pending_documents, topic, session_id, journal, doc_ids
             )
             
-            # 4. 生成最终结果
+            # 5. 生成最终结果
             total_time = time.time() - start_time
             final_results = self._generate_final_results(results, session_id, total_time)
             
-            # 5. 导出结果（使用修复的导出系统）
-            # 先保存JSON结果
-            json_file = self._save_production_results(final_results, topic, session_id)
+            # 6. 导出结果（使用修复的导出系统）
+            # 先从结果日志生成JSON结果
+            json_file = self._save_production_results(final_results, topic, session_id, journal, doc_ids)
             
             # 使用修复的Excel导出器
             excel_file = self.export_system.export_clean_excel(json_file)
@@ -449,6 +487,17 @@ class AgentReasoningMainFramework:
             for format_type, file_path in exported_files.items():
                 print(f"   {format_type.upper()}: {file_path}")
             
+            cache_stats = final_results['web_search_cache']
+            if 'local_answered' in cache_stats:
+                print(f"📚 本地预筛选: 本地命中 {cache_stats['local_answered']} 次, "
+                      f"远程搜索 {cache_stats['remote_fallbacks']} 次")
+                cache_stats = cache_stats.get('remote', {})
+            if 'hit_rate' in cache_stats:
+                print(f"🗄️ 搜索缓存: 命中 {cache_stats['hits']} 次, 未命中 {cache_stats['misses']} 次 "
+                      f"(命中率 {cache_stats['hit_rate']:.1%})")
+            elif 'avg_search_ms' in cache_stats:
+                print(f"📚 本地检索: {cache_stats['queries']} 次查询, 平均 {cache_stats['avg_search_ms']:.1f}ms")
+            
             logger.info(f"🎉 生产实验完成: 总耗时 {total_time/60:.1f} 分钟")
             return final_results
             
@@ -457,18 +506,24 @@ class AgentReasoningMainFramework:
             return self._create_error_result(session_id, str(e))
     
     def _run_agent_reasoning_generation_production(
-        self, documents: List[Dict], topic: str, session_id: str
+        self, documents: List[Dict], topic: str, session_id: str,
+        journal: ResultJournal, doc_ids: List[str]
     ) -> Dict[str, Any]:
-        """运行生产级别的Agent推理测试数据生成"""
+        """
+        运行生产级别的Agent推理测试数据生成
+        
+        每个文档完成后立即追加到结果日志；返回的统计覆盖doc_ids中所有已记录的文档（含之前运行完成的），
+        推理树和轨迹不保存在内存中，导出时从日志读取
+        """
         logger.info("🧠 开始生产级别Agent推理测试数据生成...")
         
         results = {
             'session_id': session_id,
             'mode': 'agent_reasoning_production',
             'topic': topic,
-            'processed_documents': [],
+            'journal_file': str(journal.path),
             'statistics': {
-                'total_documents': len(documents),
+                'total_documents': len(doc_ids),
                 'successful_documents': 0,
                 'failed_documents': 0,
                 'total_reasoning_trees': 0,
@@ -486,118 +541,201 @@ class AgentReasoningMainFramework:
             'errors': [],
             'success': True
         }
+        # 本次运行的进度计数
+        run_stats = {
+            'successful_documents': 0,
+            'failed_documents': 0,
+            'total_reasoning_trees': 0,
+            'total_composite_queries': 0,
+            'processing_times': []
+        }
         
         total_docs = len(documents)
+        max_workers = self.config.max_concurrent_documents if self.config.parallel_processing else 1
+        max_workers = max(1, min(max_workers, total_docs))
+        if max_workers > 1:
+            print(f"⚡ 并发处理: 同时处理 {max_workers} 个文档")
+        
+        run_start_time = time.time()
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exp07-doc") as executor:
+            # 同时在途的文档不超过max_workers个，完成一个再提交下一个；
+            # 工作线程只返回精简记录（完整结果已写入日志），先完成的记录暂存，按输入顺序输出进度
+            document_iter = iter(enumerate(documents))
+            in_flight = {}
+            finished: Dict[int, Dict[str, Any]] = {}
+            next_to_report = 0
+            
+            def _submit_next():
+                item = next(document_iter, None)
+                if item is not None:
+                    index, document = item
+                    # 复制上下文，使计量阶段等contextvars在工作线程中可见
+                    future = executor.submit(contextvars.copy_context().run,
+                                             self._process_document_production, document, journal)
+                    in_flight[future] = index
+            
+            for _ in range(max_workers):
+                _submit_next()
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[in_flight.pop(future)] = future.result()
+                    _submit_next()
+                
+                while next_to_report in finished:
+                    record = finished.pop(next_to_report)
+                    next_to_report += 1
+                    self._report_production_progress(documents[next_to_report - 1], record, next_to_report,
+                                                     total_docs, run_stats, run_start_time)
+        
+        # 最终统计从结果日志汇总（包括之前运行已完成的文档）
+        summary = journal.summarize(doc_ids)
+        results['errors'] = summary.pop('errors')
+        results['statistics'].update(summary)
+        
+        total_recorded = results['statistics']['successful_documents'] + results['statistics']['failed_documents']
+        print(f"\n" + "=" * 60)
+        print(f"🎯 生产处理完成!")
+        print(f"   📊 总文档: {len(doc_ids)} (本次处理 {total_docs})")
+        print(f"   ✅ 成功: {results['statistics']['successful_documents']}")
+        print(f"   ❌ 失败: {results['statistics']['failed_documents']}")
+        print(f"   📈 成功率: {results['statistics']['successful_documents']/max(total_recorded, 1):.1%}")
+        print(f"   🌳 总推理树: {results['statistics']['total_reasoning_trees']}")
+        print(f"   ❓ 总综合问题: {results['statistics']['total_composite_queries']}")
         
-        for i, document in enumerate(documents):
-            current_doc_num = i + 1
-            doc_id = document['doc_id']
+        return results
+    
+    def _report_production_progress(self, document: Dict, record: Dict[str, Any], current_doc_num: int,
+                                    total_docs: int, run_stats: Dict[str, Any], run_start_time: float):
+        """按输入顺序输出单个文档的处理结果与整体进度，并累计本次运行的统计"""
+        doc_id = record['doc_id']
+        doc_processing_time = record['processing_time']
+        
+        # 详细的进度日志
+        print(f"\n📄 处理文档 [{current_doc_num:>3}/{total_docs}]: {doc_id}")
+        print(f"   📏 文档长度: {document['length']:,} 字符")
+        
+        if record['status'] == STATUS_EXCEPTION:
+            run_stats['failed_documents'] += 1
+            print(f"   💥 异常错误 ({doc_processing_time:.1f}秒): {record['error']}")
+            logger.error(f"💥 文档 {doc_id} 处理异常: {record['error']}")
+            return
+        
+        run_stats['processing_times'].append(doc_processing_time)
+        
+        if record['status'] == STATUS_SUCCESS:
+            # 成功处理
+            trees_count = record['total_trees']
+            composite_queries_count = record['total_composite_queries']
             
-            # 详细的进度日志
-            print(f"\n📄 处理文档 [{current_doc_num:>3}/{total_docs}]: {doc_id}")
-            print(f"   📏 文档长度: {document['length']:,} 字符")
+            run_stats['successful_documents'] += 1
+            run_stats['total_reasoning_trees'] += trees_count
+            run_stats['total_composite_queries'] += composite_queries_count
             
-            doc_start_time = time.time()
+            # 成功日志
+            print(f"   ✅ 处理成功 ({doc_processing_time:.1f}秒)")
+            print(f"   🌳 推理树: {trees_count} 个")
+            print(f"   ❓ 综合问题: {composite_queries_count} 个")
             
-            try:
-                # 使用Agent推理框架处理文档
-                logger.info(f"🔄 开始处理文档 {current_doc_num}/{total_docs}: {doc_id}")
-                
-                doc_result = self.agent_reasoning_framework.process_document_for_agent_reasoning(
-                    document['content'], doc_id
+            logger.info(f"✅ 文档 {doc_id} 处理成功: {trees_count} 个推理树, {composite_queries_count} 个综合问题")
+            
+        else:
+            # 处理失败
+            run_stats['failed_documents'] += 1
+            print(f"   ❌ 处理失败 ({doc_processing_time:.1f}秒): {record['error']}")
+            logger.warning(f"❌ 文档 {doc_id} 处理失败: {record['error']}")
+        
+        # 进度统计：并发时单文档耗时不等于吞吐，剩余时间按实际墙钟吞吐估算
+        success_rate = run_stats['successful_documents'] / current_doc_num
+        avg_time = sum(run_stats['processing_times']) / len(run_stats['processing_times'])
+        wall_time_per_doc = (time.time() - run_start_time) / current_doc_num
+        remaining_docs = total_docs - current_doc_num
+        eta_minutes = (remaining_docs * wall_time_per_doc) / 60
+        
+        print(f"   📊 进度: {success_rate:.1%} 成功率, 平均 {avg_time:.1f}秒/文档 "
+              f"(吞吐 {wall_time_per_doc:.1f}秒/文档), 预计剩余 {eta_minutes:.1f} 分钟")
+        
+        # 每处理10个文档显示一次总体进度
+        if current_doc_num % 10 == 0 or current_doc_num == total_docs:
+            print(f"\n📈 总体进度: {current_doc_num}/{total_docs} 完成 ({current_doc_num/total_docs:.1%})")
+            print(f"   ✅ 成功: {run_stats['successful_documents']} 个")
+            print(f"   ❌ 失败: {run_stats['failed_documents']} 个")
+            print(f"   🌳 总推理树: {run_stats['total_reasoning_trees']} 个")
+            print(f"   ❓ 总综合问题: {run_stats['total_composite_queries']} 个")
+    
+    def _process_document_production(self, document: Dict, journal: ResultJournal) -> Dict[str, Any]:
+        """
+        在工作线程中处理单个文档，并把结果追加到结果日志；
+        返回精简记录（doc_id / status / processing_time / error / total_trees / total_composite_queries），
+        推理树与轨迹只保存在日志中
+        """
+        doc_id = document['doc_id']
+        doc_start_time = time.time()
+        try:
+            logger.info(f"🔄 开始处理文档: {doc_id}")
+            doc_result = self.agent_reasoning_framework.process_document_for_agent_reasoning(
+                document['content'], doc_id
+            )
+            doc_processing_time = time.time() - doc_start_time
+            
+            if doc_result.get('success'):
+                reasoning_trees = doc_result.get('reasoning_trees', [])
+                composite_queries_count = sum(
+                    1 for tree in reasoning_trees if (tree.get('final_composite_query') if isinstance(tree, dict) else tree.final_composite_query)
                 )
-                
-                doc_processing_time = time.time() - doc_start_time
-                results['statistics']['processing_times'].append(doc_processing_time)
-                
-                if doc_result.get('success'):
-                    # 成功处理
-                    reasoning_trees = doc_result.get('reasoning_trees', [])
-                    composite_queries_count = sum(
-                        1 for tree in reasoning_trees if (tree.get('final_composite_query') if isinstance(tree, dict) else tree.final_composite_query)
-                    )
-                    
-                    results['processed_documents'].append({
+                entry = {
+                    'doc_id': doc_id,
+                    'status': STATUS_SUCCESS,
+                    'processing_time': doc_processing_time,
+                    'document': {
                         'doc_id': doc_id,
                         'reasoning_trees': reasoning_trees,
                         'trajectory_records': doc_result.get('trajectory_records', []),
                         'processing_time': doc_processing_time,
                         'total_trees': len(reasoning_trees),
                         'total_composite_queries': composite_queries_count
-                    })
-                    
-                    results['statistics']['successful_documents'] += 1
-                    results['statistics']['total_reasoning_trees'] += len(reasoning_trees)
-                    results['statistics']['total_composite_queries'] += composite_queries_count
-                    
-                    # 成功日志
-                    print(f"   ✅ 处理成功 ({doc_processing_time:.1f}秒)")
-                    print(f"   🌳 推理树: {len(reasoning_trees)} 个")
-                    print(f"   ❓ 综合问题: {composite_queries_count} 个")
-                    
-                    logger.info(f"✅ 文档 {doc_id} 处理成功: {len(reasoning_trees)} 个推理树, {composite_queries_count} 个综合问题")
-                    
-                else:
-                    # 处理失败
-                    error_msg = doc_result.get('error', 'Unknown error')
-                    results['statistics']['failed_documents'] += 1
-                    results['errors'].append({
-                        'doc_id': doc_id,
-                        'error': error_msg,
-                        'processing_time': doc_processing_time
-                    })
-                    
-                    print(f"   ❌ 处理失败 ({doc_processing_time:.1f}秒): {error_msg}")
-                    logger.warning(f"❌ 文档 {doc_id} 处理失败: {error_msg}")
-                
-                # 进度统计
-                success_rate = results['statistics']['successful_documents'] / current_doc_num
-                avg_time = sum(results['statistics']['processing_times']) / len(results['statistics']['processing_times'])
-                remaining_docs = total_docs - current_doc_num
-                eta_minutes = (remaining_docs * avg_time) / 60
-                
-                print(f"   📊 进度: {success_rate:.1%} 成功率, 平均 {avg_time:.1f}秒/文档, 预计剩余 {eta_minutes:.1f} 分钟")
-                
-                # 每处理10个文档显示一次总体进度
-                if current_doc_num % 10 == 0 or current_doc_num == total_docs:
-                    print(f"\n📈 总体进度: {current_doc_num}/{total_docs} 完成 ({current_doc_num/total_docs:.1%})")
-                    print(f"   ✅ 成功: {results['statistics']['successful_documents']} 个")
-                    print(f"   ❌ 失败: {results['statistics']['failed_documents']} 个")
-                    print(f"   🌳 总推理树: {results['statistics']['total_reasoning_trees']} 个")
-                    print(f"   ❓ 总综合问题: {results['statistics']['total_composite_queries']} 个")
-                    
-                    # 自动保存中间结果
-                    if current_doc_num % 20 == 0:
-                        self._save_intermediate_results(results, topic, session_id, current_doc_num)
-                        print(f"   💾 中间结果已保存 (第{current_doc_num}个文档)")
-                
-            except Exception as e:
-                doc_processing_time = time.time() - doc_start_time
-                error_msg = f"文档处理异常: {str(e)}"
-                
-                results['statistics']['failed_documents'] += 1
-                results['errors'].append({
+                    }
+                }
+            else:
+                entry = {
                     'doc_id': doc_id,
-                    'error': error_msg,
-                    'processing_time': doc_processing_time
-                })
-                
-                print(f"   💥 异常错误 ({doc_processing_time:.1f}秒): {str(e)}")
-                logger.error(f"💥 文档 {doc_id} 处理异常: {e}")
+                    'status': STATUS_FAILED,
+                    'processing_time': doc_processing_time,
+                    'error': doc_result.get('error', 'Unknown error')
+                }
+        except Exception as e:
+            entry = {
+                'doc_id': doc_id,
+                'status': STATUS_EXCEPTION,
+                'processing_time': time.time() - doc_start_time,
+                'error': f"文档处理异常: {str(e)}"
+            }
         
-        print(f"\n" + "=" * 60)
-        print(f"🎯 生产处理完成!")
-        print(f"   📊 总文档: {total_docs}")
-        print(f"   ✅ 成功: {results['statistics']['successful_documents']}")
-        print(f"   ❌ 失败: {results['statistics']['failed_documents']}")
-        print(f"   📈 成功率: {results['statistics']['successful_documents']/total_docs:.1%}")
-        print(f"   🌳 总推理树: {results['statistics']['total_reasoning_trees']}")
-        print(f"   ❓ 总综合问题: {results['statistics']['total_composite_queries']}")
+        entry['finished_at'] = time.time()
+        try:
+            journal.append(entry)
+        except OSError as e:
+            logger.error(f"写入结果日志失败 {doc_id}: {e}")
         
-        return results
+        processed = entry.get('document', {})
+        return {
+            'doc_id': doc_id,
+            'status': entry['status'],
+            'processing_time': entry['processing_time'],
+            'error': entry.get('error'),
+            'total_trees': processed.get('total_trees', 0),
+            'total_composite_queries': processed.get('total_composite_queries', 0)
+        }
+    
+    def _get_production_journal_path(self, topic: str) -> Path:
+        """同一topic的生产运行共用一个结果日志，重启后据此续跑"""
+        return Path("results") / f"agent_reasoning_production_{topic}.journal.jsonl"
     
-    def _save_production_results(self, results: Dict[str, Any], topic: str, session_id: str):
-        """保存生产结果"""
+    def _save_production_results(self, results: Dict[str, Any], topic: str, session_id: str,
+                                 journal: ResultJournal, doc_ids: List[str]):
+        """保存生产结果（processed_documents从结果日志流式写出）"""
         try:
             # 确保结果目录存在
             results_dir = Path("results")
@@ -611,8 +749,8 @@ class AgentReasoningMainFramework:
             json_filename = f"agent_reasoning_production_{topic}_{timestamp}.json"
             json_path = results_dir / json_filename
             
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+            journal.write_results_json(json_path, results, results['processing_results'], doc_ids)
+            get_meter().write_summary(json_path)
             
             logger.info(f"💾 生产结果已保存: {json_path}")
             print(f"💾 结果已保存到: {json_filename}")
@@ -623,25 +761,6 @@ class AgentReasoningMainFramework:
             logger.error(f"保存生产结果失败: {e}")
             print(f"⚠️  保存结果失败: {e}")
             return None # 返回None表示失败
-    
-    def _save_intermediate_results(self, results: Dict[str, Any], topic: str, session_id: str, doc_count: int):
-        """保存中间结果"""
-        try:
-            results_dir = Path("results")
-            results_dir.mkdir(exist_ok=True)
-            
-            from datetime import datetime
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"agent_reasoning_intermediate_{topic}_{doc_count}docs_{timestamp}.json"
-            filepath = results_dir / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False, default=str)
-            
-            logger.info(f"💾 中间结果已保存: {filepath}")
-            
-        except Exception as e:
-            logger.error(f"保存中间结果失败: {e}")
 
 
 def main():
@@ -666,12 +785,15 @@ def main():
     print("  📊 全量处理 - 处理选定topic的所有文档")
     print("  📝 详细日志 - 实时显示处理进度和文档状态")
     print("  🔒 循环预防 - 完整的循环推理检测机制")
-    print("  💾 自动保存 - 实时保存结果，支持断点恢复")
+    print("  💾 自动保存 - 每个文档完成即写入结果日志，重启自动跳过已完成文档")
     print("=" * 80)
     
+    # --llm-stub / --llm-record / --llm-replay 用于离线运行
+    configure_offline_from_argv(sys.argv[1:])
+    
     # 获取用户输入
     try:
-        api_key = input("请输入OpenAI API密钥: ").strip()
+        api_key = input("请输入OpenAI API密钥（多个key用逗号分隔）: ").strip()
         if not api_key:
             print("❌ API密钥不能为空")
             return False
@@ -0,0 +1,9 @@
+"""实验07单元测试：把项目根目录与实验目录加入导入路径"""
+
+import sys
+from pathlib import Path
+
+experiment_dir = Path(__file__).parent.parent
+project_root = experiment_dir.parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(experiment_dir))
@@ -0,0 +1,91 @@
+"""LocalBM25Search：BM25打分与语料变化后重建索引"""
+
+import json
+import math
+
+import pytest
+
+from utils.local_search import LocalBM25Search, tokenize
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    source_dir = tmp_path / 'clueweb22'
+    source_dir.mkdir()
+    (source_dir / 'telescope.txt').write_text(
+        "James Webb Space Telescope\nThe James Webb telescope observes infrared light from early galaxies.\n",
+        encoding='utf-8')
+    (source_dir / 'hubble.txt').write_text(
+        "Hubble\nThe Hubble telescope orbits Earth and observes visible light.\n", encoding='utf-8')
+    (source_dir / 'volcano.txt').write_text(
+        "Volcano\nMount Etna is an active volcano on the island of Sicily.\n", encoding='utf-8')
+    return source_dir
+
+
+def _read_meta(index_dir):
+    with open(index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _bm25(query, docs, doc_id, k1=1.2, b=0.75):
+    """按定义直接计算的BM25得分（与索引实现对照）"""
+    tokenized = {name: tokenize(text) for name, text in docs.items()}
+    avgdl = sum(len(tokens) for tokens in tokenized.values()) / len(tokenized)
+    tokens = tokenized[doc_id]
+    score = 0.0
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(1 for doc_tokens in tokenized.values() if term in doc_tokens)
+        tf = tokens.count(term)
+        if not tf:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+    return score
+
+
+def test_bm25_ranks_by_query_term_matches(tmp_path, corpus):
+    search = LocalBM25Search(str(tmp_path / 'index'), [corpus])
+    ranked = search.rank('James Webb telescope infrared')
+
+    docs = [search.docs[doc_index]['doc_id'] for doc_index, _, _ in ranked]
+    assert docs == ['telescope', 'hubble']
+
+    texts = {path.stem: path.read_text(encoding='utf-8') for path in sorted(corpus.glob('*.txt'))}
+    for doc_index, score, coverage in ranked:
+        doc_id = search.docs[doc_index]['doc_id']
+        assert score == pytest.approx(_bm25('James Webb telescope infrared', texts, doc_id), rel=1e-5)
+    assert ranked[0][2] == 1.0
+    assert ranked[1][2] == 0.25
+
+    result = search.search('Mount Etna volcano')
+    assert result['status'] == 'success'
+    assert [item['doc_id'] for item in result['results']] == ['volcano']
+    assert search.search('nonexistent zeppelin')['results'] == []
+
+
+def test_index_rebuilt_when_corpus_changes(tmp_path, corpus):
+    index_dir = tmp_path / 'index'
+    LocalBM25Search(str(index_dir), [corpus]).rank('telescope')
+    meta = _read_meta(index_dir)
+
+    # 语料未变化：直接加载已有索引
+    LocalBM25Search(str(index_dir), [corpus]).rank('telescope')
+    assert _read_meta(index_dir) == meta
+
+    (corpus / 'hubble.txt').write_text(
+        "Hubble\nThe Hubble telescope photographed the Pillars of Creation nebula.\n", encoding='utf-8')
+    (corpus / 'glacier.txt').write_text("Glacier\nThe Perito Moreno glacier lies in Patagonia.\n", encoding='utf-8')
+
+    search = LocalBM25Search(str(index_dir), [corpus])
+    assert [item['doc_id'] for item in search.search('Pillars of Creation nebula')['results']] == ['hubble']
+    assert [item['doc_id'] for item in search.search('Perito Moreno glacier')['results']] == ['glacier']
+    rebuilt = _read_meta(index_dir)
+    assert rebuilt['source_fingerprint'] != meta['source_fingerprint']
+    assert rebuilt['num_docs'] == 4
+
+
+def test_missing_index_without_auto_build_fails_search(tmp_path, corpus):
+    search = LocalBM25Search(str(tmp_path / 'index'), [corpus], auto_build=False)
+    result = search.search('telescope')
+    assert result['status'] == 'failed'
+    assert result['results'] == []
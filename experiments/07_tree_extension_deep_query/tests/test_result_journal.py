@@ -0,0 +1,113 @@
+"""ResultJournal：崩溃恢复（截掉半行）与同一文档以最后一行为准"""
+
+import json
+
+import pytest
+
+from utils import result_journal
+from utils.result_journal import ResultJournal, STATUS_SUCCESS, STATUS_FAILED, STATUS_EXCEPTION
+
+
+def _document(doc_id, trees=1, queries=2):
+    return {'doc_id': doc_id, 'total_trees': trees, 'total_composite_queries': queries}
+
+
+def test_truncates_half_written_last_line(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append({'doc_id': 'a', 'status': STATUS_SUCCESS, 'processing_time': 1.0, 'document': _document('a')})
+    journal.append({'doc_id': 'b', 'status': STATUS_SUCCESS, 'processing_time': 2.0, 'document': _document('b')})
+    valid_size = path.stat().st_size
+
+    # 模拟写入中途崩溃：末行只写了一半、没有换行
+    with open(path, 'ab') as f:
+        f.write(b'{"doc_id": "c", "status": "succ')
+
+    resumed = ResultJournal(path)
+    assert path.stat().st_size == valid_size
+    assert resumed.completed_ids() == {'a', 'b'}
+
+    # 截断后继续追加的记录仍然可以正常读回
+    resumed.append({'doc_id': 'c', 'status': STATUS_SUCCESS, 'processing_time': 3.0, 'document': _document('c')})
+    lines = path.read_bytes().splitlines()
+    assert [json.loads(line)['doc_id'] for line in lines] == ['a', 'b', 'c']
+    assert ResultJournal(path).completed_ids() == {'a', 'b', 'c'}
+
+
+def test_resume_uses_last_entry_per_document(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append({'doc_id': 'a', 'status': STATUS_FAILED, 'processing_time': 1.0, 'error': 'first try'})
+    journal.append({'doc_id': 'b', 'status': STATUS_SUCCESS, 'processing_time': 1.0, 'document': _document('b')})
+    journal.append({'doc_id': 'c', 'status': STATUS_SUCCESS, 'processing_time': 1.0, 'document': _document('c')})
+
+    # 重启后重试失败的a；c被重新处理且这次抛出异常
+    resumed = ResultJournal(path)
+    assert resumed.completed_ids() == {'b', 'c'}
+    resumed.append({'doc_id': 'a', 'status': STATUS_SUCCESS, 'processing_time': 2.0, 'document': _document('a', 2, 3)})
+    resumed.append({'doc_id': 'c', 'status': STATUS_EXCEPTION, 'error': 'boom'})
+
+    reloaded = ResultJournal(path)
+    assert reloaded.completed_ids() == {'a', 'b'}
+    assert [entry['status'] for entry in reloaded.entries(['a', 'b', 'c'])] == [
+        STATUS_SUCCESS, STATUS_SUCCESS, STATUS_EXCEPTION]
+
+    summary = reloaded.summarize(['a', 'b', 'c'])
+    assert summary['successful_documents'] == 2
+    assert summary['failed_documents'] == 1
+    assert summary['total_reasoning_trees'] == 3
+    assert summary['total_composite_queries'] == 5
+    assert summary['errors'] == [{'doc_id': 'c', 'error': 'boom', 'processing_time': 0}]
+
+
+def test_write_results_json_streams_successful_documents(tmp_path):
+    journal = ResultJournal(tmp_path / 'journal.jsonl')
+    journal.append({'doc_id': 'a', 'status': STATUS_SUCCESS, 'document': _document('a')})
+    journal.append({'doc_id': 'b', 'status': STATUS_FAILED, 'error': 'no trees'})
+
+    results = {'experiment': 'test', 'data': {'total': 2}}
+    output_path = tmp_path / 'results.json'
+    journal.write_results_json(output_path, results, results['data'], ['b', 'a'])
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        written = json.load(f)
+    assert written['data']['processed_documents'] == [_document('a')]
+    assert written['data']['total'] == 2
+    assert 'processed_documents' not in results['data']
+
+
+def test_corrupt_line_in_the_middle_is_skipped_not_truncated(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append({'doc_id': 'a', 'status': STATUS_SUCCESS, 'document': _document('a')})
+    with open(path, 'ab') as f:
+        f.write(b'{"doc_id": "x", "sta\n')
+    journal = ResultJournal(path)
+    journal.append({'doc_id': 'b', 'status': STATUS_SUCCESS, 'document': _document('b')})
+    journal.append({'doc_id': 'c', 'status': STATUS_FAILED, 'error': 'no trees'})
+    size = path.stat().st_size
+
+    resumed = ResultJournal(path)
+    assert path.stat().st_size == size
+    assert resumed.completed_ids() == {'a', 'b'}
+    assert [entry['doc_id'] for entry in resumed.entries()] == ['a', 'b', 'c']
+
+
+def test_failed_append_is_rolled_back(tmp_path, monkeypatch):
+    path = tmp_path / 'journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append({'doc_id': 'a', 'status': STATUS_SUCCESS, 'document': _document('a')})
+    size = path.stat().st_size
+
+    def fail_fsync(fd):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(result_journal.os, 'fsync', fail_fsync)
+    with pytest.raises(OSError):
+        journal.append({'doc_id': 'b', 'status': STATUS_SUCCESS, 'document': _document('b')})
+    assert path.stat().st_size == size
+    assert journal.completed_ids() == {'a'}
+
+    monkeypatch.undo()
+    journal.append({'doc_id': 'c', 'status': STATUS_SUCCESS, 'document': _document('c')})
+    assert ResultJournal(path).completed_ids() == {'a', 'c'}
@@ -0,0 +1,74 @@
+"""WebSearchCache：TTL过期与LRU淘汰；CachedSearchClient只缓存成功结果"""
+
+import pytest
+
+from utils import search_cache
+from utils.search_cache import CachedSearchClient, WebSearchCache, make_search_cache_key
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(search_cache.time, 'time', clock)
+    return clock
+
+
+def _put(cache, query):
+    key = make_search_cache_key(query)
+    cache.put(key, query, {'status': 'success', 'query': query, 'results': []})
+    return key
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = WebSearchCache(str(tmp_path / 'cache.sqlite'), ttl_seconds=60)
+    key = _put(cache, 'James Webb Space Telescope')
+
+    clock.now += 59
+    assert cache.get(key)['query'] == 'James Webb Space Telescope'
+
+    clock.now += 2
+    assert cache.get(key) is None
+    assert cache.stats['expired'] == 1
+    # 过期条目已被删除，再次读取是普通未命中
+    assert cache.get(key) is None
+    assert cache.stats['expired'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = WebSearchCache(str(tmp_path / 'cache.sqlite'), ttl_seconds=0, max_entries=2)
+    key_a = _put(cache, 'query a')
+    clock.now += 1
+    key_b = _put(cache, 'query b')
+    clock.now += 1
+    assert cache.get(key_a) is not None  # a变为最近访问
+
+    clock.now += 1
+    key_c = _put(cache, 'query c')
+    assert cache.get(key_b) is None
+    assert cache.get(key_a) is not None
+    assert cache.get(key_c) is not None
+    assert cache.stats['evictions'] == 1
+
+
+def test_normalized_queries_share_an_entry_and_failures_are_not_cached(tmp_path, clock):
+    calls = []
+
+    def search_fn(query, max_results=5, **kwargs):
+        calls.append(query)
+        status = 'failed' if 'broken' in query else 'success'
+        return {'status': status, 'query': query, 'results': []}
+
+    client = CachedSearchClient(search_fn, cache=WebSearchCache(str(tmp_path / 'cache.sqlite')))
+    client('Mount Everest height')
+    assert client('  mount everest HEIGHT? ')['cache_hit'] is True
+    client('broken query')
+    client('broken query')
+    assert calls == ['Mount Everest height', 'broken query', 'broken query']
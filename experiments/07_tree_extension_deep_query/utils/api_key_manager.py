@@ -1,11 +1,13 @@
 """
 API Key Manager for Tree Extension Deep Query Framework  
 Handles secure API key management with automatic loading from environment variables.
+Several keys per service can be configured (OPENAI_API_KEYS / ANTHROPIC_API_KEYS, comma separated,
+or a JSON list in the config file); clients rotate requests across them by remaining rate-limit headroom.
 """
 
 import os
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -15,6 +17,8 @@ class APIKeyManager:
     
     def __init__(self):
         self.api_keys = {}
+        # All keys per service (the first one is also stored in api_keys)
+        self.key_pools: Dict[str, List[str]] = {}
         self._load_api_keys()
     
     def _load_api_keys(self):
@@ -29,6 +33,19 @@ class APIKeyManager:
         self._load_from_config_file()
         
         logger.info(f"Loaded API keys for: {list(self.api_keys.keys())}")
+        for service, keys in self.key_pools.items():
+            if len(keys) > 1:
+                logger.info(f"🔑 {service}: {len(keys)} keys in pool")
+    
+    def _add_keys(self, service: str, keys: List[str]):
+        """Add keys to a service pool (duplicates ignored, first key becomes the primary key)"""
+        pool = self.key_pools.setdefault(service, [])
+        for key in keys:
+            key = key.strip()
+            if key and key not in pool:
+                pool.append(key)
+        if pool:
+            self.api_keys.setdefault(service, pool[0])
     
     def _load_from_environment(self):
         """Load from environment variables"""
@@ -37,13 +54,21 @@ class APIKeyManager:
             'CLAUDE_API_KEY': 'claude',
             'ANTHROPIC_API_KEY': 'claude',  # Alternative name
             'GOOGLE_API_KEY': 'google',
-            'BING_API_KEY': 'bing'
+            'BING_API_KEY': 'bing',
+            # Comma separated key pools
+            'OPENAI_API_KEYS': 'openai',
+            'ANTHROPIC_API_KEYS': 'claude',
+            'CLAUDE_API_KEYS': 'claude'
         }
         
         for env_var, service in env_mappings.items():
-            key = os.getenv(env_var)
-            if key:
-                self.api_keys[service] = key
+            value = os.getenv(env_var)
+            if value:
+                if env_var.endswith('_KEYS'):
+                    self._add_keys(service, value.split(','))
+                else:
+                    self.api_keys[service] = value
+                    self._add_keys(service, [value])
                 logger.info(f"✅ Loaded {service} API key from {env_var}")
     
     def _load_from_env_file(self):
@@ -88,7 +113,8 @@ class APIKeyManager:
                     
                     for service, key in config_keys.items():
                         if service not in self.api_keys:  # Don't override env vars
-                            self.api_keys[service] = key
+                            # A list configures a key pool
+                            self._add_keys(service, key if isinstance(key, list) else [key])
                             logger.info(f"📄 Loaded {service} API key from {config_path}")
                             
                 except Exception as e:
@@ -102,6 +128,14 @@ class APIKeyManager:
         """Get Claude API key"""
         return self.api_keys.get('claude')
     
+    def get_openai_keys(self) -> List[str]:
+        """Get all configured OpenAI API keys"""
+        return list(self.key_pools.get('openai', []))
+    
+    def get_claude_keys(self) -> List[str]:
+        """Get all configured Claude API keys"""
+        return list(self.key_pools.get('claude', []))
+    
     def has_openai_key(self) -> bool:
         """Check if OpenAI API key is available"""
         return 'openai' in self.api_keys
@@ -127,8 +161,10 @@ class APIKeyManager:
         
         try:
             from core.llm_clients.openai_api_client import OpenAIClient
-            client = OpenAIClient(api_key=openai_key)
-            logger.info("✅ OpenAI client setup successful")
+            from core.llm_clients.key_pool import get_key_pool
+            keys = [openai_key] + self.get_openai_keys()
+            client = OpenAIClient(api_key=openai_key, key_pool=get_key_pool('openai', keys))
+            logger.info(f"✅ OpenAI client setup successful ({len(client.key_pool)} key(s))")
             return client
         except Exception as e:
             logger.error(f"❌ Failed to setup OpenAI client: {e}")
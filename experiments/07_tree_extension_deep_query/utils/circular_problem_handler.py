@@ -51,6 +51,9 @@ class CircularProblemHandler:
             "{keyword} principles"
         ]
         
+        # 关键词域扩展每批并发搜索的模板数（找到有效结果后不再发出后续批次）
+        self.expansion_batch_size = 4
+        
         # 多角度搜索模板
         self.angle_templates = [
             "historical aspects of {keyword}",
@@ -338,20 +341,16 @@ class CircularProblemHandler:
         logger.info(f"尝试关键词域扩展: {keyword}")
         self.stats['retry_attempts'] += 1
         
-        for template in self.expansion_templates:
-            expanded_query = template.format(keyword=keyword)
-            
-            try:
-                results = web_search_system.search(expanded_query)
-                
+        expanded_queries = [template.format(keyword=keyword) for template in self.expansion_templates]
+        
+        # 按模板顺序分批并发搜索，取第一个通过验证的结果；找到后不再发出后续批次
+        for start in range(0, len(expanded_queries), self.expansion_batch_size):
+            batch = expanded_queries[start:start + self.expansion_batch_size]
+            for expanded_query, results in zip(batch, self._search_batch(web_search_system, batch)):
                 if results and self._validate_search_results(results, parent_question):
                     logger.info(f"关键词扩展成功: {expanded_query} -> {len(results)} 个结果")
                     self.stats['successful_regenerations'] += 1
                     return results
-                    
-            except Exception as e:
-                logger.warning(f"关键词扩展搜索失败 {expanded_query}: {e}")
-                continue
         
         logger.warning(f"关键词域扩展失败: {keyword}")
         self.stats['failed_regenerations'] += 1
@@ -366,20 +365,12 @@ class CircularProblemHandler:
         
         all_results = []
         
-        for template in self.angle_templates:
-            angle_query = template.format(keyword=keyword)
-            
-            try:
-                results = web_search_system.search(angle_query)
-                
-                if results:
-                    # 过滤高相似度结果
-                    filtered_results = self._filter_by_semantic_distance(results, parent_question)
-                    all_results.extend(filtered_results)
-                    
-            except Exception as e:
-                logger.warning(f"多角度搜索失败 {angle_query}: {e}")
-                continue
+        angle_queries = [template.format(keyword=keyword) for template in self.angle_templates]
+        for results in self._search_batch(web_search_system, angle_queries):
+            if results:
+                # 过滤高相似度结果
+                filtered_results = self._filter_by_semantic_distance(results, parent_question)
+                all_results.extend(filtered_results)
         
         if all_results:
             # 去重并限制数量
@@ -394,6 +385,23 @@ class CircularProblemHandler:
         self.stats['failed_regenerations'] += 1
         return None
     
+    def _search_batch(self, web_search_system, queries: List[str]) -> List[Optional[List[Dict[str, Any]]]]:
+        """并发执行一批搜索（搜索系统不支持search_many时逐个执行），结果顺序与queries一致，失败的为None"""
+        if hasattr(web_search_system, 'search_many'):
+            try:
+                return web_search_system.search_many(queries)
+            except Exception as e:
+                logger.warning(f"批量搜索失败，改为逐个搜索: {e}")
+        
+        batch_results = []
+        for query in queries:
+            try:
+                batch_results.append(web_search_system.search(query))
+            except Exception as e:
+                logger.warning(f"搜索失败 {query}: {e}")
+                batch_results.append(None)
+        return batch_results
+    
     def _validate_search_results(self, results: List[Dict[str, Any]], parent_question: str) -> bool:
         """验证搜索结果质量"""
         
@@ -5,7 +5,6 @@ Uses LLM to assess document quality and suitability for short answer extraction.
 
 import logging
 import json
-import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
@@ -23,6 +22,9 @@ except ImportError:
     from document_loader import DocumentData
     from config import get_config
 
+from core.llm_clients.metering import metered_stage
+from core.llm_clients.structured_output import parse_json_response
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -49,6 +51,7 @@ class DocumentScreener:
         """Set the API client for LLM calls"""
         self.api_client = api_client
     
+    @metered_stage("screening", override=True)
     def screen_document(self, document: DocumentData) -> ScreeningResult:
         """Screen a single document for quality and suitability"""
         logger.info(f"Screening document: {document.doc_id}")
@@ -134,13 +137,12 @@ Priority: Documents with high density of verifiable, objective facts suitable fo
     def _call_llm_for_screening(self, prompt: str) -> str:
         """Call LLM API for document screening"""
         try:
-            # Wait to respect rate limits
-            time.sleep(0.5)
-            
+            # Rate limits are enforced by the client's shared limiter
             response = self.api_client.generate_response(
                 prompt=prompt,
                 temperature=0.3,
-                max_tokens=500
+                max_tokens=500,
+                response_schema="document_screening"
             )
             
             return response
@@ -152,14 +154,11 @@ Priority: Documents with high density of verifiable, objective facts suitable fo
     def _parse_screening_response(self, doc_id: str, response: str) -> ScreeningResult:
         """Parse LLM response for screening result"""
         try:
-            # Try to extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_text = response[json_start:json_end]
-                screening_data = json.loads(json_text)
-            else:
+            # Structured output returns plain JSON; free-text responses are repaired if possible
+            screening_data = parse_json_response(
+                response, "document_screening",
+                structured=self.api_client.uses_structured_output("document_screening"))
+            if not isinstance(screening_data, dict):
                 # Fallback parsing if JSON is not found
                 screening_data = self._fallback_parse_response(response)
             
@@ -338,7 +337,7 @@ def test_document_screener():
     """Test function for document screener"""
     # Mock API client for testing
     class MockAPIClient:
-        def generate_response(self, prompt, temperature=0.3, max_tokens=500):
+        def generate_response(self, prompt, temperature=0.3, max_tokens=500, **kwargs):
             return '''
             {
                 "is_suitable": true,
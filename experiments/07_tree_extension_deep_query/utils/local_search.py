@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Local BM25 Search - 本地语料检索后端
+在 data/clueweb22 与 data/academic_papers 上建立倒排索引（BM25排序），索引持久化到磁盘、启动时内存映射加载；
+返回与 web_search 相同的 {'status', 'results'} 结构，可直接作为 search_client 使用，
+用于开发运行、远程搜索前的预筛选（LocalFirstSearchClient）以及整条推理树流水线的离线基准测试
+
+构建/查询索引:
+    python utils/local_search.py --rebuild
+    python utils/local_search.py --query "James Webb Space Telescope"
+"""
+
+import os
+import re
+import json
+import math
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+
+# 默认语料与索引位置（可通过环境变量覆盖）
+DEFAULT_SOURCE_DIRS = [
+    _PROJECT_ROOT / 'data' / 'clueweb22',
+    _PROJECT_ROOT / 'data' / 'academic_papers',
+]
+DEFAULT_INDEX_DIR = os.getenv('LOCAL_SEARCH_INDEX_DIR', str(_PROJECT_ROOT / '.cache' / 'local_bm25_index'))
+# 预筛选：本地最佳结果覆盖的查询词比例达到该值时不再发起远程搜索
+DEFAULT_MIN_COVERAGE = float(os.getenv('LOCAL_SEARCH_MIN_COVERAGE', '0.6'))
+
+INDEX_VERSION = 1
+PROVIDER = 'local_bm25'
+
+_TOKEN_PATTERN = re.compile(r'[^\W_]+', re.UNICODE)
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how i if in into is it its
+of on or our so such than that the their them then there these they this those to was were what when where
+which who whom why will with would you your about after all also any before between both each more most
+other over same some under up very we not no only own s t just
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """小写、按字母数字切分并去掉停用词；单字符只保留数字"""
+    return [
+        token for token in _TOKEN_PATTERN.findall((text or '').lower())
+        if token not in _STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+def _parse_title(text: str, fallback: str) -> str:
+    """学术论文取 'Title:' 行，ClueWeb22 网页取第一个非空行"""
+    for line in text.splitlines()[:10]:
+        line = line.strip()
+        if line.lower().startswith('title:'):
+            return line[6:].strip() or fallback
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return fallback
+
+
+def _list_source_files(source_dirs: Sequence[Path]) -> List[Path]:
+    files = []
+    for source_dir in source_dirs:
+        source_dir = Path(source_dir)
+        if source_dir.is_dir():
+            files.extend(sorted(source_dir.glob('*.txt')))
+        else:
+            logger.warning(f"本地检索语料目录不存在，已跳过: {source_dir}")
+    return files
+
+
+def _source_fingerprint(files: Sequence[Path]) -> str:
+    """语料文件列表、大小与修改时间的摘要；语料变化时索引需要重建"""
+    digest = hashlib.sha256()
+    for path in files:
+        stat = path.stat()
+        digest.update(f"{path.parent.name}/{path.name}\t{stat.st_size}\t{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_index(index_dir: str = DEFAULT_INDEX_DIR,
+                source_dirs: Optional[Sequence[Path]] = None,
+                k1: float = 1.2, b: float = 0.75) -> Dict[str, Any]:
+    """
+    扫描语料并把倒排索引写到index_dir（先写临时目录再替换，构建中断不会留下半个索引）
+
+    文件布局:
+        meta.json          参数、文档数、平均文档长度、语料指纹
+        terms.json         词表（按term_id排列）
+        docs.json          每个文档的 doc_id / title / source
+        term_offsets.npy   词t的倒排表位于 postings[term_offsets[t]:term_offsets[t+1]]
+        postings_docs.npy  文档序号 (int32)
+        postings_tfs.npy   词频 (int32)
+        doc_lengths.npy    文档长度（词数）
+        content.bin        全部文档正文（UTF-8拼接）
+        content_offsets.npy 文档i的正文位于 content.bin[content_offsets[i]:content_offsets[i+1]]
+
+    Returns:
+        写入的meta信息
+    """
+    start_time = time.time()
+    files = _list_source_files(source_dirs or DEFAULT_SOURCE_DIRS)
+    logger.info(f"🏗️ 构建本地BM25索引: {len(files)} 个文档 -> {index_dir}")
+
+    index_path = Path(index_dir)
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    term_ids: Dict[str, int] = {}
+    postings: List[List[Tuple[int, int]]] = []
+    docs: List[Dict[str, str]] = []
+    doc_lengths: List[int] = []
+    content_offsets = [0]
+
+    with open(tmp_path / 'content.bin', 'wb') as content_file:
+        for doc_index, path in enumerate(files):
+            text = path.read_text(encoding='utf-8', errors='replace')
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                term_id = term_ids.setdefault(term, len(term_ids))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_index, tf))
+
+            docs.append({'doc_id': path.stem, 'title': _parse_title(text, path.stem), 'source': path.parent.name})
+            doc_lengths.append(sum(counts.values()))
+            data = text.encode('utf-8')
+            content_file.write(data)
+            content_offsets.append(content_offsets[-1] + len(data))
+
+    term_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    term_offsets[1:] = np.cumsum([len(plist) for plist in postings])
+    flat = [pair for plist in postings for pair in plist]
+    postings_array = np.array(flat, dtype=np.int32).reshape(-1, 2)
+
+    np.save(tmp_path / 'term_offsets.npy', term_offsets)
+    np.save(tmp_path / 'postings_docs.npy', np.ascontiguousarray(postings_array[:, 0]))
+    np.save(tmp_path / 'postings_tfs.npy', np.ascontiguousarray(postings_array[:, 1]))
+    np.save(tmp_path / 'doc_lengths.npy', np.array(doc_lengths, dtype=np.int32))
+    np.save(tmp_path / 'content_offsets.npy', np.array(content_offsets, dtype=np.int64))
+
+    with open(tmp_path / 'terms.json', 'w', encoding='utf-8') as f:
+        json.dump(sorted(term_ids, key=term_ids.get), f, ensure_ascii=False)
+    with open(tmp_path / 'docs.json', 'w', encoding='utf-8') as f:
+        json.dump(docs, f, ensure_ascii=False)
+
+    meta = {
+        'version': INDEX_VERSION,
+        'k1': k1,
+        'b': b,
+        'num_docs': len(docs),
+        'num_terms': len(term_ids),
+        'num_postings': len(flat),
+        'avgdl': (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0,
+        'sources': sorted({doc['source'] for doc in docs}),
+        'source_fingerprint': _source_fingerprint(files),
+        'built_at': time.time()
+    }
+    # meta.json最后写入，作为索引完整的标志
+    with open(tmp_path / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    if index_path.exists():
+        shutil.rmtree(index_path)
+    tmp_path.rename(index_path)
+
+    logger.info(f"✅ 本地BM25索引构建完成: {meta['num_docs']} 个文档, {meta['num_terms']} 个词, "
+                f"耗时 {time.time() - start_time:.1f}s")
+    return meta
+
+
+class LocalBM25Search:
+    """
+    基于内存映射倒排索引的BM25检索（线程安全，查询只读）
+
+    可作为search_client使用：签名 (query, max_results=5, **kwargs)，额外参数（如api_key）忽略
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR,
+                 source_dirs: Optional[Sequence[Path]] = None,
+                 auto_build: bool = True):
+        """
+        Args:
+            index_dir: 索引目录
+            source_dirs: 语料目录（默认 data/clueweb22 与 data/academic_papers）
+            auto_build: 索引不存在或语料已变化时自动（重新）构建
+        """
+        self.index_dir = Path(index_dir)
+        self.source_dirs = list(source_dirs or DEFAULT_SOURCE_DIRS)
+        self.auto_build = auto_build
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.stats = {
+            'queries': 0,
+            'empty_results': 0,
+            'total_search_time': 0.0
+        }
+
+    def _ensure_loaded(self):
+        """首次查询时加载索引（numpy数组以mmap方式打开，不读入内存）"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            meta = self._read_meta()
+            if self.auto_build:
+                fingerprint = _source_fingerprint(_list_source_files(self.source_dirs))
+                if (meta is None or meta.get('version') != INDEX_VERSION
+                        or meta.get('source_fingerprint') != fingerprint):
+                    meta = build_index(str(self.index_dir), self.source_dirs)
+            if meta is None:
+                raise FileNotFoundError(f"本地BM25索引不存在: {self.index_dir}")
+
+            self.meta = meta
+            self.k1 = meta['k1']
+            self.num_docs = meta['num_docs']
+            self.term_offsets = np.load(self.index_dir / 'term_offsets.npy', mmap_mode='r')
+            self.postings_docs = np.load(self.index_dir / 'postings_docs.npy', mmap_mode='r')
+            self.postings_tfs = np.load(self.index_dir / 'postings_tfs.npy', mmap_mode='r')
+            self.content_offsets = np.load(self.index_dir / 'content_offsets.npy', mmap_mode='r')
+            content_path = self.index_dir / 'content.bin'
+            self.content = (np.memmap(content_path, dtype=np.uint8, mode='r')
+                            if content_path.stat().st_size else np.zeros(0, dtype=np.uint8))
+
+            # 文档长度归一化项 k1 * (1 - b + b * dl / avgdl)，每个文档一个数，查询时直接复用
+            doc_lengths = np.load(self.index_dir / 'doc_lengths.npy', mmap_mode='r')
+            avgdl = meta['avgdl'] or 1.0
+            self.length_norm = (self.k1 * (1 - meta['b'] + meta['b'] * doc_lengths / avgdl)).astype(np.float32)
+
+            with open(self.index_dir / 'terms.json', 'r', encoding='utf-8') as f:
+                self.term_ids = {term: term_id for term_id, term in enumerate(json.load(f))}
+            with open(self.index_dir / 'docs.json', 'r', encoding='utf-8') as f:
+                self.docs = json.load(f)
+
+            self._loaded = True
+            logger.info(f"📚 加载本地BM25索引: {self.num_docs} 个文档, {len(self.term_ids)} 个词 ({self.index_dir})")
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _doc_text(self, doc_index: int) -> str:
+        start, end = int(self.content_offsets[doc_index]), int(self.content_offsets[doc_index + 1])
+        return bytes(self.content[start:end]).decode('utf-8', errors='replace')
+
+    def rank(self, query: str, max_results: int = 5) -> List[Tuple[int, float, float]]:
+        """
+        BM25排序
+
+        Returns:
+            [(文档序号, BM25得分, 查询词覆盖率)]，按得分降序
+        """
+        self._ensure_loaded()
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        query_terms = [self.term_ids[term] for term in query_tokens if term in self.term_ids]
+        if not query_terms or self.num_docs == 0:
+            return []
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = np.zeros(self.num_docs, dtype=np.int16)
+        for term_id in query_terms:
+            start, end = int(self.term_offsets[term_id]), int(self.term_offsets[term_id + 1])
+            doc_indices = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            scores[doc_indices] += idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[doc_indices])
+            matched[doc_indices] += 1
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > max_results:
+            candidates = candidates[np.argpartition(-scores[candidates], max_results - 1)[:max_results]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(i), float(scores[i]), float(matched[i]) / len(query_tokens)) for i in candidates]
+
+    def search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        """
+        检索本地语料
+
+        Returns:
+            与web_search相同结构的结果；每个结果额外带 score / coverage / doc_id / source，
+            content为文档中与查询最相关的段落
+        """
+        start_time = time.time()
+        try:
+            ranked = self.rank(query, max_results=max_results)
+        except Exception as e:
+            logger.error(f"❌ 本地BM25检索失败: {e}")
+            return {
+                'query': query,
+                'results': [],
+                'total_results': 0,
+                'search_time': time.time(),
+                'status': 'failed',
+                'error': str(e),
+                'provider': PROVIDER
+            }
+
+        query_tokens = set(tokenize(query))
+        results = []
+        for doc_index, score, coverage in ranked:
+            doc = self.docs[doc_index]
+            passage = _best_passage(self._doc_text(doc_index), query_tokens)
+            results.append({
+                'title': doc['title'],
+                'url': f"local://{doc['source']}/{doc['doc_id']}",
+                'content': passage,
+                'snippet': passage[:200] + '...' if len(passage) > 200 else passage,
+                'score': round(score, 4),
+                'coverage': round(coverage, 4),
+                'doc_id': doc['doc_id'],
+                'source': doc['source']
+            })
+
+        elapsed = time.time() - start_time
+        with self._lock:
+            self.stats['queries'] += 1
+            self.stats['empty_results'] += 0 if results else 1
+            self.stats['total_search_time'] += elapsed
+
+        logger.info(f"📚 本地BM25检索完成: {query} -> {len(results)} 个结果 ({elapsed * 1000:.1f}ms)")
+        return {
+            'query': query,
+            'results': results,
+            'total_results': len(results),
+            'search_time': time.time(),
+            'status': 'success',
+            'output_text': '\n\n'.join(result['content'] for result in results),
+            'provider': PROVIDER
+        }
+
+    def __call__(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        return self.search(query, max_results=max_results)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['backend'] = PROVIDER
+        stats['avg_search_ms'] = stats['total_search_time'] / stats['queries'] * 1000 if stats['queries'] else 0.0
+        if self._loaded:
+            stats['num_docs'] = self.num_docs
+            stats['num_terms'] = len(self.term_ids)
+        return stats
+
+
+def _best_passage(text: str, query_tokens: set, max_chars: int = 800) -> str:
+    """把文档按行切成不超过max_chars的段落，返回包含最多不同查询词的一段"""
+    chunks, current = [], ''
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f"{current} {line}".strip() if current else line[:max_chars]
+    if current:
+        chunks.append(current)
+    if not chunks:
+        return ''
+
+    def chunk_score(chunk: str) -> Tuple[int, int]:
+        tokens = tokenize(chunk)
+        return len(query_tokens.intersection(tokens)), sum(1 for token in tokens if token in query_tokens)
+
+    return max(chunks, key=chunk_score)
+
+
+class LocalFirstSearchClient:
+    """
+    远程搜索前的本地预筛选：本地最佳结果的查询词覆盖率达到min_coverage时直接返回本地结果，
+    否则调用远程search_client（如 CachedSearchClient(web_search)）
+    """
+
+    def __init__(self, remote_search_fn: Callable[..., Dict[str, Any]],
+                 local_search: Optional[LocalBM25Search] = None,
+                 min_coverage: float = DEFAULT_MIN_COVERAGE):
+        self.remote_search_fn = remote_search_fn
+        self.local_search = local_search or get_local_search_client()
+        self.min_coverage = min_coverage
+
+        self._lock = threading.Lock()
+        self.stats = {'local_answered': 0, 'remote_fallbacks': 0}
+
+    def __call__(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        local_result = self.local_search.search(query, max_results=max_results)
+        results = local_result.get('results') or []
+        if local_result.get('status') == 'success' and results and results[0]['coverage'] >= self.min_coverage:
+            with self._lock:
+                self.stats['local_answered'] += 1
+            return local_result
+
+        with self._lock:
+            self.stats['remote_fallbacks'] += 1
+        return self.remote_search_fn(query, max_results=max_results, **kwargs)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['min_coverage'] = self.min_coverage
+        stats['local'] = self.local_search.get_statistics()
+        if hasattr(self.remote_search_fn, 'get_statistics'):
+            stats['remote'] = self.remote_search_fn.get_statistics()
+        return stats
+
+
+# 全局共享实例
+_shared_search: Optional[LocalBM25Search] = None
+_shared_lock = threading.Lock()
+
+
+def get_local_search_client() -> LocalBM25Search:
+    """获取全局共享的本地检索实例（索引只加载一次）"""
+    global _shared_search
+    if _shared_search is None:
+        with _shared_lock:
+            if _shared_search is None:
+                _shared_search = LocalBM25Search()
+    return _shared_search
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="本地BM25检索索引")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR, help='索引目录')
+    parser.add_argument('--rebuild', action='store_true', help='强制重建索引')
+    parser.add_argument('--query', help='执行一次查询并打印结果')
+    parser.add_argument('--max-results', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build_index(args.index_dir)
+    if args.query:
+        search_result = LocalBM25Search(index_dir=args.index_dir).search(args.query, max_results=args.max_results)
+        for rank, item in enumerate(search_result['results'], 1):
+            print(f"{rank}. [{item['score']:.2f}] {item['title']} ({item['url']})")
+            print(f"   {item['snippet']}")
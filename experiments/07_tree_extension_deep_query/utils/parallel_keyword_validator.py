@@ -5,12 +5,14 @@
 """
 
 import time
-import json
 import logging
 from typing import List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 
+from core.llm_clients.metering import metered_stage
+from core.llm_clients.structured_output import parse_json_response
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -97,6 +99,7 @@ class ParallelKeywordValidator:
         
         return necessary_keywords
     
+    @metered_stage("keyword_validation", override=True)
     def _validate_single_keyword(self, keyword, query_text: str, answer: str) -> KeywordValidationResult:
         """
         验证单个关键词的必要性
@@ -149,7 +152,8 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             response = self.api_client.generate_response(
                 prompt=masking_prompt,
                 temperature=0.2,
-                max_tokens=400
+                max_tokens=400,
+                response_schema="keyword_necessity"
             )
             
             parsed_data = self._parse_json_response(response)
@@ -191,23 +195,10 @@ Mask the keyword "{keyword.keyword}" from the query and check if the remaining k
             )
     
     def _parse_json_response(self, response: str) -> Optional[Dict]:
-        """解析JSON响应"""
-        try:
-            # 尝试找到JSON部分
-            if '{' in response and '}' in response:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                json_str = response[start:end]
-                return json.loads(json_str)
-            else:
-                logger.warning("Response does not contain valid JSON")
-                return None
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON response: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error parsing response: {e}")
-            return None
+        """解析JSON响应（计入keyword_necessity调用点的解析统计）"""
+        parsed = parse_json_response(response, "keyword_necessity",
+                                     structured=self.api_client.uses_structured_output("keyword_necessity"))
+        return parsed if isinstance(parsed, dict) else None
 
 def create_parallel_validator(api_client, max_workers: int = 3) -> ParallelKeywordValidator:
     """
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+文档结果日志 (Result Journal)
+生产运行时每完成一个文档就向JSONL文件追加一行，崩溃后重启可跳过已完成文档；
+最终JSON从日志流式生成，运行期间不必在内存中保留所有文档的推理树和轨迹
+"""
+
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'        # 框架返回失败结果
+STATUS_EXCEPTION = 'exception'  # 处理过程中抛出异常
+
+# 写最终JSON时占位，之后替换为从日志流式写出的列表
+_DOCUMENTS_PLACEHOLDER = '__RESULT_JOURNAL_DOCUMENTS__'
+
+
+class ResultJournal:
+    """
+    追加写入的文档结果日志（线程安全）
+
+    每行一个文档：{'doc_id', 'status', 'processing_time', 'finished_at', 'document' | 'error'}
+    同一文档出现多次时以最后一行为准（失败的文档重启后会重试）
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, int] = {}
+        self._statuses: Dict[str, str] = {}
+        self._partial_tail = False
+        self._load_index()
+
+    def _load_index(self):
+        """建立 doc_id -> 最新一行偏移量 的索引；截掉崩溃时写了一半的末行，中间无法解析的行跳过"""
+        if not self.path.exists():
+            return
+
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 只有文件末行可能没有换行符
+                    logger.warning(f"结果日志末尾存在不完整记录，已截断: {self.path} (偏移 {offset})")
+                    break
+                try:
+                    entry = json.loads(line)
+                    doc_id = entry['doc_id']
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"结果日志中存在无法解析的记录，已跳过: {self.path} (偏移 {offset})")
+                else:
+                    self._offsets[doc_id] = offset
+                    self._statuses[doc_id] = entry.get('status', STATUS_FAILED)
+                offset += len(line)
+                valid_end = offset
+
+        if valid_end < self.path.stat().st_size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+
+        if self._offsets:
+            logger.info(f"📒 加载结果日志: {self.path} ({len(self.completed_ids())}/{len(self._offsets)} 个文档已成功)")
+
+    def completed_ids(self) -> Set[str]:
+        """已成功完成的文档ID"""
+        with self._lock:
+            return {doc_id for doc_id, status in self._statuses.items() if status == STATUS_SUCCESS}
+
+    def append(self, entry: Dict[str, Any]):
+        """追加一个文档的结果（写入并fsync后才返回）；写入失败时截回写入前的长度，不在文件中留下半行"""
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 不带缓冲：写入失败截回后，关闭文件时不会再把缓冲区中的残余刷进去
+            with open(self.path, 'ab', buffering=0) as f:
+                offset = f.seek(0, os.SEEK_END)
+                if self._partial_tail:
+                    # 上次失败的写入未能截回，先补换行，让半行单独成行（加载时跳过）
+                    line = b'\n' + line
+                try:
+                    data = memoryview(line)
+                    while data:
+                        data = data[f.write(data):]
+                    os.fsync(f.fileno())
+                except OSError:
+                    self._rollback(f, offset)
+                    raise
+            if self._partial_tail:
+                offset += 1
+                self._partial_tail = False
+            self._offsets[entry['doc_id']] = offset
+            self._statuses[entry['doc_id']] = entry.get('status', STATUS_FAILED)
+
+    def _rollback(self, f, offset: int):
+        """把文件截回offset；截断也失败时记下末尾可能有半行"""
+        try:
+            f.truncate(offset)
+        except OSError as e:
+            logger.warning(f"结果日志写入失败且无法截回: {self.path} ({e})")
+            self._partial_tail = True
+
+    def entries(self, doc_ids: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """按doc_ids顺序（默认按首次写入顺序）逐个读取每个文档的最新记录，未出现在日志中的ID跳过"""
+        with self._lock:
+            offsets = dict(self._offsets)
+        order = list(doc_ids) if doc_ids is not None else list(offsets)
+
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            for doc_id in order:
+                offset = offsets.get(doc_id)
+                if offset is None:
+                    continue
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def summarize(self, doc_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """流式汇总统计与错误列表（不保留推理树）"""
+        summary = {
+            'successful_documents': 0,
+            'failed_documents': 0,
+            'total_reasoning_trees': 0,
+            'total_composite_queries': 0,
+            'processing_times': [],
+            'errors': []
+        }
+        for entry in self.entries(doc_ids):
+            if entry.get('processing_time') is not None and entry.get('status') != STATUS_EXCEPTION:
+                summary['processing_times'].append(entry['processing_time'])
+            if entry.get('status') == STATUS_SUCCESS:
+                document = entry.get('document', {})
+                summary['successful_documents'] += 1
+                summary['total_reasoning_trees'] += document.get('total_trees', 0)
+                summary['total_composite_queries'] += document.get('total_composite_queries', 0)
+            else:
+                summary['failed_documents'] += 1
+                summary['errors'].append({
+                    'doc_id': entry['doc_id'],
+                    'error': entry.get('error', 'Unknown error'),
+                    'processing_time': entry.get('processing_time', 0)
+                })
+        return summary
+
+    def write_results_json(self, output_path: Union[str, Path], results: Dict[str, Any],
+                           container: Dict[str, Any], doc_ids: Optional[List[str]] = None):
+        """
+        写最终结果JSON，container['processed_documents'] 从日志中成功的文档流式写出
+
+        Args:
+            output_path: 输出文件
+            results: 完整结果字典
+            container: results中存放processed_documents的字典（会被临时修改）
+            doc_ids: 文档顺序（默认按日志写入顺序）
+        """
+        container['processed_documents'] = _DOCUMENTS_PLACEHOLDER
+        try:
+            text = json.dumps(results, indent=2, ensure_ascii=False, default=str)
+        finally:
+            container.pop('processed_documents', None)
+        prefix, suffix = text.split(json.dumps(_DOCUMENTS_PLACEHOLDER), 1)
+
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(prefix)
+            f.write('[')
+            first = True
+            for entry in self.entries(doc_ids):
+                if entry.get('status') != STATUS_SUCCESS:
+                    continue
+                if not first:
+                    f.write(',')
+                f.write('\n')
+                json.dump(entry['document'], f, ensure_ascii=False, default=str)
+                first = False
+            f.write('\n]' if not first else ']')
+            f.write(suffix)
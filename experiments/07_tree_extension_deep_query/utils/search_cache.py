@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Web Search Cache - 持久化Web搜索结果缓存
+按规范化查询寻址，SQLite存储，带TTL过期和按条目数/字节数的LRU淘汰；
+CachedSearchClient 包装任意 search_client 可调用对象，框架代码无需改动
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from core.llm_clients.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存位置、有效期与容量（可通过环境变量覆盖）
+DEFAULT_CACHE_PATH = os.getenv(
+    'WEB_SEARCH_CACHE_PATH',
+    str(Path(__file__).parent.parent.parent.parent / '.cache' / 'web_search.sqlite')
+)
+DEFAULT_TTL_SECONDS = float(os.getenv('WEB_SEARCH_CACHE_TTL_HOURS', '168')) * 3600
+DEFAULT_MAX_ENTRIES = int(os.getenv('WEB_SEARCH_CACHE_MAX_ENTRIES', '20000'))
+DEFAULT_MAX_BYTES = int(os.getenv('WEB_SEARCH_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：小写、合并空白、去掉首尾标点"""
+    query = re.sub(r'\s+', ' ', (query or '').lower()).strip()
+    return query.strip(' .,;:!?"\'')
+
+
+def make_search_cache_key(query: str, namespace: str = 'openai_web_search') -> str:
+    """生成缓存键（SHA-256）；namespace区分不同搜索后端"""
+    key_data = json.dumps({'namespace': namespace, 'query': normalize_query(query)},
+                          ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+class WebSearchCache:
+    """基于SQLite的带TTL的LRU搜索结果缓存（线程安全）"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 bypass: bool = False):
+        """
+        Args:
+            path: SQLite文件路径
+            ttl_seconds: 结果有效期（秒），<=0 表示永不过期
+            max_entries: 最大条目数
+            max_bytes: 最大存储字节数
+            bypass: True时不读不写
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """延迟打开数据库"""
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                "key TEXT PRIMARY KEY, query TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_last_access ON search_results(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期返回None"""
+        if self.bypass:
+            return None
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                row = conn.execute(
+                    "SELECT value, created_at FROM search_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                now = time.time()
+                if self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM search_results WHERE key = ?", (key,))
+                    conn.commit()
+                    self.stats['expired'] += 1
+                    self.stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE search_results SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.stats['hits'] += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning(f"读取搜索缓存失败: {e}")
+                self.stats['misses'] += 1
+                return None
+
+    def put(self, key: str, query: str, value: Dict[str, Any]):
+        """写入缓存并按LRU淘汰"""
+        if self.bypass:
+            return
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_results (key, query, value, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, normalize_query(query), data, len(data.encode('utf-8')), now, now)
+                )
+                self.stats['writes'] += 1
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入搜索缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """先删除过期条目，再淘汰最久未访问的条目，直到满足容量限制"""
+        if self.ttl_seconds > 0:
+            deleted = conn.execute(
+                "DELETE FROM search_results WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self.stats['evictions'] += max(deleted, 0)
+
+        count, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_results"
+        ).fetchone()
+        while count > self.max_entries or total_bytes > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM search_results ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM search_results WHERE key = ?", (row[0],))
+            count -= 1
+            total_bytes -= row[1]
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM search_results")
+            conn.commit()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['bypass'] = self.bypass
+        stats['ttl_hours'] = self.ttl_seconds / 3600
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedSearchClient:
+    """
+    带缓存的search_client包装：签名与被包装的搜索函数相同 (query, max_results=5, **kwargs)
+
+    只缓存 status == 'success' 的结果；并发的相同查询只发出一次请求
+    """
+
+    def __init__(self, search_fn: Callable[..., Dict[str, Any]],
+                 cache: Optional[WebSearchCache] = None,
+                 namespace: str = 'openai_web_search'):
+        self.search_fn = search_fn
+        self.cache = cache or get_search_cache()
+        self.namespace = namespace
+        self._single_flight = SingleFlight()
+
+    def __call__(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        key = make_search_cache_key(query, self.namespace)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"🗄️ 搜索缓存命中: {query}")
+            cached['cache_hit'] = True
+            return cached
+
+        def _search():
+            result = self.search_fn(query, max_results=max_results, **kwargs)
+            if result and result.get('status') == 'success':
+                self.cache.put(key, query, result)
+            return result
+
+        result, shared = self._single_flight.do(key, _search)
+        # 合并的调用者拿到的是同一个字典，复制一份避免相互修改
+        return copy.deepcopy(result) if shared else result
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats = self.cache.get_statistics()
+        stats['coalesced'] = self._single_flight.stats['coalesced']
+        return stats
+
+
+# 全局共享实例
+_shared_cache: Optional[WebSearchCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_search_cache() -> WebSearchCache:
+    """获取全局共享的搜索缓存（WEB_SEARCH_CACHE_BYPASS=1 时默认旁路）"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                bypass = os.getenv('WEB_SEARCH_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+                _shared_cache = WebSearchCache(bypass=bypass)
+    return _shared_cache
@@ -6,7 +6,6 @@ Extracts objective facts (nouns, numbers, names, dates, locations) from document
 import logging
 import json
 import re
-import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
@@ -24,6 +23,8 @@ except ImportError:
     from document_loader import DocumentData
     from config import get_config
 
+from core.llm_clients.structured_output import parse_json_response
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -182,13 +183,12 @@ Focus on extracting clear, factual information that can serve as definitive answ
     def _call_llm_for_answer_location(self, prompt: str) -> str:
         """Call LLM API for answer location"""
         try:
-            # Rate limiting
-            time.sleep(0.5)
-            
+            # Rate limits are enforced by the client's shared limiter
             response = self.api_client.generate_response(
                 prompt=prompt,
                 temperature=0.2,  # Low temperature for consistent extraction
-                max_tokens=800
+                max_tokens=800,
+                response_schema="answer_location"
             )
             
             return response
@@ -200,14 +200,11 @@ Focus on extracting clear, factual information that can serve as definitive answ
     def _parse_answer_location_response(self, doc_id: str, response: str) -> List[ShortAnswer]:
         """Parse LLM response for short answers"""
         try:
-            # Extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_text = response[json_start:json_end]
-                answer_data = json.loads(json_text)
-            else:
+            # Structured output returns plain JSON; free-text responses are repaired if possible
+            answer_data = parse_json_response(
+                response, "answer_location",
+                structured=self.api_client.uses_structured_output("answer_location"))
+            if not isinstance(answer_data, dict):
                 # Fallback parsing
                 answer_data = self._fallback_parse_answers(response)
             
@@ -387,7 +384,7 @@ def test_short_answer_locator():
     """Test function for short answer locator"""
     # Mock API client for testing
     class MockAPIClient:
-        def generate_response(self, prompt, temperature=0.2, max_tokens=800):
+        def generate_response(self, prompt, temperature=0.2, max_tokens=800, **kwargs):
             return '''
             {
                 "short_answers": [
@@ -6,11 +6,195 @@ Provides web search functionality using OpenAI's web_search_preview tool.
 import logging
 import json
 import time
-from typing import Dict, List, Optional, Any
+import threading
+import functools
+from typing import Callable, Dict, List, Optional, Any
 import openai
 
+from core.llm_clients.http_transport import openai_base_url
+from core.llm_clients.key_pool import PooledKey, get_key_pool
+from core.llm_clients.rate_limiter import estimate_request_tokens
+from core.llm_clients.async_support import map_with_provider_limit
+
 logger = logging.getLogger(__name__)
 
+SEARCH_MODEL = "gpt-4.1"  # 支持web search的模型
+
+
+def _build_search_input(query: str) -> str:
+    return f"Search for information about: {query}. Provide comprehensive details and relevant facts."
+
+
+class WebSearchClient:
+    """
+    可复用的OpenAI Web搜索客户端
+    
+    持有长期存在的openai.OpenAI实例（复用其连接池）；与OpenAIClient共用OpenAI的key池，
+    每次请求从池中分配key并在该key的限流器上获取额度，429/认证失败反馈给key池；
+    search_many 在提供商并发限制内并发执行一批查询
+    """
+    
+    def __init__(self, api_key: str = None):
+        """
+        Args:
+            api_key: OpenAI API key，与OPENAI_API_KEYS / OPENAI_API_KEY中的key合并为key池
+        """
+        self.key_pool = get_key_pool("openai", [api_key] if api_key else None)
+        # OPENAI_BASE_URL可指向stub服务器
+        self.client = openai.OpenAI(api_key=self.key_pool.primary_key, base_url=openai_base_url())
+        self._key_clients: Dict[str, openai.OpenAI] = {self.key_pool.primary_key: self.client}
+    
+    def _client_for(self, pooled_key: PooledKey) -> openai.OpenAI:
+        """使用指定key的客户端（与主客户端共享HTTP连接池）"""
+        client = self._key_clients.get(pooled_key.key)
+        if client is None:
+            client = self.client.with_options(api_key=pooled_key.key)
+            self._key_clients[pooled_key.key] = client
+        return client
+    
+    def search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        """
+        Perform web search using OpenAI's web_search_preview tool
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return (not directly used but kept for compatibility)
+            
+        Returns:
+            Dictionary with search results in standardized format
+        """
+        try:
+            logger.info(f"🔍 执行OpenAI Web Search: {query}")
+            
+            search_input = _build_search_input(query)
+            estimated_tokens = estimate_request_tokens(search_input, model=SEARCH_MODEL)
+            pooled_key = self.key_pool.acquire(estimated_tokens)
+            
+            # 使用Responses API + web_search_preview工具 (官方文档标准实现)
+            try:
+                response = self._client_for(pooled_key).responses.create(
+                    model=SEARCH_MODEL,
+                    tools=[{"type": "web_search_preview"}],
+                    input=search_input
+                )
+            except openai.RateLimitError as e:
+                self.key_pool.on_rate_limited(pooled_key, e.response.headers)
+                raise
+            except (openai.AuthenticationError, openai.PermissionDeniedError) as e:
+                self.key_pool.on_auth_error(pooled_key, e.status_code)
+                raise
+            usage = getattr(response, 'usage', None)
+            self.key_pool.record_usage(pooled_key, estimated_tokens, getattr(usage, 'total_tokens', 0) or 0)
+            
+            # 解析Responses API响应 (按官方文档格式)
+            search_results = []
+            web_search_calls = []
+            output_text = ""
+            citations = []
+            
+            # 处理响应中的各个部分
+            for item in response.output:
+                if item.type == "web_search_call":
+                    web_search_calls.append({
+                        'id': item.id,
+                        'status': item.status,
+                        'action': getattr(item, 'action', 'search')
+                    })
+                    logger.info(f"✅ Web search call: {item.id} - {item.status}")
+                    
+                elif item.type == "message":
+                    if hasattr(item, 'content') and item.content:
+                        for content_item in item.content:
+                            if content_item.type == "output_text":
+                                output_text = content_item.text
+                                
+                                # 提取引用信息
+                                if hasattr(content_item, 'annotations') and content_item.annotations:
+                                    for annotation in content_item.annotations:
+                                        if annotation.type == "url_citation":
+                                            citations.append({
+                                                'url': annotation.url,
+                                                'title': getattr(annotation, 'title', ''),
+                                                'start_index': annotation.start_index,
+                                                'end_index': annotation.end_index
+                                            })
+            
+            # 构建搜索结果（从引用中创建结果项）
+            unique_urls = {}
+            for citation in citations:
+                url = citation['url']
+                if url not in unique_urls:
+                    # 提取引用对应的文本内容
+                    start_idx = citation.get('start_index', 0)
+                    end_idx = citation.get('end_index', len(output_text))
+                    content_snippet = output_text[start_idx:end_idx] if start_idx and end_idx else citation['title']
+                    
+                    unique_urls[url] = {
+                        'title': citation['title'] or f'Search result for {query}',
+                        'url': url,
+                        'content': content_snippet,
+                        'snippet': content_snippet[:200] + '...' if len(content_snippet) > 200 else content_snippet
+                    }
+            
+            search_results = list(unique_urls.values())
+            
+            # 如果没有提取到具体的结果，但有输出文本，创建一个通用结果
+            if not search_results and output_text:
+                search_results = [{
+                    'title': f'Web Search Results for: {query}',
+                    'content': output_text,
+                    'url': 'https://openai.com/web-search',
+                    'snippet': output_text[:200] + '...' if len(output_text) > 200 else output_text
+                }]
+            
+            result = {
+                'query': query,
+                'results': search_results,
+                'total_results': len(search_results),
+                'search_time': time.time(),
+                'status': 'success',
+                'output_text': output_text,
+                'citations': citations,
+                'web_search_calls': web_search_calls,
+                'provider': 'openai_responses_api_web_search',
+                'model_used': SEARCH_MODEL
+            }
+            
+            logger.info(f"✅ OpenAI Web Search完成: {len(search_results)} 个结果, {len(citations)} 个引用")
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ OpenAI Web Search失败: {e}")
+            # 直接返回失败，不使用mock数据避免污染
+            return {
+                'query': query,
+                'results': [],
+                'total_results': 0,
+                'search_time': time.time(),
+                'status': 'failed',
+                'error': str(e),
+                'provider': 'openai_responses_api_web_search'
+            }
+    
+    def search_many(self, queries: List[str], max_results: int = 5) -> List[Dict[str, Any]]:
+        """并发执行一批搜索，结果顺序与queries一致"""
+        return search_many(queries, max_results=max_results, search_fn=self.search)
+
+
+_clients: Dict[Optional[str], WebSearchClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_web_search_client(api_key: str = None) -> WebSearchClient:
+    """获取按API key共享的搜索客户端"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = WebSearchClient(api_key=api_key)
+            _clients[api_key] = client
+        return client
+
+
 def web_search(query: str, max_results: int = 5, api_key: str = None) -> Dict[str, Any]:
     """
     Perform web search using OpenAI's web_search_preview tool
@@ -24,101 +208,9 @@ def web_search(query: str, max_results: int = 5, api_key: str = None) -> Dict[st
         Dictionary with search results in standardized format
     """
     try:
-        logger.info(f"🔍 执行OpenAI Web Search: {query}")
-        
-        # 初始化OpenAI客户端
-        if api_key:
-            client = openai.OpenAI(api_key=api_key)
-        else:
-            client = openai.OpenAI()  # 使用环境变量中的API key
-        
-        # 使用Responses API + web_search_preview工具 (官方文档标准实现)
-        response = client.responses.create(
-            model="gpt-4.1",  # 支持web search的模型
-            tools=[{"type": "web_search_preview"}],
-            input=f"Search for information about: {query}. Provide comprehensive details and relevant facts."
-        )
-        
-        # 解析Responses API响应 (按官方文档格式)
-        search_results = []
-        web_search_calls = []
-        output_text = ""
-        citations = []
-        
-        # 处理响应中的各个部分
-        for item in response.output:
-            if item.type == "web_search_call":
-                web_search_calls.append({
-                    'id': item.id,
-                    'status': item.status,
-                    'action': getattr(item, 'action', 'search')
-                })
-                logger.info(f"✅ Web search call: {item.id} - {item.status}")
-                
-            elif item.type == "message":
-                if hasattr(item, 'content') and item.content:
-                    for content_item in item.content:
-                        if content_item.type == "output_text":
-                            output_text = content_item.text
-                            
-                            # 提取引用信息
-                            if hasattr(content_item, 'annotations') and content_item.annotations:
-                                for annotation in content_item.annotations:
-                                    if annotation.type == "url_citation":
-                                        citations.append({
-                                            'url': annotation.url,
-                                            'title': getattr(annotation, 'title', ''),
-                                            'start_index': annotation.start_index,
-                                            'end_index': annotation.end_index
-                                        })
-        
-        # 构建搜索结果（从引用中创建结果项）
-        unique_urls = {}
-        for citation in citations:
-            url = citation['url']
-            if url not in unique_urls:
-                # 提取引用对应的文本内容
-                start_idx = citation.get('start_index', 0)
-                end_idx = citation.get('end_index', len(output_text))
-                content_snippet = output_text[start_idx:end_idx] if start_idx and end_idx else citation['title']
-                
-                unique_urls[url] = {
-                    'title': citation['title'] or f'Search result for {query}',
-                    'url': url,
-                    'content': content_snippet,
-                    'snippet': content_snippet[:200] + '...' if len(content_snippet) > 200 else content_snippet
-                }
-        
-        search_results = list(unique_urls.values())
-        
-        # 如果没有提取到具体的结果，但有输出文本，创建一个通用结果
-        if not search_results and output_text:
-            search_results = [{
-                'title': f'Web Search Results for: {query}',
-                'content': output_text,
-                'url': 'https://openai.com/web-search',
-                'snippet': output_text[:200] + '...' if len(output_text) > 200 else output_text
-            }]
-        
-        result = {
-            'query': query,
-            'results': search_results,
-            'total_results': len(search_results),
-            'search_time': time.time(),
-            'status': 'success',
-            'output_text': output_text,
-            'citations': citations,
-            'web_search_calls': web_search_calls,
-            'provider': 'openai_responses_api_web_search',
-            'model_used': 'gpt-4.1'
-        }
-        
-        logger.info(f"✅ OpenAI Web Search完成: {len(search_results)} 个结果, {len(citations)} 个引用")
-        return result
-        
+        client = get_web_search_client(api_key)
     except Exception as e:
         logger.error(f"❌ OpenAI Web Search失败: {e}")
-        # 直接返回失败，不使用mock数据避免污染
         return {
             'query': query,
             'results': [],
@@ -128,6 +220,28 @@ def web_search(query: str, max_results: int = 5, api_key: str = None) -> Dict[st
             'error': str(e),
             'provider': 'openai_responses_api_web_search'
         }
+    return client.search(query, max_results=max_results)
+
+
+def search_many(queries: List[str], max_results: int = 5, api_key: str = None,
+                search_fn: Optional[Callable[..., Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    并发执行一批搜索（受提供商并发限制，请求额度由OpenAI key池中各key的限流器控制）
+    
+    Args:
+        queries: 查询列表
+        max_results: 每个查询的最大结果数
+        api_key: OpenAI API key（未提供search_fn时使用）
+        search_fn: 任意search_client可调用对象 (query, max_results=...)，默认为web_search
+        
+    Returns:
+        与queries顺序一致的结果列表
+    """
+    if search_fn is None:
+        search_fn = functools.partial(web_search, api_key=api_key)
+    return map_with_provider_limit(
+        "openai", lambda query: search_fn(query, max_results=max_results), list(queries)
+    )
 
 # 移除了fallback mock search函数 - 不再使用假数据污染结果
 
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+HTTP Transport Benchmark
+对比连接复用（共享连接池）与每次请求新建连接（旧的requests.post行为）的耗时
+
+启动一个本地stub服务器模拟OpenAI chat completions接口，不会访问真实API。
+可用 --handshake-delay 模拟TLS握手开销（每个新连接在服务端额外等待）。
+
+用法:
+    python tools/benchmarks/http_transport_benchmark.py --requests 200 --workers 8
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+from core.llm_clients.http_transport import HTTPTransport
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    """模拟chat completions接口，支持HTTP/1.1 keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    # 避免keep-alive下Nagle与delayed ACK叠加造成的40ms停顿
+    disable_nagle_algorithm = True
+    handshake_delay = 0.0
+    response_delay = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubChatHandler.lock:
+            StubChatHandler.connections += 1
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if self.response_delay:
+            time.sleep(self.response_delay)
+
+        body = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": "stub answer"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(handshake_delay: float, response_delay: float):
+    """在后台线程启动stub服务器"""
+    StubChatHandler.handshake_delay = handshake_delay
+    StubChatHandler.response_delay = response_delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubChatHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_mode(name: str, post_fn, url: str, num_requests: int, workers: int):
+    """运行一种模式并统计延迟"""
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "ping"}], "max_tokens": 8}
+    headers = {"Content-Type": "application/json", "Authorization": "Bearer stub"}
+
+    with StubChatHandler.lock:
+        StubChatHandler.connections = 0
+
+    def one_call(_):
+        start = time.perf_counter()
+        response = post_fn(url, headers=headers, json=payload, timeout=30)
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = sorted(executor.map(one_call, range(num_requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        'mode': name,
+        'requests': num_requests,
+        'wall_time': wall,
+        'throughput': num_requests / wall if wall > 0 else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'connections': StubChatHandler.connections
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP连接池基准测试")
+    parser.add_argument('--requests', type=int, default=200, help='每种模式的请求数')
+    parser.add_argument('--workers', type=int, default=8, help='并发线程数')
+    parser.add_argument('--pool-size', type=int, default=16, help='连接池大小')
+    parser.add_argument('--handshake-delay', type=float, default=0.02, help='每个新连接的模拟握手延迟（秒）')
+    parser.add_argument('--response-delay', type=float, default=0.0, help='每个请求的模拟处理延迟（秒）')
+    args = parser.parse_args()
+
+    server = start_stub_server(args.handshake_delay, args.response_delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    print("🚀 HTTP Transport Benchmark")
+    print(f"   stub: {url}")
+    print(f"   requests={args.requests}, workers={args.workers}, pool_size={args.pool_size}, "
+          f"handshake_delay={args.handshake_delay}s")
+
+    pooled = HTTPTransport(pool_maxsize=args.pool_size, per_host_limit=args.pool_size)
+    results = [
+        run_mode('per-call requests.post', requests.post, url, args.requests, args.workers),
+        run_mode('pooled HTTPTransport', pooled.post, url, args.requests, args.workers),
+    ]
+    pooled.close()
+    server.shutdown()
+
+    print()
+    print(f"{'mode':<26}{'wall(s)':>10}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'conns':>8}")
+    for r in results:
+        print(f"{r['mode']:<26}{r['wall_time']:>10.2f}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['connections']:>8}")
+
+    speedup = results[0]['wall_time'] / results[1]['wall_time'] if results[1]['wall_time'] > 0 else 0.0
+    print(f"\n✅ 连接复用加速比: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Keyword Fusion A/B
+对比实验07关键词步骤的多次调用路径（A）与融合模式（B, fused_keyword_mode）：
+在固定的文档样本上，对同一批Root Query分别运行两条路径，比较得到的关键词集合与LLM调用数
+
+- step2: _step2_extract_minimal_keywords（候选提取 + 逐个关键词掩码测试 vs 一次融合调用）
+- minimize: _optimize_minimal_keywords_precisely（逐个关键词答案唯一性测试 vs 一次融合调用），
+  输入为Root Query的关键词与A路径step2关键词的并集
+
+Root Query 由多次调用路径的Step 1生成一次，两条路径共用；文档按文件名排序后取前 --docs 篇。
+调用数来自 core.llm_clients.metering 的调用记录（calls含缓存命中，api_calls不含）。
+搜索默认使用本地BM25索引（utils/local_search.py），不产生Web搜索请求。
+
+用法:
+    python tools/benchmarks/keyword_fusion_ab.py --docs 5 --output keyword_fusion_ab.json
+    python tools/benchmarks/keyword_fusion_ab.py --llm-replay=.cache/llm_recordings.jsonl
+    python tools/benchmarks/keyword_fusion_ab.py --stub --docs 3      # 只比较调用数（stub返回的内容无意义）
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+project_root = Path(__file__).parent.parent.parent
+experiment_dir = project_root / "experiments" / "07_tree_extension_deep_query"
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(experiment_dir))
+
+STUB_API_KEY = "stub-offline-key"
+
+
+def _normalize(keywords: List[str]) -> List[str]:
+    return sorted({keyword.strip().lower() for keyword in keywords if keyword and keyword.strip()})
+
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    set_a, set_b = set(a), set(b)
+    if not set_a and not set_b:
+        return 1.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+def _count_calls(meter, mark: int) -> Dict[str, int]:
+    records = meter.records(since=mark)
+    return {
+        'calls': len(records),
+        'api_calls': sum(1 for r in records if not r.cache_hit and not r.coalesced)
+    }
+
+
+def _run_path(framework, meter, fused: bool, func):
+    """在指定模式下运行func，返回 (结果, 调用数)"""
+    framework.fused_keyword_mode = fused
+    mark = meter.mark()
+    result = func()
+    return result, _count_calls(meter, mark)
+
+
+def _compare(name: str, keywords_a: List[str], keywords_b: List[str],
+             calls_a: Dict[str, int], calls_b: Dict[str, int]) -> Dict[str, Any]:
+    keywords_a, keywords_b = _normalize(keywords_a), _normalize(keywords_b)
+    return {
+        'step': name,
+        'keywords_a': keywords_a,
+        'keywords_b': keywords_b,
+        'exact_match': keywords_a == keywords_b,
+        'jaccard': round(_jaccard(keywords_a, keywords_b), 4),
+        'calls_a': calls_a,
+        'calls_b': calls_b
+    }
+
+
+def select_documents(docs: int, min_length: int = 200) -> List[Dict[str, str]]:
+    """固定的文档样本：ClueWeb22文档按文件名排序，取前docs篇足够长的文档"""
+    from config import get_config
+
+    selected = []
+    for path in sorted(Path(get_config().clueweb22_path).glob("clueweb22-en*.txt")):
+        content = path.read_text(encoding='utf-8', errors='replace')
+        if len(content) >= min_length:
+            selected.append({'doc_id': path.stem, 'content': content})
+        if len(selected) >= docs:
+            break
+    return selected
+
+
+def run_ab(args: argparse.Namespace, api_key: str) -> Dict[str, Any]:
+    from core.llm_clients.openai_api_client import OpenAIClient
+    from core.llm_clients.metering import get_meter
+    from core_framework import AgentDepthReasoningFramework, ReasoningRunState
+    from utils.local_search import get_local_search_client
+    from utils.search_cache import CachedSearchClient
+    from utils.web_search import web_search
+
+    framework = AgentDepthReasoningFramework()
+    framework.set_api_client(OpenAIClient(api_key=api_key))
+    if args.search_backend == 'local':
+        framework.set_search_client(get_local_search_client())
+    else:
+        remote_client = CachedSearchClient(web_search)
+        framework.set_search_client(lambda query, max_results=5, **kwargs: remote_client(
+            query, max_results=max_results, api_key=api_key, **kwargs))
+    meter = get_meter()
+
+    comparisons = []
+    documents = select_documents(args.docs)
+    for doc_index, document in enumerate(documents, 1):
+        print(f"📄 [{doc_index}/{len(documents)}] {document['doc_id']}")
+        with framework._use_run_state(ReasoningRunState()):
+            framework.fused_keyword_mode = False
+            root_queries = framework._step1_extract_short_answers_and_build_root_queries(
+                document['content'], document['doc_id']
+            )[:args.max_queries]
+
+            for root_query in root_queries:
+                keywords_a, calls_a = _run_path(
+                    framework, meter, False, lambda: framework._step2_extract_minimal_keywords(root_query))
+                keywords_b, calls_b = _run_path(
+                    framework, meter, True, lambda: framework._step2_extract_minimal_keywords(root_query))
+                step2 = _compare('step2', [kw.keyword for kw in keywords_a], [kw.keyword for kw in keywords_b],
+                                 calls_a, calls_b)
+
+                initial_keywords = list(dict.fromkeys(
+                    [kw.keyword for kw in root_query.minimal_keywords] + [kw.keyword for kw in keywords_a]
+                ))
+                minimize = None
+                if initial_keywords:
+                    minimized_a, calls_a = _run_path(framework, meter, False, lambda: framework._optimize_minimal_keywords_precisely(
+                        root_query.query_text, root_query.answer, initial_keywords))
+                    minimized_b, calls_b = _run_path(framework, meter, True, lambda: framework._optimize_minimal_keywords_precisely(
+                        root_query.query_text, root_query.answer, initial_keywords))
+                    minimize = _compare('minimize', minimized_a, minimized_b, calls_a, calls_b)
+
+                comparisons.append({
+                    'doc_id': document['doc_id'],
+                    'query_id': root_query.query_id,
+                    'query_text': root_query.query_text,
+                    'answer': root_query.answer,
+                    'results': [item for item in (step2, minimize) if item]
+                })
+                print(f"   {root_query.query_id}: step2 A={step2['keywords_a']} B={step2['keywords_b']} "
+                      f"calls {step2['calls_a']['calls']}→{step2['calls_b']['calls']}")
+
+    return {'documents': [doc['doc_id'] for doc in documents], 'comparisons': comparisons,
+            'summary': summarize(comparisons)}
+
+
+def summarize(comparisons: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按步骤汇总：关键词一致率、平均Jaccard、两条路径的调用总数与倍数"""
+    summary = {}
+    for step in ('step2', 'minimize', 'total'):
+        items = [item for comparison in comparisons for item in comparison['results']
+                 if step == 'total' or item['step'] == step]
+        if not items:
+            continue
+        calls_a = sum(item['calls_a']['calls'] for item in items)
+        calls_b = sum(item['calls_b']['calls'] for item in items)
+        summary[step] = {
+            'comparisons': len(items),
+            'exact_match_rate': round(sum(item['exact_match'] for item in items) / len(items), 4),
+            'mean_jaccard': round(sum(item['jaccard'] for item in items) / len(items), 4),
+            'calls_a': calls_a,
+            'calls_b': calls_b,
+            'api_calls_a': sum(item['calls_a']['api_calls'] for item in items),
+            'api_calls_b': sum(item['calls_b']['api_calls'] for item in items),
+            'call_reduction': round(calls_a / calls_b, 2) if calls_b else None
+        }
+    return summary
+
+
+def print_report(summary: Dict[str, Any], root_queries: int):
+    print(f"\n📊 Keyword Fusion A/B ({root_queries} 个Root Query; A=多次调用, B=融合)")
+    print(f"   {'step':<10}{'n':>5}{'match':>8}{'jaccard':>9}{'calls A':>9}{'calls B':>9}{'A/B':>7}")
+    for step, stats in summary.items():
+        reduction = f"{stats['call_reduction']:.2f}" if stats['call_reduction'] else '-'
+        print(f"   {step:<10}{stats['comparisons']:>5}{stats['exact_match_rate']:>8.0%}{stats['mean_jaccard']:>9.2f}"
+              f"{stats['calls_a']:>9}{stats['calls_b']:>9}{reduction:>7}")
+
+
+def main():
+    from core.llm_clients.replay_transport import configure_offline_from_argv, point_at_stub_server
+
+    argv = configure_offline_from_argv(sys.argv[1:])
+    parser = argparse.ArgumentParser(description="实验07关键词步骤：多次调用 vs 融合模式 A/B对比")
+    parser.add_argument('--docs', type=int, default=5, help='文档样本数（按文件名排序取前N篇）')
+    parser.add_argument('--max-queries', type=int, default=3, help='每个文档最多比较的Root Query数')
+    parser.add_argument('--search-backend', choices=['local', 'openai'], default='local', help='Step 1使用的搜索后端')
+    parser.add_argument('--stub', action='store_true', help='在本进程启动stub服务器（只用于比较调用数）')
+    parser.add_argument('--output', default=None, help='把逐条对比与汇总写入JSON文件')
+    args = parser.parse_args(argv)
+
+    server = None
+    api_key = os.getenv('OPENAI_API_KEY', '')
+    if args.stub:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from stub_llm_server import StubConfig, start_stub_server
+
+        server = start_stub_server(StubConfig())
+        point_at_stub_server(f"http://127.0.0.1:{server.server_address[1]}")
+        api_key = STUB_API_KEY
+    if not api_key:
+        parser.error("需要 OPENAI_API_KEY（或使用 --stub / --llm-stub=URL / --llm-replay=PATH）")
+
+    try:
+        result = run_ab(args, api_key.split(',')[0].strip())
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print_report(result['summary'], len(result['comparisons']))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 对比结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Offline Pipeline Benchmark
+离线端到端运行实验05 / 06 / 07 的生成流水线，报告吞吐（docs/min）、每文档调用数与各阶段延迟p50/p95
+
+在本进程启动stub LLM服务器（见 stub_llm_server.py，可回放录制文件），每个实验在独立子进程中运行
+（各实验目录有同名模块，如config），子进程的 OPENAI_BASE_URL / ANTHROPIC_BASE_URL 指向stub，
+使用临时的响应缓存与工作目录，不会访问真实API也不会写入仓库的结果目录。
+每次LLM调用的阶段与耗时来自 core.llm_clients.metering 的调用记录。
+
+- 05: FourWayComparativeExperiment.process_topic_with_llm（报告 → 问题 → 答案），每个主题取 --docs 篇文档
+- 06: FinalOptimizedExperiment.process_topic（主题多文档融合报告 → 短答案深度问题）
+- 07: AgentReasoningMainFramework 的推理树生成（不导出Excel），每个主题取 --docs 篇文档；
+      --search-backend local 时Web搜索改用本地BM25索引（utils/local_search.py）
+
+用法:
+    python tools/benchmarks/offline_pipeline_benchmark.py --experiments 05,06,07 --topics 1 --docs 5
+    python tools/benchmarks/offline_pipeline_benchmark.py --experiments 07 --search-backend local
+    python tools/benchmarks/offline_pipeline_benchmark.py --replay .cache/llm_recordings.jsonl --replay-latency-scale 1
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+EXPERIMENT_DIRS = {
+    '05': project_root / "experiments" / "05_comparative",
+    '06': project_root / "experiments" / "06_short_answer_deep_query",
+    '07': project_root / "experiments" / "07_tree_extension_deep_query",
+}
+
+STUB_API_KEY = "stub-offline-key"
+
+
+# ---------------------------------------------------------------------------
+# 子进程：运行单个实验
+# ---------------------------------------------------------------------------
+
+def _run_exp05(args: argparse.Namespace) -> Dict[str, int]:
+    from four_way_comparative_experiment import FourWayComparativeExperiment
+
+    experiment = FourWayComparativeExperiment(STUB_API_KEY, STUB_API_KEY)
+    experiment.clueweb_data_dir = project_root / "data" / "task_file" / "clueweb22_query_results"
+    topics = experiment.prepare_clueweb_data()[:args.topics]
+    model = 'gpt-4o' if args.provider == 'openai' else 'claude-sonnet-4-20250514'
+    documents = 0
+    for topic in topics:
+        topic = dict(topic, documents=topic['documents'][:args.docs])
+        topic['document_count'] = len(topic['documents'])
+        experiment.process_topic_with_llm(topic, args.provider, model, test_mode=not args.full)
+        documents += topic['document_count']
+    return {'items': len(topics), 'documents': documents}
+
+
+def _run_exp06(args: argparse.Namespace) -> Dict[str, int]:
+    from final_optimized_experiment import FinalOptimizedExperiment
+
+    experiment = FinalOptimizedExperiment(str(Path.cwd() / "results"))
+    topics = experiment.load_documents("clueweb")[:args.topics]
+    documents = 0
+    for topic in topics:
+        documents += len(topic['data_loader'].load_topic_documents(topic['topic_id']))
+        experiment.process_topic(topic)
+    return {'items': len(topics), 'documents': documents}
+
+
+def _run_exp07(args: argparse.Namespace) -> Dict[str, int]:
+    from main import AgentReasoningMainFramework
+
+    framework = AgentReasoningMainFramework()
+    if not framework.initialize_framework(STUB_API_KEY):
+        raise RuntimeError("exp07框架初始化失败")
+    topics = framework.document_loader.discover_topics()[:args.topics]
+    documents = 0
+    for topic in topics:
+        docs = [
+            {'doc_id': doc.doc_id, 'content': doc.content, 'topic': doc.topic, 'length': len(doc.content)}
+            for doc in framework.document_loader.load_documents_from_topic(topic, args.docs)
+            if len(doc.content) >= 200
+        ][:args.docs]
+        framework._run_agent_reasoning_generation(docs, topic, f"offline_benchmark_{topic}")
+        documents += len(docs)
+    return {'items': len(topics), 'documents': documents}
+
+
+WORKERS = {'05': _run_exp05, '06': _run_exp06, '07': _run_exp07}
+
+
+def run_worker(args: argparse.Namespace):
+    """子进程入口：运行实验并把计量记录写到 --worker-output"""
+    experiment_dir = EXPERIMENT_DIRS[args.worker]
+    sys.path.insert(0, str(experiment_dir))
+
+    from core.llm_clients.metering import get_meter
+    from core.llm_clients.http_transport import get_http_transport
+
+    start_time = time.time()
+    counts = WORKERS[args.worker](args)
+    wall_time = time.time() - start_time
+
+    with open(args.worker_output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'experiment': args.worker,
+            **counts,
+            'wall_time': wall_time,
+            'records': [asdict(r) for r in get_meter().records()],
+            'http': get_http_transport().get_statistics()
+        }, f, ensure_ascii=False)
+
+
+# ---------------------------------------------------------------------------
+# 主进程：启动stub、运行子进程并汇总
+# ---------------------------------------------------------------------------
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """单个实验的吞吐、调用数与按阶段延迟（缓存命中与合并的调用不计入API调用）"""
+    records = result['records']
+    api_calls = [r for r in records if not r['cache_hit'] and not r['coalesced']]
+    documents = result['documents']
+    wall_time = result['wall_time']
+    stages: Dict[str, List[float]] = {}
+    for record in api_calls:
+        stages.setdefault(record['stage'], []).append(record['latency'])
+
+    return {
+        'experiment': result['experiment'],
+        'items': result['items'],
+        'documents': documents,
+        'wall_time': round(wall_time, 2),
+        'docs_per_min': round(documents / wall_time * 60, 2) if wall_time > 0 else 0.0,
+        'api_calls': len(api_calls),
+        'calls_per_doc': round(len(api_calls) / documents, 2) if documents else 0.0,
+        'failed_calls': sum(1 for r in api_calls if not r['success']),
+        'retries': sum(r['retries'] for r in api_calls),
+        'tokens': sum(r['prompt_tokens'] + r['completion_tokens'] for r in api_calls),
+        'stages': {
+            stage: {
+                'calls': len(latencies),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3)
+            }
+            for stage, latencies in sorted(stages.items())
+        }
+    }
+
+
+def run_experiment_subprocess(experiment: str, args: argparse.Namespace, base_url: str,
+                              workdir: Path) -> Dict[str, Any]:
+    """在子进程中运行一个实验，返回其计量结果"""
+    exp_workdir = workdir / f"exp{experiment}"
+    exp_workdir.mkdir(parents=True, exist_ok=True)
+    output_path = exp_workdir / "worker_result.json"
+
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_BASE_URL': f"{base_url}/v1",
+        'ANTHROPIC_BASE_URL': base_url,
+        'OPENAI_API_KEY': STUB_API_KEY,
+        'ANTHROPIC_API_KEY': STUB_API_KEY,
+        'LLM_CACHE_PATH': str(exp_workdir / "llm_cache.sqlite"),
+        'WEB_SEARCH_CACHE_PATH': str(exp_workdir / "web_search_cache.sqlite"),
+        'EXP07_SEARCH_BACKEND': args.search_backend,
+        'PYTHONPATH': os.pathsep.join([str(project_root), env.get('PYTHONPATH', '')]).rstrip(os.pathsep),
+    })
+    # 不使用本机配置的多key池与录制模式（请求全部发往stub）
+    for name in ('OPENAI_API_KEYS', 'ANTHROPIC_API_KEYS', 'CLAUDE_API_KEYS', 'CLAUDE_API_KEY', 'LLM_TRANSPORT_MODE'):
+        env.pop(name, None)
+
+    command = [sys.executable, str(Path(__file__).resolve()), '--worker', experiment,
+               '--worker-output', str(output_path), '--topics', str(args.topics), '--docs', str(args.docs),
+               '--provider', args.provider] + (['--full'] if args.full else [])
+    print(f"▶️  实验{experiment}: 运行中 (工作目录 {exp_workdir})")
+    log_path = exp_workdir / "worker.log"
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        completed = subprocess.run(command, cwd=exp_workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+                                   timeout=args.timeout)
+    if completed.returncode != 0 or not output_path.exists():
+        raise RuntimeError(f"实验{experiment} 运行失败 (exit {completed.returncode})，日志: {log_path}")
+    with open(output_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_report(summaries: List[Dict[str, Any]], stub_stats: Dict[str, Any]):
+    print()
+    print(f"{'exp':<6}{'items':>6}{'docs':>6}{'wall(s)':>10}{'docs/min':>10}{'calls':>8}{'calls/doc':>11}"
+          f"{'failed':>8}{'retries':>9}")
+    for s in summaries:
+        print(f"{s['experiment']:<6}{s['items']:>6}{s['documents']:>6}{s['wall_time']:>10.1f}{s['docs_per_min']:>10.2f}"
+              f"{s['api_calls']:>8}{s['calls_per_doc']:>11.2f}{s['failed_calls']:>8}{s['retries']:>9}")
+    for s in summaries:
+        print(f"\n📊 实验{s['experiment']} 阶段延迟 (秒)")
+        print(f"   {'stage':<28}{'calls':>7}{'p50':>9}{'p95':>9}")
+        for stage, stats in s['stages'].items():
+            print(f"   {stage:<28}{stats['calls']:>7}{stats['p50']:>9.3f}{stats['p95']:>9.3f}")
+    print(f"\n🧪 stub: {stub_stats['requests']} 次请求, 注入429 {stub_stats['rate_limited']} 次, "
+          f"注入5xx {stub_stats['errors']} 次, 回放 {stub_stats['replayed']} 次")
+
+
+def main():
+    from stub_llm_server import add_stub_arguments, stub_config_from_args, start_stub_server
+
+    parser = argparse.ArgumentParser(description="离线端到端流水线基准测试（实验05/06/07）")
+    parser.add_argument('--experiments', default='05,06,07', help='要运行的实验，逗号分隔')
+    parser.add_argument('--topics', type=int, default=1, help='每个实验处理的主题数')
+    parser.add_argument('--docs', type=int, default=5, help='每个主题的文档数（05/07）')
+    parser.add_argument('--provider', choices=['openai', 'claude'], default='openai', help='实验05使用的提供商')
+    parser.add_argument('--full', action='store_true', help='实验05使用完整问题数（默认测试模式）')
+    parser.add_argument('--search-backend', choices=['openai', 'local', 'local_first'], default='openai',
+                        help='实验07的搜索后端（local使用本地BM25索引，不向stub发送搜索请求）')
+    parser.add_argument('--timeout', type=float, default=3600, help='单个实验的超时（秒）')
+    parser.add_argument('--workdir', default=None, help='工作目录（默认临时目录）')
+    parser.add_argument('--output', default=None, help='把汇总写入JSON文件')
+    parser.add_argument('--worker', choices=sorted(WORKERS), help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    experiments = [e.strip() for e in args.experiments.split(',') if e.strip()]
+    unknown = [e for e in experiments if e not in WORKERS]
+    if unknown:
+        parser.error(f"未知实验: {', '.join(unknown)}")
+
+    server = start_stub_server(stub_config_from_args(args))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="offline_benchmark_"))
+
+    print("🚀 Offline Pipeline Benchmark")
+    print(f"   stub: {base_url} (ttft={args.ttft}, {args.tokens_per_second:g} tok/s, "
+          f"completion={args.completion_tokens}, 429={args.rate_limit_prob:g}"
+          f"{', replay=' + args.replay if args.replay else ''})")
+    print(f"   experiments={','.join(experiments)}, topics={args.topics}, docs={args.docs}, workdir={workdir}")
+
+    summaries = []
+    for experiment in experiments:
+        try:
+            result = run_experiment_subprocess(experiment, args, base_url, workdir)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"❌ {e}")
+            continue
+        summaries.append(summarize(result))
+    stub_stats = server.state.snapshot()
+    server.shutdown()
+
+    print_report(summaries, stub_stats)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'experiments': summaries, 'stub': stub_stats, 'config': {
+                k: v for k, v in vars(args).items() if not k.startswith('worker')
+            }}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 汇总已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent))
+    main()
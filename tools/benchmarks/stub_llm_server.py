@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Stub LLM Server
+模拟OpenAI Chat Completions / Responses（web_search）与Anthropic Messages接口的本地服务器，用于离线基准测试
+
+- 延迟：首token延迟按分布采样（fixed / uniform / normal / lognormal），之后按生成速度逐块输出
+- 限流：按概率注入429（带retry-after），也可注入5xx
+- token：completion token数按分布采样（不超过请求的max_tokens），prompt token按请求体长度估算
+- 内容：有JSON Schema（response_format / 强制工具调用）时生成符合schema的JSON；
+  提示词要求 Q1: ... 格式时生成对应数量的问题；提示词中的 "Label: [...]" 输出模板按模板填充；其余为填充文本
+- 回放：--replay 指定录制文件（与 core/llm_clients/replay_transport 通用）时优先返回录制的响应
+- 录制：--record 时作为代理把请求转发到真实API并录制（用于通过官方SDK访问的调用，如web_search）
+
+客户端通过 OPENAI_BASE_URL=http://127.0.0.1:PORT/v1 与 ANTHROPIC_BASE_URL=http://127.0.0.1:PORT 指向本服务器，
+实验入口可使用 --llm-stub=http://127.0.0.1:PORT
+
+用法:
+    python tools/benchmarks/stub_llm_server.py --port 8900 --ttft lognormal:0.6,0.5 --tokens-per-second 80 \\
+        --completion-tokens uniform:150,600 --rate-limit-prob 0.05
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+from core.llm_clients.replay_transport import RecordingStore, request_key, make_entry
+
+DEFAULT_UPSTREAMS = {
+    'openai': "https://api.openai.com",
+    'anthropic': "https://api.anthropic.com",
+}
+
+# 提示词中常见的指令用词，不作为合成内容的词表
+PROMPT_WORDS = {"Generate", "Question", "Questions", "Answer", "Answers", "Output", "Format", "Based", "Provide",
+                "Return", "Your", "Please", "Critical", "Requirements", "Examples", "Example", "Context", "Type",
+                "Reasoning", "Difficulty", "Must", "Should", "Each", "Only", "Make", "Use", "This", "That", "The"}
+
+FALLBACK_VOCABULARY = ["Energy", "Research", "System", "Analysis", "Network", "Model", "Policy",
+                       "Data", "Method", "Framework", "Protocol", "Design", "Material", "Process"]
+
+
+class Distribution:
+    """
+    由规格字符串描述的非负随机分布:
+    fixed:V / uniform:A,B / normal:MEAN,STD / lognormal:MEDIAN,SIGMA
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(':')
+        self.spec = spec
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(',') if p.strip()] if params else []
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"无效的分布规格: {spec}（可选: fixed:V / uniform:A,B / normal:M,S / lognormal:MEDIAN,SIGMA）")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            value = self.params[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            value = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(max(median, 1e-9)), sigma)
+        return max(0.0, value)
+
+
+@dataclass
+class StubConfig:
+    """stub服务器行为配置"""
+    ttft: Distribution = field(default_factory=lambda: Distribution('fixed:0'))
+    tokens_per_second: float = 0.0          # 0表示生成不耗时
+    completion_tokens: Distribution = field(default_factory=lambda: Distribution('uniform:150,400'))
+    rate_limit_prob: float = 0.0
+    retry_after: float = 1.0
+    error_prob: float = 0.0
+    seed: Optional[int] = None
+    replay: Optional[RecordingStore] = None
+    replay_latency_scale: float = 1.0
+    record: Optional[RecordingStore] = None
+    upstreams: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_UPSTREAMS))
+
+
+class StubState:
+    """服务器共享状态：随机数与统计（线程安全）"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'requests': 0, 'rate_limited': 0, 'errors': 0, 'replayed': 0, 'recorded': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0
+        }
+        self.by_endpoint: Dict[str, int] = {}
+
+    def rng(self) -> random.Random:
+        """每个请求独立的随机数生成器（由共享种子派生，线程安全）"""
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def count(self, key: str, value: int = 1):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def count_endpoint(self, path: str):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.by_endpoint[path] = self.by_endpoint.get(path, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'by_endpoint': dict(self.by_endpoint)}
+
+
+# ---------------------------------------------------------------------------
+# 合成内容
+# ---------------------------------------------------------------------------
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(part.get('text', '') for part in content if isinstance(part, dict))
+    return ""
+
+
+def prompt_text(payload: Dict[str, Any]) -> str:
+    """请求中的全部提示词文本（system + messages / Responses API的input）"""
+    parts = [_message_text(payload.get('system'))]
+    for message in payload.get('messages') or []:
+        parts.append(_message_text(message.get('content')))
+    if isinstance(payload.get('input'), str):
+        parts.append(payload['input'])
+    return "\n".join(p for p in parts if p)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def vocabulary(prompt: str) -> List[str]:
+    """从提示词中取专有名词样式的词作为合成内容的词表（让关键词/答案与文档相关）"""
+    words = sorted(set(re.findall(r'\b[A-Z][a-z]{3,}\b', prompt)) - PROMPT_WORDS)
+    return words or FALLBACK_VOCABULARY
+
+
+def filler_text(rng: random.Random, words: List[str], tokens: int) -> str:
+    """约tokens个token的填充文本"""
+    sentences = []
+    count = 0
+    while count < tokens:
+        length = rng.randint(8, 16)
+        sentence = " ".join(rng.choice(words) if rng.random() < 0.4 else rng.choice(
+            ["the", "of", "and", "in", "study", "result", "shows", "which", "was", "reported", "by", "for"])
+            for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        count += int(length * 1.3)
+    return " ".join(sentences)
+
+
+def synthesize_value(schema: Dict[str, Any], rng: random.Random, words: List[str], name: str = "") -> Any:
+    """生成符合JSON Schema的值（判定类布尔字段倾向于让流水线继续）"""
+    if 'enum' in schema:
+        return schema['enum'][0] if rng.random() < 0.6 else rng.choice(schema['enum'])
+    schema_type = schema.get('type')
+    if schema_type == 'object':
+        return {key: synthesize_value(sub, rng, words, key)
+                for key, sub in (schema.get('properties') or {}).items()}
+    if schema_type == 'array':
+        return [synthesize_value(schema.get('items') or {}, rng, words, name) for _ in range(rng.randint(1, 3))]
+    if schema_type == 'boolean':
+        negative = any(marker in name for marker in ('circular', 'correlation', 'expose', 'still_determine'))
+        return (rng.random() < 0.2) if negative else (rng.random() < 0.85)
+    if schema_type == 'integer':
+        return rng.randint(1, 5)
+    if schema_type == 'number':
+        return round(rng.uniform(0.6, 0.95), 2)
+    if name.endswith('text') and 'question' in name:
+        return f"Which {rng.choice(words)} {rng.choice(words)} was reported in the study?"
+    return " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+
+
+def _question_count(prompt: str) -> int:
+    match = re.search(r'(\d+)\s+(?:\w+\s+){0,3}questions', prompt, re.IGNORECASE)
+    return min(int(match.group(1)), 60) if match else 10
+
+
+def _template_labels(prompt: str) -> List[str]:
+    """提示词输出模板中的 'Label: [...]' 标签"""
+    labels = []
+    for label in re.findall(r'^\s*([A-Z][A-Za-z ]{1,30}):\s*\[', prompt, re.MULTILINE):
+        if label not in labels:
+            labels.append(label)
+    return labels
+
+
+def synthesize_text(prompt: str, rng: random.Random, tokens: int) -> str:
+    """按提示词要求的格式生成自由文本"""
+    words = vocabulary(prompt)
+    if re.search(r'\bQ1:', prompt):
+        blocks = []
+        for i in range(1, _question_count(prompt) + 1):
+            blocks.append(
+                f"Q{i}: Which {rng.choice(words)} approach did the {rng.choice(words)} study adopt "
+                f"for {rng.choice(words)} in case {i}?\n"
+                f"Difficulty: {rng.choice(['Easy', 'Medium', 'Hard'])}\n"
+                f"Type: {rng.choice(['factual', 'analytical', 'evaluative'])}\n"
+                f"Reasoning: Tests understanding of {rng.choice(words)}."
+            )
+        return "\n\n".join(blocks)
+    labels = _template_labels(prompt)
+    if labels:
+        lines = []
+        for label in labels:
+            if label.lower() == 'question':
+                lines.append(f"{label}: Which {rng.choice(words)} {rng.choice(words)} was reported in the study?")
+            else:
+                lines.append(f"{label}: {' '.join(rng.choice(words) for _ in range(rng.randint(1, 3)))}")
+        return "\n".join(lines)
+    return filler_text(rng, words, tokens)
+
+
+# ---------------------------------------------------------------------------
+# 请求处理
+# ---------------------------------------------------------------------------
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI / Anthropic 兼容的stub接口（HTTP/1.1 keep-alive，流式响应使用chunked编码）"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- 基础输出 --
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _sse(self, payload: Any, event: Optional[str] = None):
+        text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        prefix = f"event: {event}\n" if event else ""
+        self._write_chunk(f"{prefix}data: {text}\n\n".encode('utf-8'))
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # -- 路由 --
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON body'}})
+            return
+
+        path = self.path.split('?', 1)[0]
+        state = self.state
+        state.count_endpoint(path)
+        config = state.config
+
+        if config.record is not None:
+            self._proxy_and_record(path, payload, raw)
+            return
+        if config.replay is not None:
+            entry = config.replay.lookup(request_key('POST', path, payload))
+            if entry is not None:
+                state.count('replayed')
+                self._send_recorded(entry)
+                return
+
+        rng = state.rng()
+        anthropic = path.endswith('/messages')
+        if rng.random() < config.rate_limit_prob:
+            state.count('rate_limited')
+            self._send_error(429, anthropic, 'rate_limit_error', 'Rate limit exceeded (stub)',
+                             {'retry-after': f"{config.retry_after:g}"})
+            return
+        if rng.random() < config.error_prob:
+            state.count('errors')
+            self._send_error(529 if anthropic else 500, anthropic, 'overloaded_error', 'Overloaded (stub)')
+            return
+
+        if path.endswith('/chat/completions'):
+            self._chat_completions(payload, rng)
+        elif anthropic:
+            self._messages(payload, rng)
+        elif path.endswith('/responses'):
+            self._responses(payload, rng)
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {path}'}})
+
+    def _send_error(self, status: int, anthropic: bool, error_type: str, message: str,
+                    headers: Optional[Dict[str, str]] = None):
+        body = ({'type': 'error', 'error': {'type': error_type, 'message': message}} if anthropic
+                else {'error': {'type': error_type, 'message': message, 'code': error_type}})
+        self._send_json(status, body, headers)
+
+    def _send_recorded(self, entry: Dict[str, Any]):
+        scale = self.state.config.replay_latency_scale
+        if scale > 0:
+            time.sleep(entry.get('latency', 0.0) * scale)
+        data = entry.get('body', '').encode('utf-8')
+        self.send_response(entry['status_code'])
+        for name, value in (entry.get('headers') or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _proxy_and_record(self, path: str, payload: Dict[str, Any], raw: bytes):
+        """把请求转发到真实API（完整读取后返回给客户端）并录制"""
+        provider = 'anthropic' if path.startswith('/v1/messages') else 'openai'
+        forward_headers = {name: value for name, value in self.headers.items()
+                           if name.lower() in ('authorization', 'x-api-key', 'anthropic-version',
+                                               'anthropic-beta', 'content-type', 'openai-organization')}
+        start_time = time.time()
+        try:
+            response = requests.post(self.state.config.upstreams[provider] + path, data=raw,
+                                     headers=forward_headers, timeout=600)
+        except requests.exceptions.RequestException as e:
+            self._send_error(502, provider == 'anthropic', 'upstream_error', str(e))
+            return
+        entry = make_entry('POST', path, payload, response.status_code, response.headers, response.content,
+                           time.time() - start_time)
+        self.state.config.record.append(entry)
+        self.state.count('recorded')
+        self._send_recorded(dict(entry, latency=0.0))
+
+    # -- 合成响应 --
+
+    def _plan(self, payload: Dict[str, Any], rng: random.Random) -> Tuple[int, int, float, float]:
+        """(prompt_tokens, completion_tokens, 首token延迟, 生成耗时)"""
+        config = self.state.config
+        prompt_tokens = estimate_tokens(json.dumps(payload, ensure_ascii=False))
+        max_tokens = payload.get('max_tokens') or payload.get('max_output_tokens') or 4096
+        completion_tokens = max(1, min(int(config.completion_tokens.sample(rng)), int(max_tokens)))
+        generation_time = completion_tokens / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        self.state.count('prompt_tokens', prompt_tokens)
+        self.state.count('completion_tokens', completion_tokens)
+        return prompt_tokens, completion_tokens, config.ttft.sample(rng), generation_time
+
+    @staticmethod
+    def _pieces(text: str, count: int = 40) -> List[str]:
+        size = max(1, math.ceil(len(text) / count))
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def _chat_completions(self, payload: Dict[str, Any], rng: random.Random):
+        prompt = prompt_text(payload)
+        prompt_tokens, completion_tokens, ttft, generation_time = self._plan(payload, rng)
+        json_schema = ((payload.get('response_format') or {}).get('json_schema') or {}).get('schema')
+        if json_schema:
+            content = json.dumps(synthesize_value(json_schema, rng, vocabulary(prompt)), ensure_ascii=False)
+        else:
+            content = synthesize_text(prompt, rng, completion_tokens)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        model = payload.get('model', 'stub')
+
+        time.sleep(ttft)
+        if not payload.get('stream'):
+            time.sleep(generation_time)
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': 'stop'}],
+                'usage': usage
+            })
+            return
+
+        pieces = self._pieces(content)
+        self._start_stream()
+        for piece in pieces:
+            self._sse({'id': completion_id, 'object': 'chat.completion.chunk', 'model': model,
+                       'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]})
+            time.sleep(generation_time / len(pieces))
+        self._sse({'id': completion_id, 'object': 'chat.completion.chunk', 'model': model,
+                   'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            self._sse({'id': completion_id, 'object': 'chat.completion.chunk', 'model': model,
+                       'choices': [], 'usage': usage})
+        self._sse('[DONE]')
+        self._end_stream()
+
+    def _messages(self, payload: Dict[str, Any], rng: random.Random):
+        prompt = prompt_text(payload)
+        prompt_tokens, completion_tokens, ttft, generation_time = self._plan(payload, rng)
+        tool_name = (payload.get('tool_choice') or {}).get('name')
+        tool = next((t for t in payload.get('tools') or [] if t.get('name') == tool_name), None)
+        message_id = f"msg_stub_{uuid.uuid4().hex[:12]}"
+        model = payload.get('model', 'stub')
+        usage = {'input_tokens': prompt_tokens, 'output_tokens': completion_tokens}
+        if tool is not None:
+            tool_input = synthesize_value(tool.get('input_schema') or {}, rng, vocabulary(prompt))
+            block = {'type': 'tool_use', 'id': f"toolu_stub_{uuid.uuid4().hex[:12]}", 'name': tool_name,
+                     'input': tool_input}
+            stop_reason = 'tool_use'
+        else:
+            block = {'type': 'text', 'text': synthesize_text(prompt, rng, completion_tokens)}
+            stop_reason = 'end_turn'
+
+        time.sleep(ttft)
+        if not payload.get('stream'):
+            time.sleep(generation_time)
+            self._send_json(200, {
+                'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model,
+                'content': [block], 'stop_reason': stop_reason, 'usage': usage
+            })
+            return
+
+        self._start_stream()
+        self._sse({'type': 'message_start', 'message': {
+            'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model, 'content': [],
+            'usage': {'input_tokens': prompt_tokens, 'output_tokens': 1}}}, event='message_start')
+        if block['type'] == 'tool_use':
+            start_block = dict(block, input={})
+            text, delta_type, delta_key = json.dumps(block['input'], ensure_ascii=False), 'input_json_delta', 'partial_json'
+        else:
+            start_block = {'type': 'text', 'text': ''}
+            text, delta_type, delta_key = block['text'], 'text_delta', 'text'
+        self._sse({'type': 'content_block_start', 'index': 0, 'content_block': start_block},
+                  event='content_block_start')
+        pieces = self._pieces(text)
+        for piece in pieces:
+            self._sse({'type': 'content_block_delta', 'index': 0, 'delta': {'type': delta_type, delta_key: piece}},
+                      event='content_block_delta')
+            time.sleep(generation_time / len(pieces))
+        self._sse({'type': 'content_block_stop', 'index': 0}, event='content_block_stop')
+        self._sse({'type': 'message_delta', 'delta': {'stop_reason': stop_reason},
+                   'usage': {'output_tokens': completion_tokens}}, event='message_delta')
+        self._sse({'type': 'message_stop'}, event='message_stop')
+        self._end_stream()
+
+    def _responses(self, payload: Dict[str, Any], rng: random.Random):
+        """Responses API（web_search_preview）：一次搜索调用 + 带url_citation标注的回答"""
+        prompt = prompt_text(payload)
+        prompt_tokens, completion_tokens, ttft, generation_time = self._plan(payload, rng)
+        words = vocabulary(prompt)
+        sentences = [filler_text(rng, words, 25) for _ in range(3)]
+        text = " ".join(sentences)
+        annotations = []
+        offset = 0
+        for i, sentence in enumerate(sentences):
+            annotations.append({
+                'type': 'url_citation', 'url': f"https://example.org/stub/{rng.choice(words).lower()}-{i}",
+                'title': f"{rng.choice(words)} {rng.choice(words)} reference",
+                'start_index': offset, 'end_index': offset + len(sentence)
+            })
+            offset += len(sentence) + 1
+        time.sleep(ttft + generation_time)
+        self._send_json(200, {
+            'id': f"resp_stub_{uuid.uuid4().hex[:12]}", 'object': 'response', 'created_at': int(time.time()),
+            'model': payload.get('model', 'stub'), 'status': 'completed',
+            'output': [
+                {'type': 'web_search_call', 'id': f"ws_stub_{uuid.uuid4().hex[:12]}", 'status': 'completed'},
+                {'type': 'message', 'id': f"msg_stub_{uuid.uuid4().hex[:12]}", 'role': 'assistant',
+                 'status': 'completed',
+                 'content': [{'type': 'output_text', 'text': text, 'annotations': annotations}]}
+            ],
+            'usage': {'input_tokens': prompt_tokens, 'output_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        })
+
+
+def start_stub_server(config: StubConfig, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动stub服务器（port=0时自动分配），server.state 为共享状态与统计"""
+    state = StubState(config)
+    handler = type('BoundStubLLMHandler', (StubLLMHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True)
+    thread.start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """stub行为参数（基准测试脚本共用）"""
+    parser.add_argument('--ttft', default='lognormal:0.5,0.4', help='首token延迟分布（秒）')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help='生成速度，0表示不耗时')
+    parser.add_argument('--completion-tokens', default='uniform:150,500', help='completion token数分布')
+    parser.add_argument('--rate-limit-prob', type=float, default=0.0, help='注入429的概率')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='429响应的retry-after（秒）')
+    parser.add_argument('--error-prob', type=float, default=0.0, help='注入5xx的概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--replay', default=None, help='录制文件：有录制的请求返回录制的响应')
+    parser.add_argument('--replay-latency-scale', type=float, default=1.0, help='回放时按录制耗时的倍数等待')
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        ttft=Distribution(args.ttft),
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=Distribution(args.completion_tokens),
+        rate_limit_prob=args.rate_limit_prob,
+        retry_after=args.retry_after,
+        error_prob=args.error_prob,
+        seed=args.seed,
+        replay=RecordingStore(args.replay) if args.replay else None,
+        replay_latency_scale=args.replay_latency_scale
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI / Anthropic 兼容的stub LLM服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--record', default=None, help='代理录制模式：转发到真实API并写入该录制文件')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    config = stub_config_from_args(args)
+    if args.record:
+        config.record = RecordingStore(args.record)
+    server = start_stub_server(config, args.host, args.port)
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+
+    print("🧪 Stub LLM Server")
+    print(f"   mode: {'record -> ' + args.record if args.record else 'synthetic' + (' + replay' if args.replay else '')}")
+    print(f"   OPENAI_BASE_URL={base_url}/v1")
+    print(f"   ANTHROPIC_BASE_URL={base_url}")
+    print(f"   stats: {base_url}/stats")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n📊 {json.dumps(server.state.snapshot(), ensure_ascii=False)}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()